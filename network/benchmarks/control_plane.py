@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Control-plane scaling benchmark: the controller's table pipeline on
+synthetic topologies, in-process, no Docker.
+
+• Generates each topology with topologies.py (ring, grid, random geometric,
+  fat-tree) at each size and writes its docker-compose.yml.
+• Runs what the controller does at startup with the controller's own code:
+  parse the file into a graph, generate_routing_tables, then
+  calculate_flow_tables, writing every table with save_router_table to a
+  temporary directory.
+• Reports each stage's wall time, peak traced memory and bytes written;
+  save_router_table counts as its own stage, and the time and memory of
+  the saves are not counted again in the stage that made them. Peak
+  memory comes from a second run under tracemalloc, so it does not slow
+  the timed one.
+• Appends every result, tagged with the commit, to --history and compares
+  it with the latest result of an earlier commit for the same topology and
+  size, so a regression shows up as a change from that commit.
+
+Usage:
+  python control_plane.py [--topologies ring,grid,geometric,fat-tree] [--sizes 100,500]
+                          [--encoding json|binary] [--history results/control_plane.jsonl]
+"""
+
+import argparse, json, logging, os, platform, subprocess, sys, tempfile, time, tracemalloc
+from datetime import datetime, timezone
+
+import yaml
+
+import topologies
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../sdn_controller")))
+import main as controller  # noqa: E402
+from router_channel import RouterChannelHub  # noqa: E402
+from table_store import TableStore  # noqa: E402
+from topology import Topology  # noqa: E402
+
+logging.disable(logging.INFO)  # the controller logs every router, link and saved table
+
+STAGES = ("parse", "routing_tables", "flow_tables", "save_router_table")
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "control_plane.jsonl")
+
+# ────────── helpers ────────────────────────────────────────────────
+def commit():
+    """Short hash of the checked-out commit, marked -dirty with uncommitted changes"""
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    head = git("rev-parse", "--short", "HEAD") or "unknown"
+    return head + ("-dirty" if git("status", "--porcelain", "--untracked-files=no") else "")
+
+def traced():
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+class Stages:
+    """Times the pipeline's stages; wraps the controller's save_router_table to account for saves apart"""
+
+    def __init__(self):
+        self.results = {stage: {"ms": 0.0, "peak_mb": 0.0, "written_mb": 0.0, "calls": 0} for stage in STAGES}
+        self.save_router_table = controller.save_router_table
+        self.saving = 0.0  # seconds the running stage spent in saves
+        self.peak = 0      # highest traced memory seen in the running stage before its last reset
+
+    def save(self, router_id, table):
+        memory, peak = traced()
+        self.peak = max(self.peak, peak)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        written = controller.table_store.bytes_written
+        start = time.perf_counter()
+        self.save_router_table(router_id, table)
+        elapsed = time.perf_counter() - start
+        self.saving += elapsed
+        _, peak = traced()
+        self.peak = max(self.peak, peak)
+        self.add("save_router_table", elapsed, peak - memory, controller.table_store.bytes_written - written)
+
+    def add(self, stage, seconds, peak_bytes, written_bytes=0):
+        result = self.results[stage]
+        result["ms"] += 1000 * seconds
+        result["peak_mb"] = max(result["peak_mb"], peak_bytes / 2**20)
+        result["written_mb"] += written_bytes / 2**20
+        result["calls"] += 1
+
+    def run(self, stage, function, *args):
+        """function(*args) as stage; returns its result"""
+        self.saving, self.peak = 0.0, 0
+        memory, _ = traced()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        controller.save_router_table = self.save
+        try:
+            start = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - start
+        finally:
+            controller.save_router_table = self.save_router_table
+        self.add(stage, elapsed - self.saving, max(self.peak, traced()[1]) - memory)
+        return result
+
+def parse(path):
+    with open(path) as f:
+        return controller.build_graph(yaml.safe_load(f))
+
+def pipeline(compose_path, directory, args):
+    """One run of the table pipeline on a fresh controller state; returns its Stages"""
+    controller.topology = Topology()
+    controller.spf_trees = None
+    controller.router_tables.clear()
+    controller.link_measurements.clear()
+    controller.priority_path.reset()
+    controller.path_hold.reset()
+    controller.route_stability.clear()
+    controller.router_hub = RouterChannelHub()
+    controller.table_store = TableStore(directory, args.encoding, fsync=args.fsync)
+
+    stages = Stages()
+    graph = stages.run("parse", parse, compose_path)
+    controller.topology = controller.topology.replaced(graph)
+    stages.run("routing_tables", controller.generate_routing_tables)
+    stages.run("flow_tables", controller.calculate_flow_tables)
+    return stages
+
+# ────────── one topology ───────────────────────────────────────────
+def run(kind, n, args):
+    graph = topologies.generate(kind, n, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        compose_path = os.path.join(directory, "docker-compose.yml")
+        with open(compose_path, "w") as f:
+            yaml.safe_dump(topologies.compose(graph), f, sort_keys=False)
+        tables = os.path.join(directory, "tables")
+        os.mkdir(tables)
+
+        timed = pipeline(compose_path, tables, args)
+        results = timed.results
+        if args.memory:
+            tracemalloc.start()
+            try:
+                traced_run = pipeline(compose_path, tables, args)
+            finally:
+                tracemalloc.stop()
+            for stage in STAGES:
+                results[stage]["peak_mb"] = traced_run.results[stage]["peak_mb"]
+        else:
+            for stage in STAGES:
+                results[stage]["peak_mb"] = None
+        results["parse"]["read_mb"] = os.path.getsize(compose_path) / 2**20
+
+    return {"commit": args.commit, "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(), "machine": platform.machine(),
+            "topology": kind, "routers": graph.number_of_nodes(), "links": graph.number_of_edges(),
+            "encoding": args.encoding, "fsync": args.fsync,
+            "total_ms": sum(results[stage]["ms"] for stage in STAGES),
+            "stages": results}
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def baseline(history, result):
+    """Latest result of another commit for the same topology, size and settings"""
+    for earlier in reversed(history):
+        if (earlier["commit"] != result["commit"]
+                and all(earlier[key] == result[key] for key in ("topology", "routers", "encoding", "fsync"))):
+            return earlier
+    return None
+
+def change(new, old):
+    return f"{100 * (new - old) / old:+.0f}%" if old else "-"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--topologies", default="ring,grid,geometric,fat-tree",
+                    help=f"which of {','.join(topologies.GENERATORS)}")
+    ap.add_argument("--sizes", default="100,500", help="router counts to try (fat-tree rounds down)")
+    ap.add_argument("--encoding", default="json", choices=("json", "binary"), help="table file encoding")
+    ap.add_argument("--no-fsync", dest="fsync", action="store_false", help="write tables without fsync")
+    ap.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc run")
+    ap.add_argument("--history", default=HISTORY, help="JSON lines file results are appended to and compared with")
+    ap.add_argument("--no-record", dest="record", action="store_false", help="compare, but do not append")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    args.commit = commit()
+
+    history = load_history(args.history)
+    print(f"{'':>23} {'parse':>17} {'routing_tables':>17} {'flow_tables':>17} {'save_router_table':>26}")
+    print(f"{'topology':>9} {'routers':>7} {'links':>5}" + f" {'ms':>8} {'MB':>8}" * 3
+          + f" {'ms':>8} {'MB':>8} {'written':>8}  {'total ms':>9}  vs earlier commit")
+    for kind in args.topologies.split(","):
+        for n in (int(s) for s in args.sizes.split(",")):
+            result = run(kind, n, args)
+            stages = result["stages"]
+            columns = ""
+            for stage in STAGES:
+                peak = stages[stage]["peak_mb"]
+                columns += f" {stages[stage]['ms']:>8.1f} " + (f"{peak:>8.1f}" if peak is not None else f"{'-':>8}")
+            earlier = baseline(history, result)
+            versus = ""
+            if earlier is not None:
+                versus = f"{earlier['commit']}: total {change(result['total_ms'], earlier['total_ms'])}, " + \
+                         ", ".join(f"{stage} {change(stages[stage]['ms'], earlier['stages'][stage]['ms'])}"
+                                   for stage in STAGES)
+            print(f"{kind:>9} {result['routers']:>7} {result['links']:>5}{columns}"
+                  f" {stages['save_router_table']['written_mb']:>8.1f}  {result['total_ms']:>9.1f}  {versus}",
+                  flush=True)
+            history.append(result)
+            if args.record:
+                os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+                with open(args.history, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+
+if __name__ == "__main__":
+    main()
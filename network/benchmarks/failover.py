@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Failover benchmark: how long the exchange tunnel stalls when a router on
+its path fails.
+
+• Starts the 10-router topology of docker-compose.yml as local processes on
+  loopback addresses, with the controller's shortest-path flow entries and
+  loop-free alternates (no controller runs, so nothing recomputes routes:
+  recovery is entirely local).
+• One client keeps a closed loop of orders going through the tunnel, with
+  the acking exchange server stand-in from tunnel_rtt.py.
+• Once the loop is steady, freezes a router in the middle of the
+  router1 -> router10 path with SIGSTOP. A hung router keeps its TCP
+  connections open, so only liveness detection notices it; --kill sends
+  SIGKILL instead, which the neighbors see as a reset.
+• Reports the longest gap between two acks (the stall), the orders that
+  never got an ack, and what the routers' liveness counters recorded.
+
+Usage:
+  python failover.py [--victim router6] [--interval-ms 100] [--multiplier 3] [--kill]
+"""
+
+import argparse, json, os, re, signal, socket, struct, tempfile, threading, time
+
+import networkx as nx
+import yaml
+
+from router_runtime import NUM_ROUTERS, latency_report, router_ip, start_routers
+from tunnel_rtt import ACK, AckServer
+from shortest_path_trees import ShortestPathTrees  # on sys.path via router_runtime
+
+COMPOSE_PATH = os.path.join(os.path.dirname(__file__), "../docker-compose.yml")
+
+# ────────── topology helpers ───────────────────────────────────────
+def compose_graph(path=COMPOSE_PATH):
+    """Router graph from the link-X-Y networks of docker-compose.yml, every link weight 1"""
+    with open(path) as f:
+        networks = yaml.safe_load(f).get("networks", {})
+    graph = nx.Graph()
+    for name in networks:
+        match = re.match(r"link-(\d+)-(\d+)$", name)
+        if match:
+            graph.add_edge(f"router{match.group(1)}", f"router{match.group(2)}", weight=1.0)
+    return graph
+
+def write_graph_tables(tables_dir, graph, multipath=1, priority_path=None):
+    """Flow tables as the controller writes them, loop-free alternates (next-hop groups, pinned path) included"""
+    background = graph
+    if priority_path is not None:
+        # As with PRIORITY_PATH=1: other traffic sees the pinned links' weights raised
+        priority_path.update(graph, {})
+        background = graph.copy()
+        for (u, v), weight in priority_path.background_weights(graph).items():
+            background[u][v]["weight"] = weight
+    trees = ShortestPathTrees(background, multipath=multipath)
+    tables = {}
+    for source in graph:
+        table = {
+            "router_id": source,
+            "interfaces": {n: {"ip_address": router_ip(int(n[len("router"):]))} for n in graph[source]},
+            "routes": [],
+            "flow_table": trees.flow_table(source),
+        }
+        if priority_path is not None:
+            table["priority_flows"] = priority_path.flow_entries(source)
+        with open(os.path.join(tables_dir, f"{source}_table.json"), "w") as f:
+            json.dump(table, f)
+        tables[source] = table
+    return tables
+
+def table_path(tables, source, destination):
+    """Routers a frame visits from source to destination, following each router's flow table"""
+    path = [source]
+    while path[-1] != destination:
+        flows = {f["match"]["destination"]: f["action"]["forward_to"] for f in tables[path[-1]]["flow_table"]}
+        path.append(flows[destination])
+    return path
+
+# ────────── one run ────────────────────────────────────────────────
+def run(runtime, args):
+    server = AckServer()
+    graph = compose_graph()
+    acks, lost = [], []
+    with tempfile.TemporaryDirectory() as tables_dir:
+        path = table_path(write_graph_tables(tables_dir, graph), "router1", f"router{NUM_ROUTERS}")
+        victim = args.victim or path[len(path) // 2]
+        procs = start_routers(runtime, tables_dir, args.port, server.port, args.window, args.logs,
+                              extra_env={"LIVENESS_INTERVAL_MS": str(args.interval_ms),
+                                         "LIVENESS_MULTIPLIER": str(args.multiplier)})
+        frozen = procs[int(victim[len("router"):]) - 1]
+        stop = threading.Event()
+
+        def client():
+            s, k = None, 0
+            while not stop.is_set():
+                if s is None:
+                    s = socket.create_connection((router_ip(1), args.port))
+                    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    s.settimeout(args.timeout)
+                oid, k = 10_000_000 + k, k + 1
+                try:
+                    s.sendall(struct.pack("<B I Q B q I", 0, 1, oid, k & 1, 100_00, 1))
+                    reply = b""
+                    while len(reply) < ACK.size:
+                        chunk = s.recv(ACK.size - len(reply))
+                        if not chunk:
+                            raise ConnectionError("router1 closed the session")
+                        reply += chunk
+                    acks.append(time.perf_counter())
+                except (OSError, ConnectionError):
+                    # No ack in time: count the order lost and start a fresh session
+                    lost.append(oid)
+                    s.close()
+                    s = None
+
+        try:
+            time.sleep(args.settle)             # let neighbor links come up
+            thread = threading.Thread(target=client)
+            thread.start()
+            time.sleep(args.before)
+            failed_at = time.perf_counter()
+            os.kill(frozen.pid, signal.SIGKILL if args.kill else signal.SIGSTOP)
+            time.sleep(args.after)
+            stop.set()
+            thread.join()
+            others = [router_ip(i) for i in range(1, NUM_ROUTERS + 1) if f"router{i}" != victim]
+            stats, _ = latency_report.collect(others)
+        finally:
+            frozen.send_signal(signal.SIGCONT)
+            for p in procs: p.terminate()
+            for p in procs: p.wait(timeout=5)
+
+    before = [t for t in acks if t < failed_at]
+    after = [t for t in acks if t >= failed_at]
+    gaps = [b - a for a, b in zip(acks, acks[1:]) if b >= failed_at]
+    liveness = {router: s["liveness"] for router, s in stats.items()}
+    return {
+        "runtime": runtime,
+        "victim": victim,
+        "failure": "kill" if args.kill else "hang",
+        "acks_before": len(before),
+        "acks_after": len(after),
+        "lost": len(lost),
+        "stall_ms": 1000 * max(gaps) if gaps else float("nan"),
+        "detections": sum(l["detections"] for l in liveness.values()),
+        "failovers": sum(l["failovers"] for l in liveness.values()),
+        "liveness": liveness,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--victim", help="router to fail (default: the middle of the router1 -> router10 path)")
+    ap.add_argument("--kill", action="store_true", help="SIGKILL the victim instead of freezing it")
+    ap.add_argument("--interval-ms", type=int, default=100, help="liveness beacon interval")
+    ap.add_argument("--multiplier", type=int, default=3, help="liveness detection multiplier")
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--port", type=int, default=9500)
+    ap.add_argument("--settle", type=float, default=4.0)
+    ap.add_argument("--before", type=float, default=2.0, help="seconds of traffic before the failure")
+    ap.add_argument("--after", type=float, default=3.0, help="seconds of traffic after the failure")
+    ap.add_argument("--timeout", type=float, default=3.0, help="seconds an order waits for its ack")
+    ap.add_argument("--runtimes", default="threaded,asyncio")
+    ap.add_argument("--logs", action="store_true", help="write router output to a file instead of discarding it")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = [run(rt, args) for rt in args.runtimes.split(",")]
+    print(f"{'runtime':<10} {'victim':<9} {'failure':<8} {'acks before/after':>17} {'lost':>5} {'stall ms':>9} "
+          f"{'detected':>9} {'failovers':>10}")
+    for r in results:
+        acks = f"{r['acks_before']}/{r['acks_after']}"
+        print(f"{r['runtime']:<10} {r['victim']:<9} {r['failure']:<8} {acks:>17} {r['lost']:>5} {r['stall_ms']:>9.1f} "
+              f"{r['detections']:>9} {r['failovers']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Multipath benchmark: exchange flows spread over next-hop groups.
+
+• Starts the 10-router topology of docker-compose.yml as local processes on
+  loopback addresses (every link weight 1, so many destinations have
+  several equal-cost next hops), with the acking exchange server stand-in
+  from tunnel_rtt.py.
+• Writes the flow tables as the controller does, once with a single path
+  per destination (--multipath 1) and once with next-hop groups of up to
+  --multipath members. With --pinned, both also pin the exchange path as
+  the controller does with PRIORITY_PATH=1, which takes the tunnel off the
+  groups; without it, the tables match the controller's defaults for the
+  single-path run (MULTIPATH=1, no pinned path).
+• Every client keeps --window orders in flight through the router1 ->
+  router10 tunnel for --seconds and checks that its acks come back in the
+  order it sent the orders.
+• Reports aggregate orders/s, router CPU per order, acks out of order, and
+  how many links carried tunnel traffic (read from the routers' stats
+  endpoints).
+
+Usage:
+  python multipath.py [--clients 16] [--window 8] [--seconds 5] [--multipath 4] [--pinned]
+"""
+
+import argparse, json, socket, struct, tempfile, threading, time
+
+from failover import compose_graph, write_graph_tables
+from priority_path import PriorityPath  # on sys.path via router_runtime
+from router_runtime import NUM_ROUTERS, latency_report, proc_cpu, router_ip, start_routers
+from tunnel_rtt import ACK, AckServer
+
+# ────────── one run ────────────────────────────────────────────────
+def run(runtime, multipath, args):
+    server = AckServer()
+    graph = compose_graph()
+    acked, reordered, errors = [], [], []
+    with tempfile.TemporaryDirectory() as tables_dir:
+        pinned = PriorityPath("router1", f"router{NUM_ROUTERS}") if args.pinned else None
+        tables = write_graph_tables(tables_dir, graph, multipath, pinned)
+        groups = sum(1 for table in tables.values() for flow in table["flow_table"] if "group" in flow["action"])
+        procs = start_routers(runtime, tables_dir, args.port, server.port, args.window, args.logs)
+        stop = threading.Event()
+
+        def client(cid):
+            s = socket.create_connection((router_ip(1), args.port))
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            s.settimeout(args.timeout)
+            sent, expected, count, out_of_order = 0, 0, 0, 0
+
+            def send():
+                nonlocal sent
+                s.sendall(struct.pack("<B I Q B q I", 0, cid, cid * 10_000_000 + sent, sent & 1, 100_00, 1))
+                sent += 1
+
+            try:
+                for _ in range(args.window):
+                    send()
+                buffer = b""
+                while expected < sent:
+                    chunk = s.recv(65536)
+                    if not chunk:
+                        raise ConnectionError("router1 closed the session")
+                    buffer += chunk
+                    while len(buffer) >= ACK.size:
+                        _, oid = ACK.unpack_from(buffer)
+                        buffer = buffer[ACK.size:]
+                        if oid != cid * 10_000_000 + expected:
+                            out_of_order += 1
+                        expected, count = expected + 1, count + 1
+                        if not stop.is_set():
+                            send()
+            except Exception as e:
+                errors.append(f"client {cid}: {e}")
+            finally:
+                s.close()
+                acked.append(count)
+                reordered.append(out_of_order)
+
+        try:
+            time.sleep(args.settle)             # let neighbor links come up
+            threads = [threading.Thread(target=client, args=(c + 1,)) for c in range(args.clients)]
+            start, cpu_start = time.perf_counter(), proc_cpu(procs)
+            for t in threads: t.start()
+            time.sleep(args.seconds)
+            stop.set()
+            for t in threads: t.join()
+            elapsed, cpu = time.perf_counter() - start, proc_cpu(procs) - cpu_start
+            stats, _ = latency_report.collect([router_ip(i) for i in range(1, NUM_ROUTERS + 1)])
+        finally:
+            for p in procs: p.terminate()
+            for p in procs: p.wait(timeout=5)
+    for e in errors:
+        print(f"[{runtime} x{multipath}] {e}")
+    # A link carried the tunnel if it saw at least a tenth of the even share of its busiest direction
+    tx = {(router, neighbor): counters["packets"]
+          for router, s in stats.items() for neighbor, counters in s["tx"].items()}
+    busiest = max(tx.values(), default=0)
+    return {
+        "runtime": runtime,
+        "multipath": multipath,
+        "pinned": args.pinned,
+        "grouped_entries": groups,
+        "orders": sum(acked),
+        "orders_per_s": sum(acked) / elapsed,
+        "cpu_us_per_order": 1e6 * cpu / max(sum(acked), 1),
+        "reordered": sum(reordered),
+        "errors": len(errors),
+        "links_used": sum(1 for packets in tx.values() if packets >= busiest / 10),
+        "tx": {f"{router}->{neighbor}": packets for (router, neighbor), packets in sorted(tx.items())},
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--window", type=int, default=8, help="orders each client keeps in flight")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--multipath", type=int, default=4, help="most members of a next-hop group")
+    ap.add_argument("--pinned", action="store_true", help="pin the exchange path, as PRIORITY_PATH=1 does")
+    ap.add_argument("--port", type=int, default=9600)
+    ap.add_argument("--settle", type=float, default=4.0)
+    ap.add_argument("--timeout", type=float, default=5.0, help="seconds a client waits for an ack")
+    ap.add_argument("--runtimes", default="threaded,asyncio")
+    ap.add_argument("--logs", action="store_true", help="write router output to a file instead of discarding it")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = [run(rt, multipath, args) for rt in args.runtimes.split(",") for multipath in (1, args.multipath)]
+    print(f"{'runtime':<10} {'paths':>5} {'pinned':>6} {'grouped':>8} {'orders':>8} {'orders/s':>9} {'cpu us':>7} "
+          f"{'reordered':>9} {'errors':>6} {'links used':>10}")
+    for r in results:
+        print(f"{r['runtime']:<10} {r['multipath']:>5} {'yes' if r['pinned'] else 'no':>6} {r['grouped_entries']:>8} {r['orders']:>8} "
+              f"{r['orders_per_s']:>9.0f} {r['cpu_us_per_order']:>7.0f} {r['reordered']:>9} {r['errors']:>6} "
+              f"{r['links_used']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
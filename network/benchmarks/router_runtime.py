@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Router runtime benchmark: threaded vs asyncio RouterAgent.
+
+• Starts a 10-router chain (router1 → router10) as local processes, each
+  bound to its own loopback address, plus a sink standing in for the
+  exchange server behind router10.
+• Drives NEW orders into router1 from several exchange clients at once.
+• Reports delivered orders/s at the sink, RSS / thread count of the
+  router processes and their CPU time per forwarded frame for every runtime.
+• --logs keeps router output in a file, as Docker's log driver would,
+  instead of discarding it.
+
+Usage:
+  python router_runtime.py [--orders 20000] [--clients 4] [--window 64] [--logs]
+"""
+
+import argparse, json, os, socket, struct, subprocess, sys, tempfile, threading, time
+
+ROUTER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../router"))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../sdn_controller")))
+import latency_report  # noqa: E402
+NUM_ROUTERS = 10
+ORDER_SIZE = struct.calcsize("<B I Q B q I")
+
+# ────────── topology helpers ───────────────────────────────────────
+def router_ip(i):
+    return f"127.0.1.{i}"
+
+def write_chain_tables(tables_dir, n):
+    """Line topology router1 - router2 - ... - routerN"""
+    for i in range(1, n + 1):
+        neighbors = [j for j in (i - 1, i + 1) if 1 <= j <= n]
+        table = {
+            "router_id": f"router{i}",
+            "interfaces": {f"router{j}": {"ip_address": router_ip(j)} for j in neighbors},
+            "routes": [{"destination": f"router{d}",
+                        "next_hop": f"router{i + 1 if d > i else i - 1}",
+                        "metric": abs(d - i)}
+                       for d in range(1, n + 1) if d != i],
+            "flow_table": [],
+        }
+        with open(os.path.join(tables_dir, f"router{i}_table.json"), "w") as f:
+            json.dump(table, f)
+
+# ────────── exchange server stand-in ───────────────────────────────
+class Sink:
+    """Counts bytes delivered by router10"""
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.received = 0
+        self.last_rx = time.monotonic()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            conn, _ = self.sock.accept()
+            threading.Thread(target=self._drain, args=(conn,), daemon=True).start()
+
+    def _drain(self, conn):
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                return
+            self.received += len(data)
+            self.last_rx = time.monotonic()
+
+# ────────── process helpers ────────────────────────────────────────
+def proc_status(pid):
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.strip()
+    return int(fields["VmRSS"].split()[0]), int(fields["Threads"])
+
+def proc_cpu(procs):
+    """User + system CPU seconds used so far by the given processes"""
+    ticks = 0
+    for p in procs:
+        with open(f"/proc/{p.pid}/stat") as f:
+            fields = f.read().rpartition(")")[2].split()
+        ticks += int(fields[11]) + int(fields[12])  # utime, stime
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+def frames_sent():
+    """Frames all routers have handed to their neighbor links, from their stats endpoints"""
+    stats, _ = latency_report.collect([router_ip(i) for i in range(1, NUM_ROUTERS + 1)])
+    return sum(c["packets"] for s in stats.values() for c in s["tx"].values())
+
+def start_routers(runtime, tables_dir, port, sink_port, window, logs=False, extra_env=None):
+    procs = []
+    output = open(os.path.join(tables_dir, "routers.log"), "ab") if logs else subprocess.DEVNULL
+    for i in range(1, NUM_ROUTERS + 1):
+        env = dict(os.environ, CONTROLLER_CHANNEL="")  # no controller runs here
+        env.update(extra_env or {})
+        env.update(ROUTER_ID=f"router{i}", PORT=str(port),
+                   ROUTER_RUNTIME=runtime, FORWARD_WINDOW=str(window),
+                   LISTEN_HOST=router_ip(i), ROUTER_TABLES_DIR=tables_dir,
+                   EXCHANGE_SERVER=f"127.0.0.1:{sink_port}")
+        procs.append(subprocess.Popen([sys.executable, "main.py"], cwd=ROUTER_DIR, env=env,
+                                      stdout=output, stderr=output))
+    return procs
+
+def drive(port, orders, clients):
+    """Open `clients` exchange connections to router1 and push orders as fast as possible"""
+    per_client = orders // clients
+
+    def client(cid):
+        s = socket.create_connection((router_ip(1), port))
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for k in range(per_client):
+            s.sendall(struct.pack("<B I Q B q I", 0, cid, cid * 10_000_000 + k, k & 1, 100_00, 1))
+        time.sleep(1)
+        s.close()
+
+    threads = [threading.Thread(target=client, args=(c + 1,)) for c in range(clients)]
+    for t in threads: t.start()
+    return threads, per_client * clients
+
+# ────────── one run ────────────────────────────────────────────────
+def run(runtime, args):
+    sink = Sink()
+    with tempfile.TemporaryDirectory() as tables_dir:
+        write_chain_tables(tables_dir, NUM_ROUTERS)
+        procs = start_routers(runtime, tables_dir, args.port, sink.port, args.window, args.logs)
+        try:
+            time.sleep(args.settle)             # let neighbor links come up
+            cpu_start, frames_start = proc_cpu(procs), frames_sent()
+            start = time.monotonic()
+            threads, expected = drive(args.port, args.orders, args.clients)
+            peak_rss = peak_threads = 0
+            deadline = start + args.timeout
+            while sink.received < expected * ORDER_SIZE and time.monotonic() < deadline:
+                rss, nthreads = map(sum, zip(*(proc_status(p.pid) for p in procs)))
+                peak_rss, peak_threads = max(peak_rss, rss), max(peak_threads, nthreads)
+                time.sleep(0.05)
+            elapsed = sink.last_rx - start
+            cpu, frames = proc_cpu(procs) - cpu_start, frames_sent() - frames_start
+            for t in threads: t.join()
+        finally:
+            for p in procs: p.terminate()
+            for p in procs: p.wait(timeout=5)
+    delivered = sink.received // ORDER_SIZE
+    return {
+        "runtime": runtime,
+        "orders_sent": expected,
+        "orders_delivered": delivered,
+        "orders_per_s": delivered / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss / 1024,
+        "peak_threads": peak_threads,
+        "frames": frames,
+        "cpu_us_per_frame": 1e6 * cpu / frames if frames else float("nan"),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--orders", type=int, default=20_000)
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--port", type=int, default=9400)
+    ap.add_argument("--settle", type=float, default=4.0)
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--runtimes", default="threaded,asyncio")
+    ap.add_argument("--logs", action="store_true", help="write router output to a file instead of discarding it")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = [run(rt, args) for rt in args.runtimes.split(",")]
+    print(f"{'runtime':<10} {'sent':>8} {'delivered':>10} {'orders/s':>10} {'RSS MB':>8} {'threads':>8} {'frames':>8} {'CPU us/frame':>13}")
+    for r in results:
+        print(f"{r['runtime']:<10} {r['orders_sent']:>8} {r['orders_delivered']:>10} "
+              f"{r['orders_per_s']:>10.0f} {r['peak_rss_mb']:>8.1f} {r['peak_threads']:>8} {r['frames']:>8} {r['cpu_us_per_frame']:>13.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Routing backend benchmark: all-pairs shortest-path trees, networkx vs csgraph.
+
+• Builds the same synthetic router graphs as spf_recompute.py.
+• Times what a full rebuild computes: every router's weighted tree (flow
+  tables) and its hop-count tree (routes), with the pure-Python 'networkx'
+  backend and the vectorized 'csgraph' one, in-process and sharded over
+  --processes worker processes.
+• On small graphs also times the per-pair nx.shortest_path calls that
+  generate_routing_tables used to make for the routes.
+• Fails loudly if a backend's trees differ from the networkx ones.
+
+Usage:
+  python routing_backends.py [--sizes 10,50,200,500,1000,2000] [--processes 4]
+"""
+
+import argparse, json, time
+
+import networkx as nx
+
+from spf_recompute import synthetic_graph
+from shortest_path_trees import all_shortest_path_trees  # on sys.path via spf_recompute
+import csgraph_backend  # noqa: F401  imported up front, so scipy's import is not timed
+
+# ────────── one size ───────────────────────────────────────────────
+def timed(backend, graph, processes=1):
+    start = time.perf_counter()
+    weighted = all_shortest_path_trees(graph, "weight", backend, processes)
+    middle = time.perf_counter()
+    hops = all_shortest_path_trees(graph, None, backend, processes)
+    return weighted, hops, 1000 * (middle - start), 1000 * (time.perf_counter() - middle)
+
+def run(n, args):
+    graph = synthetic_graph(n, args.degree, args.rewire, args.seed)
+    result = {"routers": n, "links": graph.number_of_edges()}
+
+    if n <= args.per_pair_max:
+        start = time.perf_counter()
+        for source in graph:
+            for target in graph:
+                if source != target:
+                    nx.shortest_path(graph, source, target)
+        result["per_pair_hops_ms"] = 1000 * (time.perf_counter() - start)
+
+    expected = None
+    for name, backend, processes in (("networkx", "networkx", 1), ("csgraph", "csgraph", 1),
+                                     (f"csgraph_x{args.processes}", "csgraph", args.processes)):
+        weighted, hops, weighted_ms, hops_ms = timed(backend, graph, processes)
+        if expected is None:
+            expected = (weighted, hops)
+        elif (weighted, hops) != expected:
+            raise SystemExit(f"{name} trees differ from networkx on {n} routers")
+        result[f"{name}_weighted_ms"] = weighted_ms
+        result[f"{name}_hops_ms"] = hops_ms
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,50,200,500,1000,2000", help="router counts to try")
+    ap.add_argument("--processes", type=int, default=4, help="worker processes of the sharded csgraph run")
+    ap.add_argument("--per-pair-max", type=int, default=200, help="largest size to time per-pair routes on")
+    ap.add_argument("--degree", type=int, default=4, help="links per router before rewiring")
+    ap.add_argument("--rewire", type=float, default=0.2, help="share of links rewired to a random router")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    sharded = f"csgraph_x{args.processes}"
+    print(f"{'':>14} {'per-pair':>9} {'networkx':>19} {'csgraph':>19} {sharded:>19}")
+    print(f"{'routers':>7} {'links':>6} {'hops ms':>9}" + f" {'weighted':>9} {'hops':>9}" * 3)
+    results = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        r = run(n, args)
+        results.append(r)
+        per_pair = f"{r['per_pair_hops_ms']:>9.1f}" if "per_pair_hops_ms" in r else f"{'-':>9}"
+        columns = " ".join(f"{r[f'{name}_weighted_ms']:>9.1f} {r[f'{name}_hops_ms']:>9.1f}"
+                           for name in ("networkx", "csgraph", sharded))
+        print(f"{r['routers']:>7} {r['links']:>6} {per_pair} {columns}", flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
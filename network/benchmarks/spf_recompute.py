@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Flow table recompute benchmark: incremental SPF vs a full rebuild.
+
+• Builds synthetic router graphs (connected small worlds: every router
+  linked to its nearest neighbors on a ring, some links rewired at random)
+  with link weights spread like measured round trips.
+• Times a full rebuild, what the controller used to do on every metrics
+  report: every router's shortest-path tree and every flow table.
+• Then changes one link weight at a time by up to ±--jitter, like a new
+  probe report, and times the incremental path: repair the trees the change
+  reaches and rebuild only the flow entries that read them.
+• Reports both costs, how many trees were repaired and tables recomputed
+  per change, and how many tables actually changed and so would be saved.
+
+Usage:
+  python spf_recompute.py [--sizes 10,50,200,500,1000,2000] [--changes 50] [--jitter 0.2]
+"""
+
+import argparse, json, random, sys, os, time
+
+import networkx as nx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../sdn_controller")))
+from shortest_path_trees import ShortestPathTrees  # noqa: E402
+
+# ────────── topology helpers ───────────────────────────────────────
+def synthetic_graph(n, degree, rewire, seed):
+    """n routers named like the controller's, link weights in ms between 1 and 10"""
+    rng = random.Random(seed)
+    graph = nx.connected_watts_strogatz_graph(n, min(degree, n - 1), rewire, seed=seed)
+    graph = nx.relabel_nodes(graph, {i: f"router{i + 1}" for i in graph})
+    for u, v in graph.edges:
+        graph[u][v]["weight"] = rng.uniform(1.0, 10.0)
+    return graph
+
+def entry_digests(trees, source, destinations=None):
+    """Fingerprint of each flow entry; holding every entry of a 2000-router network would not fit"""
+    if destinations is None:
+        destinations = [d for d in trees.distances[source] if d != source]
+    return {d: hash(repr(trees.flow_entry(source, d))) for d in destinations}
+
+# ────────── one size ───────────────────────────────────────────────
+def run(n, args):
+    graph = synthetic_graph(n, args.degree, args.rewire, args.seed)
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    trees = ShortestPathTrees(graph)
+    full_spf = time.perf_counter() - start
+    start = time.perf_counter()
+    for source in graph:
+        trees.flow_table(source)
+    full_tables = time.perf_counter() - start
+    digests = {source: entry_digests(trees, source) for source in graph}
+
+    spf, tables, repaired, recomputed, entries, saved = [], [], [], [], [], []
+    edges = list(graph.edges)
+    for _ in range(args.changes):
+        u, v = rng.choice(edges)
+        changed_links = {(u, v): graph[u][v]["weight"]}
+        graph[u][v]["weight"] *= rng.uniform(1 - args.jitter, 1 + args.jitter)
+
+        start = time.perf_counter()
+        changed = trees.update(changed_links)
+        stale = trees.stale_entries(changed, changed_links)
+        middle = time.perf_counter()
+        rebuilt = {source: entry_digests(trees, source, destinations) for source, destinations in stale.items()}
+        tables.append(time.perf_counter() - middle)
+        spf.append(middle - start)
+
+        repaired.append(len(changed))
+        recomputed.append(len(stale))
+        entries.append(sum(len(r) for r in rebuilt.values()))
+        saved.append(sum(any(digests[s].get(d) != h for d, h in r.items()) for s, r in rebuilt.items()))
+        for source, r in rebuilt.items():
+            digests[source].update(r)
+
+    mean = lambda values: sum(values) / len(values)
+    return {
+        "routers": n,
+        "links": graph.number_of_edges(),
+        "full_spf_ms": 1000 * full_spf,
+        "full_tables_ms": 1000 * full_tables,
+        "incremental_spf_ms": 1000 * mean(spf),
+        "incremental_tables_ms": 1000 * mean(tables),
+        "trees_repaired": mean(repaired),
+        "tables_recomputed": mean(recomputed),
+        "entries_recomputed": mean(entries),
+        "tables_saved": mean(saved),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,50,200,500,1000,2000", help="router counts to try")
+    ap.add_argument("--changes", type=int, default=50, help="link weight changes per size")
+    ap.add_argument("--jitter", type=float, default=0.2, help="largest relative change of a link weight")
+    ap.add_argument("--degree", type=int, default=4, help="links per router before rewiring")
+    ap.add_argument("--rewire", type=float, default=0.2, help="share of links rewired to a random router")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    print(f"{'routers':>7} {'links':>6} {'full ms':>10} {'incr ms':>9} {'speedup':>8} "
+          f"{'trees':>7} {'tables':>7} {'entries':>9} {'saved':>6}")
+    results = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        r = run(n, args)
+        results.append(r)
+        full = r["full_spf_ms"] + r["full_tables_ms"]
+        incremental = r["incremental_spf_ms"] + r["incremental_tables_ms"]
+        print(f"{r['routers']:>7} {r['links']:>6} {full:>10.1f} {incremental:>9.2f} {full / incremental:>7.0f}x "
+              f"{r['trees_repaired']:>7.1f} {r['tables_recomputed']:>7.1f} {r['entries_recomputed']:>9.0f} "
+              f"{r['tables_saved']:>6.1f}", flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Router table file benchmark: JSON vs the compact binary encoding.
+
+• Builds the same synthetic router graphs as spf_recompute.py and the
+  tables of --routers of their routers: a flow entry and a route to every
+  other router, as the controller saves them.
+• Writes each table with TableStore in both encodings (atomically, without
+  fsync) and reports the file size and the time to write it.
+• Times what a router does with the file: a full load, and for the binary
+  encoding the reload after a link weight change, which decodes only the
+  entries the change reached and reuses the rest.
+• Fails loudly if a decoded table differs from the saved one.
+
+Usage:
+  python table_files.py [--sizes 10,50,200,500,1000,2000] [--routers 20] [--changes 10]
+"""
+
+import argparse, json, os, random, sys, tempfile, time
+
+from spf_recompute import synthetic_graph
+from shortest_path_trees import ShortestPathTrees, all_shortest_path_trees, tree_path  # on sys.path via spf_recompute
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../router")))
+from table_store import TableStore  # noqa: E402
+from table_codec import read_table  # noqa: E402
+
+# ────────── helpers ────────────────────────────────────────────────
+def router_table(graph, trees, hop_parents, source):
+    """Table of source shaped like the controller's: interfaces, flow entries and fewest-hop routes"""
+    routes = []
+    for destination in graph:
+        if destination != source:
+            path = tree_path(hop_parents[source], source, destination)
+            routes.append({"destination": destination, "destination_subnet": "", "next_hop": path[1],
+                           "metric": len(path) - 1})
+    return {"router_id": source,
+            "interfaces": {neighbor: {"ip_address": None} for neighbor in graph[source]},
+            "flow_table": trees.flow_table(source),
+            "routes": routes,
+            "ports": {}}
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, 1000 * (time.perf_counter() - start)
+
+# ────────── one size ───────────────────────────────────────────────
+def run(n, args, directory):
+    graph = synthetic_graph(n, args.degree, args.rewire, args.seed)
+    rng = random.Random(args.seed)
+    trees = ShortestPathTrees(graph)
+    _, hop_parents = all_shortest_path_trees(graph, None)
+    sources = rng.sample(list(graph), min(args.routers, n))
+    tables = {source: router_table(graph, trees, hop_parents, source) for source in sources}
+
+    result = {"routers": n}
+    stores = {encoding: TableStore(os.path.join(directory, f"{encoding}{n}"), encoding, fsync=False)
+              for encoding in ("json", "binary")}
+    held = {}
+    for encoding, store in stores.items():
+        os.makedirs(store.directory)
+        writes, loads = [], []
+        for source, table in tables.items():
+            saved, ms = timed(store.save, source, table)
+            writes.append(ms)
+            loaded, ms = timed(read_table, store.path(source))
+            loads.append(ms)
+            if loaded != saved:
+                raise SystemExit(f"{encoding} table of {source} does not read back on {n} routers")
+            held[encoding, source] = loaded
+        result[f"{encoding}_bytes"] = sum(os.path.getsize(store.path(s)) for s in sources) / len(sources)
+        result[f"{encoding}_write_ms"] = sum(writes) / len(writes)
+        result[f"{encoding}_load_ms"] = sum(loads) / len(loads)
+
+    # Link weight changes: the controller saves the tables they changed, routers reload them
+    store, reloads, decoded = stores["binary"], [], []
+    edges = list(graph.edges)
+    for _ in range(args.changes):
+        u, v = rng.choice(edges)
+        changed_links = {(u, v): graph[u][v]["weight"]}
+        graph[u][v]["weight"] *= rng.uniform(1 - args.jitter, 1 + args.jitter)
+        stale = trees.stale_entries(trees.update(changed_links), changed_links)
+        for source in sources:
+            if source not in stale:
+                continue
+            old = store.tables[source]
+            table = store.save(source, dict(old, flow_table=trees.flow_table(source, old["flow_table"], stale[source])))
+            if table is old:
+                continue
+            previous = held["binary", source]
+            loaded, ms = timed(read_table, store.path(source), previous)
+            if loaded != table:
+                raise SystemExit(f"reloaded table of {source} differs from the saved one on {n} routers")
+            reloads.append(ms)
+            decoded.append(sum(new is not kept for new, kept in zip(loaded["flow_table"], previous["flow_table"])))
+            held["binary", source] = loaded
+    result["reloads"] = len(reloads)
+    result["binary_reload_ms"] = sum(reloads) / len(reloads) if reloads else 0.0
+    result["decoded_entries"] = sum(decoded) / len(decoded) if decoded else 0.0
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="10,50,200,500,1000,2000", help="router counts to try")
+    ap.add_argument("--routers", type=int, default=20, help="routers per size whose tables are written")
+    ap.add_argument("--changes", type=int, default=10, help="link weight changes per size")
+    ap.add_argument("--jitter", type=float, default=0.2, help="largest relative change of a link weight")
+    ap.add_argument("--degree", type=int, default=4, help="links per router before rewiring")
+    ap.add_argument("--rewire", type=float, default=0.2, help="share of links rewired to a random router")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    print(f"{'':>7} {'KB per table':>17} {'write ms':>17} {'load ms':>17} {'binary reload':>22}")
+    print(f"{'routers':>7}" + f" {'json':>8} {'binary':>8}" * 3 + f" {'ms':>8} {'entries':>8} {'n':>4}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n in (int(s) for s in args.sizes.split(",")):
+            r = run(n, args, directory)
+            results.append(r)
+            print(f"{r['routers']:>7} {r['json_bytes'] / 1024:>8.1f} {r['binary_bytes'] / 1024:>8.1f} "
+                  f"{r['json_write_ms']:>8.2f} {r['binary_write_ms']:>8.2f} "
+                  f"{r['json_load_ms']:>8.2f} {r['binary_load_ms']:>8.2f} "
+                  f"{r['binary_reload_ms']:>8.2f} {r['decoded_entries']:>8.0f} {r['reloads']:>4}", flush=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Synthetic router topologies, as graphs and as docker-compose files.
+
+• ring, grid, random geometric (routers scattered on a unit square, linked
+  to those within a radius, the pieces joined into one network) and
+  fat-tree (k-ary, core / aggregation / edge layers; the size is rounded
+  down to the largest 5k²/4 that fits).
+• compose() turns a graph into the docker-compose.yml the controller
+  parses: a routerN service per router with its host port and an address
+  on each of its link-A-B networks, and each link network with its own
+  /29 subnet.
+
+Usage:
+  python topologies.py grid 100 > docker-compose.yml
+"""
+
+import argparse, ipaddress, math, random, sys
+
+import networkx as nx
+import yaml
+
+LINKS = ipaddress.ip_network("10.0.0.0/8")
+LINK_PREFIX = 29
+
+# ────────── generators ─────────────────────────────────────────────
+def routers(graph):
+    """graph with its nodes renamed router1 … routerN, in node order"""
+    return nx.relabel_nodes(graph, {node: f"router{i}" for i, node in enumerate(graph, 1)})
+
+def ring(n, seed=None):
+    return routers(nx.cycle_graph(n))
+
+def grid(n, seed=None):
+    """The first n routers of a nearly square grid, row by row"""
+    rows = max(int(math.sqrt(n)), 1)
+    columns = math.ceil(n / rows)
+    graph = nx.grid_2d_graph(rows, columns)
+    graph.remove_nodes_from([node for node in list(graph) if node[0] * columns + node[1] >= n])
+    return routers(graph)
+
+def random_geometric(n, seed=1, degree=6):
+    """n routers on a unit square, each linked to about degree others nearby"""
+    radius = math.sqrt(degree / (math.pi * n)) if n > 1 else 1.0
+    graph = nx.random_geometric_graph(n, radius, seed=seed)
+    positions = nx.get_node_attributes(graph, "pos")
+    components = sorted(nx.connected_components(graph), key=len, reverse=True)
+    network = set(components[0])
+    for component in components[1:]:
+        # Join each stray piece to the nearest router already in the network
+        u, v = min(((u, v) for u in component for v in network), key=lambda link: math.dist(
+            positions[link[0]], positions[link[1]]))
+        graph.add_edge(u, v)
+        network |= component
+    for node in graph:
+        del graph.nodes[node]["pos"]
+    return routers(graph)
+
+def fat_tree(n, seed=None):
+    """k-ary fat-tree with the most routers not above n: (k/2)² core, k pods of k/2 aggregation and k/2 edge"""
+    k = 2
+    while 5 * (k + 2) ** 2 // 4 <= n:
+        k += 2
+    half = k // 2
+    graph = nx.Graph()
+    core = [("core", i) for i in range(half * half)]
+    graph.add_nodes_from(core)
+    for pod in range(k):
+        aggregation = [("aggregation", pod, i) for i in range(half)]
+        edge = [("edge", pod, i) for i in range(half)]
+        graph.add_nodes_from(aggregation + edge)
+        for i, switch in enumerate(aggregation):
+            graph.add_edges_from((switch, core[i * half + j]) for j in range(half))
+            graph.add_edges_from((switch, lower) for lower in edge)
+    return routers(graph)
+
+GENERATORS = {"ring": ring, "grid": grid, "geometric": random_geometric, "fat-tree": fat_tree}
+
+def generate(kind, n, seed=1):
+    return GENERATORS[kind](n, seed=seed)
+
+# ────────── docker-compose ─────────────────────────────────────────
+def compose(graph):
+    """docker-compose.yml contents for graph's routers, linked as in graph"""
+    subnets = LINKS.subnets(new_prefix=LINK_PREFIX)
+    services = {name: {"build": "./router", "ports": [f"{8000 + i}:8000"], "networks": {}}
+                for i, name in enumerate(graph, 1)}
+    networks = {}
+    for u, v in graph.edges:
+        a, b = sorted((int(u[len("router"):]), int(v[len("router"):])))
+        name = f"link-{a}-{b}"
+        subnet = next(subnets)
+        hosts = subnet.hosts()
+        networks[name] = {"driver": "bridge", "ipam": {"config": [{"subnet": str(subnet)}]}}
+        services[f"router{a}"]["networks"][name] = {"ipv4_address": str(next(hosts))}
+        services[f"router{b}"]["networks"][name] = {"ipv4_address": str(next(hosts))}
+    return {"services": services, "networks": networks}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("kind", choices=sorted(GENERATORS))
+    ap.add_argument("routers", type=int)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    yaml.safe_dump(compose(generate(args.kind, args.routers, args.seed)), sys.stdout, sort_keys=False)
+
+if __name__ == "__main__":
+    main()
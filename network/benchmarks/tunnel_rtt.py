@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Exchange tunnel round-trip benchmark.
+
+• Starts the same 10-router loopback chain as router_runtime.py, with an
+  acking stand-in for the exchange server behind router10 that answers every
+  NEW order with an 'A' ack on the connection it came in on.
+• Each client sends one order, waits for its ack to come back through the
+  tunnel to its own socket, then sends the next.
+• Reports per-runtime round-trip latency percentiles, and fails loudly if an
+  ack reaches the wrong client.
+• With --breakdown, also collects every router's stats endpoint and prints
+  the per-hop latency breakdown of both tunnel directions.
+
+Usage:
+  python tunnel_rtt.py [--orders 500] [--clients 8] [--breakdown]
+"""
+
+import argparse, json, socket, struct, tempfile, threading, time
+
+from router_runtime import (NUM_ROUTERS, ORDER_SIZE, frames_sent, latency_report, proc_cpu, router_ip,
+                            start_routers, write_chain_tables)
+
+ACK = struct.Struct("<cQ")
+
+# ────────── exchange server stand-in ───────────────────────────────
+class AckServer:
+    """Acks every NEW order on the connection that carried it"""
+    def __init__(self):
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.connections = 0
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            conn, _ = self.sock.accept()
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        buf = b""
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                conn.close()
+                return
+            buf += data
+            while len(buf) >= ORDER_SIZE:
+                oid = struct.unpack_from("<Q", buf, 5)[0]
+                buf = buf[ORDER_SIZE:]
+                conn.sendall(ACK.pack(b"A", oid))
+
+# ────────── one run ────────────────────────────────────────────────
+def run(runtime, args):
+    server = AckServer()
+    samples, errors = [], []
+    with tempfile.TemporaryDirectory() as tables_dir:
+        write_chain_tables(tables_dir, NUM_ROUTERS)
+        procs = start_routers(runtime, tables_dir, args.port, server.port, args.window, args.logs)
+        try:
+            time.sleep(args.settle)             # let neighbor links come up
+            cpu_start, frames_start = proc_cpu(procs), frames_sent()
+
+            def client(cid):
+                s = socket.create_connection((router_ip(1), args.port))
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                s.settimeout(args.timeout)
+                try:
+                    for k in range(args.orders):
+                        oid = cid * 10_000_000 + k
+                        start = time.perf_counter()
+                        s.sendall(struct.pack("<B I Q B q I", 0, cid, oid, k & 1, 100_00, 1))
+                        reply = b""
+                        while len(reply) < ACK.size:
+                            chunk = s.recv(ACK.size - len(reply))
+                            if not chunk:
+                                raise ConnectionError("router1 closed the session")
+                            reply += chunk
+                        samples.append(time.perf_counter() - start)
+                        if ACK.unpack(reply) != (b"A", oid):
+                            raise AssertionError(f"client {cid} got {ACK.unpack(reply)}, expected ack {oid}")
+                except Exception as e:
+                    errors.append(f"client {cid}: {e}")
+                finally:
+                    s.close()
+
+            threads = [threading.Thread(target=client, args=(c + 1,)) for c in range(args.clients)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            cpu, frames = proc_cpu(procs) - cpu_start, frames_sent() - frames_start
+
+            if args.breakdown:
+                stats, unreachable = latency_report.collect([router_ip(i) for i in range(1, NUM_ROUTERS + 1)])
+                print(f"[{runtime}] per-hop breakdown ({len(unreachable)} routers unreachable)")
+                print(latency_report.format_breakdown(latency_report.breakdown(stats)))
+        finally:
+            for p in procs: p.terminate()
+            for p in procs: p.wait(timeout=5)
+    for e in errors:
+        print(f"[{runtime}] {e}")
+    samples.sort()
+    pct = lambda q: 1000 * samples[min(len(samples) - 1, int(q * len(samples)))] if samples else float("nan")
+    return {
+        "runtime": runtime,
+        "round_trips": len(samples),
+        "errors": len(errors),
+        "server_connections": server.connections,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "max_ms": 1000 * samples[-1] if samples else float("nan"),
+        "frames": frames,
+        "cpu_us_per_frame": 1e6 * cpu / frames if frames else float("nan"),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--orders", type=int, default=500, help="round trips per client")
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--window", type=int, default=64)
+    ap.add_argument("--port", type=int, default=9450)
+    ap.add_argument("--settle", type=float, default=4.0)
+    ap.add_argument("--timeout", type=float, default=10.0)
+    ap.add_argument("--runtimes", default="threaded,asyncio")
+    ap.add_argument("--breakdown", action="store_true", help="print the per-hop latency breakdown")
+    ap.add_argument("--logs", action="store_true", help="write router output to a file instead of discarding it")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    results = [run(rt, args) for rt in args.runtimes.split(",")]
+    print(f"{'runtime':<10} {'trips':>7} {'errors':>7} {'sessions':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'frames':>7} {'CPU us/frame':>13}")
+    for r in results:
+        print(f"{r['runtime']:<10} {r['round_trips']:>7} {r['errors']:>7} {r['server_connections']:>9} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f} {r['frames']:>7} {r['cpu_us_per_frame']:>13.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,832 @@
+# async_agent.py
+"""asyncio runtime for the router agent.
+
+AsyncRouterAgent keeps the wire protocol and message semantics of the
+threaded RouterAgent (JSON hello handshake, binary exchange frames,
+pipelined links with cumulative acks, heartbeats, table reloads and SDN
+metric reports) but runs the listener, every neighbor link and every
+periodic task as coroutines on a single event loop.
+"""
+import asyncio
+import json
+import random
+import time
+
+import requests
+
+from framing import (
+    FRAME_EXCHANGE_DATA, FRAME_EXCHANGE_RESPONSE, FRAME_ACK, FRAME_CONTROL,
+    ACK_OK, ACK_NO_ROUTE, ACK_ERROR, STREAM_FIN,
+    Frame, encode_frame, encode_ack, encode_liveness, read_frame_async,
+)
+from latency import start_stats_server
+from main import RouterAgent, logger, traffic_class
+from packet_trace import (
+    TRACE_RECEIVE, TRACE_ENTER, TRACE_FORWARD, TRACE_SLOW_PATH, TRACE_DELIVER, TRACE_DROP,
+)
+from stream import RECV_SIZE, AsyncBatchingWriter, MessageReassembler, read_message_async
+from table_watcher import TableWatcher
+
+
+class AsyncLink:
+    """Event-loop counterpart of PipelinedLink: one neighbor stream with a send window"""
+
+    def __init__(self, router_id, neighbor_id, reader, writer, window=64, ack_timeout=5.0, initial=b""):
+        self.router_id = router_id
+        self.neighbor_id = neighbor_id
+        self.reader = reader
+        self.writer = writer
+        self.window = max(1, window)
+        self.ack_timeout = ack_timeout
+        self.closed = False
+        self.last_activity = time.time()
+        self.idle_since = None   # monotonic time the reader started waiting for bytes, None while it handles a batch
+        self.detect_time = None  # seconds of silence after which the neighbor is declared down (liveness.py)
+
+        self.next_seq = 1
+        self.acked_seq = 0
+        self.unacked = {}  # seq -> frame, in send order
+        self.slots = asyncio.Semaphore(self.window)
+
+        # asyncio already sets TCP_NODELAY; frames written in one loop iteration go out together
+        self.batcher = AsyncBatchingWriter(writer)
+        self.reassembler = MessageReassembler(initial)  # may hold bytes read with the handshake
+
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.frames_failed = 0  # acked with ACK_NO_ROUTE or ACK_ERROR: the neighbor dropped them
+
+    @property
+    def in_flight(self):
+        return len(self.unacked)
+
+    async def send(self, frame):
+        """Queue a frame on the link; waits only while the window is full"""
+        if self.slots.locked():
+            try:
+                await asyncio.wait_for(self.slots.acquire(), self.ack_timeout)
+            except asyncio.TimeoutError:
+                return False  # Neighbor stopped acknowledging
+        else:
+            await self.slots.acquire()  # Free slot: skip the timeout wrapper
+        if self.closed:
+            return False
+
+        # write() never yields, so frames hit the stream in seq order
+        frame.seq = self.next_seq
+        try:
+            data = encode_frame(frame)
+        except ValueError:
+            self.slots.release()  # Not a frame the link can carry; the link itself is fine
+            raise
+        self.next_seq += 1
+        self.unacked[frame.seq] = frame
+        self.batcher.write(data)
+        self.frames_sent += 1
+        try:
+            await self.batcher.drain()
+        except ConnectionError:
+            pass  # The reader notices the broken stream and reclaims unacked frames
+        return True
+
+    def send_control(self, message):
+        """Send a JSON control message outside the window (seq 0, never acked)"""
+        frame = Frame(FRAME_CONTROL, self.router_id, self.neighbor_id,
+                      json.dumps(message).encode('utf-8'))
+        self.batcher.write(encode_frame(frame))
+
+    def send_ack(self, seq, status=ACK_OK):
+        """Acknowledge every frame up to seq received on this link"""
+        self.batcher.write(encode_ack(self.router_id, self.neighbor_id, status, seq))
+
+    def send_liveness(self, interval_us, multiplier):
+        """Send a liveness beacon outside the window"""
+        self.batcher.write(encode_liveness(self.router_id, self.neighbor_id, interval_us, multiplier))
+
+    async def receive(self):
+        """Every complete message from one read on the link (possibly none)"""
+        messages = list(self.reassembler)
+        if messages:
+            return messages
+        self.idle_since = time.monotonic()
+        try:
+            data = await self.reader.read(RECV_SIZE)
+        finally:
+            self.idle_since = None
+        if not data:
+            raise ConnectionError("Socket closed")
+        self.reassembler.feed(data)
+        return list(self.reassembler)
+
+    def on_ack(self, seq, status=ACK_OK):
+        """Release every window slot covered by a cumulative ack; returns the frame at seq if the ack reports it failed"""
+        failed = None
+        if status != ACK_OK:
+            failed = self.unacked.get(seq)
+            if failed is not None:
+                self.frames_failed += 1
+        if seq <= self.acked_seq:
+            return failed
+        released = 0
+        for pending in list(self.unacked):
+            if pending > seq:
+                break
+            del self.unacked[pending]
+            released += 1
+        self.acked_seq = seq
+        self.frames_acked += released
+        self.last_activity = time.time()
+        for _ in range(released):
+            self.slots.release()
+        return failed
+
+    def close(self):
+        """Close the link and hand back frames the neighbor never acknowledged"""
+        if self.closed:
+            return []
+        self.closed = True
+        pending = list(self.unacked.values())
+        self.unacked.clear()
+        # Wake every sender blocked on the window so it sees the link is closed
+        for _ in range(self.window):
+            self.slots.release()
+        self.writer.close()
+        return pending
+
+
+def close_when_connected(connect):
+    """Close the stream a pending or finished open_connection task produces"""
+    def close(task):
+        if not task.cancelled() and task.exception() is None:
+            task.result()[1].close()
+    connect.add_done_callback(close)
+
+
+class AsyncRouterAgent(RouterAgent):
+    """Router agent running all sockets and timers on one asyncio event loop"""
+
+    # ───────── listener ─────────────────────────────────────────────
+
+    async def handle_connection_async(self, reader, writer):
+        """Handle an incoming connection - could be a packet or a connection request"""
+        addr = writer.get_extra_info('peername')
+        try:
+            data = await reader.read(RECV_SIZE)
+            if not data:
+                writer.close()
+                return
+
+            # Check if this is binary data (exchange client protocol)
+            if data[0] == 0:  # NEW order message type is 0
+                if self.router_id == "router1":
+                    logger.info(f"Received exchange client binary packet from {addr}")
+                    await self.exchange_forwarding_loop_async(reader, writer, data)
+                else:
+                    logger.error(f"Non-router1 received exchange client connection")
+                    writer.close()
+                return
+
+            # Everything else is a binary frame or a JSON message, possibly split
+            # across reads or followed by more bytes (e.g. frames after a hello)
+            reassembler = MessageReassembler(data)
+            try:
+                packet = await read_message_async(reader, reassembler)
+            except json.JSONDecodeError:
+                logger.error(f"Received non-JSON data and not binary exchange format, closing connection")
+                writer.close()
+                return
+
+            # Binary exchange frame from a router without a persistent connection
+            if isinstance(packet, Frame):
+                packet.arrived = time.monotonic_ns()
+                self.tracer.sample(packet, TRACE_RECEIVE, now=packet.arrived)
+                status = await self.handle_frame_async(packet)
+                writer.write(encode_ack(self.router_id, self.previous_hop(packet), status))
+                await writer.drain()
+                return
+
+            packet_type = packet.get('type', 'data')
+            source_router = packet.get('source')
+
+            if packet_type == 'hello' and source_router:
+                accepted = source_router != self.router_id
+                response = {
+                    "type": "hello_ack",
+                    "source": self.router_id,
+                    "destination": source_router,
+                    "status": "accepted" if accepted else "rejected"
+                }
+                if not accepted:
+                    logger.warning(f"Rejecting self-connection request from {source_router}")
+                    response["reason"] = "self-connection"
+                writer.write(json.dumps(response).encode('utf-8'))
+                await writer.drain()
+                if not accepted:
+                    writer.close()
+                    return
+                logger.info(f"Received connection request from {source_router}")
+                self.register_link_async(source_router, reader, writer, addr[0], reassembler.take_rest())
+                return  # Keep connection open
+
+            if packet_type == 'heartbeat' and source_router:
+                writer.write(json.dumps({
+                    "type": "heartbeat_ack",
+                    "source": self.router_id,
+                    "destination": source_router,
+                    "timestamp": time.time()
+                }).encode('utf-8'))
+                await writer.drain()
+                return
+
+            await self.handle_packet_async(writer, packet)
+
+        except Exception as e:
+            logger.error(f"Error handling connection: {e}")
+            writer.close()
+
+    # ───────── neighbor links ───────────────────────────────────────
+
+    def register_link_async(self, neighbor_id, reader, writer, ip_address, initial=b""):
+        """Wrap an established neighbor stream in a link and start its reader task; None if the pool is full"""
+        link = AsyncLink(self.router_id, neighbor_id, reader, writer, self.forward_window, initial=initial)
+        pool = self.neighbor_pool(neighbor_id)
+        if not pool.add(link):
+            logger.info(f"Pool to {neighbor_id} is full, closing the extra link")
+            link.close()
+            return None
+        self.neighbor_connections[neighbor_id] = {
+            'pool': pool,
+            'ip': ip_address,
+            'status': 'connected',
+            'last_activity': time.time()
+        }
+        asyncio.ensure_future(self.monitor_link_async(neighbor_id, link))
+        return link
+
+    async def connect_neighbor_async(self, neighbor_id):
+        """Fill a neighbor's link pool, retrying with the pool's capped exponential backoff"""
+        if neighbor_id == self.router_id or neighbor_id in self.connecting:
+            return
+        ip_address = self.routing_table.get('interfaces', {}).get(neighbor_id, {}).get('ip_address')
+        if not ip_address:
+            logger.error(f"No IP address found for neighbor {neighbor_id}")
+            return
+
+        self.connecting.add(neighbor_id)
+        pool = self.neighbor_pool(neighbor_id)
+        max_retries = 10
+        try:
+            while self.running and pool.deficit and neighbor_id in self.get_neighbors():
+                delay = pool.retry_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer = None
+                try:
+                    logger.info(f"Attempting to connect to neighbor {neighbor_id} at {ip_address}:{self.listen_port}")
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(ip_address, self.listen_port), 5)
+                    writer.write(json.dumps({
+                        "type": "hello",
+                        "source": self.router_id,
+                        "destination": neighbor_id,
+                        "payload": {"type": "connection_request"}
+                    }).encode('utf-8'))
+                    # The neighbor may start sending frames right behind its response
+                    reassembler = MessageReassembler()
+                    response = await asyncio.wait_for(read_message_async(reader, reassembler), 5)
+                    logger.info(f"Connection established with {neighbor_id}, response: {response}")
+                    self.register_link_async(neighbor_id, reader, writer, ip_address, reassembler.take_rest())
+                except Exception as e:
+                    if writer is not None:
+                        writer.close()
+                    delay = pool.connect_failed()
+                    logger.warning(f"Failed to connect to {neighbor_id}: {e}, will retry in {delay:.1f}s")
+                    if pool.failures >= max_retries:
+                        logger.error(f"Failed to establish connection with {neighbor_id} after {max_retries} attempts")
+                        if neighbor_id in self.neighbor_connections and not pool.healthy:
+                            self.neighbor_connections[neighbor_id]['status'] = 'failed'
+                        break
+        finally:
+            self.connecting.discard(neighbor_id)
+
+    async def monitor_link_async(self, router_id, link):
+        """Read frames from an established neighbor link until it closes
+        
+        As in the threaded agent, acks and beacons are applied by the reader and the rest is
+        queued for the link's forwarder task, so a forward awaiting a full window or the
+        exchange server never holds up the acks that would open it.
+        """
+        inbound = asyncio.Queue()
+        forwarder = asyncio.ensure_future(self.forward_link_frames_async(router_id, link, inbound))
+        while self.running and not link.closed:
+            try:
+                # Idle links are reaped by heartbeat_loop_async, not a per-read timeout
+                messages = await link.receive()
+                link.last_activity = time.time()
+
+                conn_info = self.neighbor_connections.get(router_id)
+                if conn_info is not None:
+                    conn_info['last_activity'] = time.time()
+
+                arrived = time.monotonic_ns()  # One clock read per batch; the frames came in together
+                frames = self.handle_link_acks(router_id, link, messages, arrived)
+                if frames:
+                    inbound.put_nowait((frames, arrived))
+
+            except Exception as e:
+                if not link.closed:
+                    logger.error(f"Error monitoring connection to {router_id}: {e}")
+                break
+
+        forwarder.cancel()  # The neighbor re-forwards whatever we did not acknowledge
+        self.link_failed_async(link)
+
+    async def forward_link_frames_async(self, router_id, link, inbound):
+        """Handle the batches a link's reader queued, in order, until the link closes"""
+        while not link.closed:
+            batch = await inbound.get()
+            try:
+                await self.handle_link_messages_async(router_id, link, *batch)
+            except ConnectionError:
+                break  # The reader notices the broken stream
+            except Exception as e:
+                logger.error(f"Error handling frames from {router_id}: {e}")
+
+    async def handle_link_messages_async(self, router_id, link, messages, arrived):
+        """Handle one batch of link messages and acknowledge it with a single cumulative ack"""
+        ack_seq = 0
+        for frame in messages:
+            if isinstance(frame, dict):
+                await self.handle_control_async(router_id, link, frame)  # Bare JSON from an older peer
+                continue
+
+            self.tracer.sample(frame, TRACE_RECEIVE, router_id, arrived)
+
+            # Forwarding renumbers the frame for the next link, so keep our seq
+            seq = frame.seq
+            frame.arrived = arrived
+            self.stats.on_receive(router_id, frame)
+            if frame.type == FRAME_CONTROL:
+                status = await self.handle_control_async(router_id, link, json.loads(bytes(frame.payload).decode('utf-8')))
+            else:
+                status = await self.handle_frame_async(frame)
+
+            # Only failures are acked on their own to report their status
+            if seq:
+                if status == ACK_OK:
+                    ack_seq = seq
+                else:
+                    link.send_ack(seq, status)
+                    ack_seq = 0
+
+        if ack_seq:
+            link.send_ack(ack_seq)
+
+    async def handle_control_async(self, router_id, link, packet):
+        """Handle a JSON message received inside a control frame"""
+        packet_type = packet.get('type', 'data')
+        if packet_type == 'heartbeat':
+            self.answer_heartbeat(router_id, link, packet)
+        elif packet_type == 'heartbeat_ack':
+            self.probe_answered(router_id, packet)
+        elif packet_type == 'data':
+            return await self.handle_packet_async(None, packet)
+        return ACK_OK
+
+    def link_failed_async(self, link):
+        """Tear down a broken link and re-forward frames it never got acknowledged"""
+        pending = link.close()
+        pool = self.neighbor_pool(link.neighbor_id)
+        current = pool.discard(link)  # False if a table change already dropped it
+        if current:
+            logger.info(f"Closed a connection to {link.neighbor_id} ({len(pool.links)} left in pool)")
+            conn_info = self.neighbor_connections.get(link.neighbor_id)
+            if conn_info is not None and not pool.healthy:
+                conn_info['status'] = 'disconnected'
+
+        if pending:
+            logger.warning(f"Re-forwarding {len(pending)} unacknowledged frames from link to {link.neighbor_id}")
+            asyncio.ensure_future(self.reforward_frames_async(pending))
+
+        if current and self.running and link.neighbor_id in self.get_neighbors():
+            asyncio.ensure_future(self.connect_neighbor_async(link.neighbor_id))
+
+    async def reforward_frames_async(self, frames):
+        """Send frames recovered from a failed link along the current best route"""
+        for frame in frames:
+            if not await self.forward_to_destination_async(frame):
+                logger.error(f"Dropped frame for {frame.destination} after link failure")
+
+    def update_neighbor_connections(self, diff=None):
+        """Table updates arrive on the loop thread; hand them to the async version"""
+        asyncio.ensure_future(self.update_neighbor_connections_async(diff))
+
+    async def update_neighbor_connections_async(self, diff=None):
+        """Update links based on current routing table; with a diff, only touch affected neighbors"""
+        neighbors = self.get_neighbors()
+        if diff is None:
+            logger.info(f"Updating neighbor connections. Current neighbors: {neighbors}")
+            stale = [n for n in self.neighbor_connections if n not in neighbors]
+            candidates = neighbors
+        else:
+            stale = diff.removed_neighbors | diff.changed_neighbors
+            candidates = (diff.added_neighbors | diff.changed_neighbors) & set(neighbors)
+
+        for neighbor_id in list(stale):
+            if neighbor_id not in self.neighbor_connections:
+                continue
+            logger.info(f"Closing connection to {neighbor_id} after table change")
+            self.neighbor_connections.pop(neighbor_id)
+            for link in self.neighbor_pool(neighbor_id).clear():
+                link.close()
+
+        for neighbor_id in candidates:
+            if self.neighbor_pool(neighbor_id).deficit:
+                asyncio.ensure_future(self.connect_neighbor_async(neighbor_id))
+
+    # ───────── data path ────────────────────────────────────────────
+
+    async def handle_frame_async(self, frame):
+        """Handle a binary exchange frame: deliver it locally or forward it; returns the ack status"""
+        try:
+            if frame.destination == self.router_id:
+                self.stats.on_deliver(frame)
+                if frame.type == FRAME_EXCHANGE_DATA:
+                    status = ACK_OK if await self.deliver_to_exchange_server_async(frame) else ACK_ERROR
+                else:
+                    status = ACK_OK if await self.deliver_exchange_response_async(frame) else ACK_ERROR
+            else:
+                entry = self.fib.get(frame.destination, traffic_class(frame))
+                if entry is not None:
+                    status = ACK_OK if await self.forward_packet_async(frame, entry.next_hop, entry) else ACK_ERROR
+                else:
+                    logger.error(f"No route to destination {frame.destination}")
+                    status = ACK_NO_ROUTE
+            if frame.traced and (status != ACK_OK or frame.destination == self.router_id):
+                self.tracer.record(TRACE_DELIVER if status == ACK_OK else TRACE_DROP, frame, status=status)
+            return status
+        except Exception as e:
+            logger.error(f"Error handling frame: {e}")
+            return ACK_ERROR
+
+    async def handle_packet_async(self, writer, packet):
+        """Handle a JSON data packet; writer is None when it arrived on a link"""
+        destination = packet.get('destination')
+        if destination == self.router_id:
+            payload = packet.get('payload', {})
+            response = {
+                "status": "delivered",
+                "router": self.router_id,
+                "timestamp": time.time()
+            }
+            if isinstance(payload, dict) and payload.get('type') == 'ping':
+                response["message"] = f"Ping received by {self.router_id}"
+            status = ACK_OK
+        else:
+            next_hop = self.get_next_hop(destination)
+            if next_hop:
+                forward_result = await self.forward_packet_async(packet, next_hop)
+                response = {
+                    "status": "forwarded",
+                    "next_hop": next_hop,
+                    "result": forward_result,
+                    "router": self.router_id
+                }
+                status = ACK_OK if forward_result else ACK_ERROR
+            else:
+                response = {
+                    "status": "error",
+                    "message": f"No route to destination {destination}",
+                    "router": self.router_id
+                }
+                status = ACK_NO_ROUTE
+
+        event = TRACE_DELIVER if destination == self.router_id else TRACE_FORWARD if status == ACK_OK else TRACE_DROP
+        self.tracer.record_packet(event, packet, response.get('next_hop'), status)
+        if writer is not None:
+            writer.write(json.dumps(response).encode('utf-8'))
+            await writer.drain()
+        return status
+
+    async def forward_to_destination_async(self, packet):
+        """Look up the packet's destination once and forward it; False when there is no route"""
+        destination = packet.destination if isinstance(packet, Frame) else packet.get('destination')
+        entry = self.fib.get(destination, traffic_class(packet))
+        if entry is None:
+            logger.error(f"No route to destination {destination}")
+            return False
+        return await self.forward_packet_async(packet, entry.next_hop, entry)
+
+    async def forward_packet_async(self, packet, next_hop, entry=None):
+        """Forward packet to next hop, pipelined over the persistent link when one exists"""
+        if entry is not None and entry.group is not None and isinstance(packet, Frame):
+            # Flows spread over the next-hop group; a stream always hashes to the same member
+            entry = entry.for_stream(packet.stream)
+            next_hop = entry.next_hop
+        if entry is not None and entry.backup is not None:
+            active = entry.active()
+            if active is not entry:
+                # The primary neighbor has no live link: take the loop-free alternate right away
+                entry, next_hop = active, active.next_hop
+                self.liveness.failed_over()
+        self.record_hop(packet, next_hop)
+
+        pool = entry.neighbor if entry is not None else self.neighbor_pool(next_hop)
+        if isinstance(packet, Frame):
+            frame = packet
+        else:
+            # Legacy JSON data packets ride the link inside a control frame
+            packet['type'] = 'data'
+            frame = Frame(FRAME_CONTROL, self.router_id, next_hop, json.dumps(packet).encode('utf-8'))
+
+        # A stream always borrows the same link so its frames stay in order
+        for _ in range(pool.size):
+            link = pool.borrow(frame.stream)
+            if link is None:
+                break
+            if await link.send(frame):
+                return True
+            logger.error(f"Link to {next_hop} stopped acknowledging, tearing it down")
+            self.link_failed_async(link)
+
+        # Pool is empty: make sure it is being refilled, then take the slow path once
+        if pool.can_connect() and next_hop in self.get_neighbors():
+            asyncio.ensure_future(self.connect_neighbor_async(next_hop))
+
+        # Fall back to a one-off connection
+        ip_address = entry.interface_ip if entry is not None else self.fib.interfaces.get(next_hop)
+        if not ip_address:
+            logger.error(f"No IP address found for {next_hop}")
+            return False
+
+        writer = None
+        try:
+            logger.debug("Forwarding to %s at %s:%s (new connection)", next_hop, ip_address, self.listen_port)
+            if isinstance(packet, Frame) and packet.traced:
+                self.tracer.record(TRACE_SLOW_PATH, packet, next_hop)
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip_address, self.listen_port), 5)
+            if isinstance(packet, Frame):
+                packet.seq = 0
+                writer.write(encode_frame(packet))
+                ack = await asyncio.wait_for(read_frame_async(reader), 5)
+                return ack.type == FRAME_ACK and ack.flags == ACK_OK
+            packet['type'] = 'data'
+            writer.write(json.dumps(packet).encode('utf-8'))
+            response = await asyncio.wait_for(read_message_async(reader, MessageReassembler()), 5)
+            logger.debug("Forward response: %s", response)
+            return True
+        except Exception as e:
+            logger.error(f"Error forwarding to {next_hop}: {e}")
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+
+    # ───────── exchange endpoints ───────────────────────────────────
+
+    async def send_into_tunnel_async(self, session, frame_type, destination, data, flags=0):
+        """Forward exchange bytes of one session along the current route to the tunnel's other end"""
+        frame = Frame(frame_type, self.router_id, destination, data, flags=flags, stream=session.stream_id)
+        self.stats.start_frame(frame, session.frames_out)
+        self.tracer.sample(frame, TRACE_ENTER, now=frame.arrived)
+        session.sent(len(data))
+        return await self.forward_to_destination_async(frame)
+
+    async def exchange_forwarding_loop_async(self, reader, writer, initial_data):
+        """Forward one client's exchange traffic into the tunnel towards router10"""
+        session = self.client_sessions.open(writer)
+        logger.info(f"Opened exchange session {session.stream_id} ({len(self.client_sessions)} active)")
+        try:
+            data = initial_data
+            while self.running and data:
+                if not await self.send_into_tunnel_async(session, FRAME_EXCHANGE_DATA, "router10", data):
+                    logger.error("Failed to forward exchange packet")
+                    break
+                data = await reader.read(RECV_SIZE)
+            logger.info(f"Exchange client of session {session.stream_id} closed connection")
+        except Exception as e:
+            logger.error(f"Error in exchange forwarding loop: {e}")
+        finally:
+            # Still in the table means router10 did not end the stream; tell it we did
+            if self.client_sessions.close(session.stream_id) is not None:
+                await self.send_into_tunnel_async(session, FRAME_EXCHANGE_DATA, "router10", b"", STREAM_FIN)
+            writer.close()
+            logger.info(f"Exchange session {session.stream_id} closed")
+
+    async def deliver_exchange_response_async(self, frame):
+        """Write an exchange response arriving at router1 back to the client stream of its session"""
+        session = self.client_sessions.get(frame.stream)
+        if session is None:
+            logger.debug(f"Dropping response for closed exchange session {frame.stream}")
+            return True  # The client is gone; nothing for the sender to retry
+        if frame.flags & STREAM_FIN:
+            # router10 lost its exchange server connection; closing the writer ends the client loop
+            self.client_sessions.close(frame.stream)
+            session.endpoint.close()
+            return True
+        try:
+            session.endpoint.write(frame.payload)
+            await session.endpoint.drain()
+            session.received(len(frame.payload))
+            return True
+        except Exception as e:
+            logger.error(f"Error delivering exchange response to session {frame.stream}: {e}")
+            session.endpoint.close()  # The forwarding loop ends the session
+            return False
+
+    async def deliver_to_exchange_server_async(self, frame):
+        """Forward the payload of an exchange frame to the exchange server connection of its session"""
+        if self.router_id != "router10":
+            logger.error("Only router10 should handle exchange server packets")
+            return False
+
+        if frame.flags & STREAM_FIN:
+            # The client at router1 went away; drop its exchange server connection
+            session = self.server_sessions.close(frame.stream)
+            if session is not None:
+                close_when_connected(session.endpoint)
+            return True
+
+        if not frame.payload:
+            logger.error("No binary data in exchange packet")
+            return False
+
+        # First frame of a stream: give it its own exchange server connection. The
+        # endpoint is the connect task, bound before any await so frames that arrive
+        # while it is pending find the same session.
+        session = self.server_sessions.get(frame.stream)
+        if session is None:
+            connect = asyncio.ensure_future(asyncio.open_connection(*self.exchange_server))
+            session = self.server_sessions.bind(frame.stream, connect)
+            asyncio.ensure_future(self.exchange_server_response_handler_async(session))
+        try:
+            _, writer = await session.endpoint
+            writer.write(frame.payload)
+            await writer.drain()
+            session.received(len(frame.payload))
+            return True
+        except Exception as e:
+            logger.error(f"Error handling exchange server packet: {e}")
+            close_when_connected(session.endpoint)  # The response handler ends the session
+            return False
+
+    async def exchange_server_response_handler_async(self, session):
+        """Relay one session's exchange server responses back towards router1"""
+        writer = None
+        try:
+            reader, writer = await session.endpoint
+            logger.info(f"Connected exchange session {session.stream_id} to exchange server "
+                        f"({len(self.server_sessions)} active)")
+            while self.running:
+                response_data = await reader.read(RECV_SIZE)
+                if not response_data:
+                    logger.info(f"Exchange server closed connection of session {session.stream_id}")
+                    break
+                if not await self.send_into_tunnel_async(session, FRAME_EXCHANGE_RESPONSE, "router1", response_data):
+                    logger.error("Failed to forward exchange response to router1")
+        except Exception as e:
+            logger.error(f"Exchange server response handler error: {e}")
+        finally:
+            # Still in the table means router1 did not end the stream; tell it we did
+            if self.server_sessions.close(session.stream_id) is not None:
+                await self.send_into_tunnel_async(session, FRAME_EXCHANGE_RESPONSE, "router1", b"", STREAM_FIN)
+            if writer is not None:
+                writer.close()
+
+    # ───────── periodic tasks ───────────────────────────────────────
+
+    async def heartbeat_loop_async(self):
+        """Send heartbeats (link quality probes) on every connected link and reap idle ones from a single task"""
+        while self.running:
+            await asyncio.sleep(self.probe_interval)
+            now = time.time()
+            for neighbor_id, conn_info in list(self.neighbor_connections.items()):
+                if conn_info['status'] != 'connected':
+                    continue
+                for link in conn_info['pool'].links:
+                    # Each link times out on its own after 5 minutes without traffic, like the threaded reader
+                    if now - link.last_activity > 300:
+                        logger.warning(f"Link to {neighbor_id} timed out due to inactivity")
+                        self.link_failed_async(link)
+                        continue
+                    try:
+                        self.send_probe(link)
+                    except Exception as e:
+                        logger.warning(f"Error in heartbeat with {neighbor_id}: {e}")
+                        self.link_failed_async(link)
+
+    async def liveness_loop_async(self):
+        """Beacon on every link and fail the ones whose neighbor went silent, from a single task"""
+        while self.running:
+            await asyncio.sleep(self.liveness.interval)
+            for link in self.liveness.expired(list(self.neighbor_pools.values())):
+                self.link_failed_async(link)
+            for pool in list(self.neighbor_pools.values()):
+                for link in pool.links:
+                    if not link.closed:
+                        self.liveness.beacon(link)
+
+    async def table_watch_loop_async(self):
+        """Reload the routing table on inotify events, with a periodic stat() safety check"""
+        self.table_watcher = TableWatcher(self.table_path, self.table_file_changed)
+        loop = asyncio.get_running_loop()
+        fd = self.table_watcher.fileno()
+        if fd is not None:
+            loop.add_reader(fd, self.on_table_events)
+        logger.info(f"Watching routing table {self.table_path} via {'inotify' if fd is not None else 'stat polling'}")
+        try:
+            while self.running:
+                await asyncio.sleep(self.table_watcher.interval)
+                try:
+                    self.table_watcher.check()
+                except Exception as e:
+                    logger.error(f"Error refreshing routing table: {e}")
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+            self.table_watcher.close()
+
+    def on_table_events(self):
+        """Reader callback for the table watcher's inotify descriptor"""
+        try:
+            self.table_watcher.handle_events()
+        except Exception as e:
+            logger.error(f"Error refreshing routing table: {e}")
+
+    async def status_loop_async(self):
+        """Periodically print the status of all neighbor connections"""
+        while self.running:
+            await asyncio.sleep(60)  # Print status every 60 seconds
+            connected = [self.describe_pool(c['pool'])
+                         for c in self.neighbor_connections.values() if c['status'] == 'connected']
+            disconnected = [n for n, c in self.neighbor_connections.items() if c['status'] != 'connected']
+            logger.info(f"===== ROUTER {self.router_id} CONNECTION STATUS =====")
+            logger.info(f"Connected neighbors ({len(connected)}): {', '.join(connected) if connected else 'None'}")
+            if disconnected:
+                logger.info(f"Disconnected neighbors ({len(disconnected)}): {', '.join(disconnected)}")
+            sessions = self.session_summary()
+            if sessions:
+                logger.info(sessions)
+
+    async def metrics_loop_async(self):
+        """Periodically report metrics to the SDN controller without blocking the loop"""
+        while self.running:
+            await asyncio.sleep(30 + 30 * random.random())
+            try:
+                metrics = self.measure_link_metrics()
+                if not metrics:
+                    continue
+                logger.info(f"Measured link metrics: {metrics}")
+                # Over the controller channel when it is up, else a one-off HTTP post
+                if self.channel is not None and self.channel.send({"type": "metrics", "metrics": metrics}):
+                    continue
+                response = await asyncio.to_thread(requests.post, self.metrics_url(), json=metrics, timeout=5)
+                if response.status_code == 200:
+                    logger.info(f"Successfully reported metrics to SDN controller")
+                else:
+                    logger.error(f"Failed to report metrics: {response.status_code} - {response.text}")
+            except Exception as e:
+                logger.error(f"Error reporting metrics to SDN: {e}")
+
+    async def main_async(self):
+        """Start the listener and all periodic tasks on the running loop"""
+        server = await asyncio.start_server(self.handle_connection_async,
+                                            self.listen_host, self.listen_port, backlog=128)
+        logger.info(f"Router {self.router_id} listening on port {self.listen_port}")
+
+        if self.stats_port:
+            start_stats_server(self.stats_snapshot, self.listen_host, self.stats_port, self.tracer)
+
+        # The channel thread hands pushed tables over to the loop
+        loop = asyncio.get_running_loop()
+        self.start_controller_channel(lambda table: loop.call_soon_threadsafe(self.apply_table_update, table))
+
+        await self.update_neighbor_connections_async()
+        tasks = [
+            asyncio.ensure_future(self.table_watch_loop_async()),
+            asyncio.ensure_future(self.heartbeat_loop_async()),
+            asyncio.ensure_future(self.status_loop_async()),
+            asyncio.ensure_future(self.metrics_loop_async()),
+        ]
+        if self.liveness.interval:
+            tasks.append(asyncio.ensure_future(self.liveness_loop_async()))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.running = False
+            for task in tasks:
+                task.cancel()
+            for pool in self.neighbor_pools.values():
+                for link in pool.clear():
+                    link.close()
+
+    def run(self):
+        """Run the router agent on an asyncio event loop"""
+        logger.info(f"Starting asyncio router agent for {self.router_id}")
+        self.tracer.install_signal_handler(self.trace_dir)
+        try:
+            asyncio.run(self.main_async())
+        except KeyboardInterrupt:
+            logger.info("Shutting down router agent")
@@ -0,0 +1,158 @@
+# controller_channel.py
+"""Router end of the persistent channel to the SDN controller.
+
+One thread keeps a TCP connection to the controller (see the controller's
+router_channel.py for the message format). The controller pushes this
+router's table as a full copy on connect and as versioned deltas whenever it
+changes; each one is applied to the local copy, handed to on_table and
+confirmed with "applied". A delta that does not apply to the version we hold
+(a message was missed, or the controller restarted) is answered with
+"resync", which brings a full table. Link metrics go to the controller over
+the same connection.
+
+The channel reconnects with a capped exponential backoff. While it is down
+the router falls back to watching its table file and posting metrics over
+HTTP.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+
+from stream import MessageReassembler, recv_message, set_nodelay
+
+logger = logging.getLogger("router_agent")
+
+CONTROL_CHANNEL_PORT = 6653  # the controller's default, see router_channel.py
+
+# Table sections made of entries with a key, and how to get the key
+KEYED_SECTIONS = {
+    "flow_table": lambda flow: flow.get("match", {}).get("destination"),
+    "routes": lambda route: route.get("destination"),
+}
+
+
+def apply_delta(table, delta):
+    """The table a controller delta turns table into; table itself is not modified"""
+    new = dict(table)
+    new.update(delta.get("set", {}))
+    if "interfaces" in delta:
+        interfaces = dict(table.get("interfaces", {}))
+        for neighbor in delta["interfaces"]["remove"]:
+            interfaces.pop(neighbor, None)
+        interfaces.update(delta["interfaces"]["upsert"])
+        new["interfaces"] = interfaces
+    for field, key in KEYED_SECTIONS.items():
+        if field not in delta:
+            continue
+        removed = set(delta[field]["remove"])
+        upserts = {key(entry): entry for entry in delta[field]["upsert"]}
+        entries = []
+        for entry in table.get(field, []):
+            k = key(entry)
+            if k not in removed:
+                entries.append(upserts.pop(k, entry))  # Changed entries keep their position
+        entries.extend(upserts.values())
+        new[field] = entries
+    return new
+
+
+class ControllerChannel:
+    """Persistent connection to the controller that delivers table updates to on_table(table)"""
+
+    def __init__(self, router_id, address, on_table, max_backoff=10.0):
+        self.router_id = router_id
+        self.address = address  # (host, port)
+        self.on_table = on_table
+        self.max_backoff = max_backoff
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.connected = False
+        self.running = True
+
+        # The controller's copy of our table that we last applied
+        self.table = None
+        self.epoch = None
+        self.version = 0
+
+        self.tables = 0   # full tables applied
+        self.deltas = 0   # deltas applied
+        self.resyncs = 0  # deltas that did not apply to our version
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        backoff = 0.5
+        while self.running:
+            sock = None
+            try:
+                sock = socket.create_connection(self.address, timeout=5)
+                sock.settimeout(None)
+                set_nodelay(sock)
+                self.sock = sock
+                self.write({"type": "hello", "router_id": self.router_id,
+                            "epoch": self.epoch, "version": self.version})
+                self.connected = True
+                backoff = 0.5
+                logger.info(f"Connected to the controller channel at {self.address[0]}:{self.address[1]}")
+                reassembler = MessageReassembler()
+                while self.running:
+                    self.handle(recv_message(sock, reassembler))
+            except (OSError, ValueError) as e:
+                if self.connected:
+                    logger.warning(f"Lost the controller channel: {e}")
+            finally:
+                self.connected = False
+                if sock is not None:
+                    sock.close()
+            time.sleep(backoff)
+            backoff = min(2 * backoff, self.max_backoff)
+
+    def handle(self, message):
+        kind = message.get("type")
+        if kind == "table":
+            self.tables += 1
+            self.install(message["epoch"], message["version"], message["table"])
+        elif kind == "delta":
+            if message.get("epoch") != self.epoch or message.get("base") != self.version or self.table is None:
+                self.resyncs += 1
+                logger.warning(f"Table delta {message.get('base')} -> {message.get('version')} does not apply "
+                               f"to version {self.version}, asking for the full table")
+                self.write({"type": "resync"})
+                return
+            self.deltas += 1
+            self.install(message["epoch"], message["version"], apply_delta(self.table, message["delta"]))
+
+    def install(self, epoch, version, table):
+        self.table, self.epoch, self.version = table, epoch, version
+        try:
+            self.on_table(table)
+        except Exception as e:
+            logger.error(f"Error applying table version {version} from the controller: {e}")
+        self.write({"type": "applied", "version": version})
+
+    def write(self, message):
+        with self.send_lock:
+            self.sock.sendall(json.dumps(message).encode('utf-8') + b"\n")
+
+    def send(self, message):
+        """Send a message to the controller; False if the channel is down"""
+        if not self.connected:
+            return False
+        try:
+            self.write(message)
+            return True
+        except OSError:
+            return False
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "version": self.version,
+            "tables": self.tables,
+            "deltas": self.deltas,
+            "resyncs": self.resyncs,
+        }
@@ -0,0 +1,212 @@
+# forwarding_table.py
+"""Compiled forwarding table for the router data path.
+
+The routing table JSON written by the SDN controller is compiled once per
+load into a ForwardingTable: a plain dict from destination to an immutable
+ForwardingEntry holding the next hop, the interface IP used to reach it and
+the NeighborPool (see pool.py) through which live links to that neighbor are
+borrowed. Flow entries may also name a loop-free alternate (action.backup_to)
+that the controller precomputed; the entry keeps its pool too, so when the
+primary neighbor has no live link the data path switches to the backup on
+its own, without waiting for the controller to recompute routes.
+
+A flow entry may list a weighted next-hop group (action.group): the
+neighbors on equal-cost, or nearly as cheap, loop-free paths. Each member
+is compiled into its own entry, and a frame takes the member its stream
+hashes to (see for_stream), so one client's frames always follow one path
+and stay in order while different clients spread over the group. Members
+without a live link are passed over for the next one.
+
+Priority flow entries (the table's priority_flows) match a traffic class
+as well as a destination: the controller pins exchange frames between its
+configured pair to a path of their own. They are compiled apart, per
+class, and looked up with get(destination, traffic_class); other traffic
+never sees them. A pinned entry falls back on the destination's ordinary
+next hop while its own neighbor has no live link.
+Tables are never mutated after compilation, so the agent swaps a new one in
+with a single attribute assignment and readers need no lock.
+"""
+import zlib
+from bisect import bisect_right
+from collections import namedtuple
+
+ROUTE_PRIORITY = 0  # Plain shortest-hop routes lose to any flow entry
+
+EXCHANGE = "exchange"  # Traffic class of exchange data and response frames
+
+GOLDEN = 0x9E3779B1  # Multiplier spreading consecutive stream ids over the 32-bit range
+
+
+class NextHopGroup:
+    """Members of one destination's group as entries, each holding a share of the hash range by its weight"""
+    __slots__ = ("members", "bounds", "total", "salt")
+
+    def __init__(self, members, weights, salt=0):
+        self.members = members
+        self.bounds = []
+        total = 0
+        for weight in weights:
+            total += max(int(weight), 1)
+            self.bounds.append(total)
+        self.total = total
+        self.salt = salt  # differs per router, so routers along a path do not all split flows alike
+
+    def pick(self, stream):
+        """Member that stream hashes to, or the next one with a live link; None if no member has one"""
+        point = (((stream ^ self.salt) * GOLDEN) & 0xFFFFFFFF) % self.total
+        index = bisect_right(self.bounds, point)
+        count = len(self.members)
+        for step in range(count):
+            member = self.members[(index + step) % count]
+            if member.neighbor.healthy:
+                return member
+        return None
+
+
+class ForwardingEntry(namedtuple(
+        "ForwardingEntry",
+        ["destination", "next_hop", "interface_ip", "neighbor", "priority", "metric",
+         "backup_hop", "backup_ip", "backup", "group"],
+        defaults=(None, None, None, None))):
+    __slots__ = ()
+
+    def for_stream(self, stream):
+        """The entry to forward a stream's frames with: the group member it hashes to, else this one
+
+        Frames outside any stream (stream 0) always take the primary next hop.
+        """
+        if self.group is None or not stream:
+            return self
+        member = self.group.pick(stream)
+        return member if member is not None else self
+
+    def active(self):
+        """The entry to forward with: this one, or its backup while the primary neighbor has no live link"""
+        if self.backup is None or self.neighbor.healthy or not self.backup.healthy:
+            return self
+        return self._replace(next_hop=self.backup_hop, interface_ip=self.backup_ip, neighbor=self.backup,
+                             backup_hop=None, backup_ip=None, backup=None)
+
+
+class ForwardingTable:
+    """Immutable destination -> ForwardingEntry index"""
+    __slots__ = ("entries", "interfaces", "classes")
+
+    def __init__(self, entries, interfaces, classes=None):
+        self.entries = entries
+        self.interfaces = interfaces  # neighbor -> interface IP
+        self.classes = classes or {}  # traffic class -> destination -> pinned ForwardingEntry
+
+    def get(self, destination, traffic_class=None):
+        """Entry for destination: the traffic class's pinned one if it has one, else the ordinary one"""
+        if traffic_class is not None:
+            pinned = self.classes.get(traffic_class)
+            if pinned:
+                entry = pinned.get(destination)
+                if entry is not None:
+                    return entry
+        return self.entries.get(destination)
+
+    def next_hop(self, destination):
+        entry = self.entries.get(destination)
+        return entry.next_hop if entry is not None else None
+
+    @property
+    def protected(self):
+        """Destinations that have a loop-free alternate"""
+        return sum(1 for entry in self.entries.values() if entry.backup is not None)
+
+    @property
+    def multipath(self):
+        """Destinations whose flows spread over a next-hop group"""
+        return sum(1 for entry in self.entries.values() if entry.group is not None)
+
+    @property
+    def pinned(self):
+        """Destinations with a pinned entry, over every traffic class"""
+        return sum(len(pinned) for pinned in self.classes.values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def compile(cls, table, neighbor_pool):
+        """Build a table from routing JSON; neighbor_pool(neighbor_id) returns the shared pool"""
+        interfaces = {
+            neighbor: info.get('ip_address')
+            for neighbor, info in table.get('interfaces', {}).items()
+        }
+        candidates = {}
+        salt = zlib.crc32(str(table.get('router_id', '')).encode('utf-8'))
+
+        def offer(destination, next_hop, priority, metric, backup_hop=None, group=None):
+            if not destination or next_hop not in interfaces:
+                return  # Only directly connected neighbors can be a next hop
+            if backup_hop not in interfaces or backup_hop == next_hop:
+                backup_hop = None
+            best = candidates.get(destination)
+            if best is None or (priority, -metric) > (best[2], -best[3]):
+                candidates[destination] = (destination, next_hop, priority, metric, backup_hop, group)
+
+        def entry(destination, next_hop, priority, metric, backup_hop):
+            return ForwardingEntry(destination, next_hop, interfaces[next_hop],
+                                   neighbor_pool(next_hop), priority, metric,
+                                   backup_hop, interfaces.get(backup_hop),
+                                   neighbor_pool(backup_hop) if backup_hop else None)
+
+        def compile_group(primary, group):
+            """Primary with its group attached, or as it is when fewer than two members are usable"""
+            members, weights = [], []
+            for member in group or ():
+                next_hop = member.get('next_hop') if isinstance(member, dict) else None
+                if next_hop not in interfaces or any(m.next_hop == next_hop for m in members):
+                    continue
+                if next_hop == primary.next_hop:
+                    members.append(primary)
+                else:
+                    # No alternate of its own: pick() passes over members without a live link
+                    members.append(entry(primary.destination, next_hop, primary.priority,
+                                         member.get('metric', primary.metric), None))
+                weights.append(member.get('weight', 1))
+            if len(members) < 2:
+                return primary
+            group = NextHopGroup(members, weights, salt)
+            return primary._replace(group=group)
+
+        # Dijkstra-weighted flow entries from the controller, highest priority first
+        for flow in table.get('flow_table', []):
+            action = flow.get('action', {})
+            offer(flow.get('match', {}).get('destination'),
+                  action.get('forward_to'),
+                  flow.get('priority', ROUTE_PRIORITY),
+                  flow.get('metric', float('inf')),
+                  action.get('backup_to'),
+                  action.get('group'))
+
+        # Shortest-hop routes fill in destinations without a flow entry
+        for route in table.get('routes', []):
+            offer(route.get('destination'), route.get('next_hop'),
+                  ROUTE_PRIORITY, route.get('metric', float('inf')))
+
+        entries = {
+            destination: compile_group(entry(destination, next_hop, priority, metric, backup_hop), group)
+            for destination, next_hop, priority, metric, backup_hop, group in candidates.values()
+        }
+
+        # Pinned paths of traffic classes; the destination's ordinary next hop is their backup
+        classes = {}
+        for flow in table.get('priority_flows', []):
+            match, action = flow.get('match', {}), flow.get('action', {})
+            destination, next_hop = match.get('destination'), action.get('forward_to')
+            traffic_class = match.get('traffic_class')
+            if traffic_class is None or not destination or next_hop not in interfaces:
+                continue
+            ordinary = entries.get(destination)
+            backup_hop = ordinary.next_hop if ordinary is not None and ordinary.next_hop != next_hop else None
+            pinned = classes.setdefault(traffic_class, {})
+            best = pinned.get(destination)
+            priority = flow.get('priority', ROUTE_PRIORITY)
+            if best is None or priority > best.priority:
+                pinned[destination] = entry(destination, next_hop, priority,
+                                            flow.get('metric', float('inf')), backup_hop)
+        return cls(entries, interfaces, classes)
@@ -0,0 +1,217 @@
+# framing.py
+"""Binary wire format for router-to-router exchange traffic.
+
+Every data frame is a fixed header followed by the hop trace and the raw
+exchange bytes:
+
+    magic    u8   FRAME_MAGIC, distinguishes frames from JSON control messages
+    type     u8   FRAME_* constant
+    flags    u8   type specific (ack status for FRAME_ACK, STREAM_FIN for exchange frames)
+    hops     u8   number of entries in the hop trace
+    source   u16  router number (router7 -> 7)
+    dest     u16  router number
+    seq      u32  per-link sequence number, cumulative ack number in FRAME_ACK
+    stream   u32  client session the exchange bytes belong to, 0 outside a session
+    length   u32  payload length in bytes
+    trace    u16 * hops
+    times    (u64 arrival, u64 departure) * hops, only with FLAG_HOP_TIMES
+    payload  length bytes
+
+All integers are network byte order. JSON is only used for control
+messages (hello, heartbeat and their acks); on persistent links those are
+carried as the payload of FRAME_CONTROL frames. Sequence number 0 marks a
+frame that is outside the send window and is never acknowledged.
+FRAME_LIVENESS is header-only like FRAME_ACK: its seq field carries the
+sender's beacon interval in microseconds and its flags byte the sender's
+detection multiplier.
+
+Exchange frames are multiplexed: router1 gives every client connection a
+stream id, router10 keeps one exchange server connection per stream, and
+responses carry the same id back so router1 can find the client socket.
+An empty frame with STREAM_FIN set closes the stream at the other end.
+
+Sampled frames set FLAG_HOP_TIMES and carry, for every router in the hop
+trace, the CLOCK_MONOTONIC nanoseconds at which the frame arrived at and
+left that router. Routers sharing a host (Docker containers do) share that
+clock, so the destination can split a frame's latency into per-router and
+per-link parts.
+"""
+import struct
+
+FRAME_MAGIC = 0xEB
+
+# Frame types
+FRAME_EXCHANGE_DATA = 1      # client -> exchange server bytes
+FRAME_EXCHANGE_RESPONSE = 2  # exchange server -> client bytes
+FRAME_ACK = 3                # hop-by-hop cumulative acknowledgment, no payload
+FRAME_CONTROL = 4            # JSON control message or legacy JSON packet
+FRAME_LIVENESS = 5           # link liveness beacon, no payload (see liveness.py)
+
+# Ack status carried in the flags byte of FRAME_ACK
+ACK_OK = 0
+ACK_NO_ROUTE = 1
+ACK_ERROR = 2
+
+# Flags of FRAME_EXCHANGE_DATA / FRAME_EXCHANGE_RESPONSE
+STREAM_FIN = 0x01  # The sender closed its end of the stream
+
+# Flags of every frame type except the header-only FRAME_ACK and FRAME_LIVENESS
+FLAG_HOP_TIMES = 0x80  # Hop trace is followed by per-hop arrival/departure times
+
+HEADER = struct.Struct("!BBBBHHIII")
+HEADER_SIZE = HEADER.size
+MAX_HOPS = 255
+HOP_TIME = struct.Struct("!QQ")
+
+_ROUTER_PREFIX = "router"
+
+
+def router_number(router_id):
+    """Map a router name such as 'router7' to its wire number"""
+    return int(router_id[len(_ROUTER_PREFIX):])
+
+
+def router_name(number):
+    """Map a wire number back to the router name"""
+    return f"{_ROUTER_PREFIX}{number}"
+
+
+class Frame:
+    """A decoded data frame; payload is kept as a memoryview where possible
+
+    stamps is parallel to route and holds (arrival_ns, departure_ns) per hop
+    when FLAG_HOP_TIMES is set. arrived and traced are local only: when this
+    router read the frame, in time.monotonic_ns(), and whether its packet
+    tracer sampled it.
+    """
+    __slots__ = ("type", "flags", "source", "destination", "route", "payload", "seq", "stream",
+                 "stamps", "arrived", "traced")
+
+    def __init__(self, frame_type, source, destination, payload=b"", route=None, flags=0, seq=0, stream=0):
+        self.type = frame_type
+        self.flags = flags
+        self.source = source
+        self.destination = destination
+        self.route = route if route is not None else []
+        self.payload = payload
+        self.seq = seq
+        self.stream = stream
+        self.stamps = []
+        self.arrived = None
+        self.traced = False
+
+    def __repr__(self):
+        return (f"Frame(type={self.type}, seq={self.seq}, stream={self.stream}, source={self.source}, "
+                f"destination={self.destination}, route={self.route}, bytes={len(self.payload)})")
+
+
+def has_hop_times(frame_type, flags):
+    return frame_type != FRAME_ACK and frame_type != FRAME_LIVENESS and flags & FLAG_HOP_TIMES
+
+
+def encode_frame(frame):
+    """Serialize a frame into a single bytes object ready for sendall"""
+    hops = len(frame.route)
+    if hops > MAX_HOPS:
+        raise ValueError(f"Hop trace too long ({hops} hops)")
+    timed = has_hop_times(frame.type, frame.flags)
+    if timed and len(frame.stamps) != hops:
+        raise ValueError(f"{len(frame.stamps)} hop times for {hops} hops")
+    header = HEADER.pack(
+        FRAME_MAGIC,
+        frame.type,
+        frame.flags,
+        hops,
+        router_number(frame.source),
+        router_number(frame.destination),
+        frame.seq,
+        frame.stream,
+        len(frame.payload),
+    )
+    if hops:
+        trace = struct.pack(f"!{hops}H", *[router_number(r) for r in frame.route])
+        if timed:
+            times = b"".join(HOP_TIME.pack(arrival, departure) for arrival, departure in frame.stamps)
+            return b"".join((header, trace, times, frame.payload))
+        return b"".join((header, trace, frame.payload))
+    return b"".join((header, frame.payload))
+
+
+def encode_ack(source, destination, status=ACK_OK, seq=0):
+    """Build a header-only acknowledgment frame covering every frame up to seq"""
+    return HEADER.pack(FRAME_MAGIC, FRAME_ACK, status, 0,
+                       router_number(source), router_number(destination), seq, 0, 0)
+
+
+def encode_liveness(source, destination, interval_us, multiplier):
+    """Build a header-only liveness beacon announcing the sender's interval and multiplier"""
+    return HEADER.pack(FRAME_MAGIC, FRAME_LIVENESS, multiplier, 0,
+                       router_number(source), router_number(destination), interval_us, 0, 0)
+
+
+def frame_size(header_view):
+    """Total frame size given at least HEADER_SIZE bytes of it"""
+    magic, frame_type, flags, hops, _, _, _, _, length = HEADER.unpack_from(header_view)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad frame magic 0x{magic:02x}")
+    if has_hop_times(frame_type, flags):
+        return HEADER_SIZE + (2 + HOP_TIME.size) * hops + length
+    return HEADER_SIZE + 2 * hops + length
+
+
+def decode_frame(buf):
+    """Decode one complete frame from a bytes-like object without copying the payload"""
+    view = memoryview(buf)
+    magic, frame_type, flags, hops, source, destination, seq, stream, length = HEADER.unpack_from(view)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad frame magic 0x{magic:02x}")
+    offset = HEADER_SIZE
+    route = [router_name(n) for n in struct.unpack_from(f"!{hops}H", view, offset)] if hops else []
+    offset += 2 * hops
+    stamps = []
+    if hops and has_hop_times(frame_type, flags):
+        if len(view) - offset < HOP_TIME.size * hops:
+            raise ValueError("Truncated frame")
+        stamps = [HOP_TIME.unpack_from(view, offset + HOP_TIME.size * i) for i in range(hops)]
+        offset += HOP_TIME.size * hops
+    if len(view) - offset < length:
+        raise ValueError("Truncated frame")
+    payload = view[offset:offset + length]
+    frame = Frame(frame_type, router_name(source), router_name(destination),
+                  payload, route, flags, seq, stream)
+    frame.stamps = stamps
+    return frame
+
+
+def recv_exact(sock, n, initial=b""):
+    """Read until exactly n bytes are available, starting from already received bytes"""
+    buf = bytearray(initial)
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Socket closed mid-frame")
+        buf += chunk
+    return buf
+
+
+def read_frame(sock, initial=b""):
+    """Read one whole frame from a socket; initial holds bytes already received"""
+    buf = recv_exact(sock, HEADER_SIZE, initial)
+    total = frame_size(buf)
+    if len(buf) > total:
+        raise ValueError("Unexpected bytes after frame")
+    buf = recv_exact(sock, total, buf)
+    return decode_frame(buf)
+
+
+async def read_frame_async(reader, initial=b""):
+    """Read one whole frame from an asyncio StreamReader"""
+    buf = bytes(initial)
+    if len(buf) < HEADER_SIZE:
+        buf += await reader.readexactly(HEADER_SIZE - len(buf))
+    total = frame_size(buf)
+    if len(buf) > total:
+        raise ValueError("Unexpected bytes after frame")
+    if len(buf) < total:
+        buf += await reader.readexactly(total - len(buf))
+    return decode_frame(buf)
@@ -0,0 +1,224 @@
+# latency.py
+"""Per-hop latency accounting and the router's local stats endpoint.
+
+Every frame read from a link is timed on arrival. Forwarding it records how
+long it stayed in this router (per destination), and frames sampled at the
+tunnel entry also collect arrival/departure stamps at each hop (see
+FLAG_HOP_TIMES in framing.py). From those stamps a router measures the
+latency of the link it came in on (per neighbor), and the destination splits
+the whole trip into router and link segments (per path). Histograms use
+power-of-two microsecond buckets so recording is a bit_length() and an
+increment, with no locks; a lost increment under contention is acceptable
+for stats.
+
+RouterStats.snapshot() is served as JSON on GET /stats by a small HTTP
+server in a daemon thread, used by both runtimes. The same server hands out
+the packet trace buffer on GET /trace.
+"""
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from framing import FLAG_HOP_TIMES
+from packet_trace import decode_dump
+
+logger = logging.getLogger("router_agent")
+
+BUCKETS = 32  # Bucket i holds samples below 2**i microseconds; the last one is open-ended
+
+
+class LatencyHistogram:
+    """Log2 histogram of durations, recorded in nanoseconds and reported in milliseconds"""
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, ns):
+        if ns < 0:
+            ns = 0  # Clocks of different hosts; never let one bad sample poison the sums
+        self.buckets[min((ns // 1000).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        """Upper bound in ms of the bucket holding the q-th quantile, capped at the maximum seen"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(2 ** i / 1000, self.max / 1e6)
+        return self.max / 1e6
+
+    def to_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count / 1e6,
+            "min_ms": self.min / 1e6,
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max / 1e6,
+        }
+
+
+class TrafficCounter:
+    """Packet and payload byte counts in one direction of one neighbor"""
+    __slots__ = ("packets", "bytes")
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+
+    def add(self, nbytes):
+        self.packets += 1
+        self.bytes += nbytes
+
+
+def histogram(table, key):
+    hist = table.get(key)
+    if hist is None:
+        hist = table.setdefault(key, LatencyHistogram())
+    return hist
+
+
+def counter(table, key):
+    count = table.get(key)
+    if count is None:
+        count = table.setdefault(key, TrafficCounter())
+    return count
+
+
+class RouterStats:
+    """In-memory latency histograms and traffic counters of one router"""
+
+    def __init__(self, router_id, sample_every=16):
+        self.router_id = router_id
+        self.sample_every = sample_every  # Stamp one tunnel frame in this many; 0 disables
+        self.started = time.time()
+        self.sampled = 0
+        self.residence = {}  # destination -> time from arrival here to handing to the next link
+        self.links = {}      # neighbor -> departure there to arrival here, from sampled frames
+        self.end_to_end = {} # source -> entry into the tunnel to arrival here
+        self.paths = {}      # (source, route) -> [segment histograms], from sampled frames
+        self.rx = {}         # neighbor -> TrafficCounter of frames received from it
+        self.tx = {}         # neighbor -> TrafficCounter of frames sent to it
+
+    def should_sample(self, seq):
+        return self.sample_every > 0 and seq % self.sample_every == 0
+
+    def start_frame(self, frame, seq):
+        """Time a frame entering the tunnel here and mark every sample_every-th one for stamping"""
+        frame.arrived = time.monotonic_ns()
+        if self.should_sample(seq):
+            frame.flags |= FLAG_HOP_TIMES
+            self.sampled += 1
+
+    def on_receive(self, neighbor, frame):
+        """A frame was read from a link to neighbor at frame.arrived"""
+        counter(self.rx, neighbor).add(len(frame.payload))
+        if frame.stamps:
+            histogram(self.links, neighbor).record(frame.arrived - frame.stamps[-1][1])
+
+    def on_forward(self, frame, next_hop, departed):
+        """A frame is handed to the link towards next_hop at departed"""
+        counter(self.tx, next_hop).add(len(frame.payload))
+        if frame.arrived is not None:
+            histogram(self.residence, frame.destination).record(departed - frame.arrived)
+
+    def on_deliver(self, frame):
+        """A sampled frame reached its destination here; break its trip into segments"""
+        stamps = frame.stamps
+        if not stamps or frame.arrived is None:
+            return
+        histogram(self.end_to_end, frame.source).record(frame.arrived - stamps[0][0])
+        key = (frame.source, tuple(frame.route))
+        segments = self.paths.get(key)
+        if segments is None:
+            # router, link, router, link, ..., link into this router
+            segments = self.paths.setdefault(key, [LatencyHistogram() for _ in range(2 * len(stamps))])
+        for i, (arrival, departure) in enumerate(stamps):
+            segments[2 * i].record(departure - arrival)
+            following = stamps[i + 1][0] if i + 1 < len(stamps) else frame.arrived
+            segments[2 * i + 1].record(following - departure)
+
+    def path_breakdown(self, source, route, segments):
+        hops = list(route) + [self.router_id]
+        breakdown = []
+        for i, router in enumerate(route):
+            breakdown.append({"segment": router, **segments[2 * i].to_dict()})
+            breakdown.append({"segment": f"{router}->{hops[i + 1]}", **segments[2 * i + 1].to_dict()})
+        return {"source": source, "route": hops, "segments": breakdown}
+
+    def snapshot(self):
+        """Everything this router measured, as a JSON-serializable dict"""
+        traffic = lambda table: {n: {"packets": c.packets, "bytes": c.bytes} for n, c in list(table.items())}
+        latency = lambda table: {k: h.to_dict() for k, h in list(table.items())}
+        return {
+            "router": self.router_id,
+            "uptime": time.time() - self.started,
+            "sample_every": self.sample_every,
+            "sampled": self.sampled,
+            "rx": traffic(self.rx),
+            "tx": traffic(self.tx),
+            "residence": latency(self.residence),
+            "links": latency(self.links),
+            "end_to_end": latency(self.end_to_end),
+            "paths": [self.path_breakdown(source, route, segments)
+                      for (source, route), segments in list(self.paths.items())],
+        }
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    """GET /stats: JSON snapshot of the router's counters and histograms; GET /trace: packet trace dump"""
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        if path in ('/', '/stats'):
+            body, content_type = json.dumps(self.server.snapshot()).encode('utf-8'), "application/json"
+        elif path == '/trace' and self.server.tracer is not None:
+            body, content_type = self.server.tracer.dump(), "application/octet-stream"
+            if 'format=json' in query:
+                router, records = decode_dump(body)
+                body = json.dumps({"router": router, "records": records}).encode('utf-8')
+                content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Stats request from {self.client_address[0]}: {format % args}")
+
+
+def start_stats_server(snapshot, host, port, tracer=None):
+    """Serve snapshot() on http://host:port/stats from a daemon thread; None if the port is taken"""
+    try:
+        server = ThreadingHTTPServer((host, port), StatsHandler)
+    except OSError as e:
+        logger.error(f"Could not start stats endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    server.snapshot = snapshot
+    server.tracer = tracer
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Stats endpoint listening on http://{host}:{port}/stats")
+    return server
@@ -0,0 +1,109 @@
+# link_quality.py
+"""Active link quality measurement piggybacked on neighbor heartbeats.
+
+Every heartbeat is a probe: it carries a probe number, the neighbor echoes
+it in its heartbeat_ack, and the round trip is timed on this router's own
+monotonic clock. Every `bulk_every`-th probe is padded with `bulk_bytes` so
+the extra time it takes over the smoothed round trip of small probes gives
+an estimate of the throughput still available on the link (the variable
+packet size method). A probe that is not answered within `timeout` counts
+as lost.
+
+All four measurements are smoothed with exponentially weighted moving
+averages: RTT with TCP's 1/8, jitter (mean change between consecutive
+RTTs) with RFC 3550's 1/16, loss and throughput with their own weights, so
+one slow probe nudges the metric instead of rerouting traffic.
+"""
+import itertools
+import threading
+import time
+
+
+def ewma(average, sample, alpha):
+    return sample if average is None else average + alpha * (sample - average)
+
+
+class LinkQuality:
+    """Smoothed RTT, jitter, loss and available throughput towards one neighbor"""
+
+    def __init__(self, timeout=2.0, bulk_every=10, bulk_bytes=16384,
+                 rtt_alpha=0.125, jitter_alpha=0.0625, loss_alpha=0.1, throughput_alpha=0.25):
+        self.timeout_ns = int(timeout * 1e9)
+        self.bulk_every = bulk_every
+        self.bulk_bytes = bulk_bytes
+        self.rtt_alpha = rtt_alpha
+        self.jitter_alpha = jitter_alpha
+        self.loss_alpha = loss_alpha
+        self.throughput_alpha = throughput_alpha
+        self.probes = itertools.count(1)
+        self.outstanding = {}  # probe number -> (sent ns, padding bytes)
+        self.lock = threading.Lock()
+
+        # Smoothed estimates, None until the first sample
+        self.rtt = None         # seconds
+        self.jitter = None      # seconds
+        self.loss = None        # fraction of probes lost
+        self.throughput = None  # bytes per second
+        self.last_rtt = None
+        self.sent = 0
+        self.answered = 0
+        self.lost = 0
+
+    def probe(self, now=None):
+        """Start a probe; returns (probe number, padding bytes to send with it)"""
+        number = next(self.probes)
+        padding = self.bulk_bytes if self.bulk_every and number % self.bulk_every == 0 else 0
+        with self.lock:
+            self.outstanding[number] = (time.monotonic_ns() if now is None else now, padding)
+            self.sent += 1
+        return number, padding
+
+    def on_reply(self, number, now=None):
+        """Record the echo of a probe; False if it was unknown or had already expired"""
+        if now is None:
+            now = time.monotonic_ns()
+        with self.lock:
+            probe = self.outstanding.pop(number, None)
+            if probe is None:
+                return False
+            sent, padding = probe
+            rtt = (now - sent) / 1e9
+            self.answered += 1
+            self.loss = ewma(self.loss, 0.0, self.loss_alpha)
+            if padding:
+                # The padded probe took longer than a small one by its transfer time
+                extra = rtt - self.rtt if self.rtt is not None else 0.0
+                if extra > 0:
+                    self.throughput = ewma(self.throughput, padding / extra, self.throughput_alpha)
+                return True
+            if self.last_rtt is not None:
+                self.jitter = ewma(self.jitter, abs(rtt - self.last_rtt), self.jitter_alpha)
+            self.last_rtt = rtt
+            self.rtt = ewma(self.rtt, rtt, self.rtt_alpha)
+        return True
+
+    def expire(self, now=None):
+        """Count probes older than the timeout as lost; returns how many were"""
+        deadline = (time.monotonic_ns() if now is None else now) - self.timeout_ns
+        with self.lock:
+            expired = [n for n, (sent, _) in self.outstanding.items() if sent < deadline]
+            for number in expired:
+                del self.outstanding[number]
+                self.lost += 1
+                self.loss = ewma(self.loss, 1.0, self.loss_alpha)
+        return len(expired)
+
+    @property
+    def measured(self):
+        return self.rtt is not None
+
+    def snapshot(self):
+        """Smoothed measurements as reported to the SDN controller"""
+        return {
+            "rtt_ms": 1000 * self.rtt if self.rtt is not None else None,
+            "jitter_ms": 1000 * self.jitter if self.jitter is not None else 0.0,
+            "loss": self.loss or 0.0,
+            "throughput_mbps": 8 * self.throughput / 1e6 if self.throughput is not None else None,
+            "probes": self.sent,
+            "lost": self.lost,
+        }
@@ -0,0 +1,84 @@
+# liveness.py
+"""BFD-style liveness detection for persistent neighbor links.
+
+TCP reports a neighbor that closed or reset its end right away, but a router
+that hangs, or a link that silently stops delivering, leaves the connection
+open and would only be noticed by the 300 s inactivity timeout. So every
+link sends a header-only FRAME_LIVENESS beacon each `interval`, announcing
+the sender's interval and detection multiplier, and every read from a link
+proves the neighbor alive. As in BFD the receiver takes its detection time
+from what the neighbor announced, interval times multiplier, and declares
+the link down once its reader has been waiting that long without a byte.
+A reader that is busy handling a batch is not waiting, so backpressure
+from a slow next hop never looks like a dead neighbor. Links whose neighbor
+has not sent a beacon yet (an older router) are left to the inactivity
+timeout.
+
+A link declared down is failed like a broken one: its unacknowledged
+frames are re-forwarded and, once the neighbor's pool is empty, forwarding
+entries switch to their loop-free alternate (see forwarding_table.py)
+until the controller installs new routes.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger("router_agent")
+
+
+class LivenessMonitor:
+    """Beacon settings and the detection timer shared by every link of a router"""
+
+    def __init__(self, interval=0.1, multiplier=3):
+        self.interval = interval
+        self.multiplier = max(1, min(multiplier, 255))
+        self.interval_us = int(interval * 1e6)
+        self.detections = 0        # links declared down
+        self.failovers = 0         # frames sent to a backup next hop while the primary was down
+        self.last_detection = None  # (neighbor, seconds of silence) of the latest one
+        self.lock = threading.Lock()  # forwarding threads count failovers while the watchdog counts detections
+
+    def beacon(self, link):
+        link.send_liveness(self.interval_us, self.multiplier)
+
+    def failed_over(self):
+        """Count a frame sent to a backup next hop"""
+        with self.lock:
+            self.failovers += 1
+
+    def on_beacon(self, link, frame):
+        """Adopt the detection time the neighbor announced"""
+        link.detect_time = frame.seq / 1e6 * max(1, frame.flags)
+
+    def expired(self, pools, now=None):
+        """Live links whose reader has waited longer than their detection time"""
+        if now is None:
+            now = time.monotonic()
+        down = []
+        for pool in pools:
+            for link in pool.links:
+                idle_since, detect_time = link.idle_since, link.detect_time
+                if link.closed or detect_time is None or idle_since is None:
+                    continue
+                silence = now - idle_since
+                if silence <= detect_time:
+                    continue
+                logger.warning(f"No traffic from {link.neighbor_id} for {1000 * silence:.0f} ms, "
+                               f"declaring the link down")
+                with self.lock:
+                    self.detections += 1
+                    self.last_detection = (link.neighbor_id, silence)
+                down.append(link)
+        return down
+
+    def snapshot(self):
+        with self.lock:
+            detections, failovers, last_detection = self.detections, self.failovers, self.last_detection
+        return {
+            "interval_ms": 1000 * self.interval,
+            "multiplier": self.multiplier,
+            "detections": detections,
+            "failovers": failovers,
+            "last_detection": {"neighbor": last_detection[0], "silence_ms": 1000 * last_detection[1]}
+            if last_detection else None,
+        }
@@ -2,37 +2,113 @@
 import socket
 import json
 import os
+import queue
 import threading
 import time
 import logging
 import random
 import requests
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from framing import (
+    FRAME_EXCHANGE_DATA, FRAME_EXCHANGE_RESPONSE, FRAME_ACK, FRAME_CONTROL, FRAME_LIVENESS,
+    ACK_OK, ACK_NO_ROUTE, ACK_ERROR, STREAM_FIN, FLAG_HOP_TIMES,
+    Frame, encode_frame, encode_ack, read_frame,
+)
+from pipeline import PipelinedLink
+from forwarding_table import EXCHANGE, ForwardingTable
+from pool import NeighborPool
+from link_quality import LinkQuality
+from liveness import LivenessMonitor
+from table_watcher import TableWatcher, diff_tables
+from table_codec import read_table, table_file
+from controller_channel import CONTROL_CHANNEL_PORT, ControllerChannel
+from sessions import SessionTable
+from latency import RouterStats, start_stats_server
+from stream import RECV_SIZE, MessageReassembler, recv_message
+from packet_trace import (
+    TRACE_RECEIVE, TRACE_ENTER, TRACE_FORWARD, TRACE_SLOW_PATH, TRACE_DELIVER, TRACE_DROP,
+    PacketTracer, parse_rates,
+)
+# Configure logging; per-packet events go to the packet tracer, not the log
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger("router_agent")
 
+def shutdown_socket(sock):
+    """Wake any thread blocked on a socket so it notices the session ended"""
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+def traffic_class(packet):
+    """Traffic class a packet is forwarded by: exchange frames may have a pinned path, the rest do not"""
+    if isinstance(packet, Frame) and packet.type in (FRAME_EXCHANGE_DATA, FRAME_EXCHANGE_RESPONSE):
+        return EXCHANGE
+    return None
+
 class RouterAgent:
-    def __init__(self, router_id, table_path, listen_port=9000):
+    def __init__(self, router_id, table_path, listen_port=9000, forward_window=64,
+                 listen_host='0.0.0.0', exchange_server=("exchange_server", 6000), pool_size=2,
+                 send_linger=0.0, nodelay=True, stats_port=8000, hop_sample=16,
+                 trace_rates=None, trace_capacity=65536, trace_dir='/tmp',
+                 probe_interval=1.0, probe_timeout=2.0, liveness_interval=0.1, liveness_multiplier=3,
+                 controller=("sdn_controller", CONTROL_CHANNEL_PORT),
+                 controller_url="http://sdn_controller:8000"):
         self.router_id = router_id
         self.table_path = table_path
         self.listen_port = listen_port
-        self.routing_table = self.load_routing_table()
+        self.listen_host = listen_host
+        self.exchange_server = exchange_server  # (host, port) reached from router10
+        self.forward_window = forward_window  # Unacknowledged frames allowed per neighbor link
+        self.pool_size = pool_size  # Persistent links kept to every neighbor
+        self.send_linger = send_linger  # Seconds a link waits to coalesce more frames into one send
+        self.nodelay = nodelay  # TCP_NODELAY on neighbor links
+        self.stats_port = stats_port  # Local HTTP stats endpoint; 0 disables it
+        self.stats = RouterStats(router_id, hop_sample)  # Latency histograms and traffic counters
+        self.tracer = PacketTracer(router_id, trace_capacity, trace_rates)  # Sampled per-packet events
+        self.trace_dir = trace_dir  # Where SIGUSR1 dumps the packet trace
+        self.probe_interval = probe_interval  # Seconds between heartbeats, each one a link quality probe
+        self.probe_timeout = probe_timeout  # Seconds before an unanswered probe counts as lost
+        self.liveness = LivenessMonitor(liveness_interval, liveness_multiplier)  # Beacons and failure detection; interval 0 disables
+        self.controller = controller  # (host, port) of the controller channel; None disables it
+        self.controller_url = controller_url.rstrip('/')  # Controller HTTP API, used while the channel is down
+        self.channel = None  # ControllerChannel once started
+        self.neighbor_pools = {}  # neighbor -> NeighborPool of its live links
+        self.routing_table = None
+        self.fib = None  # Compiled ForwardingTable, replaced atomically on refresh
+        self.install_routing_table(self.load_routing_table())
         self.refresh_thread = None
+        self.table_watcher = None
         self.neighbor_connections = {}  # Store connections to neighbors
+        self.connecting = set()  # Neighbors with a dialer running
+        self.client_sessions = SessionTable()  # router1: stream id -> exchange client socket
+        self.server_sessions = SessionTable()  # router10: stream id -> exchange server socket
         self.connection_lock = threading.Lock()  # Lock for thread-safe access
         self.running = True  # Flag to control connection threads
         
     def load_routing_table(self):
         """Load routing table from the shared volume"""
         try:
-            with open(self.table_path, 'r') as f:
-                table = json.load(f)
-                logger.info(f"Loaded routing table for {self.router_id} with {len(table.get('routes', []))} routes")
-                return table
+            table = read_table(self.table_path)
+            logger.info(f"Loaded routing table for {self.router_id} with {len(table.get('routes', []))} routes")
+            return table
         except Exception as e:
             logger.error(f"Error loading routing table: {e}")
             return {"interfaces": {}, "routes": [], "flow_table": []}
     
+    def install_routing_table(self, table):
+        """Compile a routing table and swap it in; readers see the old or the new table, never a mix"""
+        fib = ForwardingTable.compile(table, self.neighbor_pool)
+        self.routing_table = table
+        self.fib = fib
+    
+    def neighbor_pool(self, neighbor_id):
+        """Stable pool through which forwarding entries borrow a neighbor's live links"""
+        pool = self.neighbor_pools.get(neighbor_id)
+        if pool is None:
+            pool = self.neighbor_pools.setdefault(neighbor_id, NeighborPool(
+                neighbor_id, self.pool_size, quality=LinkQuality(self.probe_timeout)))
+        return pool
+    
     def get_neighbors(self):
         """Extract neighbors from interfaces in routing table"""
         neighbors = []
@@ -41,32 +117,44 @@ class RouterAgent:
                 neighbors.append(router_id)
         return neighbors
     
-    def start_periodic_table_refresh(self):
-        """Start a thread to periodically refresh the routing table"""
-        def refresh_routine():
-            while self.running:
-                try:
-                    old_table = self.routing_table
-                    self.routing_table = self.load_routing_table()
-                    # Check for new neighbors after refresh
-                    old_neighbors = set(old_table.get('interfaces', {}).keys())
-                    new_neighbors = set(self.routing_table.get('interfaces', {}).keys())
-                    
-                    if old_neighbors != new_neighbors:
-                        logger.info(f"Neighbor change detected. Updating connections.")
-                        self.update_neighbor_connections()
-                        
-                    logger.info(f"Refreshed routing table for {self.router_id}")
-                except Exception as e:
-                    logger.error(f"Error refreshing routing table: {e}")
-                time.sleep(10)  # Refresh every 10 seconds
+    def start_table_watcher(self):
+        """Start a thread that reloads the routing table only when the file really changes"""
+        self.table_watcher = TableWatcher(self.table_path, self.table_file_changed)
+        
+        def watch_routine():
+            try:
+                self.table_watcher.run(lambda: self.running)
+            except Exception as e:
+                logger.error(f"Routing table watcher stopped: {e}")
         
-        self.refresh_thread = threading.Thread(target=refresh_routine, daemon=True)
+        self.refresh_thread = threading.Thread(target=watch_routine, daemon=True)
         self.refresh_thread.start()
-        logger.info("Started periodic routing table refresh")
+        mode = "inotify" if self.table_watcher.fileno() is not None else "stat polling"
+        logger.info(f"Watching routing table {self.table_path} via {mode}")
+    
+    def start_controller_channel(self, on_table):
+        """Connect to the controller, which pushes table changes instead of us watching the file"""
+        if self.controller:
+            self.channel = ControllerChannel(self.router_id, self.controller, on_table).start()
+    
+    def table_file_changed(self, table):
+        """Apply a table from the shared file, unless the controller channel already delivers them"""
+        if self.channel is not None and self.channel.connected:
+            return
+        self.apply_table_update(table)
+    
+    def apply_table_update(self, table):
+        """Install a changed routing table and touch only the neighbor connections it affects"""
+        diff = diff_tables(self.routing_table, table)
+        self.install_routing_table(table)
+        logger.info(f"Routing table for {self.router_id} changed: {len(diff.changed_destinations)} destinations, "
+                    f"neighbors added {sorted(diff.added_neighbors)}, removed {sorted(diff.removed_neighbors)}, "
+                    f"readdressed {sorted(diff.changed_neighbors)}")
+        if diff.added_neighbors or diff.removed_neighbors or diff.changed_neighbors:
+            self.update_neighbor_connections(diff)
     
     def establish_neighbor_connection(self, neighbor_id):
-        """Establish a TCP connection with a neighbor"""
+        """Start a dialer that fills the neighbor's link pool, unless one is already running"""
         if neighbor_id == self.router_id:
             return  # Skip self-connection
             
@@ -77,164 +165,155 @@ class RouterAgent:
             logger.error(f"No IP address found for neighbor {neighbor_id}")
             return
         
+        with self.connection_lock:
+            if neighbor_id in self.connecting:
+                return
+            self.connecting.add(neighbor_id)
+        
+        pool = self.neighbor_pool(neighbor_id)
+        
         def connection_handler():
-            retries = 0
             max_retries = 10
-            backoff_time = 2  # Initial backoff time in seconds
-            
-            while self.running and retries < max_retries:
-                try:
-                    # Don't create a new connection if one already exists
-                    with self.connection_lock:
-                        if neighbor_id in self.neighbor_connections and self.neighbor_connections[neighbor_id].get('status') == 'connected':
-                            break
-                    
-                    # Create socket for connection
-                    neighbor_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    neighbor_socket.settimeout(5)  # Set timeout for connection attempts
-                    
-                    logger.info(f"Attempting to connect to neighbor {neighbor_id} at {ip_address}:{self.listen_port}")
-                    neighbor_socket.connect((ip_address, self.listen_port))
-                    
-                    # Send hello message
-                    hello_msg = {
-                        "type": "hello",
-                        "source": self.router_id,
-                        "destination": neighbor_id,
-                        "payload": {"type": "connection_request"}
-                    }
-                    neighbor_socket.send(json.dumps(hello_msg).encode('utf-8'))
-                    
-                    # Wait for response
-                    response = neighbor_socket.recv(4096)
-                    if response:
-                        response_data = json.loads(response.decode('utf-8'))
-                        logger.info(f"Connection established with {neighbor_id}, response: {response_data}")
-                        
-                        # Store connection info
-                        with self.connection_lock:
-                            self.neighbor_connections[neighbor_id] = {
-                                'socket': neighbor_socket,
-                                'ip': ip_address,
-                                'status': 'connected',
-                                'last_activity': time.time()
-                            }
-                        
-                        # Start heartbeat for this connection
-                        threading.Thread(target=self.connection_heartbeat, 
-                                        args=(neighbor_id,), 
-                                        daemon=True).start()
-                        
-                        break  # Connection successful
-                    else:
-                        neighbor_socket.close()
-                        logger.warning(f"No response from {neighbor_id}, will retry")
+            try:
+                # Keep dialing until the pool is full; backoff is tracked by the pool
+                while self.running and pool.deficit and neighbor_id in self.get_neighbors():
+                    delay = pool.retry_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    try:
+                        link = self.dial_neighbor(neighbor_id, ip_address)
                         
-                except Exception as e:
-                    logger.warning(f"Failed to connect to {neighbor_id}: {e}, will retry in {backoff_time}s")
-                    # Exponential backoff
-                    time.sleep(backoff_time)
-                    backoff_time = min(backoff_time * 2, 30)  # Cap at 30 seconds
-                    retries += 1
-            
-            if retries >= max_retries:
-                logger.error(f"Failed to establish connection with {neighbor_id} after {max_retries} attempts")
+                        # Start heartbeat for this connection, unless the neighbor's links filled the pool first
+                        if link is not None:
+                            threading.Thread(target=self.connection_heartbeat, 
+                                            args=(link,), 
+                                            daemon=True).start()
+                    except Exception as e:
+                        delay = pool.connect_failed()
+                        logger.warning(f"Failed to connect to {neighbor_id}: {e}, will retry in {delay:.1f}s")
+                        if pool.failures >= max_retries:
+                            logger.error(f"Failed to establish connection with {neighbor_id} after {max_retries} attempts")
+                            with self.connection_lock:
+                                if neighbor_id in self.neighbor_connections and not pool.healthy:
+                                    self.neighbor_connections[neighbor_id]['status'] = 'failed'
+                            break
+            finally:
                 with self.connection_lock:
-                    if neighbor_id in self.neighbor_connections:
-                        self.neighbor_connections[neighbor_id]['status'] = 'failed'
+                    self.connecting.discard(neighbor_id)
         
         # Start connection attempt in a separate thread
         threading.Thread(target=connection_handler, daemon=True).start()
     
-    def connection_heartbeat(self, neighbor_id):
-        """Send periodic heartbeats to maintain the connection"""
-        while self.running:
+    def dial_neighbor(self, neighbor_id, ip_address):
+        """Open one link to a neighbor with the hello handshake and put it in the pool"""
+        # Create socket for connection
+        neighbor_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        neighbor_socket.settimeout(5)  # Set timeout for connection attempts
+        try:
+            logger.info(f"Attempting to connect to neighbor {neighbor_id} at {ip_address}:{self.listen_port}")
+            neighbor_socket.connect((ip_address, self.listen_port))
+            
+            # Send hello message
+            hello_msg = {
+                "type": "hello",
+                "source": self.router_id,
+                "destination": neighbor_id,
+                "payload": {"type": "connection_request"}
+            }
+            neighbor_socket.send(json.dumps(hello_msg).encode('utf-8'))
+            
+            # Wait for response; the neighbor may start sending frames right behind it
+            reassembler = MessageReassembler()
+            response_data = recv_message(neighbor_socket, reassembler)
+            logger.info(f"Connection established with {neighbor_id}, response: {response_data}")
+        except:
+            neighbor_socket.close()
+            raise
+        
+        # Store connection info and start reading acks and frames from it
+        return self.register_link(neighbor_id, neighbor_socket, ip_address, reassembler.take_rest())
+    
+    def connection_heartbeat(self, link):
+        """Send periodic heartbeats on one link to keep it alive and probe its quality"""
+        while self.running and not link.closed:
             try:
-                # Sleep between heartbeats - much longer interval
-                time.sleep(120)  # Reduced from 30s to 120s (2 minutes)
-                
-                with self.connection_lock:
-                    if neighbor_id not in self.neighbor_connections or self.neighbor_connections[neighbor_id]['status'] != 'connected':
-                        break
-                    
-                    # Get connection info
-                    conn_info = self.neighbor_connections[neighbor_id]
-                    socket_obj = conn_info['socket']
-                
-                # Prepare heartbeat message
-                heartbeat = {
-                    "type": "heartbeat",
-                    "source": self.router_id,
-                    "destination": neighbor_id,
-                    "timestamp": time.time()
-                }
+                time.sleep(self.probe_interval)
+                if link.closed:
+                    break
                 
-                # Send heartbeat
-                socket_obj.send(json.dumps(heartbeat).encode('utf-8'))
-                logger.debug(f"Sent heartbeat to {neighbor_id}")
-                
-                # Wait for response, but don't block for too long
-                socket_obj.settimeout(5)
-                try:
-                    response = socket_obj.recv(4096)
-                    
-                    if response:
-                        # Update last activity timestamp
-                        with self.connection_lock:
-                            if neighbor_id in self.neighbor_connections:
-                                self.neighbor_connections[neighbor_id]['last_activity'] = time.time()
-                                logger.debug(f"Received heartbeat response from {neighbor_id}")
-                    else:
-                        logger.warning(f"Empty heartbeat response from {neighbor_id}")
-                except socket.timeout:
-                    logger.warning(f"Heartbeat timeout from {neighbor_id}, but keeping connection")
-                    # Don't close the connection immediately on timeout
-                    continue
+                # Send heartbeat; the ack is picked up by the link reader
+                self.send_probe(link)
                 
             except Exception as e:
-                logger.warning(f"Error in heartbeat with {neighbor_id}: {e}")
+                logger.warning(f"Error in heartbeat with {link.neighbor_id}: {e}")
                 # Close connection and try to reestablish only if it's a serious error
-                if isinstance(e, (ConnectionResetError, ConnectionRefusedError, ConnectionAbortedError)):
-                    with self.connection_lock:
-                        if neighbor_id in self.neighbor_connections:
-                            try:
-                                self.neighbor_connections[neighbor_id]['socket'].close()
-                            except:
-                                pass
-                            self.neighbor_connections[neighbor_id]['status'] = 'disconnected'
-                    
-                    # Try to reconnect
-                    self.establish_neighbor_connection(neighbor_id)
+                if isinstance(e, (ConnectionResetError, ConnectionRefusedError, ConnectionAbortedError, BrokenPipeError)):
+                    self.link_failed(link)
                 break
     
-    def update_neighbor_connections(self):
-        """Update connections based on current routing table"""
+    def send_probe(self, link):
+        """Send a heartbeat that doubles as a link quality probe towards the link's neighbor"""
+        quality = self.neighbor_pool(link.neighbor_id).quality
+        quality.expire()
+        number, padding = quality.probe()
+        heartbeat = {
+            "type": "heartbeat",
+            "source": self.router_id,
+            "destination": link.neighbor_id,
+            "timestamp": time.time(),
+            "probe": number
+        }
+        if padding:
+            heartbeat["pad"] = "x" * padding  # Bulk probe for the throughput estimate
+        link.send_control(heartbeat)
+    
+    def answer_heartbeat(self, router_id, link, packet):
+        """Echo a heartbeat's probe number back so the neighbor can time the round trip"""
+        link.send_control({
+            "type": "heartbeat_ack",
+            "source": self.router_id,
+            "destination": router_id,
+            "timestamp": time.time(),
+            "probe": packet.get('probe')
+        })
+    
+    def probe_answered(self, router_id, packet):
+        """Feed a heartbeat_ack into the link quality estimate of its neighbor"""
+        if packet.get('probe') is not None:
+            self.neighbor_pool(router_id).quality.on_reply(packet['probe'])
+    
+    def update_neighbor_connections(self, diff=None):
+        """Update connections based on current routing table; with a diff, only touch affected neighbors"""
         neighbors = self.get_neighbors()
-        logger.info(f"Updating neighbor connections. Current neighbors: {neighbors}")
+        if diff is None:
+            logger.info(f"Updating neighbor connections. Current neighbors: {neighbors}")
+            stale = [n for n in self.neighbor_connections if n not in neighbors]
+            candidates = neighbors
+        else:
+            stale = diff.removed_neighbors | diff.changed_neighbors
+            candidates = (diff.added_neighbors | diff.changed_neighbors) & set(neighbors)
         
-        # Close connections to routers that are no longer neighbors
+        # Close connections to routers that are no longer neighbors or moved address
         with self.connection_lock:
-            for neighbor_id in list(self.neighbor_connections.keys()):
-                if neighbor_id not in neighbors:
-                    logger.info(f"Closing connection to {neighbor_id} as it's no longer a neighbor")
-                    try:
-                        self.neighbor_connections[neighbor_id]['socket'].close()
-                    except:
-                        pass
-                    del self.neighbor_connections[neighbor_id]
+            for neighbor_id in list(stale):
+                if neighbor_id not in self.neighbor_connections:
+                    continue
+                logger.info(f"Closing connection to {neighbor_id} after table change")
+                self.neighbor_connections.pop(neighbor_id)
+                for link in self.neighbor_pool(neighbor_id).clear():
+                    link.close()
         
         # Establish connections to new neighbors
-        for neighbor_id in neighbors:
-            with self.connection_lock:
-                if neighbor_id not in self.neighbor_connections or self.neighbor_connections[neighbor_id]['status'] != 'connected':
-                    # Start a new connection
-                    self.establish_neighbor_connection(neighbor_id)
+        for neighbor_id in candidates:
+            if self.neighbor_pool(neighbor_id).deficit:
+                # Start a new connection
+                self.establish_neighbor_connection(neighbor_id)
     
     def start_tcp_server(self):
         """Start TCP server to listen for incoming packets"""
         server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        server_socket.bind(('0.0.0.0', self.listen_port))
+        server_socket.bind((self.listen_host, self.listen_port))
         server_socket.listen(10)  # Increased backlog for more connections
         
         logger.info(f"Router {self.router_id} listening on port {self.listen_port}")
@@ -243,7 +322,7 @@ class RouterAgent:
             try:
                 # Accept incoming connection
                 client_socket, addr = server_socket.accept()
-                logger.info(f"Accepted connection from {addr}")
+                logger.debug("Accepted connection from %s", addr)
                 
                 # Handle the connection in a new thread
                 threading.Thread(target=self.handle_connection, 
@@ -257,7 +336,7 @@ class RouterAgent:
         """Handle an incoming connection - could be a packet or a connection request"""
         try:
             # Receive data
-            data = client_socket.recv(4096)
+            data = client_socket.recv(RECV_SIZE)
             if not data:
                 client_socket.close()
                 return
@@ -271,11 +350,22 @@ class RouterAgent:
                     logger.error(f"Non-router1 received exchange client connection")
                     client_socket.close()
                     return
-                
-            # Parse packet as JSON
+            
+            # Everything else is a binary frame or a JSON message, possibly split
+            # across reads or followed by more bytes (e.g. frames after a hello)
+            reassembler = MessageReassembler(data)
             try:
-                packet = json.loads(data.decode('utf-8'))
-                logger.info(f"Received data: {packet}")
+                packet = recv_message(client_socket, reassembler)
+                
+                # Binary exchange frame from a router without a persistent connection
+                if isinstance(packet, Frame):
+                    packet.arrived = time.monotonic_ns()
+                    self.tracer.sample(packet, TRACE_RECEIVE, now=packet.arrived)
+                    status = self.handle_frame(packet)
+                    client_socket.sendall(encode_ack(self.router_id, self.previous_hop(packet), status))
+                    return
+                
+                logger.debug("Received data: %s", packet)
                 
                 # Check packet type
                 packet_type = packet.get('type', 'data')
@@ -309,19 +399,8 @@ class RouterAgent:
                         }
                         client_socket.send(json.dumps(response).encode('utf-8'))
                         
-                        # Store connection
-                        with self.connection_lock:
-                            self.neighbor_connections[source_router] = {
-                                'socket': client_socket,
-                                'ip': addr[0],
-                                'status': 'connected',
-                                'last_activity': time.time()
-                            }
-                        
-                        # Start heartbeat monitoring in a separate thread
-                        threading.Thread(target=self.monitor_connection, 
-                                        args=(source_router, client_socket), 
-                                        daemon=True).start()
+                        # Store connection and start reading frames from it
+                        self.register_link(source_router, client_socket, addr[0], reassembler.take_rest())
                         
                         return  # Keep connection open
                 
@@ -352,13 +431,12 @@ class RouterAgent:
                 pass
     
     def handle_exchange_client(self, client_socket, initial_data):
-        """Handle exchange client connection and forward to the exchange server"""
+        """Open a tunnel session for an exchange client and start forwarding its traffic"""
         if self.router_id != "router1":
             logger.error("Only router1 should handle exchange client connections")
             client_socket.close()
             return
         
-        # Connect to router10
         try:
             # First, find the next hop to router10
             next_hop = self.get_next_hop("router10")
@@ -368,10 +446,13 @@ class RouterAgent:
                 client_socket.close()
                 return
             
+            session = self.client_sessions.open(client_socket)
+            logger.info(f"Opened exchange session {session.stream_id} ({len(self.client_sessions)} active)")
+            
             # Create a thread to handle ongoing communication
             threading.Thread(
                 target=self.exchange_forwarding_loop,
-                args=(client_socket, next_hop, initial_data),
+                args=(session, initial_data),
                 daemon=True
             ).start()
             
@@ -379,47 +460,33 @@ class RouterAgent:
             logger.error(f"Error setting up exchange client forwarding: {e}")
             client_socket.close()
     
-    def exchange_forwarding_loop(self, client_socket, next_hop, initial_data):
-        """Forward exchange traffic between client and server via the router network"""
+    def send_into_tunnel(self, session, frame_type, destination, data, flags=0):
+        """Forward exchange bytes of one session along the current route to the tunnel's other end"""
+        frame = Frame(frame_type, self.router_id, destination, data, flags=flags, stream=session.stream_id)
+        self.stats.start_frame(frame, session.frames_out)
+        self.tracer.sample(frame, TRACE_ENTER, now=frame.arrived)
+        session.sent(len(data))
+        return self.forward_to_destination(frame)
+    
+    def exchange_forwarding_loop(self, session, initial_data):
+        """Forward one client's exchange traffic into the tunnel towards router10"""
+        client_socket = session.endpoint
         try:
-            # Create a special exchange packet for router network
-            exchange_packet = {
-                "type": "exchange_data",
-                "source": self.router_id,
-                "destination": "router10",
-                "payload": {
-                    "binary_data": initial_data.hex()  # Convert binary to hex string for JSON
-                }
-            }
-            
             # Use our existing forwarding mechanism
-            forward_result = self.forward_packet(exchange_packet, next_hop)
-            if not forward_result:
+            if not self.send_into_tunnel(session, FRAME_EXCHANGE_DATA, "router10", initial_data):
                 logger.error("Failed to forward initial exchange packet")
-                client_socket.close()
                 return
             
             # Now establish an ongoing forwarding loop
             while self.running:
                 try:
                     client_socket.settimeout(1.0)  # Short timeout to check running flag
-                    data = client_socket.recv(4096)
+                    data = client_socket.recv(RECV_SIZE)
                     if not data:
-                        logger.info("Exchange client closed connection")
+                        logger.info(f"Exchange client of session {session.stream_id} closed connection")
                         break
                     
-                    # Forward the data
-                    exchange_packet = {
-                        "type": "exchange_data",
-                        "source": self.router_id,
-                        "destination": "router10",
-                        "payload": {
-                            "binary_data": data.hex()
-                        }
-                    }
-                    
-                    forward_result = self.forward_packet(exchange_packet, next_hop)
-                    if not forward_result:
+                    if not self.send_into_tunnel(session, FRAME_EXCHANGE_DATA, "router10", data):
                         logger.error("Failed to forward exchange packet")
                         break
                     
@@ -434,98 +501,222 @@ class RouterAgent:
             logger.error(f"Exchange forwarding thread error: {e}")
         
         finally:
+            # Still in the table means router10 did not end the stream; tell it we did
+            if self.client_sessions.close(session.stream_id) is not None:
+                self.send_into_tunnel(session, FRAME_EXCHANGE_DATA, "router10", b"", STREAM_FIN)
             try:
                 client_socket.close()
             except:
                 pass
-            logger.info("Exchange forwarding thread exited")
+            logger.info(f"Exchange session {session.stream_id} closed")
     
-    def monitor_connection(self, router_id, client_socket):
-        """Monitor an established connection from another router"""
-        last_activity = time.time()
+    def deliver_exchange_response(self, frame):
+        """Write an exchange response arriving at router1 back to the client socket of its session"""
+        session = self.client_sessions.get(frame.stream)
+        if session is None:
+            logger.debug(f"Dropping response for closed exchange session {frame.stream}")
+            return True  # The client is gone; nothing for the sender to retry
         
-        while self.running:
+        if frame.flags & STREAM_FIN:
+            # router10 lost its exchange server connection; end the client's session too
+            self.client_sessions.close(frame.stream)
+            shutdown_socket(session.endpoint)
+            return True
+        
+        try:
+            session.endpoint.sendall(frame.payload)
+            session.received(len(frame.payload))
+            return True
+        except Exception as e:
+            logger.error(f"Error delivering exchange response to session {frame.stream}: {e}")
+            shutdown_socket(session.endpoint)  # The forwarding loop ends the session
+            return False
+    
+    def register_link(self, neighbor_id, neighbor_socket, ip_address, initial=b""):
+        """Wrap an established neighbor socket in a pipelined link and start its reader; None if the pool is full"""
+        neighbor_socket.settimeout(300)  # Inactivity timeout (5 minutes) for the reader
+        link = PipelinedLink(self.router_id, neighbor_id, neighbor_socket, self.forward_window,
+                             initial=initial, linger=self.send_linger, nodelay=self.nodelay)
+        pool = self.neighbor_pool(neighbor_id)
+        if not pool.add(link):
+            logger.info(f"Pool to {neighbor_id} is full, closing the extra link")
+            link.close()
+            return None
+        with self.connection_lock:
+            self.neighbor_connections[neighbor_id] = {
+                'pool': pool,
+                'ip': ip_address,
+                'status': 'connected',
+                'last_activity': time.time()
+            }
+        threading.Thread(target=self.monitor_connection,
+                        args=(neighbor_id, link),
+                        daemon=True).start()
+        if self.liveness.interval:
+            threading.Thread(target=self.liveness_beacon, args=(link,), daemon=True).start()
+        return link
+    
+    def monitor_connection(self, router_id, link):
+        """Read frames from an established neighbor link until it closes
+        
+        The reader applies acks and liveness beacons itself and queues everything else for
+        the link's forwarder, so it never waits on another link's window. The queue holds
+        at most a window of frames: the neighbor sends no more before we acknowledge them.
+        """
+        inbound = queue.SimpleQueue()
+        threading.Thread(target=self.forward_link_frames, args=(router_id, link, inbound), daemon=True).start()
+        while self.running and not link.closed:
             try:
-                # Check if we should close this connection
-                with self.connection_lock:
-                    if router_id not in self.neighbor_connections or self.neighbor_connections[router_id]['status'] != 'connected':
-                        break
+                # Every complete frame that one recv() brought in
+                messages = link.receive()
                 
-                # Set timeout for receiving data
-                client_socket.settimeout(5)
-                
-                # Try to receive data
-                data = client_socket.recv(4096)
-                if not data:
-                    logger.warning(f"Connection closed by {router_id}")
-                    break
-                
-                # Process received data
-                packet = json.loads(data.decode('utf-8'))
-                packet_type = packet.get('type', 'data')
-                
-                if packet_type == 'heartbeat':
-                    # Respond to heartbeat
-                    response = {
-                        "type": "heartbeat_ack",
-                        "source": self.router_id,
-                        "destination": router_id,
-                        "timestamp": time.time()
-                    }
-                    client_socket.send(json.dumps(response).encode('utf-8'))
-                    
-                    # Update last activity
-                    with self.connection_lock:
-                        if router_id in self.neighbor_connections:
-                            self.neighbor_connections[router_id]['last_activity'] = time.time()
-                
-                elif packet_type == 'data':
-                    # Handle data packet
-                    threading.Thread(target=self.handle_packet, 
-                                    args=(client_socket, packet)).start()
+                with self.connection_lock:
+                    if router_id in self.neighbor_connections:
+                        self.neighbor_connections[router_id]['last_activity'] = time.time()
                 
-                # Update last activity time
-                last_activity = time.time()
+                arrived = time.monotonic_ns()  # One clock read per batch; the frames came in together
+                frames = self.handle_link_acks(router_id, link, messages, arrived)
+                if frames:
+                    inbound.put((frames, arrived))
                 
             except socket.timeout:
-                # Connection is idle but still open
-                continue
-                
-            except Exception as e:
-                logger.error(f"Error monitoring connection to {router_id}: {e}")
-                break
-                
-            # Check for inactivity timeout (5 minutes)
-            if (time.time() - last_activity) > 300:
                 logger.warning(f"Connection to {router_id} timed out due to inactivity")
                 break
                 
-            time.sleep(1)  # Sleep to avoid busy waiting
+            except Exception as e:
+                if not link.closed:
+                    logger.error(f"Error monitoring connection to {router_id}: {e}")
+                break
         
-        # Clean up connection
-        try:
-            client_socket.close()
-        except:
-            pass
+        inbound.put(None)
+        self.link_failed(link)
+    
+    def handle_link_acks(self, router_id, link, messages, arrived):
+        """Apply a batch's acks and liveness beacons; returns the messages left for the forwarder"""
+        rest = []
+        for frame in messages:
+            if isinstance(frame, dict):
+                rest.append(frame)
+            elif frame.type == FRAME_LIVENESS:
+                self.liveness.on_beacon(link, frame)
+            elif frame.type == FRAME_ACK:
+                self.tracer.sample(frame, TRACE_RECEIVE, router_id, arrived)
+                failed = link.on_ack(frame.seq, frame.flags)
+                if failed is not None:
+                    logger.warning(f"{router_id} dropped a frame for {failed.destination} "
+                                   f"({'no route' if frame.flags == ACK_NO_ROUTE else 'error'})")
+            else:
+                rest.append(frame)
+        return rest
+    
+    def forward_link_frames(self, router_id, link, inbound):
+        """Handle the batches a link's reader queued, in order, until the link closes"""
+        while True:
+            batch = inbound.get()
+            if batch is None or link.closed:
+                break  # The neighbor re-forwards whatever we did not acknowledge
+            try:
+                self.handle_link_messages(router_id, link, *batch)
+            except OSError:
+                break  # The reader notices the broken socket
+            except Exception as e:
+                logger.error(f"Error handling frames from {router_id}: {e}")
+    
+    def handle_link_messages(self, router_id, link, messages, arrived):
+        """Handle one batch of link messages and acknowledge it with a single cumulative ack"""
+        ack_seq = 0
+        for frame in messages:
+            if isinstance(frame, dict):
+                self.handle_control(router_id, link, frame)  # Bare JSON from an older peer
+                continue
+            
+            self.tracer.sample(frame, TRACE_RECEIVE, router_id, arrived)
+            
+            # Forwarding renumbers the frame for the next link, so keep our seq
+            seq = frame.seq
+            frame.arrived = arrived
+            self.stats.on_receive(router_id, frame)
+            if frame.type == FRAME_CONTROL:
+                status = self.handle_control(router_id, link, json.loads(bytes(frame.payload).decode('utf-8')))
+            else:
+                status = self.handle_frame(frame)
             
+            # Cumulative acks for sequenced frames; TCP keeps them in order, so
+            # only failures are acked on their own to report their status
+            if seq:
+                if status == ACK_OK:
+                    ack_seq = seq
+                else:
+                    link.send_ack(seq, status)
+                    ack_seq = 0
+        
+        if ack_seq:
+            link.send_ack(ack_seq)
+    
+    def handle_control(self, router_id, link, packet):
+        """Handle a JSON message received inside a control frame"""
+        packet_type = packet.get('type', 'data')
+        
+        if packet_type == 'heartbeat':
+            self.answer_heartbeat(router_id, link, packet)
+        elif packet_type == 'heartbeat_ack':
+            self.probe_answered(router_id, packet)
+        elif packet_type == 'data':
+            return self.handle_packet(None, packet)
+        return ACK_OK
+    
+    def link_failed(self, link):
+        """Tear down a broken link and re-forward frames it never got acknowledged"""
+        pending = link.close()
+        pool = self.neighbor_pool(link.neighbor_id)
+        current = pool.discard(link)  # False if a table change already dropped it
+        if current:
+            logger.info(f"Closed a connection to {link.neighbor_id} ({len(pool.links)} left in pool)")
         with self.connection_lock:
-            if router_id in self.neighbor_connections:
-                self.neighbor_connections[router_id]['status'] = 'disconnected'
-                logger.info(f"Closed connection to {router_id}")
+            conn_info = self.neighbor_connections.get(link.neighbor_id)
+            if current and conn_info is not None and not pool.healthy:
+                conn_info['status'] = 'disconnected'
+        
+        if pending:
+            logger.warning(f"Re-forwarding {len(pending)} unacknowledged frames from link to {link.neighbor_id}")
+            threading.Thread(target=self.reforward_frames, args=(pending,), daemon=True).start()
+        
+        if current and self.running and link.neighbor_id in self.get_neighbors():
+            self.establish_neighbor_connection(link.neighbor_id)
+    
+    def liveness_beacon(self, link):
+        """Send liveness beacons on one link until it closes"""
+        while self.running and not link.closed:
+            try:
+                self.liveness.beacon(link)
+            except OSError:
+                break  # The link's reader notices the broken socket
+            time.sleep(self.liveness.interval)
+    
+    def liveness_watchdog(self):
+        """Fail every link whose neighbor has been silent for longer than its detection time"""
+        while self.running:
+            time.sleep(self.liveness.interval)
+            for link in self.liveness.expired(list(self.neighbor_pools.values())):
+                try:
+                    self.link_failed(link)
+                except Exception as e:
+                    logger.error(f"Error failing link to {link.neighbor_id}: {e}")
+    
+    def reforward_frames(self, frames):
+        """Send frames recovered from a failed link along the current best route"""
+        for frame in frames:
+            if not self.forward_to_destination(frame):
+                logger.error(f"Dropped frame for {frame.destination} after link failure")
     
     def handle_packet(self, client_socket, packet):
-        """Handle a data packet"""
+        """Handle a JSON data packet; client_socket is None when it arrived on a pipelined link"""
         try:
             # Get packet info
             destination = packet.get('destination')
             
-            # Check if this is an exchange_data packet and this is router10
-            if packet.get('type') == 'exchange_data' and self.router_id == 'router10':
-                return self.handle_exchange_server_packet(client_socket, packet)
-            
             # Check if this router is the destination
             if destination == self.router_id:
-                logger.info(f"Packet reached destination: {self.router_id}")
                 # Process packet locally
                 payload = packet.get('payload', {})
                 
@@ -543,11 +734,10 @@ class RouterAgent:
                         "router": self.router_id,
                         "timestamp": time.time()
                     }
-                    
-                client_socket.send(json.dumps(response).encode('utf-8'))
+                
+                status = ACK_OK
             else:
                 # Forward packet
-                logger.info(f"Forwarding packet to {destination}")
                 next_hop = self.get_next_hop(destination)
                 if next_hop:
                     forward_result = self.forward_packet(packet, next_hop)
@@ -557,14 +747,20 @@ class RouterAgent:
                         "result": forward_result,
                         "router": self.router_id
                     }
+                    status = ACK_OK if forward_result else ACK_ERROR
                 else:
                     response = {
                         "status": "error", 
                         "message": f"No route to destination {destination}",
                         "router": self.router_id
                     }
-                
+                    status = ACK_NO_ROUTE
+            
+            event = TRACE_DELIVER if destination == self.router_id else TRACE_FORWARD if status == ACK_OK else TRACE_DROP
+            self.tracer.record_packet(event, packet, response.get('next_hop'), status)
+            if client_socket is not None:
                 client_socket.send(json.dumps(response).encode('utf-8'))
+            return status
                 
         except Exception as e:
             logger.error(f"Error handling packet: {e}")
@@ -574,168 +770,190 @@ class RouterAgent:
                     "message": str(e),
                     "router": self.router_id
                 }
-                client_socket.send(json.dumps(error_response).encode('utf-8'))
+                if client_socket is not None:
+                    client_socket.send(json.dumps(error_response).encode('utf-8'))
             except:
                 pass
+            return ACK_ERROR
+    
+    def handle_frame(self, frame):
+        """Handle a binary exchange frame: deliver it locally or forward it; returns the ack status"""
+        try:
+            if frame.destination == self.router_id:
+                self.stats.on_deliver(frame)
+                if frame.type == FRAME_EXCHANGE_DATA:
+                    status = ACK_OK if self.handle_exchange_server_packet(frame) else ACK_ERROR
+                else:
+                    status = ACK_OK if self.deliver_exchange_response(frame) else ACK_ERROR
+            else:
+                entry = self.fib.get(frame.destination, traffic_class(frame))
+                if entry is not None:
+                    status = ACK_OK if self.forward_packet(frame, entry.next_hop, entry) else ACK_ERROR
+                else:
+                    logger.error(f"No route to destination {frame.destination}")
+                    status = ACK_NO_ROUTE
+            if frame.traced and (status != ACK_OK or frame.destination == self.router_id):
+                self.tracer.record(TRACE_DELIVER if status == ACK_OK else TRACE_DROP, frame, status=status)
+            return status
+            
+        except Exception as e:
+            logger.error(f"Error handling frame: {e}")
+            return ACK_ERROR
     
-    def handle_exchange_server_packet(self, client_socket, packet):
-        """Handle exchange_data packet by forwarding to exchange server"""
+    def previous_hop(self, frame):
+        """Router that handed us this frame, used as the destination of its ack"""
+        return frame.route[-1] if frame.route else frame.source
+    
+    def handle_exchange_server_packet(self, frame):
+        """Forward the payload of an exchange frame to the exchange server connection of its session"""
+        session = None
         try:
             if self.router_id != "router10":
                 logger.error("Only router10 should handle exchange server packets")
-                response = {"status": "error", "message": "Wrong router for exchange server"}
-                client_socket.send(json.dumps(response).encode('utf-8'))
-                return
+                return False
+            
+            session = self.server_sessions.get(frame.stream)
             
-            # Extract binary data
-            binary_data = bytes.fromhex(packet.get('payload', {}).get('binary_data', ''))
-            if not binary_data:
+            if frame.flags & STREAM_FIN:
+                # The client at router1 went away; drop its exchange server connection
+                session = self.server_sessions.close(frame.stream)
+                if session is not None:
+                    shutdown_socket(session.endpoint)
+                return True
+            
+            if not frame.payload:
                 logger.error("No binary data in exchange packet")
-                response = {"status": "error", "message": "No binary data in exchange packet"}
-                client_socket.send(json.dumps(response).encode('utf-8'))
-                return
+                return False
             
-            # Connect to exchange server if needed
-            if not hasattr(self, 'exchange_server_socket') or self.exchange_server_socket is None:
+            # First frame of a stream: give it its own exchange server connection
+            if session is None:
                 try:
-                    self.exchange_server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    self.exchange_server_socket.connect(("exchange_server", 6000))
-                    logger.info("Connected to exchange server")
+                    server_socket = socket.create_connection(self.exchange_server)
+                except Exception as e:
+                    logger.error(f"Failed to connect to exchange server: {e}")
+                    self.send_fin_response(frame.stream)
+                    return False
+                
+                session = self.server_sessions.bind(frame.stream, server_socket)
+                if session.endpoint is not server_socket:
+                    server_socket.close()  # Another reader opened this stream first
+                else:
+                    logger.info(f"Connected exchange session {frame.stream} to exchange server "
+                                f"({len(self.server_sessions)} active)")
                     
                     # Start thread for receiving exchange server responses
                     threading.Thread(
                         target=self.exchange_server_response_handler,
+                        args=(session,),
                         daemon=True
                     ).start()
-                except Exception as e:
-                    logger.error(f"Failed to connect to exchange server: {e}")
-                    response = {"status": "error", "message": f"Exchange server connection failed: {e}"}
-                    client_socket.send(json.dumps(response).encode('utf-8'))
-                    return
             
-            # Forward the binary data to exchange server
-            self.exchange_server_socket.sendall(binary_data)
-            
-            # Send acknowledgment
-            response = {"status": "forwarded", "message": "Data forwarded to exchange server"}
-            client_socket.send(json.dumps(response).encode('utf-8'))
+            # Forward the raw bytes to the exchange server
+            session.endpoint.sendall(frame.payload)
+            session.received(len(frame.payload))
+            return True
             
         except Exception as e:
             logger.error(f"Error handling exchange server packet: {e}")
-            try:
-                response = {"status": "error", "message": str(e)}
-                client_socket.send(json.dumps(response).encode('utf-8'))
-            except:
-                pass
+            if session is not None:
+                shutdown_socket(session.endpoint)  # The response handler ends the session
+            return False
     
-    def exchange_server_response_handler(self):
-        """Thread to handle responses from exchange server"""
+    def send_fin_response(self, stream_id):
+        """Tell router1 that a stream ended without ever having a session here"""
+        frame = Frame(FRAME_EXCHANGE_RESPONSE, self.router_id, "router1", b"", flags=STREAM_FIN, stream=stream_id)
+        self.forward_to_destination(frame)
+    
+    def exchange_server_response_handler(self, session):
+        """Thread relaying one session's exchange server responses back towards router1"""
+        server_socket = session.endpoint
         try:
             while self.running:
-                try:
-                    # Check if socket is still valid
-                    if not hasattr(self, 'exchange_server_socket') or self.exchange_server_socket is None:
-                        break
-                    
-                    # Receive response from exchange server
-                    response_data = self.exchange_server_socket.recv(4096)
-                    if not response_data:
-                        logger.warning("Exchange server closed connection")
-                        self.exchange_server_socket.close()
-                        self.exchange_server_socket = None
-                        break
-                    
-                    # Log the response for debugging
-                    logger.info(f"Received response from exchange server: {len(response_data)} bytes")
-                    
-                    # Find a route back to router1
-                    next_hop = self.get_next_hop("router1")
-                    if not next_hop:
-                        logger.error("No route back to router1 for exchange response")
-                        continue
-                    
-                    # Create packet to forward response back to client
-                    exchange_response_packet = {
-                        "type": "exchange_response",
-                        "source": self.router_id,
-                        "destination": "router1",
-                        "payload": {
-                            "binary_data": response_data.hex()
-                        }
-                    }
-                    
-                    # Forward the response
-                    self.forward_packet(exchange_response_packet, next_hop)
-                    
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    logger.error(f"Error handling exchange server response: {e}")
+                # Receive response from exchange server
+                response_data = server_socket.recv(RECV_SIZE)
+                if not response_data:
+                    logger.info(f"Exchange server closed connection of session {session.stream_id}")
                     break
+                
+                # Forward the response along the current route back to router1
+                if not self.send_into_tunnel(session, FRAME_EXCHANGE_RESPONSE, "router1", response_data):
+                    logger.error("Failed to forward exchange response to router1")
                     
         except Exception as e:
             logger.error(f"Exchange server response handler error: {e}")
         finally:
-            if hasattr(self, 'exchange_server_socket') and self.exchange_server_socket:
-                try:
-                    self.exchange_server_socket.close()
-                except:
-                    pass
-                self.exchange_server_socket = None
+            # Still in the table means router1 did not end the stream; tell it we did
+            if self.server_sessions.close(session.stream_id) is not None:
+                self.send_into_tunnel(session, FRAME_EXCHANGE_RESPONSE, "router1", b"", STREAM_FIN)
+            try:
+                server_socket.close()
+            except:
+                pass
     
-    def get_next_hop(self, destination):
-        """Determine next hop for a destination using routing table"""
-        for route in self.routing_table.get('routes', []):
-            if route.get('destination') == destination:
-                return route.get('next_hop')
+    def session_summary(self):
+        """One status line about tunnel sessions at this router, or None if it never had any"""
+        for name, table in (("client", self.client_sessions), ("server", self.server_sessions)):
+            if table.opened:
+                rtts = [s.last_rtt for s in table if s.last_rtt is not None]
+                rtt = f", last round trip avg {1000 * sum(rtts) / len(rtts):.2f} ms" if rtts else ""
+                return f"Exchange {name} sessions: {len(table)} active, {table.opened} opened, {table.closed} closed{rtt}"
         return None
     
-    def forward_packet(self, packet, next_hop):
-        """Forward packet to next hop using existing connection if available"""
-        # Check if we have an active connection to this neighbor
-        with self.connection_lock:
-            if next_hop in self.neighbor_connections and self.neighbor_connections[next_hop]['status'] == 'connected':
-                try:
-                    # Use existing connection
-                    neighbor_socket = self.neighbor_connections[next_hop]['socket']
-                    
-                    # Track hop in route if not already present
-                    if 'route' not in packet:
-                        packet['route'] = []
-                    if self.router_id not in packet['route']:
-                        packet['route'].append(self.router_id)
-                    
-                    # Set packet type to data for proper handling
-                    packet['type'] = 'data'
-                    
-                    # Send packet
-                    neighbor_socket.send(json.dumps(packet).encode('utf-8'))
-                    
-                    # Wait for acknowledgment with timeout
-                    neighbor_socket.settimeout(5)
-                    response = neighbor_socket.recv(4096)
-                    
-                    if response:
-                        response_data = json.loads(response.decode('utf-8'))
-                        logger.info(f"Forward response: {response_data}")
-                        return True
-                    return False
-                    
-                except Exception as e:
-                    logger.error(f"Error using existing connection to {next_hop}: {e}")
-                    # Connection might be broken, mark it as disconnected
-                    self.neighbor_connections[next_hop]['status'] = 'disconnected'
-                    try:
-                        self.neighbor_connections[next_hop]['socket'].close()
-                    except:
-                        pass
-                    
-                    # Try to establish a new connection in the background
-                    self.establish_neighbor_connection(next_hop)
+    def get_next_hop(self, destination):
+        """Determine next hop for a destination using the compiled forwarding table"""
+        return self.fib.next_hop(destination)
+    
+    def forward_to_destination(self, packet):
+        """Look up the packet's destination once and forward it; False when there is no route"""
+        destination = packet.destination if isinstance(packet, Frame) else packet.get('destination')
+        entry = self.fib.get(destination, traffic_class(packet))
+        if entry is None:
+            logger.error(f"No route to destination {destination}")
+            return False
+        return self.forward_packet(packet, entry.next_hop, entry)
+    
+    def forward_packet(self, packet, next_hop, entry=None):
+        """Forward packet to next hop, pipelined over the persistent link when one exists"""
+        if entry is not None and entry.group is not None and isinstance(packet, Frame):
+            # Flows spread over the next-hop group; a stream always hashes to the same member
+            entry = entry.for_stream(packet.stream)
+            next_hop = entry.next_hop
+        if entry is not None and entry.backup is not None:
+            active = entry.active()
+            if active is not entry:
+                # The primary neighbor has no live link: take the loop-free alternate right away
+                entry, next_hop = active, active.next_hop
+                self.liveness.failed_over()
+        self.record_hop(packet, next_hop)
+        
+        # Borrowing reads the pool's current tuple of links, so the hot path takes no lock
+        pool = entry.neighbor if entry is not None else self.neighbor_pool(next_hop)
+        if isinstance(packet, Frame):
+            frame = packet
+        else:
+            # Legacy JSON data packets ride the link inside a control frame
+            packet['type'] = 'data'
+            frame = Frame(FRAME_CONTROL, self.router_id, next_hop, json.dumps(packet).encode('utf-8'))
+        
+        # A stream always borrows the same link so its frames stay in order
+        for _ in range(pool.size):
+            link = pool.borrow(frame.stream)
+            if link is None:
+                break
+            
+            # Only waits while the window towards this neighbor is full
+            if link.send(frame):
+                return True
+            
+            logger.error(f"Link to {next_hop} stopped acknowledging, tearing it down")
+            self.link_failed(link)
+        
+        # Pool is empty: make sure it is being refilled, then take the slow path once
+        if pool.can_connect() and next_hop in self.get_neighbors():
+            self.establish_neighbor_connection(next_hop)
         
         # Fall back to a new connection if needed
-        interface = self.routing_table.get('interfaces', {}).get(next_hop, {})
-        ip_address = interface.get('ip_address')
+        ip_address = entry.interface_ip if entry is not None else self.fib.interfaces.get(next_hop)
         
         if not ip_address:
             logger.error(f"No IP address found for {next_hop}")
@@ -744,34 +962,64 @@ class RouterAgent:
         # Connect to next hop
         forward_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            logger.info(f"Forwarding to {next_hop} at {ip_address}:{self.listen_port} (new connection)")
+            logger.debug("Forwarding to %s at %s:%s (new connection)", next_hop, ip_address, self.listen_port)
+            if isinstance(packet, Frame) and packet.traced:
+                self.tracer.record(TRACE_SLOW_PATH, packet, next_hop)
+            forward_socket.settimeout(5)
             forward_socket.connect((ip_address, self.listen_port))
-            
-            # Track hop in route if not already present
-            if 'route' not in packet:
-                packet['route'] = []
-            if self.router_id not in packet['route']:
-                packet['route'].append(self.router_id)
-            
-            # Set packet type to data
-            packet['type'] = 'data'
-            
-            # Send packet
-            forward_socket.send(json.dumps(packet).encode('utf-8'))
-            
-            # Wait for acknowledgment
-            response = forward_socket.recv(4096)
-            if response:
-                response_data = json.loads(response.decode('utf-8'))
-                logger.info(f"Forward response: {response_data}")
-                return True
-            return False
+            return self.send_and_wait_ack(forward_socket, packet)
         except Exception as e:
             logger.error(f"Error forwarding to {next_hop}: {e}")
             return False
         finally:
             forward_socket.close()
     
+    def record_hop(self, packet, next_hop):
+        """Track this router in the packet's route if not already present, with its times on sampled frames"""
+        if not isinstance(packet, Frame):
+            route = packet.setdefault('route', [])
+            if self.router_id not in route:
+                route.append(self.router_id)
+            return
+        
+        departed = time.monotonic_ns()
+        self.stats.on_forward(packet, next_hop, departed)
+        if packet.traced:
+            self.tracer.record(TRACE_FORWARD, packet, next_hop, now=departed)
+        if self.router_id in packet.route:
+            return  # Re-sent after a link failure; the first pass already recorded us
+        packet.route.append(self.router_id)
+        if packet.flags & FLAG_HOP_TIMES:
+            if len(packet.stamps) == len(packet.route) - 1:
+                arrived = packet.arrived if packet.arrived is not None else departed
+                packet.stamps.append((arrived, departed))
+            else:
+                # A hop that does not stamp broke the trace; stop sampling this frame
+                packet.flags &= ~FLAG_HOP_TIMES
+                packet.stamps = []
+    
+    def send_and_wait_ack(self, neighbor_socket, packet):
+        """Send a binary frame or JSON packet on a one-off connection and wait for its acknowledgment"""
+        if isinstance(packet, Frame):
+            packet.seq = 0
+            neighbor_socket.sendall(encode_frame(packet))
+            ack = read_frame(neighbor_socket)
+            if ack.type != FRAME_ACK:
+                logger.warning(f"Expected ack frame, got type {ack.type}")
+                return False
+            return ack.flags == ACK_OK
+        
+        # Set packet type to data for proper handling
+        packet['type'] = 'data'
+        
+        # Send packet
+        neighbor_socket.send(json.dumps(packet).encode('utf-8'))
+        
+        # Wait for acknowledgment, however the reply is split across reads
+        response_data = recv_message(neighbor_socket, MessageReassembler())
+        logger.debug("Forward response: %s", response_data)
+        return True
+    
     def print_neighbor_status(self):
         """Periodically print the status of all neighbor connections"""
         while self.running:
@@ -783,7 +1031,7 @@ class RouterAgent:
                         
                         for neighbor_id, conn_info in self.neighbor_connections.items():
                             if conn_info['status'] == 'connected':
-                                connected.append(neighbor_id)
+                                connected.append(self.describe_pool(conn_info['pool']))
                             else:
                                 disconnected.append(neighbor_id)
                         
@@ -791,6 +1039,9 @@ class RouterAgent:
                         logger.info(f"Connected neighbors ({len(connected)}): {', '.join(connected) if connected else 'None'}")
                         if disconnected:
                             logger.info(f"Disconnected neighbors ({len(disconnected)}): {', '.join(disconnected)}")
+                        sessions = self.session_summary()
+                        if sessions:
+                            logger.info(sessions)
                     else:
                         logger.info(f"Router {self.router_id} has no neighbor connections")
             
@@ -800,17 +1051,40 @@ class RouterAgent:
             # Sleep for a while before the next status update
             time.sleep(60)  # Print status every 60 seconds
     
-    def generate_random_metrics(self):
-        """Generate random metrics for links to neighbors"""
+    def describe_pool(self, pool):
+        """Status line fragment for one neighbor's link pool"""
+        stats = pool.stats()
+        return (f"{pool.neighbor_id} ({stats['links']}/{stats['size']} links, {stats['in_flight']}/{pool.window} in flight, "
+                f"pool hits {stats['hits']}, misses {stats['misses']})")
+    
+    def pool_stats(self):
+        """Per-neighbor pool counters; misses count sends that found no live link"""
+        return {neighbor_id: pool.stats() for neighbor_id, pool in self.neighbor_pools.items()}
+    
+    def stats_snapshot(self):
+        """Stats endpoint contents: latency histograms, traffic counters, probed link quality, liveness, multipath and pinned paths"""
+        snapshot = self.stats.snapshot()
+        snapshot["link_quality"] = {n: pool.quality.snapshot() for n, pool in list(self.neighbor_pools.items())}
+        snapshot["liveness"] = dict(self.liveness.snapshot(), protected_destinations=self.fib.protected)
+        snapshot["multipath_destinations"] = self.fib.multipath
+        snapshot["pinned_destinations"] = self.fib.pinned
+        if self.channel is not None:
+            snapshot["controller_channel"] = self.channel.stats()
+        return snapshot
+    
+    def measure_link_metrics(self):
+        """Smoothed probe measurements for every neighbor that has answered a probe"""
         metrics = {}
-        neighbors = self.get_neighbors()
-        
-        for neighbor in neighbors:
-            # Generate random metric between 1 and 10
-            metrics[neighbor] = random.randint(1, 1000)
-        
+        for neighbor in self.get_neighbors():
+            pool = self.neighbor_pools.get(neighbor)
+            if pool is not None and pool.quality.measured:
+                metrics[neighbor] = pool.quality.snapshot()
         return metrics
 
+    def metrics_url(self):
+        """Controller endpoint that takes this router's metrics reports over HTTP"""
+        return f"{self.controller_url}/sdn_controller/update_link_metrics/{self.router_id}"
+
     def report_metrics_to_sdn(self):
         """Periodically report metrics to the SDN controller"""
         while self.running:
@@ -818,43 +1092,20 @@ class RouterAgent:
                 # Wait for a random interval (30-60 seconds)
                 time.sleep(30 + 30 * random.random())
                 
-                # Generate random metrics
-                metrics = self.generate_random_metrics()
-                logger.info(f"Generated metrics: {metrics}")
+                metrics = self.measure_link_metrics()
+                if not metrics:
+                    continue
+                logger.info(f"Measured link metrics: {metrics}")
                 
-                # Send to SDN controller
-                sdn_url = "http://sdn_controller:8000/sdn_controller/update_link_metrics/" + self.router_id
+                # Over the controller channel when it is up, else a one-off HTTP post
+                if self.channel is not None and self.channel.send({"type": "metrics", "metrics": metrics}):
+                    continue
                 
-                # Create a socket connection to the SDN controller
-                # try:
-                    # Use requests library if availableX
-                response = requests.post(sdn_url, json=metrics, timeout=5)
+                response = requests.post(self.metrics_url(), json=metrics, timeout=5)
                 if response.status_code == 200:
                     logger.info(f"Successfully reported metrics to SDN controller")
                 else:
                     logger.error(f"Failed to report metrics: {response.status_code} - {response.text}")
-                # except ImportError:
-                #     # Fallback to using socket directly
-                #     sdn_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                #     sdn_socket.connect(("sdn_controller", 8000))
-                    
-                #     # Create HTTP POST request
-                #     metrics_json = json.dumps(metrics)
-                #     http_request = (
-                #         f"POST /sdn_controller/update_link_metrics/{self.router_id} HTTP/1.1\r\n"
-                #         f"Host: sdn_controller:8000\r\n"
-                #         f"Content-Type: application/json\r\n"
-                #         f"Content-Length: {len(metrics_json)}\r\n"
-                #         f"\r\n"
-                #         f"{metrics_json}"
-                #     )
-                #     sdn_socket.send(http_request.encode('utf-8'))
-                    
-                    # Get response
-                    # response = sdn_socket.recv(4096).decode('utf-8')
-                    # logger.info(f"SDN response: {response}")
-                    # sdn_socket.close()
-                    
             except Exception as e:
                 logger.error(f"Error reporting metrics to SDN: {e}")
     
@@ -862,8 +1113,9 @@ class RouterAgent:
         """Run the router agent"""
         logger.info(f"Starting router agent for {self.router_id}")
         
-        # Start periodic routing table refresh
-        self.start_periodic_table_refresh()
+        # Take table changes pushed by the controller; the file watcher covers channel outages
+        self.start_controller_channel(self.apply_table_update)
+        self.start_table_watcher()
         
         # Clean up any self-connections
         # self.cleanup_self_connections()
@@ -875,6 +1127,15 @@ class RouterAgent:
         server_thread = threading.Thread(target=self.start_tcp_server, daemon=True)
         server_thread.start()
         
+        # Serve latency histograms and counters to the controller and CLI
+        if self.stats_port:
+            start_stats_server(self.stats_snapshot, self.listen_host, self.stats_port, self.tracer)
+        self.tracer.install_signal_handler(self.trace_dir)
+        
+        # Declare silent neighbors down within the liveness detection time
+        if self.liveness.interval:
+            threading.Thread(target=self.liveness_watchdog, daemon=True).start()
+        
         # Start periodic connection status reporting
         status_thread = threading.Thread(target=self.print_neighbor_status, daemon=True)
         status_thread.start()
@@ -892,13 +1153,9 @@ class RouterAgent:
             self.running = False
             
             # Close all connections
-            with self.connection_lock:
-                for neighbor_id, conn_info in self.neighbor_connections.items():
-                    try:
-                        if 'socket' in conn_info:
-                            conn_info['socket'].close()
-                    except:
-                        pass
+            for pool in self.neighbor_pools.values():
+                for link in pool.clear():
+                    link.close()
 
 if __name__ == "__main__":
     # Debug prints
@@ -909,7 +1166,26 @@ if __name__ == "__main__":
     # Try to get router ID from environment variables
     router_id = os.environ.get('ROUTER_ID')
     port = int(os.environ.get('PORT'))
-    table_path = f"/shared/{router_id}_table.json"
+    forward_window = int(os.environ.get('FORWARD_WINDOW', 64))
+    pool_size = int(os.environ.get('NEIGHBOR_POOL_SIZE', 2))
+    send_linger = float(os.environ.get('SEND_LINGER_MS', 0)) / 1000
+    nodelay = os.environ.get('TCP_NODELAY', '1') != '0'
+    stats_port = int(os.environ.get('STATS_PORT', 8000))
+    hop_sample = int(os.environ.get('HOP_TIMES_SAMPLE', 16))
+    trace_rates = parse_rates(os.environ.get('TRACE_SAMPLE'))
+    trace_capacity = int(os.environ.get('TRACE_BUFFER', 65536))
+    trace_dir = os.environ.get('TRACE_DUMP_DIR', '/tmp')
+    probe_interval = float(os.environ.get('PROBE_INTERVAL', 1.0))
+    probe_timeout = float(os.environ.get('PROBE_TIMEOUT', 2.0))
+    liveness_interval = float(os.environ.get('LIVENESS_INTERVAL_MS', 100)) / 1000
+    liveness_multiplier = int(os.environ.get('LIVENESS_MULTIPLIER', 3))
+    controller_host, _, controller_port = os.environ.get('CONTROLLER_CHANNEL', 'sdn_controller:6653').partition(':')
+    controller_url = os.environ.get('CONTROLLER_URL', 'http://sdn_controller:8000')
+    runtime = os.environ.get('ROUTER_RUNTIME', 'asyncio')  # 'asyncio' or 'threaded'
+    listen_host = os.environ.get('LISTEN_HOST', '0.0.0.0')
+    exchange_host, _, exchange_port = os.environ.get('EXCHANGE_SERVER', 'exchange_server:6000').partition(':')
+    tables_dir = os.environ.get('ROUTER_TABLES_DIR', '/shared')
+    table_path = table_file(tables_dir, router_id, os.environ.get('TABLE_ENCODING', 'json'))
     
     # Wait for the routing table to be created
     retries = 0
@@ -920,9 +1196,24 @@ if __name__ == "__main__":
         retries += 1
     
     if not os.path.exists(table_path):
-        logger.warning(f"Routing table not found at {table_path} after {max_retries} seconds. Will continue and rely on periodic refresh.")
+        logger.warning(f"Routing table not found at {table_path} after {max_retries} seconds. Will continue and rely on the table watcher.")
     
     # Start router agent
-    logger.info(f"Initializing router agent with ID={router_id}, port={port}, table_path={table_path}")
-    agent = RouterAgent(router_id, table_path, port)
-    agent.run()
\ No newline at end of file
+    logger.info(f"Initializing {runtime} router agent with ID={router_id}, port={port}, table_path={table_path}, forward_window={forward_window}, pool_size={pool_size}")
+    if runtime == 'asyncio':
+        from async_agent import AsyncRouterAgent
+        agent_class = AsyncRouterAgent
+    else:
+        agent_class = RouterAgent
+    agent = agent_class(router_id, table_path, port, forward_window,
+                        listen_host=listen_host,
+                        exchange_server=(exchange_host, int(exchange_port)),
+                        pool_size=pool_size, send_linger=send_linger, nodelay=nodelay,
+                        stats_port=stats_port, hop_sample=hop_sample,
+                        trace_rates=trace_rates, trace_capacity=trace_capacity, trace_dir=trace_dir,
+                        probe_interval=probe_interval, probe_timeout=probe_timeout,
+                        liveness_interval=liveness_interval, liveness_multiplier=liveness_multiplier,
+                        controller=(controller_host, int(controller_port or CONTROL_CHANNEL_PORT))
+                        if controller_host else None,
+                        controller_url=controller_url)
+    agent.run()
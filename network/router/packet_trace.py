@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# packet_trace.py
+"""Sampled packet tracing into a fixed-size ring buffer of binary records.
+
+Logging every packet at INFO formats a message and writes a line to stdout
+at every hop, which costs more CPU than forwarding the packet. Instead the
+data path records what happens to a packet (received, forwarded, delivered,
+dropped, ...) as one 28-byte record packed into a preallocated buffer that
+always holds the most recent `capacity` records. Which frames are traced is
+decided once per frame and router, at the rate configured for its type, so
+all events of a traced frame at this router are in the buffer together.
+
+The buffer is dumped on demand: SIGUSR1 writes it to a file, GET /trace on
+the stats endpoint returns it (add ?format=json to get it decoded), and
+running this module decodes a dump file or URL:
+
+  python packet_trace.py trace-router4-1700000000.bin
+  python packet_trace.py http://router4:8000/trace
+"""
+import itertools
+import json
+import logging
+import os
+import signal
+import struct
+import sys
+import time
+
+from framing import (
+    FRAME_EXCHANGE_DATA, FRAME_EXCHANGE_RESPONSE, FRAME_ACK, FRAME_CONTROL,
+    router_number, router_name,
+)
+
+logger = logging.getLogger("router_agent")
+
+# time_ns, event, frame type, flags, hops, source, destination, peer, status, stream, length
+RECORD = struct.Struct("<QBBBBHHHHII")
+# magic, version, record size, router, records, wall clock minus monotonic clock (ns)
+DUMP_HEADER = struct.Struct("<4sBBHIq")
+DUMP_MAGIC = b"RTRC"
+
+# Events
+TRACE_RECEIVE = 1    # read from a neighbor (peer) or a one-off connection
+TRACE_ENTER = 2      # bytes from the local exchange client/server entered the tunnel here
+TRACE_FORWARD = 3    # handed to the persistent link towards peer
+TRACE_SLOW_PATH = 4  # sent to peer over a one-off connection, the pool had no live link
+TRACE_DELIVER = 5    # reached its destination here
+TRACE_DROP = 6       # not forwarded; status holds the ack status
+
+EVENT_NAMES = {
+    TRACE_RECEIVE: "receive",
+    TRACE_ENTER: "enter",
+    TRACE_FORWARD: "forward",
+    TRACE_SLOW_PATH: "slow_path",
+    TRACE_DELIVER: "deliver",
+    TRACE_DROP: "drop",
+}
+
+TYPE_NAMES = {
+    FRAME_EXCHANGE_DATA: "exchange_data",
+    FRAME_EXCHANGE_RESPONSE: "exchange_response",
+    FRAME_ACK: "ack",
+    FRAME_CONTROL: "control",
+}
+
+# Trace one frame in N of each type; 0 never traces that type
+DEFAULT_RATES = {"exchange_data": 8, "exchange_response": 8, "control": 1, "ack": 0}
+
+
+def parse_rates(spec):
+    """Sampling rates from 'exchange_data=8,control=1,...'; unnamed types keep their default"""
+    rates = dict(DEFAULT_RATES)
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, rate = item.partition("=")
+        if name not in rates:
+            raise ValueError(f"Unknown packet type '{name}' in trace sampling rates")
+        rates[name] = int(rate)
+    return rates
+
+
+class PacketTracer:
+    """Ring buffer of packet events for one router"""
+
+    def __init__(self, router_id, capacity=65536, rates=None):
+        self.router_id = router_id
+        self.capacity = capacity
+        self.buf = bytearray(RECORD.size * capacity)
+        self.slots = itertools.count()  # next() is atomic, so concurrent writers never share a slot
+        self.written = 0
+        self.numbers = {}  # router name -> wire number, 0 for anything else
+        self.seen = [0] * 256
+        self.rates = [0] * 256
+        for type_number, name in TYPE_NAMES.items():
+            self.rates[type_number] = max(0, (rates or DEFAULT_RATES).get(name, DEFAULT_RATES[name]))
+
+    def number(self, router_id):
+        number = self.numbers.get(router_id)
+        if number is None:
+            try:
+                number = router_number(router_id)
+            except (TypeError, ValueError):
+                number = 0
+            self.numbers[router_id] = number
+        return number
+
+    def sample(self, frame, event, peer=None, now=None):
+        """Decide whether this router traces the frame and record its first event if so"""
+        rate = self.rates[frame.type]
+        if not rate:
+            return False
+        self.seen[frame.type] += 1
+        frame.traced = self.seen[frame.type] % rate == 0
+        if frame.traced:
+            self.record(event, frame, peer, now=now)
+        return frame.traced
+
+    def record(self, event, frame, peer=None, status=0, now=None):
+        """Append one event of a frame; callers check frame.traced first"""
+        slot = next(self.slots)
+        RECORD.pack_into(self.buf, (slot % self.capacity) * RECORD.size,
+                         time.monotonic_ns() if now is None else now, event, frame.type, frame.flags, len(frame.route),
+                         self.number(frame.source), self.number(frame.destination),
+                         self.number(peer) if peer else 0, status, frame.stream, len(frame.payload))
+        self.written = slot + 1
+
+    def record_packet(self, event, packet, peer=None, status=0):
+        """Sampled event of a legacy JSON packet, traced at the control frame rate"""
+        rate = self.rates[FRAME_CONTROL]
+        if not rate:
+            return
+        self.seen[FRAME_CONTROL] += 1
+        if self.seen[FRAME_CONTROL] % rate:
+            return
+        slot = next(self.slots)
+        RECORD.pack_into(self.buf, (slot % self.capacity) * RECORD.size,
+                         time.monotonic_ns(), event, FRAME_CONTROL, 0, len(packet.get('route', [])),
+                         self.number(packet.get('source')), self.number(packet.get('destination')),
+                         self.number(peer) if peer else 0, status, 0, 0)
+        self.written = slot + 1
+
+    def dump(self):
+        """Header plus the buffered records, oldest first"""
+        written = self.written
+        count = min(written, self.capacity)
+        start = (written - count) % self.capacity
+        data = bytes(self.buf)  # One copy so writers cannot tear the rotation below
+        end = start + count
+        if end <= self.capacity:
+            records = data[start * RECORD.size:end * RECORD.size]
+        else:
+            records = data[start * RECORD.size:] + data[:(end - self.capacity) * RECORD.size]
+        header = DUMP_HEADER.pack(DUMP_MAGIC, 1, RECORD.size, self.number(self.router_id), count,
+                                  time.time_ns() - time.monotonic_ns())
+        return header + records
+
+    def dump_to_file(self, directory):
+        path = os.path.join(directory, f"trace-{self.router_id}-{int(time.time())}.bin")
+        with open(path, "wb") as f:
+            f.write(self.dump())
+        return path
+
+    def install_signal_handler(self, directory, signum=signal.SIGUSR1):
+        """Dump the buffer to directory on signum; only possible from the main thread"""
+        def handler(signum, frame):
+            try:
+                logger.info(f"Wrote packet trace to {self.dump_to_file(directory)}")
+            except OSError as e:
+                logger.error(f"Could not write packet trace: {e}")
+        try:
+            signal.signal(signum, handler)
+        except ValueError:
+            logger.warning("Packet trace dump signal not installed outside the main thread")
+
+
+def decode_dump(data):
+    """(router, records) from a dump; records are dicts with names and wall clock times"""
+    magic, version, size, router, count, offset = DUMP_HEADER.unpack_from(data)
+    if magic != DUMP_MAGIC or size != RECORD.size:
+        raise ValueError("Not a packet trace dump")
+    records = []
+    for fields in RECORD.iter_unpack(data[DUMP_HEADER.size:DUMP_HEADER.size + count * size]):
+        time_ns, event, frame_type, flags, hops, source, destination, peer, status, stream, length = fields
+        records.append({
+            "time": (time_ns + offset) / 1e9,
+            "monotonic_ns": time_ns,
+            "event": EVENT_NAMES.get(event, str(event)),
+            "type": TYPE_NAMES.get(frame_type, str(frame_type)),
+            "flags": flags,
+            "hops": hops,
+            "source": router_name(source) if source else None,
+            "destination": router_name(destination) if destination else None,
+            "peer": router_name(peer) if peer else None,
+            "status": status,
+            "stream": stream,
+            "bytes": length,
+        })
+    return router_name(router), records
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    if source.startswith("http"):
+        import urllib.request
+        with urllib.request.urlopen(source, timeout=5) as response:
+            data = response.read()
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+    router, records = decode_dump(data)
+    print(f"{router}: {len(records)} records")
+    for r in records:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# pipeline.py
+"""Sliding-window sender for persistent router-to-router links.
+
+A PipelinedLink owns one neighbor socket. Senders only wait for a free slot
+in the window of unacknowledged frames, never for the acknowledgment of
+their own frame; cumulative acks are fed in by the link's reader thread.
+An ack with a failure status (no route, error) still releases the slot:
+the neighbor took the frame and gave up on it, so there is nothing to
+resend, but it is counted in frames_failed and handed back to be logged.
+Outgoing frames are coalesced by a BatchingWriter and incoming bytes are
+split into messages by a MessageReassembler (see stream.py).
+"""
+import json
+import socket
+import threading
+import time
+
+from framing import FRAME_CONTROL, Frame, encode_frame, encode_ack, encode_liveness, ACK_OK
+from stream import BatchingWriter, MessageReassembler, recv_messages, set_nodelay
+
+
+class PipelinedLink:
+    """One persistent neighbor socket with a window of in-flight frames"""
+
+    def __init__(self, router_id, neighbor_id, sock, window=64, ack_timeout=5.0,
+                 initial=b"", linger=0.0, nodelay=True):
+        self.router_id = router_id
+        self.neighbor_id = neighbor_id
+        self.sock = sock
+        self.window = max(1, window)
+        self.ack_timeout = ack_timeout
+        self.closed = False
+        self.last_activity = time.time()
+        self.idle_since = None   # monotonic time the reader started waiting for bytes, None while it handles a batch
+        self.detect_time = None  # seconds of silence after which the neighbor is declared down (liveness.py)
+
+        self.next_seq = 1
+        self.acked_seq = 0       # highest cumulative ack received from the neighbor
+        self.reserved = 0        # window slots taken by senders, including ones still sending
+        self.unacked = {}        # seq -> frame, in send order
+
+        self.window_cond = threading.Condition()
+        self.send_lock = threading.Lock()  # keeps frames in the send queue in seq order
+
+        set_nodelay(sock, nodelay)
+        self.batcher = BatchingWriter(sock, linger=linger)
+        self.reassembler = MessageReassembler(initial)  # may hold bytes read with the handshake
+
+        self.frames_sent = 0
+        self.frames_acked = 0
+        self.frames_failed = 0   # acked with ACK_NO_ROUTE or ACK_ERROR: the neighbor dropped them
+
+    @property
+    def in_flight(self):
+        return len(self.unacked)
+
+    def send(self, frame):
+        """Queue a frame on the link; blocks only while the window is full"""
+        deadline = time.monotonic() + self.ack_timeout
+        with self.window_cond:
+            while not self.closed and self.reserved >= self.window:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False  # Neighbor stopped acknowledging
+                self.window_cond.wait(remaining)
+            if self.closed:
+                return False
+            self.reserved += 1
+
+        try:
+            with self.send_lock:
+                frame.seq = self.next_seq
+                try:
+                    data = encode_frame(frame)
+                except ValueError:
+                    # Not a frame the link can carry (e.g. too many hops); the link itself is fine
+                    with self.window_cond:
+                        if not self.closed:
+                            self.reserved -= 1
+                            self.window_cond.notify()
+                    raise
+                with self.window_cond:
+                    self.next_seq += 1
+                    self.unacked[frame.seq] = frame
+                flush = self.batcher.enqueue(data)
+                self.frames_sent += 1
+            # Flush outside send_lock so other senders keep queueing behind us
+            if flush:
+                self.batcher.flush()
+            return True
+        except OSError:
+            # The caller still owns this frame; the rest are reclaimed by close()
+            with self.window_cond:
+                if self.unacked.pop(frame.seq, None) is not None:
+                    self.reserved -= 1
+            return False
+
+    def send_control(self, message):
+        """Send a JSON control message outside the window (seq 0, never acked)"""
+        frame = Frame(FRAME_CONTROL, self.router_id, self.neighbor_id,
+                      json.dumps(message).encode('utf-8'))
+        self.batcher.write(encode_frame(frame))
+
+    def send_ack(self, seq, status=ACK_OK):
+        """Acknowledge every frame up to seq received on this link"""
+        self.batcher.write(encode_ack(self.router_id, self.neighbor_id, status, seq))
+
+    def send_liveness(self, interval_us, multiplier):
+        """Send a liveness beacon outside the window"""
+        self.batcher.write(encode_liveness(self.router_id, self.neighbor_id, interval_us, multiplier))
+
+    def receive(self):
+        """Every complete message from one recv() on the link (possibly none)"""
+        self.idle_since = time.monotonic()
+        try:
+            return recv_messages(self.sock, self.reassembler)
+        finally:
+            self.idle_since = None
+
+    def on_ack(self, seq, status=ACK_OK):
+        """Release every window slot covered by a cumulative ack; returns the frame at seq if the ack reports it failed"""
+        with self.window_cond:
+            failed = None
+            if status != ACK_OK:
+                failed = self.unacked.get(seq)
+                if failed is not None:
+                    self.frames_failed += 1
+            if seq <= self.acked_seq:
+                return failed
+            released = 0
+            for pending in list(self.unacked):
+                if pending > seq:
+                    break
+                del self.unacked[pending]
+                released += 1
+            self.acked_seq = seq
+            self.reserved -= released
+            self.frames_acked += released
+            self.last_activity = time.time()
+            self.window_cond.notify_all()
+            return failed
+
+    def close(self):
+        """Close the link and hand back frames the neighbor never acknowledged"""
+        with self.window_cond:
+            if self.closed:
+                return []
+            self.closed = True
+            pending = list(self.unacked.values())
+            self.unacked.clear()
+            self.reserved = 0
+            self.window_cond.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # Wake a reader or flusher blocked on the socket
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        return pending
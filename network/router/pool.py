@@ -0,0 +1,139 @@
+# pool.py
+"""Per-neighbor pool of persistent links.
+
+A NeighborPool holds up to `size` live links to one neighbor; when both
+routers dial each other at once, links beyond that are refused and closed. The data path
+borrows a link by reading the pool's current tuple of links, which is only
+ever replaced, never mutated, so borrowing takes no lock. Frames are keyed
+to a link (by exchange stream id) so one stream stays on one link and keeps
+its order. The pool also tracks the neighbor's health: consecutive connect
+failures, a capped exponential reconnect backoff and hit/miss counters for
+how often a send found no live link and had to take the slow path, and
+the measured quality of the link (see link_quality.py), which outlives the
+individual connections.
+"""
+import random
+import threading
+import time
+
+from link_quality import LinkQuality
+
+
+class NeighborPool:
+    """Persistent links to one neighbor, shared by every forwarding entry that uses it"""
+
+    def __init__(self, neighbor_id, size=2, base_backoff=0.5, max_backoff=30.0, quality=None):
+        self.neighbor_id = neighbor_id
+        self.size = max(1, size)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.links = ()  # replaced as a whole under self.lock; readers never lock
+        self.lock = threading.Lock()
+
+        # Health
+        self.failures = 0        # consecutive failed connection attempts
+        self.retry_at = 0.0      # monotonic time before which no reconnect is attempted
+        self.drops = 0           # links that broke after being established
+        self.last_connected = None
+        self.quality = quality or LinkQuality()  # Probed RTT, jitter, loss and throughput
+
+        # Plain counters; a lost increment under contention is acceptable for stats
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def link(self):
+        """First live link, or None"""
+        for link in self.links:
+            if not link.closed:
+                return link
+        return None
+
+    @property
+    def healthy(self):
+        return any(not link.closed for link in self.links)
+
+    @property
+    def deficit(self):
+        """How many more links the pool wants"""
+        return max(0, self.size - sum(1 for link in self.links if not link.closed))
+
+    @property
+    def in_flight(self):
+        return sum(link.in_flight for link in self.links)
+
+    @property
+    def window(self):
+        return sum(link.window for link in self.links)
+
+    def borrow(self, key=0):
+        """Live link for a frame key without locking; None (a miss) when every link is down"""
+        links = self.links
+        count = len(links)
+        for i in range(count):
+            link = links[(key + i) % count]
+            if not link.closed:
+                self.hits += 1
+                return link
+        self.misses += 1
+        return None
+
+    def add(self, link):
+        """Put a newly established link into rotation and reset the failure streak; False if the pool is full"""
+        with self.lock:
+            live = tuple(l for l in self.links if not l.closed)
+            if len(live) >= self.size:
+                self.links = live
+                return False
+            self.links = live + (link,)
+            self.failures = 0
+            self.retry_at = 0.0
+            self.last_connected = time.time()
+            return True
+
+    def discard(self, link):
+        """Take a link out of rotation; True if it was still in the pool"""
+        with self.lock:
+            if link not in self.links:
+                return False
+            self.links = tuple(l for l in self.links if l is not link)
+            self.drops += 1
+            return True
+
+    def clear(self):
+        """Empty the pool and return the links that were in it"""
+        with self.lock:
+            links, self.links = self.links, ()
+        return links
+
+    def connect_failed(self):
+        """Record a failed connection attempt; returns the delay before the next one"""
+        with self.lock:
+            self.failures += 1
+            delay = min(self.base_backoff * 2 ** (self.failures - 1), self.max_backoff)
+            delay *= 0.5 + random.random() / 2  # Jitter so both ends do not retry in lockstep
+            self.retry_at = time.monotonic() + delay
+        return delay
+
+    def can_connect(self):
+        """True once the reconnect backoff has expired"""
+        return time.monotonic() >= self.retry_at
+
+    def stats(self):
+        links = self.links
+        sent = sum(link.batcher.messages for link in links)
+        flushes = sum(link.batcher.flushes for link in links)
+        received = sum(link.reassembler.messages for link in links)
+        reads = sum(link.reassembler.reads for link in links)
+        return {
+            "links": sum(1 for link in self.links if not link.closed),
+            "size": self.size,
+            "in_flight": self.in_flight,
+            "failed": sum(link.frames_failed for link in links),  # frames the neighbor acked as dropped
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "drops": self.drops,
+            "messages_per_send": sent / flushes if flushes else 0.0,
+            "messages_per_recv": received / reads if reads else 0.0,
+        }
@@ -0,0 +1,88 @@
+# sessions.py
+"""Session tables for the router1 <-> router10 exchange tunnel.
+
+Every exchange client connection accepted by router1 becomes a stream with
+its own id. Frames of all streams share the same pipelined neighbor links;
+the stream id in the frame header tells router10 which exchange server
+connection the bytes belong to, and tells router1 which client socket a
+response goes back to. Each end keeps a SessionTable mapping stream ids to
+whatever its runtime uses to reach the local peer (a socket, a stream
+writer or a pending connection).
+"""
+import itertools
+import threading
+import time
+
+
+class Session:
+    """One client stream and the local endpoint it is bound to"""
+    __slots__ = ("stream_id", "endpoint", "opened", "frames_in", "frames_out",
+                 "bytes_in", "bytes_out", "last_request", "last_rtt")
+
+    def __init__(self, stream_id, endpoint):
+        self.stream_id = stream_id
+        self.endpoint = endpoint
+        self.opened = time.time()
+        self.frames_in = 0    # frames received from the tunnel
+        self.frames_out = 0   # frames sent into the tunnel
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.last_request = None  # monotonic time of the last frame sent into the tunnel
+        self.last_rtt = None      # seconds from the last request to the response that followed it
+
+    def sent(self, nbytes):
+        self.frames_out += 1
+        self.bytes_out += nbytes
+        self.last_request = time.monotonic()
+
+    def received(self, nbytes):
+        self.frames_in += 1
+        self.bytes_in += nbytes
+        if self.last_request is not None:
+            self.last_rtt = time.monotonic() - self.last_request
+            self.last_request = None
+
+
+class SessionTable:
+    """Thread-safe stream id -> Session map for one end of the tunnel"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)  # 0 is reserved for frames outside any session
+        self.opened = 0
+        self.closed = 0
+
+    def open(self, endpoint):
+        """Start a new stream for a local client and return its session"""
+        with self.lock:
+            session = Session(next(self.ids), endpoint)
+            self.sessions[session.stream_id] = session
+            self.opened += 1
+        return session
+
+    def bind(self, stream_id, endpoint):
+        """Register a stream opened by the far end of the tunnel"""
+        with self.lock:
+            session = self.sessions.get(stream_id)
+            if session is None:
+                session = self.sessions[stream_id] = Session(stream_id, endpoint)
+                self.opened += 1
+        return session
+
+    def get(self, stream_id):
+        return self.sessions.get(stream_id)
+
+    def close(self, stream_id):
+        """Forget a stream; returns its session, or None if it was already closed"""
+        with self.lock:
+            session = self.sessions.pop(stream_id, None)
+            if session is not None:
+                self.closed += 1
+        return session
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(list(self.sessions.values()))
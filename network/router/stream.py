@@ -0,0 +1,283 @@
+# stream.py
+"""Stream reassembly and send coalescing for router sockets.
+
+TCP delivers a byte stream, not messages: one recv() can hold several
+frames, a frame and a half, or a JSON message followed by the first frames
+on a freshly accepted link. MessageReassembler buffers whatever was read
+and hands back every complete message in it, binary frames and JSON
+messages alike, so readers do one large recv() per batch instead of one or
+more per message and never lose bytes that arrived early. A JSON object is
+found by matching its brackets over the raw bytes, resuming where the last
+read left off, and decoded once it is complete, so a large message split
+over many reads (a full table on the controller channel) costs one pass.
+Messages never contain a raw newline (json.dumps does not write one), so
+a newline inside an unfinished value marks garbage, not a partial message.
+
+On the send side BatchingWriter (threads) and AsyncBatchingWriter (asyncio)
+queue encoded messages and put everything queued on the wire with a single
+sendmsg()/writelines() call, flushing when the batch reaches max_bytes or
+after an optional linger delay.
+"""
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+from collections import deque
+
+from framing import FRAME_MAGIC, HEADER_SIZE, frame_size, decode_frame
+
+RECV_SIZE = 65536
+MAX_IOV = 512  # Buffers per sendmsg(); Linux rejects more than IOV_MAX (1024)
+_WHITESPACE = b" \t\r\n"
+_JSON_TOKENS = re.compile(rb'[][{}"\\\n]')  # the bytes that move the bracket scan
+
+
+def set_nodelay(sock, enabled=True):
+    """Disable Nagle so a flushed batch leaves immediately; we coalesce ourselves"""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if enabled else 0)
+    except (OSError, AttributeError):
+        pass  # Not a TCP socket (e.g. a socketpair in tests)
+
+
+class MessageReassembler:
+    """Splits a byte stream into binary frames (Frame) and JSON messages (dict)"""
+
+    def __init__(self, initial=b""):
+        self.buf = bytearray(initial)
+        self.start = 0      # offset of the first unconsumed byte in buf
+        self.scan = (0, 0, False)  # (position from start, depth, in a string) of an unfinished JSON value
+        self.reads = 0      # chunks fed in, one per recv()
+        self.messages = 0   # complete messages handed out
+
+    @property
+    def pending(self):
+        return len(self.buf) - self.start
+
+    def feed(self, data):
+        if self.start:
+            del self.buf[:self.start]  # Compact once per read, not once per message
+            self.start = 0
+        self.reads += 1
+        self.buf += data
+
+    def take_rest(self):
+        """Bytes after the last complete message, removed from the buffer"""
+        rest = bytes(self.buf[self.start:])
+        self.buf.clear()
+        self.start = 0
+        self.scan = (0, 0, False)
+        return rest
+
+    def next_message(self):
+        """Consume and return one complete message, or None until more bytes arrive"""
+        buf = self.buf
+        offset = self.start
+        while offset < len(buf) and buf[offset] in _WHITESPACE:
+            offset += 1
+        self.start = offset
+        if offset == len(buf):
+            return None
+        if buf[offset] == FRAME_MAGIC:
+            if len(buf) - offset < HEADER_SIZE:
+                return None
+            end = offset + frame_size(memoryview(buf)[offset:offset + HEADER_SIZE])
+            if end > len(buf):
+                return None
+            # Copy the frame out so its payload survives compaction of buf
+            message = decode_frame(bytes(buf[offset:end]))
+        else:
+            message, end = self._decode_json(offset)
+            if message is None:
+                return None
+        self.start = end
+        self.messages += 1
+        return message
+
+    def __iter__(self):
+        """Every complete message in the buffer; a partial one stays for the next feed"""
+        message = self.next_message()
+        while message is not None:
+            yield message
+            message = self.next_message()
+
+    def _decode_json(self, offset):
+        """Decode one JSON value at offset; (None, offset) while it is still incomplete"""
+        buf = self.buf
+        if buf[offset] not in b"{[":
+            # Not an object or array: only whole lines of it are decoded (and garbage raises)
+            end = buf.find(b"\n", offset)
+            if end < 0:
+                return None, offset
+            return json.loads(bytes(buf[offset:end])), end
+        position, depth, in_string = self.scan
+        position += offset
+        while True:
+            match = _JSON_TOKENS.search(buf, position)
+            if match is None:
+                self.scan = (max(position, len(buf)) - offset, depth, in_string)
+                return None, offset
+            token, position = buf[match.start()], match.end()
+            if token == 0x0A:
+                raise ValueError("Newline inside a JSON message")  # A whole line that is not JSON
+            if in_string:
+                if token == 0x5C:
+                    position += 1  # Skip the escaped byte
+                elif token == 0x22:
+                    in_string = False
+            elif token == 0x22:
+                in_string = True
+            elif token in b"{[":
+                depth += 1
+            elif token in b"}]":
+                depth -= 1
+                if depth == 0:
+                    break
+        self.scan = (0, 0, False)
+        return json.loads(bytes(buf[offset:position])), position
+
+
+def recv_messages(sock, reassembler, bufsize=RECV_SIZE):
+    """Complete messages already buffered, else those completed by one recv(); ConnectionError at EOF"""
+    messages = list(reassembler)
+    if messages:
+        return messages
+    data = sock.recv(bufsize)
+    if not data:
+        raise ConnectionError("Socket closed")
+    reassembler.feed(data)
+    return list(reassembler)
+
+
+def recv_message(sock, reassembler):
+    """Block until one complete message is available and return it"""
+    message = reassembler.next_message()
+    while message is None:
+        data = sock.recv(RECV_SIZE)
+        if not data:
+            raise ConnectionError("Socket closed")
+        reassembler.feed(data)
+        message = reassembler.next_message()
+    return message
+
+
+async def read_message_async(reader, reassembler):
+    """Event-loop counterpart of recv_message"""
+    message = reassembler.next_message()
+    while message is None:
+        data = await reader.read(RECV_SIZE)
+        if not data:
+            raise ConnectionError("Socket closed")
+        reassembler.feed(data)
+        message = reassembler.next_message()
+    return message
+
+
+class BatchingWriter:
+    """Coalesces messages from many threads into one sendmsg() per batch
+
+    The first writer to find no flush in progress becomes the flusher and sends
+    everything queued, including messages other threads add while it is on the
+    wire; the others return as soon as their message is queued. Queue order is
+    wire order, so a caller can enqueue() under its own lock to fix the order
+    and flush() after releasing it.
+    """
+
+    def __init__(self, sock, max_bytes=65536, linger=0.0):
+        self.sock = sock
+        self.max_bytes = max_bytes
+        self.linger = linger  # seconds to wait for more messages before a flush
+        self.queue = deque()
+        self.queued = 0
+        self.flushing = False
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.flushes = 0  # sendmsg() calls
+
+    def enqueue(self, data):
+        """Queue one message; True if the caller must now flush()"""
+        with self.lock:
+            self.queue.append(data)
+            self.queued += len(data)
+            self.messages += 1
+            if self.flushing:
+                return False  # The current flusher picks it up
+            self.flushing = True
+            return True
+
+    def write(self, data):
+        if self.enqueue(data):
+            self.flush()
+
+    def flush(self):
+        """Send batches until the queue is empty; only called by the thread enqueue() elected"""
+        try:
+            if self.linger and self.queued < self.max_bytes:
+                time.sleep(self.linger)
+            while True:
+                with self.lock:
+                    if not self.queue:
+                        self.flushing = False
+                        return
+                    batch, size = [], 0
+                    while self.queue and len(batch) < MAX_IOV and (
+                            not batch or size + len(self.queue[0]) <= self.max_bytes):
+                        data = self.queue.popleft()
+                        batch.append(data)
+                        size += len(data)
+                    self.queued -= size
+                self._send(batch)
+        except BaseException:
+            with self.lock:
+                self.flushing = False
+            raise
+
+    def _send(self, batch):
+        """sendmsg() the whole batch, resuming after partial writes"""
+        views = [memoryview(b) for b in batch]
+        while views:
+            sent = self.sock.sendmsg(views)
+            self.flushes += 1
+            while views and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            if sent:
+                views[0] = views[0][sent:]
+
+
+class AsyncBatchingWriter:
+    """Coalesces messages written during one event loop iteration into one writelines()"""
+
+    def __init__(self, writer, max_bytes=65536):
+        self.writer = writer
+        self.max_bytes = max_bytes
+        self.queue = []
+        self.queued = 0
+        self.scheduled = False
+        self.messages = 0
+        self.flushes = 0  # writelines() calls
+
+    def write(self, data):
+        self.queue.append(data)
+        self.queued += len(data)
+        self.messages += 1
+        if self.queued >= self.max_bytes:
+            self.flush()
+        elif not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        if not self.queue or self.writer.is_closing():
+            self.queue.clear()
+            self.queued = 0
+            return
+        batch, self.queue, self.queued = self.queue, [], 0
+        self.writer.writelines(batch)
+        self.flushes += 1
+
+    async def drain(self):
+        await self.writer.drain()
@@ -0,0 +1,163 @@
+# table_codec.py
+"""Reading the router's table file in either of the controller's encodings.
+
+{router}_table.json is plain JSON. {router}_table.bin is the controller's
+compact encoding (see the controller's table_store.py for the layout):
+fixed-size flow, next-hop group member and route records, paths given by each destination's parent
+in the router's shortest-path tree, and the generation each entry last
+changed in. The file is memory-mapped; given the table decoded from an
+earlier generation of the same controller epoch, only the records that
+changed since are decoded and every other entry is reused as it was.
+
+Run as a script it exports a table file as JSON, for debugging:
+
+    python table_codec.py /shared/router1_table.bin
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'RTBL'
+FORMAT = 2
+HEADER = struct.Struct('<4sHQQIII')      # magic, format, epoch, generation, flows, members, routes
+FLOW = struct.Struct('<Qiiiiiiddii')    # changed, destination, forward_to, backup_to, parent, priority,
+                                        # protection, metric, backup_metric, first member, members
+MEMBER = struct.Struct('<iid')          # next_hop, weight, metric
+ROUTE = struct.Struct('<Qiiii')         # changed, destination, next_hop, destination_subnet, metric
+NONE = -1
+
+BINARY_SUFFIX = '.bin'
+
+
+def table_file(directory, router_id, encoding='json'):
+    """Name of router_id's table file in the controller's TABLE_ENCODING"""
+    suffix = BINARY_SUFFIX if encoding == 'binary' else '.json'
+    return os.path.join(directory, f"{router_id}_table{suffix}")
+
+
+def by_key(entries, key):
+    """First entry of each key"""
+    found = {}
+    for entry in entries:
+        found.setdefault(key(entry), entry)
+    return found
+
+
+def path_to(destination, parents, paths):
+    """Path from the tree's root to destination; paths holds those already read and gains the new ones"""
+    below = []
+    while destination not in paths:
+        below.append(destination)
+        destination = parents[destination]
+    path = paths[destination]
+    for node in reversed(below):
+        path = path + [node]
+        paths[node] = path
+    return path
+
+
+def decode_table(buffer, previous=None):
+    """Table in a binary table file's content
+
+    previous is the table decoded from an earlier file. If it belongs to the
+    same router and controller epoch, entries that did not change since its
+    generation are taken from it instead of being decoded; if it is the same
+    generation, previous itself is returned.
+    """
+    try:
+        magic, version, epoch, generation, flow_count, member_count, route_count = HEADER.unpack_from(buffer, 0)
+    except struct.error:
+        raise ValueError("Table file is shorter than its header")
+    if magic != MAGIC or version != FORMAT:
+        raise ValueError(f"Not a version {FORMAT} binary table file")
+    if previous is not None and (previous.get("epoch"), previous.get("generation")) == (epoch, generation):
+        return previous
+
+    flows_at = HEADER.size
+    members_at = flows_at + flow_count * FLOW.size
+    routes_at = members_at + member_count * MEMBER.size
+    trailer_at = routes_at + route_count * ROUTE.size
+    if len(buffer) <= trailer_at:
+        raise ValueError("Table file is truncated")
+    trailer = json.loads(buffer[trailer_at:])
+    names = trailer["names"]
+    table = dict(trailer["table"])
+    source = table.get("router_id")
+
+    base = -1  # generation whose entries we hold; -1 decodes everything
+    if (previous is not None and previous.get("epoch") == epoch and previous.get("router_id") == source
+            and isinstance(previous.get("generation"), int) and previous["generation"] < generation):
+        base = previous["generation"]
+    reuse = previous if base >= 0 else {}
+
+    if "flow_table" in trailer["sections"]:
+        records = list(FLOW.iter_unpack(buffer[flows_at:members_at]))
+        held = by_key(reuse.get("flow_table", []), lambda flow: flow.get("match", {}).get("destination"))
+        parents = None
+        flows = []
+        for (changed, destination, forward_to, backup_to, parent, priority, protection, metric, backup_metric,
+             first, count) in records:
+            name = names[destination]
+            if changed <= base and name in held:
+                flows.append(held[name])
+                continue
+            if parents is None:  # every parent, to read paths
+                parents = dict(trailer["parents"])
+                parents.update((names[record[1]], names[record[4]]) for record in records)
+                paths = {source: [source]}
+            path = path_to(name, parents, paths)
+            flow = {
+                "match": {"destination": name},
+                "action": {"forward_to": names[forward_to]},
+                "priority": priority,
+                "path": path,
+                "metric": metric,
+            }
+            if backup_to != NONE:
+                flow["action"]["backup_to"] = names[backup_to]
+                flow["backup_metric"] = backup_metric
+                flow["protection"] = names[protection]
+            if count:
+                flow["action"]["group"] = [
+                    {"next_hop": names[next_hop], "weight": weight, "metric": member_metric}
+                    for next_hop, weight, member_metric in MEMBER.iter_unpack(
+                        buffer[members_at + first * MEMBER.size:members_at + (first + count) * MEMBER.size])]
+            flows.append(flow)
+        for position, flow in trailer["raw"]["flow_table"]:
+            flows.insert(position, flow)
+        table["flow_table"] = flows
+
+    if "routes" in trailer["sections"]:
+        held = by_key(reuse.get("routes", []), lambda route: route.get("destination"))
+        routes = []
+        for changed, destination, next_hop, subnet, metric in ROUTE.iter_unpack(buffer[routes_at:trailer_at]):
+            name = names[destination]
+            if changed <= base and name in held:
+                routes.append(held[name])
+            else:
+                routes.append({"destination": name, "destination_subnet": names[subnet],
+                               "next_hop": names[next_hop], "metric": metric})
+        for position, route in trailer["raw"]["routes"]:
+            routes.insert(position, route)
+        table["routes"] = routes
+    return table
+
+
+def read_table(path, previous=None):
+    """Table in the file at path; binary files are memory-mapped and reuse previous's unchanged entries"""
+    with open(path, 'rb') as f:
+        if not path.endswith(BINARY_SUFFIX):
+            return json.load(f)
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError("Table file is empty")
+        with buffer:
+            return decode_table(buffer, previous)
+
+
+if __name__ == "__main__":
+    json.dump(read_table(sys.argv[1]), sys.stdout, indent=2)
+    print()
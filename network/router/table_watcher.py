@@ -0,0 +1,202 @@
+# table_watcher.py
+"""Change-driven reload of the router's table file.
+
+TableWatcher replaces blind periodic re-parsing. It waits for inotify
+events on the table's directory where the kernel supports it, and always
+keeps a cheap stat() check as a safety net (bind mounts from some hosts do
+not deliver inotify events). A file is only parsed when its mtime/size moved
+and its content hash differs from the last table that was applied, so the
+controller rewriting identical tables costs one read and one hash. Binary
+table files are not hashed: their header says which generation they hold,
+and a new generation is decoded against the last table (see table_codec.py).
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import time
+from collections import namedtuple
+
+from table_codec import BINARY_SUFFIX, read_table
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+TableDiff = namedtuple(
+    "TableDiff",
+    ["added_neighbors", "removed_neighbors", "changed_neighbors", "changed_destinations"],
+)
+
+
+def diff_tables(old, new):
+    """Neighbors and destinations whose interface or forwarding entries differ between two tables"""
+    old_ifaces = old.get('interfaces', {}) if old else {}
+    new_ifaces = new.get('interfaces', {})
+    added = set(new_ifaces) - set(old_ifaces)
+    removed = set(old_ifaces) - set(new_ifaces)
+    changed = {n for n in set(old_ifaces) & set(new_ifaces)
+               if old_ifaces[n].get('ip_address') != new_ifaces[n].get('ip_address')}
+
+    def by_destination(table):
+        entries = {}
+        for route in table.get('routes', []) if table else []:
+            entries.setdefault(route.get('destination'), []).append(('route', route.get('next_hop'), route.get('metric')))
+        for flow in table.get('flow_table', []) if table else []:
+            entries.setdefault(flow.get('match', {}).get('destination'), []).append(
+                ('flow', flow.get('action', {}).get('forward_to'), flow.get('action', {}).get('backup_to'),
+                 flow.get('priority'), flow.get('metric')))
+        for flow in table.get('priority_flows', []) if table else []:
+            match = flow.get('match', {})
+            entries.setdefault(match.get('destination'), []).append(
+                ('pinned', match.get('traffic_class'), flow.get('action', {}).get('forward_to'),
+                 flow.get('priority'), flow.get('metric')))
+        return entries
+
+    old_routes, new_routes = by_destination(old), by_destination(new)
+    changed_destinations = {d for d in set(old_routes) | set(new_routes)
+                            if old_routes.get(d) != new_routes.get(d)}
+    return TableDiff(added, removed, changed, changed_destinations)
+
+
+class TableWatcher:
+    """Calls on_change(table) whenever the table file at path really changes"""
+
+    def __init__(self, path, on_change, poll_interval=1.0, safety_interval=5.0, use_inotify=True):
+        self.path = path
+        self.on_change = on_change
+        self.poll_interval = poll_interval      # stat() period without inotify
+        self.safety_interval = safety_interval  # stat() period alongside inotify
+        self.signature = None  # (mtime_ns, size) of the last file we looked at
+        self.digest = None     # content hash of the last table handed to on_change
+        self.table = None      # last table handed to on_change
+        self.reloads = 0
+        self.checks = 0
+        self.fd = None
+        if use_inotify:
+            self._start_inotify()
+
+    def _start_inotify(self):
+        libc = _load_libc()
+        if libc is None:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path)).encode()
+        if libc.inotify_add_watch(fd, directory, IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def fileno(self):
+        return self.fd
+
+    @property
+    def interval(self):
+        """How often the stat() safety check runs in the current mode"""
+        return self.safety_interval if self.fd is not None else self.poll_interval
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def handle_events(self):
+        """Drain pending inotify events and check the file if one of them names it"""
+        name = os.path.basename(self.path).encode()
+        touched = False
+        while True:
+            try:
+                buf = os.read(self.fd, 4096)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                _, _, _, length = _EVENT.unpack_from(buf, offset)
+                event_name = buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                touched = touched or event_name == name
+                offset += _EVENT.size + length
+        if touched:
+            return self.check(force=True)
+        return False
+
+    def check(self, force=False):
+        """Reload if the file changed; returns True when on_change was called"""
+        self.checks += 1
+        signature = self._stat()
+        if signature is None or (signature == self.signature and not force):
+            return False
+        if self.path.endswith(BINARY_SUFFIX):
+            return self.check_binary(signature)
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return False
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest == self.digest:
+            self.signature = signature
+            return False
+        try:
+            table = json.loads(data)
+        except ValueError:
+            return False  # Caught the writer mid-file; the next event or poll retries
+        self.signature = signature
+        self.digest = digest
+        return self.changed(table)
+
+    def check_binary(self, signature):
+        """Decode a binary table file unless it still holds the generation last applied"""
+        try:
+            table = read_table(self.path, self.table)
+        except OSError:
+            return False
+        except ValueError:
+            return False  # Not a complete table file; the next event or poll retries
+        self.signature = signature
+        if table is self.table:
+            return False
+        return self.changed(table)
+
+    def changed(self, table):
+        self.table = table
+        self.reloads += 1
+        self.on_change(table)
+        return True
+
+    def run(self, is_running):
+        """Blocking watch loop for the threaded agent"""
+        while is_running():
+            if self.fd is not None:
+                ready, _, _ = select.select([self.fd], [], [], self.interval)
+                if ready:
+                    self.handle_events()
+                    continue
+            else:
+                time.sleep(self.poll_interval)
+            self.check()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
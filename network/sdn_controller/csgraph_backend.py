@@ -0,0 +1,148 @@
+# csgraph_backend.py
+"""Vectorized all-pairs shortest-path trees with scipy's csgraph.
+
+The controller's graph becomes a sparse adjacency matrix and
+scipy.sparse.csgraph.dijkstra computes the distances from every source in
+compiled code, a block of sources at a time (optionally one block per
+worker process). Parents are then read off the distance matrix: U is a
+parent candidate of V when the link is tight,
+
+    dist(S, U) + weight(U, V) == dist(S, V)
+
+When a router has several candidates, the tables must name the same one
+the pure-Python Dijkstra would (see shortest_path_trees.dijkstra): the
+candidate it settled first. It settles routers by distance, and routers at
+the same distance in the order they were last pushed, i.e. by when their
+parent was settled and then by their position among the parent's
+neighbors. Candidates are always closer to the source than the router, so
+the routers are settled one distance level at a time, all sources at once:
+each level's parents and settle order only depend on earlier levels.
+Sources whose candidates are all unique skip this.
+
+Link weights must be positive, as they are for hop counts and measured
+latencies.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+BLOCK = 256  # sources solved together; bounds the memory of the per-link arrays
+
+
+class GraphArrays:
+    """The graph as index arrays, built once and shared by every block of sources"""
+
+    def __init__(self, graph, weight='weight'):
+        self.nodes = list(graph)
+        index = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+        tails, heads, weights, positions = [], [], [], []
+        for u in self.nodes:
+            for position, (v, attributes) in enumerate(graph[u].items()):
+                tails.append(index[u])
+                heads.append(index[v])
+                weights.append(1 if weight is None else attributes.get(weight, 1))
+                positions.append(position)
+        self.n = n
+        self.degree = max(positions, default=0) + 1
+        self.matrix = csr_matrix((np.array(weights, dtype=float), (tails, heads)), shape=(n, n))
+
+        # Links grouped by the router they lead to, for per-router reductions
+        by_head = np.argsort(np.array(heads, dtype=np.int64), kind='stable')
+        self.tails = np.array(tails, dtype=np.int64)[by_head]
+        self.heads = np.array(heads, dtype=np.int64)[by_head]
+        self.weights = np.array(weights, dtype=float)[by_head]
+        self.positions = np.array(positions, dtype=np.int64)[by_head]  # of the head among the tail's neighbors
+        self.has_links = np.unique(self.heads)
+        self.starts = np.searchsorted(self.heads, self.has_links)
+
+    def solve(self, sources):
+        """Distance and parent index rows of sources; parent -1 for the source and unreachable routers"""
+        sources = np.asarray(sources)
+        distances = dijkstra(self.matrix, directed=True, indices=sources)
+        from_tail = distances[:, self.tails]
+        tight = np.isfinite(from_tail) & (from_tail + self.weights == distances[:, self.heads])
+
+        parents = np.full(distances.shape, -1, dtype=np.int64)
+        candidates = np.add.reduceat(tight, self.starts, axis=1)
+        parents[:, self.has_links] = np.maximum.reduceat(np.where(tight, self.tails, -1), self.starts, axis=1)
+        tied = np.nonzero((candidates > 1).any(axis=1))[0]
+        if tied.size:
+            parents[tied] = self.break_ties(distances[tied], tight[tied])
+        return distances, parents
+
+    def break_ties(self, distances, tight):
+        """Parents as Dijkstra picks them: the tight candidate it settled first"""
+        rows, n = distances.shape
+        # Level of each router: how many distinct distances from the source are shorter
+        order = np.argsort(distances, axis=1, kind='stable')
+        in_order = np.take_along_axis(distances, order, axis=1)
+        new_level = np.ones((rows, n), dtype=bool)
+        new_level[:, 1:] = in_order[:, 1:] != in_order[:, :-1]
+        level = np.empty((rows, n), dtype=np.int64)
+        np.put_along_axis(level, order, np.cumsum(new_level, axis=1) - 1, axis=1)
+
+        # Settle rank: level first, then place within the level; sources (level 0) come first
+        rank = np.zeros((rows, n), dtype=np.int64)
+        parents = np.full((rows, n), -1, dtype=np.int64)
+        row_of, router_of = np.nonzero(np.isfinite(distances) & (level > 0))
+        by_level = np.argsort(level[row_of, router_of], kind='stable')
+        row_of, router_of = row_of[by_level], router_of[by_level]
+        bounds = np.searchsorted(level[row_of, router_of], np.arange(1, level[row_of, router_of].max(initial=0) + 2))
+        first_link = np.searchsorted(self.heads, np.arange(n))
+        link_count = np.searchsorted(self.heads, np.arange(n), side='right') - first_link
+
+        for level_number, (start, end) in enumerate(zip(bounds, bounds[1:]), 1):
+            level_rows, level_routers = row_of[start:end], router_of[start:end]
+            # Every link into these routers, grouped by router
+            counts = link_count[level_routers]
+            group_starts = np.cumsum(counts) - counts
+            links = np.repeat(first_link[level_routers] - group_starts, counts) + np.arange(counts.sum())
+            link_rows = np.repeat(level_rows, counts)
+            # Candidates settled earlier win, then the router's place among their neighbors; the tail rides along
+            pushed = np.where(tight[link_rows, links],
+                              (rank[link_rows, self.tails[links]] * self.degree + self.positions[links]) * n
+                              + self.tails[links],
+                              np.iinfo(np.int64).max)
+            pushed = np.minimum.reduceat(pushed, group_starts)
+            parents[level_rows, level_routers] = pushed % n
+            # Routers of a level settle in the order they were pushed
+            settle = np.lexsort((pushed, level_rows))
+            in_row = np.arange(end - start) - np.searchsorted(level_rows[settle], level_rows[settle])
+            rank[level_rows[settle], level_routers[settle]] = level_number * n + in_row
+        return parents
+
+
+shared = None  # GraphArrays of the worker process
+
+
+def share(arrays):
+    global shared
+    shared = arrays
+
+
+def solve_shared(sources):
+    return shared.solve(sources)
+
+
+def all_shortest_path_trees(graph, weight='weight', processes=1):
+    """({source: {destination: distance}}, {source: {destination: parent}}) for every router"""
+    arrays = GraphArrays(graph, weight)
+    blocks = [range(start, min(start + BLOCK, arrays.n)) for start in range(0, arrays.n, BLOCK)]
+    if processes > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(processes, initializer=share, initargs=(arrays,)) as pool:
+            solved = list(pool.map(solve_shared, blocks))
+    else:
+        solved = [arrays.solve(block) for block in blocks]
+
+    names = np.array(arrays.nodes + [None], dtype=object)  # parent -1 reads as None
+    all_distances, all_parents = {}, {}
+    for block, (distances, parents) in zip(blocks, solved):
+        for row, source in enumerate(block):
+            reachable = np.isfinite(distances[row])
+            destinations = names[:-1][reachable].tolist()
+            all_distances[names[source]] = dict(zip(destinations, distances[row][reachable].tolist()))
+            all_parents[names[source]] = dict(zip(destinations, names[parents[row][reachable]].tolist()))
+    return all_distances, all_parents
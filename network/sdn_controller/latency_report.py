@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# latency_report.py
+"""Collect router latency stats into an end-to-end breakdown of the exchange path.
+
+Every router serves its histograms and counters on http://<router>:8000/stats
+(STATS_PORT). The destination of a sampled tunnel frame knows the whole trip:
+time spent inside each router and on each link, from the arrival/departure
+stamps the frame collected on the way. This module fetches every router's
+snapshot and lines up the paths between two routers, router1 -> router10
+for orders and router10 -> router1 for their responses. It is used by the
+controller's /sdn_controller/latency endpoint and on its own as a CLI:
+
+  python latency_report.py [--hosts router1,...,router10] [--port 8000]
+"""
+import argparse
+import json
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ROUTERS = [f"router{i}" for i in range(1, 11)]
+STATS_PORT = 8000
+
+
+def fetch_stats(host, port=STATS_PORT, timeout=2.0):
+    """One router's stats snapshot"""
+    with urllib.request.urlopen(f"http://{host}:{port}/stats", timeout=timeout) as response:
+        return json.load(response)
+
+
+def collect(hosts, port=STATS_PORT, timeout=2.0):
+    """Snapshots keyed by router id, plus errors keyed by the hosts that did not answer"""
+    stats, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(hosts))) as pool:
+        futures = {host: pool.submit(fetch_stats, host, port, timeout) for host in hosts}
+    for host, future in futures.items():
+        try:
+            snapshot = future.result()
+            stats[snapshot["router"]] = snapshot
+        except Exception as e:
+            errors[host] = str(e)
+    return stats, errors
+
+
+def paths_between(stats, source, destination):
+    """Per-path segment breakdowns measured at destination for frames from source, busiest first"""
+    snapshot = stats.get(destination)
+    if snapshot is None:
+        return []
+    paths = [p for p in snapshot["paths"] if p["source"] == source]
+    return sorted(paths, key=lambda p: -max((s["count"] for s in p["segments"]), default=0))
+
+
+def breakdown(stats, source="router1", destination="router10"):
+    """Latency breakdown of both directions of the source <-> destination path"""
+    report = {}
+    for name, (src, dst) in (("forward", (source, destination)), ("reverse", (destination, source))):
+        report[name] = {
+            "source": src,
+            "destination": dst,
+            "end_to_end": stats.get(dst, {}).get("end_to_end", {}).get(src, {"count": 0}),
+            "paths": paths_between(stats, src, dst),
+        }
+    report["routers"] = {
+        router: {"rx": s["rx"], "tx": s["tx"], "residence": s["residence"], "links": s["links"]}
+        for router, s in sorted(stats.items())
+    }
+    return report
+
+
+def format_breakdown(report):
+    """Plain-text table of the report's paths"""
+    ms = lambda v: f"{v:9.3f}" if v is not None else f"{'-':>9}"
+    lines = []
+    for name in ("forward", "reverse"):
+        direction = report[name]
+        total = direction["end_to_end"]
+        lines.append(f"{direction['source']} -> {direction['destination']}: "
+                     f"{total['count']} sampled frames, end to end p50 {ms(total.get('p50_ms')).strip()} ms, "
+                     f"p99 {ms(total.get('p99_ms')).strip()} ms")
+        for path in direction["paths"]:
+            lines.append(f"  via {' -> '.join(path['route'])}")
+            lines.append(f"    {'segment':<22} {'count':>7} {'avg ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+            for s in path["segments"]:
+                lines.append(f"    {s['segment']:<22} {s['count']:>7} {ms(s.get('avg_ms'))} "
+                             f"{ms(s.get('p50_ms'))} {ms(s.get('p99_ms'))} {ms(s.get('max_ms'))}")
+        if not direction["paths"]:
+            lines.append("  no sampled frames yet")
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", default=",".join(DEFAULT_ROUTERS), help="comma-separated router hosts")
+    ap.add_argument("--port", type=int, default=STATS_PORT)
+    ap.add_argument("--source", default="router1")
+    ap.add_argument("--destination", default="router10")
+    ap.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = ap.parse_args()
+
+    stats, errors = collect(args.hosts.split(","), args.port)
+    for host, error in errors.items():
+        print(f"{host}: {error}")
+    report = breakdown(stats, args.source, args.destination)
+    print(json.dumps(report, indent=2) if args.json else format_breakdown(report))
+
+
+if __name__ == "__main__":
+    main()
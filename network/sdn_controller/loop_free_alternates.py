@@ -0,0 +1,45 @@
+# loop_free_alternates.py
+"""Loop-free alternate (LFA, RFC 5286) backup next hops for the flow tables.
+
+A router whose primary next hop fails can only switch traffic to another
+neighbor on its own if that neighbor will not send the traffic straight
+back. Neighbor N of source S is loop-free towards destination D when its
+own shortest path to D does not go through S:
+
+    dist(N, D) < dist(N, S) + dist(S, D)
+
+and it also protects against the failure of the primary next hop P itself,
+not just of the S-P link, when its path to D avoids P as well:
+
+    dist(N, D) < dist(N, P) + dist(P, D)
+
+The controller adds the best alternate to every flow entry (node-protecting
+ones first, then the cheapest way to D through the neighbor) so routers can
+fail over the moment they detect the failure, before new tables arrive.
+"""
+
+
+def loop_free_alternate(graph, distances, source, destination, primary, weight='weight'):
+    """Best alternate of source towards destination if primary fails, as (neighbor, metric, protection)
+
+    protection is 'node' when the alternate also avoids the primary router and
+    'link' when it only avoids the source-primary link; None if no neighbor is
+    loop-free.
+    """
+    to_destination = distances[source].get(destination)
+    if to_destination is None:
+        return None
+    best, best_rank = None, None
+    for neighbor in graph.neighbors(source):
+        if neighbor == primary:
+            continue
+        neighbor_distance = distances[neighbor].get(destination)
+        if neighbor_distance is None or not neighbor_distance < distances[neighbor][source] + to_destination:
+            continue
+        node_protecting = primary != destination and \
+            neighbor_distance < distances[neighbor][primary] + distances[primary][destination]
+        metric = graph[source][neighbor].get(weight, 1.0) + neighbor_distance
+        rank = (not node_protecting, metric, neighbor)
+        if best_rank is None or rank < best_rank:
+            best, best_rank = (neighbor, metric, 'node' if node_protecting else 'link'), rank
+    return best
@@ -1,7 +1,9 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel
 import logging
 import uvicorn
 import yaml
@@ -14,7 +16,18 @@ from fastapi.responses import HTMLResponse
 from fastapi.responses import Response
 import time
 import threading
+import asyncio
 from datetime import datetime
+import latency_report
+from priority_path import PriorityPath
+from recompute_scheduler import RecomputeScheduler
+from response_cache import ResponseCache, not_modified
+from route_stability import PathHold, RouteStability
+from router_channel import CONTROL_CHANNEL_PORT, RouterChannelHub
+from shortest_path_trees import ShortestPathTrees, tree_path
+from snapshot_renderer import SnapshotRenderer
+from table_store import TableStore
+from topology import Topology
 
 # Setuplogging
 logging.basicConfig(level=logging.INFO)
@@ -25,15 +38,96 @@ app = FastAPI(title="SDN Controller API")
 ROUTER_TABLES_DIR = "/shared/"
 DOCKER_COMPOSE_PATH= "/app/docker-compose.yml"
 
-# Global network graph
-network_graph = nx.Graph()
+# Routers are named routerN; frames carry N as a u16 (router/framing.py)
+ROUTER_ID = re.compile(r'router(\d+)')
+MAX_ROUTER_NUMBER = 0xFFFF
 
-# Store node positions to keep graph layout consistent
-node_positions = {}
+# Current version of the network graph; replaced whole on every change, never mutated
+topology = Topology()
+
+# Latest probe measurements of each link, by the router that reported them
+link_measurements = {}
+measurements_lock = threading.Lock()
 
 # Directory to save graph snapshots
 GRAPH_SNAPSHOTS_DIR = "/shared/snapshots/"
 
+# Graph image and table responses, built once per version; ?wait_for_version long-polls wait here
+response_cache = ResponseCache()
+LONG_POLL_TIMEOUT = 30.0  # seconds a long-poll waits by default
+LONG_POLL_MAX = 60.0
+
+# Renders a snapshot of every graph version in a worker process, keeping the newest SNAPSHOT_RETAIN
+snapshot_renderer = SnapshotRenderer(GRAPH_SNAPSHOTS_DIR,
+                                     retain=int(os.environ.get('SNAPSHOT_RETAIN', 100)),
+                                     min_interval=float(os.environ.get('SNAPSHOT_INTERVAL', 4)))
+
+# Versioned router tables, pushed to routers over their persistent channel
+router_hub = RouterChannelHub()
+
+# Every router's shortest-path tree, repaired in place when link weights change
+spf_trees = None
+
+# Every router's fewest-hops tree, for the routes; repaired in place when routers or links come and go
+hop_trees = None
+
+# How all-pairs trees are computed: 'networkx' (pure Python) or 'csgraph' (scipy, vectorized),
+# optionally spread over worker processes
+ROUTING_BACKEND = os.environ.get('ROUTING_BACKEND', 'networkx')
+ROUTING_PROCESSES = int(os.environ.get('ROUTING_PROCESSES', 1))
+
+# Flow entries list up to MULTIPATH next hops, those at most MULTIPATH_STRETCH costlier than the
+# shortest path (0: equal-cost only), for routers to spread flows over; 1 (the default) keeps a single
+# path, since on one host the routers forward less with groups (see benchmarks/README.md)
+MULTIPATH = int(os.environ.get('MULTIPATH', 1))
+MULTIPATH_STRETCH = float(os.environ.get('MULTIPATH_STRETCH', 0))
+
+# With PRIORITY_PATH=1, exchange frames between SOURCE_ROUTER and DESTINATION_ROUTER keep to a pinned
+# lowest-latency path of at most PRIORITY_MAX_HOPS links (0: any number) over links losing at most
+# PRIORITY_MAX_LOSS of their probes, instead of the flow tables and their next-hop groups; other traffic
+# pays PRIORITY_AVOIDANCE times the weight of its links. Off by default
+priority_path = PriorityPath(os.environ.get('SOURCE_ROUTER', 'router1'),
+                             os.environ.get('DESTINATION_ROUTER', 'router10'),
+                             max_hops=int(os.environ.get('PRIORITY_MAX_HOPS', 0)) or None,
+                             max_loss=float(os.environ.get('PRIORITY_MAX_LOSS', 0.05)),
+                             switch_gain=float(os.environ.get('PRIORITY_SWITCH_GAIN', 0.2)),
+                             avoidance=float(os.environ.get('PRIORITY_AVOIDANCE', 4)),
+                             hold_down=float(os.environ.get('PRIORITY_HOLD_DOWN', 60)),
+                             enabled=os.environ.get('PRIORITY_PATH', '0') == '1')
+
+# Reported link weights are smoothed (LINK_WEIGHT_EWMA, 1: not at all) and published only once they move by
+# more than LINK_WEIGHT_HYSTERESIS; links that keep changing are damped like flapping BGP routes
+# (FLAP_PENALTY per change, suppressed at FLAP_SUPPRESS, 0 turns damping off, reused below FLAP_REUSE)
+route_stability = RouteStability(alpha=float(os.environ.get('LINK_WEIGHT_EWMA', 0.3)),
+                                 hysteresis=float(os.environ.get('LINK_WEIGHT_HYSTERESIS', 0.1)),
+                                 penalty=float(os.environ.get('FLAP_PENALTY', 1000)),
+                                 suppress=float(os.environ.get('FLAP_SUPPRESS', 3000)),
+                                 reuse=float(os.environ.get('FLAP_REUSE', 750)),
+                                 half_life=float(os.environ.get('FLAP_HALF_LIFE', 300)),
+                                 max_suppress=float(os.environ.get('FLAP_MAX_SUPPRESS', 1800)))
+
+# The flow tables move SOURCE_ROUTER's path to DESTINATION_ROUTER only to a path PATH_SWITCH_GAIN cheaper,
+# and not within PATH_HOLD_DOWN seconds of its last move (0 disables the hold-down)
+path_hold = PathHold(priority_path.source, priority_path.destination,
+                     switch_gain=float(os.environ.get('PATH_SWITCH_GAIN', 0.2)),
+                     hold_down=float(os.environ.get('PATH_HOLD_DOWN', 60)))
+
+# Router tables as last saved, so recomputes compare against them instead of re-reading the files
+router_tables = {}
+
+# Writes the table files atomically, as 'json' or the compact 'binary' encoding routers can map
+table_store = TableStore(ROUTER_TABLES_DIR, os.environ.get('TABLE_ENCODING', 'json'))
+
+# Serializes writers: publishing a new topology and recomputing the tables for it; readers need no lock
+topology_lock = threading.RLock()
+
+# Links and routers taken down through the API, with what it takes to bring them back up
+down_links = {}    # (u, v) -> link attributes
+down_routers = {}  # router -> (router attributes, {neighbor: link attributes})
+
+# Link weight updates wait here to be applied in batches, off the request that reported them
+recompute_scheduler = RecomputeScheduler(debounce=float(os.environ.get('RECOMPUTE_DEBOUNCE_MS', 250)) / 1000)
+
 def parse_docker_compose():
     """Parse docker-compose.yml to build network topology graph"""
     try:
@@ -48,224 +142,347 @@ def parse_docker_compose():
         with open(compose_path, 'r') as file:
             compose_data = yaml.safe_load(file)
         
-        # Clear existing graph
-        network_graph.clear()
-        
-        # Get all networks that represent links between routers
-        link_networks = {}
-        for network_name, network_config in compose_data.get('networks', {}).items():
-            # Look for networks with names like 'link-X-Y'
-            if network_name.startswith('link-'):
-                subnet = None
-                if 'ipam' in network_config and 'config' in network_config['ipam']:
-                    for config in network_config['ipam']['config']:
-                        if 'subnet' in config:
-                            subnet = config['subnet']
-                            break
-                
-                link_networks[network_name] = {'subnet': subnet}
-                logger.info(f"Found network: {network_name}, subnet: {subnet}")
+        # Build the next version of the graph
+        graph = build_graph(compose_data)
         
-        # Get all routers and their connections
-        routers = {}
-        for service_name, service_config in compose_data.get('services', {}).items():
-            # Skip non-router services like the SDN controller
-            if service_name.startswith('router'):
-                router_id = service_name
-                router_networks = {}
-                router_ports = {}
-                
-                # Extract port mappings
-                if 'ports' in service_config:
-                    for port_mapping in service_config['ports']:
-                        if isinstance(port_mapping, str):
-                            # Format like "8001:8000"
-                            host_port, container_port = port_mapping.split(':')
-                            router_ports[container_port] = host_port
+        global topology
+        with topology_lock:
+            topology = topology.replaced(graph)
+            with measurements_lock:
+                link_measurements.clear()
+            route_stability.clear()
+            priority_path.reset()
+            path_hold.reset()
+            down_links.clear()
+            down_routers.clear()
             
-                
-                # Get networks this router is connected to
-                if 'networks' in service_config:
-                    for network_name, network_config in service_config['networks'].items():
-                        if network_name.startswith('link-'):
-                            ip_address = None
-                            if isinstance(network_config, dict) and 'ipv4_address' in network_config:
-                                ip_address = network_config['ipv4_address']
-                            
-                            router_networks[network_name] = ip_address
-                
-                routers[router_id] = {
-                    'networks': router_networks,
-                    'ports': router_ports
-                }
-                
-                # Add router node to graph with both network and port information
-                network_graph.add_node(
-                    router_id, 
-                    ip_addresses=router_networks,
-                    ports=router_ports
-                )
-                logger.info(f"Added router: {router_id} with networks: {router_networks} and ports: {router_ports}")
-        
-        # Create links between routers
-        for network_name, network_info in link_networks.items():
-            # Extract router IDs from link names (e.g., 'link-1-2' → routers 1 and 2)
-            match = re.search(r'link-(\d+)-(\d+)', network_name)
-            if match:
-                router1_id = f"router{match.group(1)}"
-                router2_id = f"router{match.group(2)}"
-                
-                # Check if both routers exist
-                if router1_id in routers and router2_id in routers:
-                    subnet = network_info.get('subnet')
-                    router1_ip = routers[router1_id]['networks'].get(network_name)
-                    router2_ip = routers[router2_id]['networks'].get(network_name)
-                    
-                    # Add edge between routers
-                    network_graph.add_edge(
-                        router1_id, 
-                        router2_id, 
-                        subnet=subnet,
-                        network=network_name,
-                        router1_ip=router1_ip,
-                        router2_ip=router2_ip,
-                        weight=calculate_link_weight(network_name, router1_id, router2_id)
-                    )
-                    logger.info(f"Added link between {router1_id} and {router2_id} on network {network_name}")
-
-        logger.info(f"Network graph built with {len(network_graph.nodes)} nodes and {len(network_graph.edges)} edges")
-        
-        # Generate initial routing tables based on the topology
-        generate_routing_tables()
+            # Generate initial routing tables based on the topology
+            generate_routing_tables()
 
-        # Calculate flow tables for optimal routing
-        calculate_flow_tables()
+            # Calculate flow tables for optimal routing
+            calculate_flow_tables()
+            graph_changed()
         
     except Exception as e:
         logger.error(f"Error parsing docker-compose.yml: {str(e)}")
 
+def build_graph(compose_data):
+    """Network graph of the routers and link networks in parsed docker-compose.yml contents"""
+    graph = nx.Graph()
+    
+    # Get all networks that represent links between routers
+    link_networks = {}
+    for network_name, network_config in compose_data.get('networks', {}).items():
+        # Look for networks with names like 'link-X-Y'
+        if network_name.startswith('link-'):
+            subnet = None
+            if 'ipam' in network_config and 'config' in network_config['ipam']:
+                for config in network_config['ipam']['config']:
+                    if 'subnet' in config:
+                        subnet = config['subnet']
+                        break
+            
+            link_networks[network_name] = {'subnet': subnet}
+            logger.info(f"Found network: {network_name}, subnet: {subnet}")
+    
+    # Get all routers and their connections
+    routers = {}
+    for service_name, service_config in compose_data.get('services', {}).items():
+        # Skip non-router services like the SDN controller
+        if service_name.startswith('router'):
+            router_id = service_name
+            router_networks = {}
+            router_ports = {}
+            
+            # Extract port mappings
+            if 'ports' in service_config:
+                for port_mapping in service_config['ports']:
+                    if isinstance(port_mapping, str):
+                        # Format like "8001:8000"
+                        host_port, container_port = port_mapping.split(':')
+                        router_ports[container_port] = host_port
+        
+            
+            # Get networks this router is connected to
+            if 'networks' in service_config:
+                for network_name, network_config in service_config['networks'].items():
+                    if network_name.startswith('link-'):
+                        ip_address = None
+                        if isinstance(network_config, dict) and 'ipv4_address' in network_config:
+                            ip_address = network_config['ipv4_address']
+                        
+                        router_networks[network_name] = ip_address
+            
+            routers[router_id] = {
+                'networks': router_networks,
+                'ports': router_ports
+            }
+            
+            # Add router node to graph with both network and port information
+            graph.add_node(
+                router_id, 
+                ip_addresses=router_networks,
+                ports=router_ports
+            )
+            logger.info(f"Added router: {router_id} with networks: {router_networks} and ports: {router_ports}")
+    
+    # Create links between routers
+    for network_name, network_info in link_networks.items():
+        # Extract router IDs from link names (e.g., 'link-1-2' → routers 1 and 2)
+        match = re.search(r'link-(\d+)-(\d+)', network_name)
+        if match:
+            router1_id = f"router{match.group(1)}"
+            router2_id = f"router{match.group(2)}"
+            
+            # Check if both routers exist
+            if router1_id in routers and router2_id in routers:
+                subnet = network_info.get('subnet')
+                router1_ip = routers[router1_id]['networks'].get(network_name)
+                router2_ip = routers[router2_id]['networks'].get(network_name)
+                
+                # Add edge between routers
+                graph.add_edge(
+                    router1_id, 
+                    router2_id, 
+                    subnet=subnet,
+                    network=network_name,
+                    router1_ip=router1_ip,
+                    router2_ip=router2_ip,
+                    weight=calculate_link_weight(network_name, router1_id, router2_id)
+                )
+                logger.info(f"Added link between {router1_id} and {router2_id} on network {network_name}")
+
+    logger.info(f"Network graph built with {len(graph.nodes)} nodes and {len(graph.edges)} edges")
+    return graph
+
 def generate_routing_tables():
     """Generate routing tables for all routers based on the network graph"""
-    for router_id in network_graph.nodes:
+    global hop_trees
+    graph = topology.graph
+    
+    # Every router's breadth-first tree, in one pass over all sources
+    hop_trees = ShortestPathTrees(graph, weight=None, backend=ROUTING_BACKEND, processes=ROUTING_PROCESSES)
+    
+    for router_id in graph.nodes:
         routing_table = {
             "router_id": router_id,
-            "interfaces": {},
+            "interfaces": router_interfaces(graph, router_id),
             "flow_table": [],
-            "routes": [],
-            "ports": network_graph.nodes[router_id].get('ports', {})
+            "priority_flows": [],
+            "routes": route_table(router_id),
+            "ports": graph.nodes[router_id].get('ports', {})
         }
         
-        # Add interfaces (direct connections)
-        for neighbor in network_graph.neighbors(router_id):
-            edge_data = network_graph.get_edge_data(router_id, neighbor)
-            network_name = edge_data.get('network')
-            subnet = edge_data.get('subnet')
-            
-            # Get IP address for this router on this network
-            router_ip_key = f"{router_id}_ip".replace('router', 'router')
-            ip_address = edge_data.get(router_ip_key)
-            
-            # If not found in edge data, try node data
-            if not ip_address and 'ip_addresses' in network_graph.nodes[router_id]:
-                ip_address = network_graph.nodes[router_id]['ip_addresses'].get(network_name)
+        # Save router table to shared volume
+        save_router_table(router_id, routing_table)
+
+def router_interfaces(graph, router_id):
+    """Interfaces of a router (direct connections): each neighbor's network, subnet and the router's address"""
+    interfaces = {}
+    for neighbor in graph.neighbors(router_id):
+        edge_data = graph.get_edge_data(router_id, neighbor)
+        network_name = edge_data.get('network')
+        subnet = edge_data.get('subnet')
+        
+        # Get IP address for this router on this network
+        router_ip_key = f"{router_id}_ip".replace('router', 'router')
+        ip_address = edge_data.get(router_ip_key)
+        
+        # If not found in edge data, try node data
+        if not ip_address and 'ip_addresses' in graph.nodes[router_id]:
+            ip_address = graph.nodes[router_id]['ip_addresses'].get(network_name)
+        
+        interfaces[neighbor] = {
+            "network": network_name,
+            "subnet": subnet,
+            "ip_address": ip_address
+        }
+    return interfaces
+
+def route_table(router_id, previous=None, destinations=None):
+    """Routes of a router to all possible destinations (fewest hops), along its tree in hop_trees
+    
+    With the previous routes and the destinations whose hops changed (see ShortestPathTrees.update),
+    the other routes are reused.
+    """
+    graph, hop_parents = hop_trees.graph, hop_trees.parents[router_id]
+    reuse = {}
+    if previous is not None and destinations is not None:
+        reuse = {route['destination']: route for route in previous}
+    routes = []
+    for target in graph.nodes:
+        if target == router_id:
+            continue  # Skip self
             
-            routing_table["interfaces"][neighbor] = {
-                "network": network_name,
-                "subnet": subnet,
-                "ip_address": ip_address
-            }
+        if target not in hop_parents:
+            logger.warning(f"No path from {router_id} to {target}")
+            continue
+        if target in reuse and target not in destinations:
+            routes.append(reuse[target])
+            continue
+        path = tree_path(hop_parents, router_id, target)
+        next_hop = path[1]  # The next router in the path
         
-        # Generate routes to all possible destinations (shortest path)
-        for target in network_graph.nodes:
-            if target == router_id:
-                continue  # Skip self
-                
-            try:
-                path = nx.shortest_path(network_graph, router_id, target)
-                if len(path) > 1:
-                    next_hop = path[1]  # The next router in the path
-                    
-                    # Get the subnet for the target
-                    edge_data = network_graph.get_edge_data(path[-2], target)
-                    target_subnet = edge_data.get('subnet', '')
-                    
-                    # Create a route entry
-                    routing_table["routes"].append({
-                        "destination": target,
-                        "destination_subnet": target_subnet,
-                        "next_hop": next_hop,
-                        "metric": len(path) - 1
-                    })
-            except nx.NetworkXNoPath:
-                logger.warning(f"No path from {router_id} to {target}")
+        # Get the subnet for the target
+        edge_data = graph.get_edge_data(path[-2], target)
+        target_subnet = edge_data.get('subnet', '')
         
-        # Save router table to shared volume
-        save_router_table(router_id, routing_table)
+        # Create a route entry
+        routes.append({
+            "destination": target,
+            "destination_subnet": target_subnet,
+            "next_hop": next_hop,
+            "metric": len(path) - 1
+        })
+    return routes
 
 def save_router_table(router_id, table):
-    """Save router table to JSON file in shared volume"""
-    file_path = os.path.join(ROUTER_TABLES_DIR, f"{router_id}_table.json")
-    with open(file_path, 'w') as file:
-        json.dump(table, file, indent=2)
-    logger.info(f"Saved routing table for {router_id}")
-
-def calculate_flow_tables():
-    """Calculate and populate flow tables for all routers using Dijkstra's algorithm"""
-    logger.info("Calculating optimal paths for all router pairs...")
-    
-    # For each router, calculate shortest paths to all destinations
-    for source in network_graph.nodes:
-        # Get shortest paths from this source to all destinations using weights
-        # Format: {destination: (distance, path)}
-        paths_with_distances = nx.single_source_dijkstra(network_graph, source, weight='weight')
-        # Unpack into separate dictionaries
-        distances, paths = paths_with_distances
+    """Save router table to the shared volume, stamped with a new generation if it changed"""
+    table = table_store.save(router_id, table)
+    router_tables[router_id] = table
+    response_cache.changed(f"table/{router_id}")
+    version = router_hub.publish(router_id, table)
+    logger.info(f"Saved routing table for {router_id} (generation {table['generation']}, version {version})")
+
+def calculate_flow_tables(changed_links=None, structure=None, tables=None):
+    """Calculate and populate flow tables for all routers using Dijkstra's algorithm
+    
+    changed_links maps links whose weight changed to their weight before; then only the
+    shortest-path trees and flow entries the change reaches are recomputed, and only the
+    tables that actually changed are saved. Without it every tree is rebuilt. structure
+    names the routers and links added and removed besides (see ShortestPathTrees.update),
+    and tables holds routers' tables with new routes or interfaces, saved here with their
+    flow entries.
+    
+    The exchange pair's priority path is re-evaluated first, and the shortest-path trees
+    are computed on the weights background traffic sees, with the reserved links avoided.
+    The pair's own path in the flow tables then goes through path_hold, and the routers
+    on a path it holds get entries along it in place of their trees' ones.
+    """
+    global spf_trees
+    with topology_lock:
+        graph = topology.graph
+        with measurements_lock:
+            measurements = {link: dict(reports) for link, reports in link_measurements.items()}
+        reserved = priority_path.reserved()
+        if priority_path.update(graph, measurements):
+            logger.info(f"Exchange traffic {priority_path.source} -> {priority_path.destination} pinned to "
+                        f"{priority_path.path} ({priority_path.latency:.2f} ms)")
+        background = topology.with_weights(priority_path.background_weights(graph))[0].graph
         
-        # Get the router's current table
-        file_path = os.path.join(ROUTER_TABLES_DIR, f"{source}_table.json")
-        try:
-            with open(file_path, "r") as file:
-                router_data = json.load(file)
-        except FileNotFoundError:
-            logger.error(f"Table for router {source} not found")
-            continue
-            
-        # Reset flow table
-        router_data['flow_table'] = []
+        if changed_links is None or spf_trees is None:
+            logger.info("Calculating optimal paths for all router pairs...")
+            spf_trees = ShortestPathTrees(background, backend=ROUTING_BACKEND, processes=ROUTING_PROCESSES,
+                                          multipath=MULTIPATH, stretch=MULTIPATH_STRETCH)
+            stale = dict.fromkeys(graph.nodes)
+        else:
+            # Links whose background weight changed: the reported ones, and those reserved or released
+            previous, background_links = spf_trees.graph, {}
+            for u, v in set(changed_links) | reserved | priority_path.reserved():
+                if background.has_edge(u, v) and previous.has_edge(u, v) and \
+                        previous[u][v].get('weight', 1) != background[u][v].get('weight', 1):
+                    background_links[(u, v)] = previous[u][v].get('weight', 1)
+            structure = structure or {}
+            changed = spf_trees.update(background_links, background, **structure)
+            stale = spf_trees.stale_entries(changed, [*background_links, *structure.get('removed_links', ()),
+                                                      *structure.get('added_links', ())])
+            logger.info(f"Repaired {len(changed)} of {len(graph)} shortest-path trees "
+                        f"after {len(changed_links)} link weight change(s)"
+                        + (f" and {sum(map(len, structure.values()))} added or removed router(s) and link(s)"
+                           if structure else ""))
         
-        # Create flow entries for each destination
-        for destination, path in paths.items():
-            if source == destination:
-                continue  # Skip self
-                
-            if len(path) > 1:
-                next_hop = path[1]  # Next router in the path
-                distance = distances[destination]  # Total path cost
-                
-                # Create a flow entry
-                flow_entry = {
-                    "match": {
-                        "destination": destination
-                    },
-                    "action": {
-                        "forward_to": next_hop
-                    },
-                    "priority": 100,
-                    "path": path,
-                    "metric": distance  # Use actual distance now instead of hop count
-                }
-                
-                router_data['flow_table'].append(flow_entry)
+        # The pair's path moves only for a clear gain after its hold-down (route_stability.py); until
+        # then the routers on the held path keep forwarding along it, in both directions
+        source, destination = path_hold.source, path_hold.destination
+        previous = path_hold.path or []
+        shortest = spf_trees.path(source, destination) \
+            if destination in spf_trees.distances.get(source, {}) else None
+        path = path_hold.update(shortest, spf_trees.path_cost) or []
+        held = {}
+        if path != shortest:
+            for route in (path, path[::-1]):
+                for position, router_id in enumerate(route[:-1]):
+                    if spf_trees.path(router_id, route[-1]) != route[position:]:
+                        held.setdefault(router_id, {})[route[-1]] = \
+                            spf_trees.flow_entry(router_id, route[-1], route[position:])
+        for router_id in {*previous, *path}:
+            if router_id in graph and stale.get(router_id, ()) is not None:
+                stale[router_id] = {*stale.get(router_id, ()), source, destination} - {router_id}
         
-        # Save updated router table
-        save_router_table(source, router_data)
-        logger.info(f"Updated flow table for {source} with {len(router_data['flow_table'])} entries")
+        # Routers on the priority path, and those that were, get their priority entries rebuilt
+        pinned = {router_id: priority_path.flow_entries(router_id)
+                  for router_id in priority_path.path or ()}
+        for router_id, router_data in router_tables.items():
+            if router_id in pinned or router_data.get('priority_flows'):
+                stale.setdefault(router_id, ())
+        tables = tables or {}
+        for router_id in tables:
+            stale.setdefault(router_id, ())
+        
+        saved = 0
+        for source, destinations in stale.items():
+            # Get the router's current table, or the one with its new routes
+            router_data = tables.get(source, router_tables.get(source))
+            if router_data is None:
+                logger.error(f"Table for router {source} not found")
+                continue
+            
+            flow_table = spf_trees.flow_table(source, router_data.get('flow_table'), destinations)
+            if source in held:
+                flow_table = [held[source].get(flow["match"]["destination"], flow) for flow in flow_table]
+            table = dict(router_data, flow_table=flow_table, priority_flows=pinned.get(source, []))
+            if table == router_tables.get(source):
+                continue
+            
+            # Save updated router table
+            save_router_table(source, table)
+            saved += 1
+            logger.info(f"Updated flow table for {source} with {len(flow_table)} entries")
+        logger.info(f"Saved {saved} of {len(stale)} recomputed flow tables")
+
+def graph_changed():
+    """Announce a newly published topology version: wake its long-polls and queue a snapshot of it"""
+    snapshot = topology
+    source, destination = priority_path.source, priority_path.destination
+    # The exchange pair's pinned path, else the source's shortest path from its flow table
+    path = list(priority_path.path or [])
+    if not path:
+        for entry in router_tables.get(source, {}).get('flow_table', []):
+            if entry.get('match', {}).get('destination') == destination:
+                path = entry.get('path', [])
+                break
+    scene = {
+        "version": snapshot.version,
+        "nodes": list(snapshot.graph.nodes),
+        "edges": [(u, v, data.get('weight', 1.0)) for u, v, data in snapshot.graph.edges(data=True)],
+        "path": path,
+        "source": source,
+        "destination": destination,
+        "suppressed": {"path_changes": path_hold.suppressed + priority_path.suppressed,
+                       "link_updates": route_stability.held + route_stability.damped},
+    }
+    response_cache.changed("graph")
+    snapshot_renderer.submit(scene)
 
 def calculate_link_weight(network_name, router1_id, router2_id):
     """Calculate default weight for a link"""
     # Default base weight
     return 1.0
 
+class LinkMeasurement(BaseModel):
+    """Smoothed heartbeat probe results a router reports for the link to one neighbor"""
+    rtt_ms: float
+    jitter_ms: float = 0.0
+    loss: float = 0.0
+    throughput_mbps: Optional[float] = None
+    probes: int = 0
+    lost: int = 0
+
+def measured_link_weight(measurement):
+    """Weight in milliseconds: round trip plus a jitter margin, inflated by the chance of a retransmit"""
+    loss = min(max(measurement.loss, 0.0), 0.9)
+    return (measurement.rtt_ms + 2 * measurement.jitter_ms) / (1 - loss)
+
 @app.get("/sdn_controller/health")
 def service_health():
     return {
@@ -276,43 +493,69 @@ def service_health():
 @app.get("/sdn_controller/topology")
 def get_topology():
     """Return the current network topology"""
+    snapshot = topology
+    with measurements_lock:
+        measurements = {link: dict(reports) for link, reports in link_measurements.items()}
     nodes = [{
         "id": node, 
         "ip_addresses": data.get('ip_addresses', {}),
         "ports": data.get('ports', {})
-    } for node, data in network_graph.nodes(data=True)]
+    } for node, data in snapshot.graph.nodes(data=True)]
     
-    links = [{"source": u, "target": v, "subnet": data.get('subnet')} 
-             for u, v, data in network_graph.edges(data=True)]
+    links = [{"source": u, "target": v, "subnet": data.get('subnet'), "weight": data.get('weight', 1.0),
+              "measurements": measurements.get(tuple(sorted((u, v))), {})}
+             for u, v, data in snapshot.graph.edges(data=True)]
     
     return {
+        "version": snapshot.version,
         "nodes": nodes,
-        "links": links
+        "links": links,
+        "down": {"links": [f"{u}-{v}" for u, v in list(down_links)], "routers": list(down_routers)}
     }
 
+def table_generation(router_id):
+    return router_tables.get(router_id, {}).get('generation', 0)
+
+def cached_response(request, key, version, render, media_type, signature=None):
+    """Response for key at version from the response cache; 304 if the client already has it"""
+    etag, body = response_cache.get(key, version, render, signature)
+    headers = {"ETag": etag, "X-Version": str(version)}
+    if not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+async def wait_for_table(router_id, wait_for_version, timeout):
+    """Long-poll: wait for router_id's table to reach generation wait_for_version"""
+    if wait_for_version is not None:
+        await response_cache.wait(f"table/{router_id}", wait_for_version,
+                                  lambda: table_generation(router_id), min(timeout, LONG_POLL_MAX))
+
 @app.get("/sdn_controller/routers/flow_table/{router_id}")
-def get_flow_table(router_id: str):
-    file_path = os.path.join(ROUTER_TABLES_DIR, f"{router_id}_table.json")
-    try:
-        with open(file_path, "r") as file:
-            router_data = json.load(file)
-    except FileNotFoundError:
+async def get_flow_table(router_id: str, request: Request, wait_for_version: Optional[int] = None,
+                         timeout: float = LONG_POLL_TIMEOUT):
+    """Flow entries of a router; ETag is its table generation, ?wait_for_version=N waits for generation N"""
+    await wait_for_table(router_id, wait_for_version, timeout)
+    router_data = router_tables.get(router_id)
+    if router_data is None:
         logger.error(f"Table for router {router_id} not found")
         return {
             "router_id": router_id,
             "flow_table": [],
             "interfaces": {}
         }
-    return router_data.get('flow_table', [])
+    return cached_response(request, f"flow_table/{router_id}", router_data.get('generation', 0),
+                           lambda: json.dumps(router_data.get('flow_table', [])).encode('utf-8'), "application/json")
 
 @app.get("/sdn_controller/routers/routing_table/{router_id}")
-def get_routing_table(router_id: str):
-    """Get the full routing table for a router"""
-    file_path = os.path.join(ROUTER_TABLES_DIR, f"{router_id}_table.json")
-    try:
-        with open(file_path, "r") as file:
-            router_data = json.load(file)
-    except FileNotFoundError:
+async def get_routing_table(router_id: str, request: Request, wait_for_version: Optional[int] = None,
+                            timeout: float = LONG_POLL_TIMEOUT):
+    """Get the full routing table for a router, as JSON whatever the files' encoding
+    
+    ETag is the table's generation; ?wait_for_version=N waits up to timeout seconds for generation N.
+    """
+    await wait_for_table(router_id, wait_for_version, timeout)
+    router_data = router_tables.get(router_id)
+    if router_data is None:
         logger.error(f"Table for router {router_id} not found")
         return {
             "router_id": router_id,
@@ -320,181 +563,116 @@ def get_routing_table(router_id: str):
             "interfaces": {},
             "routes": []
         }
-    return router_data
+    return cached_response(request, f"table/{router_id}", router_data.get('generation', 0),
+                           lambda: json.dumps(router_data).encode('utf-8'), "application/json")
 
 @app.get("/sdn_controller/rebuild_topology")
 def rebuild_topology():
     """Manually trigger rebuilding the topology from docker-compose.yml"""
-    parse_docker_compose()
+    with topology_lock:
+        parse_docker_compose()
     return {"status": "topology rebuilt"}
 
+@app.get("/sdn_controller/channel")
+def get_channel_status():
+    """Table version of every router, whether it is connected and how fast it applied the last change"""
+    return router_hub.status()
+
+@app.get("/sdn_controller/tables")
+def get_table_store_status():
+    """Encoding, generation and write counts of the router table files"""
+    return table_store.status()
+
+@app.get("/sdn_controller/recompute")
+def get_recompute_status():
+    """Topology version the flow tables are at, updates waiting for a recompute and how often they run"""
+    return recompute_scheduler.status()
+
+@app.get("/sdn_controller/priority_path")
+def get_priority_path():
+    """The exchange pair's pinned path, its measured latency and the constraints it was chosen under"""
+    return priority_path.status()
+
+@app.get("/sdn_controller/stability")
+def get_stability_status():
+    """Link weight smoothing, hysteresis and flap damping: what was published, held back and suppressed"""
+    return dict(route_stability.status(), path_hold=path_hold.status(),
+                path_changes_suppressed=path_hold.suppressed + priority_path.suppressed,
+                path_switches=path_hold.switches + priority_path.switches)
+
+@app.get("/sdn_controller/latency")
+def get_latency_breakdown(source: Optional[str] = None, destination: Optional[str] = None):
+    """Collect every router's latency stats into a per-hop breakdown of the exchange path"""
+    source = source or priority_path.source
+    destination = destination or priority_path.destination
+    routers = [n for n in topology.graph.nodes if n.startswith('router')] or latency_report.DEFAULT_ROUTERS
+    port = int(os.environ.get('ROUTER_STATS_PORT', latency_report.STATS_PORT))
+    stats, errors = latency_report.collect(routers, port)
+    report = latency_report.breakdown(stats, source, destination)
+    report["unreachable"] = errors
+    return report
+
+
+def render_graph_png(graph):
+    """PNG image of a version of the network graph"""
+    # Create figure
+    plt.figure(figsize=(10, 8))
+    
+    # Use a deterministic layout
+    pos = nx.spring_layout(graph, seed=42)
+    
+    # Draw nodes with different colors for routers
+    nx.draw_networkx_nodes(graph, pos, 
+                          node_size=1000, 
+                          node_color="skyblue")
+    
+    # Draw edges
+    nx.draw_networkx_edges(graph, pos, width=2)
+    
+    # Create clear labels for nodes
+    labels = {}
+    for node in graph.nodes():
+        labels[node] = node
+    nx.draw_networkx_labels(graph, pos, labels, font_size=12, font_weight='bold')
+    
+    # Add subnet information on edges
+    edge_labels = {}
+    for u, v, data in graph.edges(data=True):
+        if 'subnet' in data:
+            edge_labels[(u, v)] = data['subnet']
+    nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels)
+    
+    plt.title("Network Topology")
+    plt.axis('off')  # Turn off axis
+    
+    # Save to bytes buffer
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png', dpi=150)
+    plt.close()
+    return buf.getvalue()
 
 @app.get("/sdn_controller/graph", response_class=Response)
-def network_graph_image():
-    """Return just a PNG image of the network graph"""
+async def network_graph_image(request: Request, wait_for_version: Optional[int] = None,
+                              timeout: float = LONG_POLL_TIMEOUT):
+    """Return just a PNG image of the network graph
+    
+    The image is drawn once per graph version, and not again while only link weights change since
+    it does not show them; ETag and ?wait_for_version=N work as for the tables.
+    """
+    if wait_for_version is not None:
+        await response_cache.wait("graph", wait_for_version, lambda: topology.version, min(timeout, LONG_POLL_MAX))
     try:
-        # Create figure
-        plt.figure(figsize=(10, 8))
-        
-        # Use a deterministic layout
-        pos = nx.spring_layout(network_graph, seed=42)
-        
-        # Draw nodes with different colors for routers
-        nx.draw_networkx_nodes(network_graph, pos, 
-                              node_size=1000, 
-                              node_color="skyblue")
-        
-        # Draw edges
-        nx.draw_networkx_edges(network_graph, pos, width=2)
-        
-        # Create clear labels for nodes
-        labels = {}
-        for node in network_graph.nodes():
-            labels[node] = node
-        nx.draw_networkx_labels(network_graph, pos, labels, font_size=12, font_weight='bold')
-        
-        # Add subnet information on edges
-        edge_labels = {}
-        for u, v, data in network_graph.edges(data=True):
-            if 'subnet' in data:
-                edge_labels[(u, v)] = data['subnet']
-        nx.draw_networkx_edge_labels(network_graph, pos, edge_labels=edge_labels)
-        
-        plt.title("Network Topology")
-        plt.axis('off')  # Turn off axis
-        
-        # Save to bytes buffer
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150)
-        plt.close()
-        
-        # Return the image
-        buf.seek(0)
-        return Response(content=buf.getvalue(), media_type="image/png")
+        snapshot = topology
+        graph = snapshot.graph
+        signature = (tuple(graph.nodes), tuple((u, v, data.get('subnet')) for u, v, data in graph.edges(data=True)))
+        return await run_in_threadpool(cached_response, request, "graph", snapshot.version,
+                                       lambda: render_graph_png(graph), "image/png", signature)
     
     except Exception as e:
         logger.error(f"Error generating graph image: {str(e)}")
         # Return error message as plain text
         return Response(content=f"Error generating graph: {str(e)}", media_type="text/plain")
 
-def generate_graph_snapshots():
-    """Thread function to generate graph snapshots every 4 seconds"""
-    # Ensure snapshots directory exists
-    os.makedirs(GRAPH_SNAPSHOTS_DIR, exist_ok=True)
-    logger.info(f"Starting graph snapshot thread - saving to {GRAPH_SNAPSHOTS_DIR}")
-    
-    snapshot_count = 0
-    
-    while True:
-        try:
-            # Generate timestamp for filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            snapshot_count += 1
-            filename = f"network_graph_{timestamp}_{snapshot_count:04d}.png"
-            filepath = os.path.join(GRAPH_SNAPSHOTS_DIR, filename)
-            
-            # Create figure
-            plt.figure(figsize=(12, 10))
-            
-            # Use the stored node positions for consistent layout
-            global node_positions
-            if not node_positions or set(node_positions.keys()) != set(network_graph.nodes):
-                node_positions = nx.spring_layout(network_graph, seed=42)
-            
-            # Get router1's path to router10 from flow table
-            path_to_highlight = []
-            try:
-                file_path = os.path.join(ROUTER_TABLES_DIR, f"router1_table.json")
-                with open(file_path, "r") as file:
-                    router_data = json.load(file)
-                    # Find flow entry for router10
-                    for entry in router_data.get('flow_table', []):
-                        match_info = entry.get('match', {})
-                        if match_info.get('destination') == 'router10':
-                            path_to_highlight = entry.get('path', [])
-                            break
-            except Exception as e:
-                logger.error(f"Error reading router1 flow table: {e}")
-            
-            # Create edge lists for normal and highlighted paths
-            regular_edges = []
-            highlighted_edges = []
-            
-            for u, v, data in network_graph.edges(data=True):
-                # Check if this edge is in the path
-                edge_in_path = False
-                if path_to_highlight:
-                    for i in range(len(path_to_highlight) - 1):
-                        if (u == path_to_highlight[i] and v == path_to_highlight[i+1]) or \
-                          (v == path_to_highlight[i] and u == path_to_highlight[i+1]):
-                            edge_in_path = True
-                            break
-                
-                if edge_in_path:
-                    highlighted_edges.append((u, v))
-                else:
-                    regular_edges.append((u, v))
-            
-            # Draw nodes
-            nx.draw_networkx_nodes(network_graph, node_positions, 
-                                  node_size=1000, 
-                                  node_color="skyblue")
-            
-            # Draw regular edges
-            nx.draw_networkx_edges(network_graph, node_positions, 
-                                  edgelist=regular_edges,
-                                  width=2,
-                                  edge_color='gray',
-                                  alpha=0.7)
-            
-            # Draw highlighted edges
-            if highlighted_edges:
-                nx.draw_networkx_edges(network_graph, node_positions, 
-                                      edgelist=highlighted_edges,
-                                      width=4,
-                                      edge_color='red',
-                                      alpha=1.0)
-            
-            # Create clear labels for nodes
-            labels = {}
-            for node in network_graph.nodes():
-                labels[node] = node
-            nx.draw_networkx_labels(network_graph, node_positions, labels, font_size=12, font_weight='bold')
-            
-            # Add weight information on all edges
-            edge_labels = {}
-            for u, v, data in network_graph.edges(data=True):
-                weight = data.get('weight', 1.0)
-                edge_labels[(u, v)] = f"{weight:.1f}"  # Format to 1 decimal place
-                
-            nx.draw_networkx_edge_labels(network_graph, node_positions, 
-                                        edge_labels=edge_labels, 
-                                        font_size=10,
-                                        font_color='black')
-            
-            # Add title with timestamp
-            plt.title(f"Network Topology - {timestamp}")
-            
-            # Add legend as text in the corner
-            legend_text = "Red edges: Path from router1 to router10"
-            plt.figtext(0.02, 0.02, legend_text, fontsize=10, 
-                       bbox=dict(facecolor='white', alpha=0.8, boxstyle='round'))
-            
-            plt.axis('off')  # Turn off axis
-            
-            # Save to file
-            plt.savefig(filepath, format='png', dpi=150)
-            plt.close()
-            
-            logger.info(f"Saved graph snapshot to {filepath}")
-            
-            # If we have too many snapshots, we could implement cleanup here
-            
-        except Exception as e:
-            logger.error(f"Error generating graph snapshot: {e}")
-        
-        # Sleep for 4 seconds
-        time.sleep(4)
 @app.on_event("startup")
 async def startup_event():
     """Parse the docker-compose.yml on startup"""
@@ -520,74 +698,385 @@ async def startup_event():
     # Ensure the snapshots directory exists
     os.makedirs(GRAPH_SNAPSHOTS_DIR, exist_ok=True)
     
+    # Snapshots are rendered off the controller's process, only when the graph changes
+    snapshot_renderer.start()
+    logger.info(f"Started graph snapshot renderer - saving to {GRAPH_SNAPSHOTS_DIR}")
+    
     # Parse docker-compose and build the network graph
     logger.info("Beginning docker-compose parsing")
     parse_docker_compose()
 
-    source_router = os.environ.get('SOURCE_ROUTER')
-    destination_router = os.environ.get('DESTINATION_ROUTER')
-    logger.info(f"Setting up priority path from {source_router} to {destination_router}")
-    
+    # Accept router channels; tables are pushed to routers as they change
+    channel_port = int(os.environ.get('CONTROL_CHANNEL_PORT', CONTROL_CHANNEL_PORT))
+    await router_hub.start("0.0.0.0", channel_port, apply_link_metrics)
 
-    # Start graph snapshot thread
-    try:
-        snapshot_thread = threading.Thread(target=generate_graph_snapshots, daemon=True)
-        snapshot_thread.start()
-        logger.info("Started graph snapshot thread")
-    except Exception as e:
-        logger.error(f"Error starting graph snapshot thread: {e}")
+    # Long-polls on the graph and tables are woken on this loop
+    response_cache.attach(asyncio.get_running_loop())
 
-@app.post("/sdn_controller/update_link_metrics/{router_id}")
-def update_link_metrics(router_id: str, metrics: Dict[str, float]):
+    # Recompute flow tables in the background as link weights are reported
+    recompute_scheduler.start(apply_link_weights)
+
+    logger.info(f"Priority path from {priority_path.source} to {priority_path.destination}: {priority_path.path}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Disconnect the routers' channels and stop recomputing and rendering"""
+    recompute_scheduler.stop()
+    snapshot_renderer.stop()
+    await router_hub.stop()
+
+def apply_link_metrics(router_id, metrics):
     """
-    Update link weights based on router metrics
+    Queue the link weights from one router's report for the next flow table recompute
     
     router_id: The ID of the router reporting metrics
-    metrics: Dictionary with keys as neighbor router IDs and values as metric weights
+    metrics: Dictionary with keys as neighbor router IDs and values as either a metric weight
+             or the router's probe measurements of that link (LinkMeasurement or its dict)
+    Returns the recompute version whose flow tables will include the new weights (see
+    recompute_scheduler.py), not a topology version.
     """
-    try:
-        logger.info(f"Received metrics from {router_id}: {metrics}")
-        
-        # Validate router exists
-        if router_id not in network_graph.nodes:
-            raise HTTPException(status_code=404, detail=f"Router {router_id} not found")
-        
-        # Update weights for each reported link
-        for neighbor_id, metric in metrics.items():
-            if neighbor_id not in network_graph.nodes:
-                logger.warning(f"Neighbor {neighbor_id} does not exist in network graph")
-                continue
-                
-            if not network_graph.has_edge(router_id, neighbor_id):
-                logger.warning(f"No direct link between {router_id} and {neighbor_id}")
-                continue
-                
-            # Update the edge weight
-            current_weight = network_graph[router_id][neighbor_id].get('weight', 1.0)
+    graph = topology.graph
+    
+    # Validate router exists
+    if router_id not in graph.nodes:
+        raise KeyError(f"Router {router_id} not found")
+    
+    weights = {}
+    
+    # Work out the new weight of each reported link
+    for neighbor_id, metric in metrics.items():
+        if neighbor_id not in graph.nodes:
+            logger.warning(f"Neighbor {neighbor_id} does not exist in network graph")
+            continue
             
-            # You could use different strategies here:
-            # 1. Replace the weight: network_graph[router_id][neighbor_id]['weight'] = metric
-            # 2. Add to the weight: network_graph[router_id][neighbor_id]['weight'] = current_weight + metric
-            # 3. Use weighted average: network_graph[router_id][neighbor_id]['weight'] = 0.7*current_weight + 0.3*metric
+        if not graph.has_edge(router_id, neighbor_id):
+            logger.warning(f"No direct link between {router_id} and {neighbor_id}")
+            continue
             
-            # For now, we'll use option 2: add to the weight
-            # network_graph[router_id][neighbor_id]['weight'] = current_weight + metric
-            network_graph[router_id][neighbor_id]['weight'] = metric
-            logger.info(f"Updated link {router_id}-{neighbor_id} weight to {network_graph[router_id][neighbor_id]['weight']}")
+        # You could use different strategies here:
+        # 1. Replace the weight: network_graph[router_id][neighbor_id]['weight'] = metric
+        # 2. Add to the weight: network_graph[router_id][neighbor_id]['weight'] = current_weight + metric
+        # 3. Use weighted average: network_graph[router_id][neighbor_id]['weight'] = 0.7*current_weight + 0.3*metric
+        if isinstance(metric, dict):
+            metric = LinkMeasurement(**metric)  # Reported over the router channel
+        link = tuple(sorted((router_id, neighbor_id)))  # Both ends report the same link
+        if isinstance(metric, LinkMeasurement):
+            # Both ends probe the link; weigh it by the average of what they measured
+            with measurements_lock:
+                reports = link_measurements.setdefault(link, {})
+                reports[router_id] = metric.dict()
+                link_weights = [measured_link_weight(LinkMeasurement(**m)) for m in reports.values()]
+            weights[link] = sum(link_weights) / len(link_weights)
+        else:
+            weights[link] = float(metric)
+    
+    return recompute_scheduler.submit(weights)
+
+def apply_link_weights(weights):
+    """Publish a topology with a batch of new link weights and recompute the flow tables they affect
+    
+    Runs on the scheduler's worker. The reported weights are smoothed and damped first (see
+    route_stability.py). Links gone since they were reported, with a topology rebuild, are skipped,
+    and a batch that changes nothing publishes nothing.
+    """
+    global topology
+    with topology_lock:
+        graph = topology.graph
+        weights = route_stability.filter(
+            weights, lambda link: graph[link[0]][link[1]].get('weight', 1.0) if graph.has_edge(*link) else None)
         
-        # Recalculate flow tables with updated weights
-        calculate_flow_tables()
+        # Next version, copy-on-write, and the weight of every changed link before this batch
+        new_topology, changed_links = topology.with_weights(weights)
+        if not changed_links:
+            return
+        topology = new_topology
+        for u, v in changed_links:
+            logger.info(f"Updated link {u}-{v} weight to {weights[(u, v)]:.3f}")
         
+        # Recalculate flow tables with updated weights
+        calculate_flow_tables(changed_links)
+        graph_changed()
+
+@app.post("/sdn_controller/update_link_metrics/{router_id}")
+def update_link_metrics(router_id: str, metrics: Dict[str, Union[float, LinkMeasurement]]):
+    """
+    Update link weights based on router metrics
+    
+    Returns at once with the recompute version whose flow tables will include them; they are
+    recomputed in the background, and /sdn_controller/recompute's applied_version reaches it then.
+    Routers connected over the router channel report there instead; see apply_link_metrics
+    """
+    if router_id not in topology.graph.nodes:
+        raise HTTPException(status_code=404, detail=f"Router {router_id} not found")
+    try:
+        logger.info(f"Received metrics from {router_id}: {metrics}")
+        version = apply_link_metrics(router_id, metrics)
         return {
             "status": "success", 
             "message": f"Updated metrics for {router_id}",
-            "updated_links": len(metrics)
+            "updated_links": len(metrics),
+            "recompute_version": version
         }
         
     except Exception as e:
         logger.error(f"Error updating metrics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def apply_topology_change(new_topology, structure, routers=()):
+    """Publish a version with routers or links added or removed and recompute only the tables it reaches
+    
+    structure names the routers and links added and removed, as ShortestPathTrees.update takes them
+    (removed routers' links among the removed links); routers are those whose attributes changed
+    besides. The trees are repaired as after a weight change, so a link failure costs work in
+    proportion to the trees that used the link, not a rebuild. Returns the new topology version.
+    """
+    global topology
+    with topology_lock:
+        topology = new_topology
+        graph = topology.graph
+        removed_links = [tuple(sorted(link)) for link in structure.get('removed_links', ())]
+        with measurements_lock:
+            for link in removed_links:
+                link_measurements.pop(link, None)
+        route_stability.forget(removed_links)
+        for router_id in structure.get('removed_routers', ()):
+            router_tables.pop(router_id, None)
+        if hop_trees is None or spf_trees is None:
+            generate_routing_tables()
+            calculate_flow_tables()
+            graph_changed()
+            return topology.version
+        
+        # Routes of the trees the change reaches, and interfaces of the routers it touches
+        changed = hop_trees.update({}, graph, **structure)
+        ends = [router for link in (*structure.get('removed_links', ()), *structure.get('added_links', ()))
+                for router in link]
+        tables = {}
+        for router_id in dict.fromkeys([*routers, *structure.get('added_routers', ()), *ends, *changed]):
+            if router_id not in graph:
+                continue
+            router_data = router_tables.get(router_id) or {"router_id": router_id, "interfaces": {}, "flow_table": [],
+                                                           "priority_flows": [], "routes": [], "ports": {}}
+            tables[router_id] = dict(router_data,
+                                     interfaces=router_interfaces(graph, router_id),
+                                     routes=route_table(router_id, router_data['routes'], changed.get(router_id, ())),
+                                     ports=graph.nodes[router_id].get('ports', {}))
+        logger.info(f"Repaired {len(changed)} of {len(graph)} fewest-hops trees after a topology change")
+        
+        calculate_flow_tables({}, structure, tables)
+        graph_changed()
+        return topology.version
+
+def link_ends(u, v):
+    """A link's routers in docker-compose.yml order, router2 before router10"""
+    return tuple(sorted((u, v), key=lambda router: (len(router), router)))
+
+def link_network(u, v):
+    """Name of the network of a new link between two routers, link-1-2 for router1 and router2"""
+    first, second = link_ends(u, v)
+    if first.startswith('router') and second.startswith('router'):
+        first, second = first[len('router'):], second[len('router'):]
+    return f"link-{first}-{second}"
+
+def with_addresses(graph, router_id, network, ip_address=None):
+    """router_id's attributes with its address on network set, or dropped when ip_address is None"""
+    ip_addresses = {name: ip for name, ip in graph.nodes[router_id].get('ip_addresses', {}).items() if name != network}
+    if ip_address is not None:
+        ip_addresses[network] = ip_address
+    return dict(graph.nodes[router_id], ip_addresses=ip_addresses)
+
+def add_link(u, v, spec):
+    """Add a link between two routers"""
+    with topology_lock:
+        graph = topology.graph
+        for router_id in (u, v):
+            if router_id not in graph:
+                raise KeyError(f"Router {router_id} not found")
+        if u == v or graph.has_edge(u, v) or tuple(sorted((u, v))) in down_links:
+            raise ValueError(f"Link {u}-{v} already exists")
+        network = spec.network or link_network(u, v)
+        first, second = link_ends(u, v)
+        attributes = {
+            "subnet": spec.subnet,
+            "network": network,
+            "router1_ip": spec.ip_addresses.get(first),
+            "router2_ip": spec.ip_addresses.get(second),
+            "weight": spec.weight,
+        }
+        routers = {router_id: with_addresses(graph, router_id, network, spec.ip_addresses.get(router_id))
+                   for router_id in (u, v)}
+        logger.info(f"Adding link between {u} and {v} on network {network}")
+        return apply_topology_change(topology.restructured(routers=routers, links={(u, v): attributes}),
+                                     {"added_links": [(u, v)]}, routers)
+
+def remove_link(u, v):
+    """Remove a link for good, whether it is up or down"""
+    with topology_lock:
+        graph = topology.graph
+        if not graph.has_edge(u, v):
+            if down_links.pop(tuple(sorted((u, v))), None) is None:
+                raise KeyError(f"No link between {u} and {v}")
+            return topology.version
+        network = graph[u][v].get('network')
+        routers = {router_id: with_addresses(graph, router_id, network) for router_id in (u, v)}
+        logger.info(f"Removing link between {u} and {v}")
+        return apply_topology_change(topology.restructured(routers=routers, removed_links=[(u, v)]),
+                                     {"removed_links": [(u, v)]}, routers)
+
+def link_down(u, v):
+    """Take a link out of the topology, keeping it to bring back up"""
+    with topology_lock:
+        graph = topology.graph
+        if not graph.has_edge(u, v):
+            raise KeyError(f"No link between {u} and {v} is up")
+        down_links[tuple(sorted((u, v)))] = dict(graph[u][v])
+        logger.info(f"Link between {u} and {v} is down")
+        return apply_topology_change(topology.restructured(removed_links=[(u, v)]), {"removed_links": [(u, v)]})
+
+def link_up(u, v):
+    """Bring a link that was taken down back"""
+    with topology_lock:
+        link = tuple(sorted((u, v)))
+        if link not in down_links:
+            raise KeyError(f"No link between {u} and {v} is down")
+        if not all(router_id in topology.graph for router_id in link):
+            raise ValueError(f"A router of link {u}-{v} is down or gone")
+        attributes = down_links.pop(link)
+        logger.info(f"Link between {u} and {v} is up")
+        return apply_topology_change(topology.restructured(links={link: attributes}), {"added_links": [link]})
+
+def check_router_id(router_id):
+    """Raise ValueError unless router_id is a routerN name the routers' frames can carry (N fits a u16)"""
+    match = ROUTER_ID.fullmatch(router_id)
+    if match is None or int(match.group(1)) > MAX_ROUTER_NUMBER:
+        raise ValueError(f"Router ids are routerN with N up to {MAX_ROUTER_NUMBER}, not {router_id}")
+
+def forget_router(router_id):
+    """Delete a removed router's table file and its channel state"""
+    table_store.remove(router_id)
+    router_hub.forget(router_id)
+    response_cache.changed(f"table/{router_id}")
+
+def add_router(router_id, spec):
+    """Add a router without links; links are added on their own"""
+    check_router_id(router_id)
+    with topology_lock:
+        if router_id in topology.graph or router_id in down_routers:
+            raise ValueError(f"Router {router_id} already exists")
+        routers = {router_id: {"ip_addresses": {}, "ports": dict(spec.ports)}}
+        logger.info(f"Adding router {router_id}")
+        return apply_topology_change(topology.restructured(routers=routers), {"added_routers": [router_id]})
+
+def remove_router(router_id):
+    """Remove a router and its links for good, whether it is up or down"""
+    with topology_lock:
+        for link in [link for link in down_links if router_id in link]:
+            del down_links[link]
+        graph = topology.graph
+        if router_id not in graph:
+            if down_routers.pop(router_id, None) is None:
+                raise KeyError(f"Router {router_id} not found")
+            forget_router(router_id)
+            return topology.version
+        links = list(graph.edges(router_id))
+        routers = {neighbor: with_addresses(graph, neighbor, graph[router_id][neighbor].get('network'))
+                   for neighbor in graph[router_id]}
+        logger.info(f"Removing router {router_id} and its {len(links)} links")
+        version = apply_topology_change(topology.restructured(routers=routers, removed_routers=[router_id]),
+                                        {"removed_routers": [router_id], "removed_links": links}, routers)
+        forget_router(router_id)
+        return version
+
+def router_down(router_id):
+    """Take a router and its links out of the topology, keeping them to bring back up"""
+    with topology_lock:
+        graph = topology.graph
+        if router_id not in graph:
+            raise KeyError(f"Router {router_id} is not up")
+        links = list(graph.edges(router_id))
+        down_routers[router_id] = (dict(graph.nodes[router_id]),
+                                   {neighbor: dict(graph[router_id][neighbor]) for neighbor in graph[router_id]})
+        logger.info(f"Router {router_id} is down")
+        return apply_topology_change(topology.restructured(removed_routers=[router_id]),
+                                     {"removed_routers": [router_id], "removed_links": links})
+
+def router_up(router_id):
+    """Bring a router that was taken down back, with its links to the routers that are up"""
+    with topology_lock:
+        if router_id not in down_routers:
+            raise KeyError(f"Router {router_id} is not down")
+        attributes, neighbors = down_routers.pop(router_id)
+        links = {(router_id, neighbor): link_attributes for neighbor, link_attributes in neighbors.items()
+                 if neighbor in topology.graph}
+        logger.info(f"Router {router_id} is up with {len(links)} links")
+        return apply_topology_change(topology.restructured(routers={router_id: attributes}, links=links),
+                                     {"added_routers": [router_id], "added_links": list(links)})
+
+class LinkSpec(BaseModel):
+    """A link to add: its network (link-A-B by default), subnet, each router's address on it and its weight"""
+    network: Optional[str] = None
+    subnet: Optional[str] = None
+    ip_addresses: Dict[str, str] = {}
+    weight: float = 1.0
+
+class RouterSpec(BaseModel):
+    """A router to add: its port mappings, container port to host port"""
+    ports: Dict[str, str] = {}
+
+def topology_change(change, *args):
+    """Response of a structural change: the topology version whose tables include it"""
+    try:
+        version = change(*args)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "success", "topology_version": version}
+
+@app.post("/sdn_controller/links/{u}/{v}")
+def post_link(u: str, v: str, spec: Optional[LinkSpec] = None):
+    """Add a link between two routers; only the tables it reaches are recomputed"""
+    return topology_change(add_link, u, v, spec or LinkSpec())
+
+@app.delete("/sdn_controller/links/{u}/{v}")
+def delete_link(u: str, v: str):
+    """Remove a link"""
+    return topology_change(remove_link, u, v)
+
+@app.post("/sdn_controller/links/{u}/{v}/down")
+def post_link_down(u: str, v: str):
+    """Take a link down, e.g. on a failure, until it is brought up again"""
+    return topology_change(link_down, u, v)
+
+@app.post("/sdn_controller/links/{u}/{v}/up")
+def post_link_up(u: str, v: str):
+    """Bring a link back up"""
+    return topology_change(link_up, u, v)
+
+@app.post("/sdn_controller/routers/{router_id}")
+def post_router(router_id: str, spec: Optional[RouterSpec] = None):
+    """Add a router; add its links with /links"""
+    try:
+        check_router_id(router_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return topology_change(add_router, router_id, spec or RouterSpec())
+
+@app.delete("/sdn_controller/routers/{router_id}")
+def delete_router(router_id: str):
+    """Remove a router and its links"""
+    return topology_change(remove_router, router_id)
+
+@app.post("/sdn_controller/routers/{router_id}/down")
+def post_router_down(router_id: str):
+    """Take a router and its links down until it is brought up again"""
+    return topology_change(router_down, router_id)
+
+@app.post("/sdn_controller/routers/{router_id}/up")
+def post_router_up(router_id: str):
+    """Bring a router back up with its links"""
+    return topology_change(router_up, router_id)
+
 if __name__ == "__main__":
     logger.info("Starting SDN Controller server")
     
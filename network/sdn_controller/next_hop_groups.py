@@ -0,0 +1,59 @@
+# next_hop_groups.py
+"""Weighted next-hop groups (ECMP and bounded-stretch multipath) for the flow tables.
+
+A flow entry used to name one next hop, so all traffic from a router to a
+destination followed one chain of links however many equally good ones
+there were. Neighbor N of source S can carry traffic towards destination D
+without any risk of a loop when it is downstream, strictly closer to D
+than S is:
+
+    dist(N, D) < dist(S, D)
+
+Every hop then brings traffic closer to D, whichever member each router
+picks. Among its downstream neighbors, S groups those whose way to D costs
+at most (1 + stretch) times its shortest one:
+
+    weight(S, N) + dist(N, D) <= (1 + stretch) * dist(S, D)
+
+With stretch 0 that is exactly the set of next hops on equal-cost shortest
+paths (ECMP). The group is computed per hop from the all-pairs distances
+the controller already keeps, instead of enumerating k paths per pair;
+following groups hop by hop still reaches every such path.
+
+Members carry integer weights, GROUP_WEIGHT for a shortest path and
+proportionally less for longer ones. Routers hash each flow to one member,
+so a flow's frames stay on one path and in order while different flows
+spread over the group.
+"""
+
+GROUP_WEIGHT = 10
+
+# Relative slack on cost comparisons, so float sums that should tie do
+TOLERANCE = 1e-9
+
+
+def next_hop_group(graph, distances, source, destination, primary, max_paths=4, stretch=0.0, weight='weight'):
+    """Members of source's group towards destination, as [{"next_hop", "weight", "metric"}], or None
+
+    primary (the next hop on source's shortest-path tree) comes first, then
+    the other members by cost. None when fewer than two neighbors qualify.
+    """
+    to_destination = distances[source].get(destination)
+    if max_paths < 2 or not to_destination:
+        return None
+    bound = (1 + stretch) * to_destination * (1 + TOLERANCE)
+    members = []
+    for neighbor in graph.neighbors(source):
+        neighbor_distance = distances[neighbor].get(destination)
+        if neighbor_distance is None or not neighbor_distance < to_destination:
+            continue
+        metric = graph[source][neighbor].get(weight, 1.0) + neighbor_distance
+        if metric <= bound:
+            members.append((neighbor != primary, metric, neighbor))
+    if len(members) < 2:
+        return None
+    members.sort()
+    return [{"next_hop": neighbor,
+             "weight": max(1, round(GROUP_WEIGHT * to_destination / metric)),
+             "metric": float(metric)}
+            for _, metric, neighbor in members[:max_paths]]
@@ -0,0 +1,220 @@
+# priority_path.py
+"""Pinned, latency-optimized path for the exchange traffic class.
+
+Exchange orders between SOURCE_ROUTER and DESTINATION_ROUTER used to share
+the flow tables with every other packet, so they took whatever path the
+weights of all traffic made shortest, and a burst of background traffic on
+it delayed them too. The exchange pair now gets a path of its own:
+
+  • links are measured by latency alone: half the round trip the routers
+    probe, plus jitter, averaged over both ends; links without
+    measurements count their weight;
+  • a link losing more than max_loss of its probes is not admissible at
+    all, however fast it is;
+  • the path is the lowest-latency one over admissible links with at most
+    max_hops links (a hop-bounded Bellman-Ford; plain Dijkstra without a
+    bound).
+
+The path is pinned: a later, faster path replaces it only when it is
+switch_gain faster and the path has been in place for hold_down seconds,
+or at once when a link of the pinned path fails the constraints. Latency
+measurements jitter, and every switch could reorder the orders in flight;
+re-evaluations that found a better path but kept the pinned one are
+counted as suppressed.
+
+The pin is opt-in (enabled): a pinned path is one chain of links, so while
+it is on, exchange frames between the pair no longer spread over next-hop
+groups; the groups only carry the rest of the traffic. Disabled, nothing is
+pinned and exchange traffic follows the flow tables like everything else.
+
+Every router on the path gets a "priority_flows" entry for each direction,
+matching the destination and the "exchange" traffic class, with PRIORITY
+above the shortest-path flow entries. Their metrics are the latencies
+measured when the path was pinned, so a table only changes when the path
+does, not with every probe report. Background traffic avoids the
+reserved links: the flow tables are computed on a graph in which their
+weights are multiplied by avoidance, so it only shares them where the way
+around costs more than that.
+"""
+import time
+
+import networkx as nx
+
+EXCHANGE = 'exchange'  # traffic class of exchange data and response frames
+PRIORITY = 200         # above the shortest-path flow entries (100)
+
+INFINITY = float('inf')
+
+
+def link_key(u, v):
+    return tuple(sorted((u, v)))
+
+
+def link_latency(reports, weight):
+    """(one-way latency in ms, loss) of a link from its ends' probe reports; (weight, 0) without any"""
+    if not reports:
+        return weight, 0.0
+    latency = sum(r['rtt_ms'] / 2 + r.get('jitter_ms', 0.0) for r in reports.values()) / len(reports)
+    return latency, max(r.get('loss', 0.0) for r in reports.values())
+
+
+def constrained_shortest_path(graph, source, destination, latency, max_hops=None):
+    """(path, latency) of the lowest-latency path using at most max_hops links, or (None, inf)
+
+    latency(u, v) is a link's latency, or None when the link must not be used.
+    """
+    if source not in graph or destination not in graph:
+        return None, INFINITY
+    if source == destination:
+        return [source], 0.0
+    if max_hops is None:
+        try:
+            cost, path = nx.single_source_dijkstra(graph, source, destination,
+                                                   weight=lambda u, v, _: latency(u, v))
+        except nx.NetworkXNoPath:
+            return None, INFINITY
+        return path, cost
+
+    # best[node] is the latency of the best path of at most k links, layer by layer
+    best, parents = {source: 0.0}, [{}]
+    for _ in range(max_hops):
+        improved, layer = dict(best), {}
+        for node, cost in best.items():
+            for neighbor in graph[node]:
+                link = latency(node, neighbor)
+                if link is None:
+                    continue
+                if cost + link < improved.get(neighbor, INFINITY):
+                    improved[neighbor] = cost + link
+                    layer[neighbor] = node
+        if not layer:
+            break
+        best = improved
+        parents.append(layer)
+    if destination not in best:
+        return None, INFINITY
+
+    # Walk back through the layers: a node's parent was set in the last layer that improved it
+    path, node, k = [destination], destination, len(parents) - 1
+    while node != source:
+        while node not in parents[k]:
+            k -= 1
+        node = parents[k][node]
+        path.append(node)
+        k -= 1
+    path.reverse()
+    return path, best[destination]
+
+
+class PriorityPath:
+    """The exchange pair's pinned path, and the flow entries and background weights that follow from it"""
+
+    def __init__(self, source, destination, max_hops=None, max_loss=0.05, switch_gain=0.2, avoidance=4.0,
+                 hold_down=60.0, clock=time.monotonic, enabled=True):
+        self.enabled = enabled
+        self.source = source
+        self.destination = destination
+        self.max_hops = max_hops
+        self.max_loss = max_loss
+        self.switch_gain = switch_gain
+        self.avoidance = avoidance
+        self.hold_down = hold_down
+        self.clock = clock
+        self.path = None
+        self.latency = INFINITY
+        self.hops = {}  # link -> its latency when the path was pinned, the entries' metrics
+        self.pinned_at = -INFINITY
+        self.switches = 0
+        self.suppressed = 0  # re-evaluations that kept the pinned path over a faster one
+
+    def reset(self):
+        """Forget the pinned path, e.g. for a new network"""
+        self.path, self.latency, self.hops, self.pinned_at = None, INFINITY, {}, -INFINITY
+
+    def latencies(self, graph, measurements):
+        """latency(u, v) over graph's links; None for a link that loses too much"""
+        def latency(u, v):
+            value, loss = link_latency(measurements.get(link_key(u, v)), graph[u][v].get('weight', 1.0))
+            return value if loss <= self.max_loss else None
+        return latency
+
+    def path_latency(self, graph, path, latency):
+        """Latency of path on graph, or None if it no longer meets the constraints"""
+        if self.max_hops is not None and len(path) - 1 > self.max_hops:
+            return None
+        total = 0.0
+        for u, v in zip(path, path[1:]):
+            link = latency(u, v) if graph.has_edge(u, v) else None
+            if link is None:
+                return None
+            total += link
+        return total
+
+    def update(self, graph, measurements):
+        """Re-evaluate the path on graph with measurements {link: {router: report}}; True if it changed"""
+        if not self.enabled:
+            return False
+        latency = self.latencies(graph, measurements)
+        path, cost = constrained_shortest_path(graph, self.source, self.destination, latency, self.max_hops)
+        if self.path is not None:
+            pinned = self.path_latency(graph, self.path, latency)
+            if pinned is not None:
+                self.latency = pinned
+                if path is None or path == self.path or cost >= pinned:
+                    return False
+                if cost * (1 + self.switch_gain) >= pinned or self.clock() - self.pinned_at < self.hold_down:
+                    self.suppressed += 1
+                    return False
+        changed = path != self.path
+        if changed:
+            self.pinned_at = self.clock()
+            if self.path is not None and path is not None:
+                self.switches += 1
+        self.path, self.latency = path, cost
+        self.hops = {link_key(u, v): latency(u, v) for u, v in zip(path, path[1:])} if path else {}
+        return changed
+
+    def reserved(self):
+        """Links of the pinned path"""
+        path = self.path or []
+        return {link_key(u, v) for u, v in zip(path, path[1:])}
+
+    def background_weights(self, graph):
+        """{link: weight} background traffic sees on the reserved links"""
+        return {(u, v): graph[u][v].get('weight', 1.0) * self.avoidance
+                for u, v in self.reserved() if graph.has_edge(u, v)}
+
+    def flow_entries(self, router_id):
+        """router_id's priority flow entries, towards each end of the path it is on"""
+        if not self.path or router_id not in self.path or len(self.path) < 2:
+            return []
+        entries = []
+        for path in (self.path, self.path[::-1]):
+            position = path.index(router_id)
+            if position == len(path) - 1:
+                continue
+            rest = path[position:]
+            entries.append({
+                "match": {"destination": path[-1], "traffic_class": EXCHANGE},
+                "action": {"forward_to": rest[1]},
+                "priority": PRIORITY,
+                "path": rest,
+                "metric": sum(self.hops[link_key(u, v)] for u, v in zip(rest, rest[1:])),
+            })
+        return entries
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "source": self.source,
+            "destination": self.destination,
+            "path": self.path,
+            "latency_ms": self.latency if self.path else None,
+            "max_hops": self.max_hops,
+            "max_loss": self.max_loss,
+            "switch_gain": self.switch_gain,
+            "avoidance": self.avoidance,
+            "hold_down_s": self.hold_down,
+            "switches": self.switches,
+            "suppressed": self.suppressed,
+        }
@@ -0,0 +1,130 @@
+# recompute_scheduler.py
+"""Coalesced background recomputation of the flow tables.
+
+Metrics reports used to recompute the flow tables inside the request that
+carried them, so a burst of reports queued up recomputations and slowed
+every response. Now a report only records the link weights it implies and
+gets back the recompute version that will include them. One worker thread
+waits a short debounce window after the first pending update, so that the
+rest of a burst lands in the same batch, then applies every pending weight
+and recomputes once.
+
+Recompute versions count accepted updates. They are the scheduler's own:
+the topology's version only moves when a batch actually publishes new
+weights, and structural changes move it too. A batch covers every version
+submitted before it started; applied_version is the newest one whose
+tables are saved, and wait() blocks until a given version is.
+"""
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RATE_WINDOW = 60.0  # seconds over which recomputes per second are averaged
+
+
+class RecomputeScheduler:
+    """Queues link weight updates and hands them to apply(weights) in batches on a worker thread"""
+
+    def __init__(self, debounce=0.25):
+        self.debounce = debounce
+        self.apply = None
+        self.condition = threading.Condition()
+        self.running = False
+        self.pending = {}           # (u, v) -> newest weight not applied yet
+        self.queued = 0             # updates behind those weights (the queue depth)
+        self.dirty_since = None     # monotonic time of the oldest of them
+        self.version = 0            # recompute version of the newest accepted update
+        self.applied_version = 0    # newest version whose flow tables are saved
+        self.recomputing = None     # version the running batch brings the tables to
+        self.recomputes = 0
+        self.coalesced = 0          # updates that shared a batch with an earlier one
+        self.errors = 0
+        self.last_duration = None
+        self.finished = collections.deque()  # monotonic times of recent recomputes
+
+    def start(self, apply):
+        """Run apply({(u, v): weight}) on a worker thread for each batch of updates"""
+        self.apply = apply
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def submit(self, weights):
+        """Queue new link weights; returns the recompute version whose tables will include them"""
+        with self.condition:
+            if not weights:
+                return self.version
+            if not self.pending:
+                self.dirty_since = time.monotonic()
+            self.pending.update(weights)
+            self.queued += 1
+            self.version += 1
+            self.condition.notify_all()
+            return self.version
+
+    def wait(self, version, timeout=None):
+        """Block until the tables include version; False if timeout ran out first"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.applied_version >= version, timeout)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or not self.running)
+                if not self.running:
+                    return
+                delay = self.dirty_since + self.debounce - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)  # Updates arriving meanwhile join this batch
+
+            with self.condition:
+                weights, self.pending = self.pending, {}
+                version, self.recomputing = self.version, self.version
+                self.coalesced += self.queued - 1
+                self.queued, self.dirty_since = 0, None
+
+            start = time.monotonic()
+            try:
+                self.apply(weights)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error recomputing flow tables for version {version}: {e}")
+            finished = time.monotonic()
+
+            with self.condition:
+                self.applied_version, self.recomputing = version, None
+                self.recomputes += 1
+                self.last_duration = finished - start
+                self.finished.append(finished)
+                self.trim(finished)
+                self.condition.notify_all()
+
+    def trim(self, now):
+        """Forget recomputes older than the rate window"""
+        while self.finished and now - self.finished[0] > RATE_WINDOW:
+            self.finished.popleft()
+
+    def status(self):
+        with self.condition:
+            self.trim(time.monotonic())
+            return {
+                "version": self.version,
+                "applied_version": self.applied_version,
+                "recomputing": self.recomputing,
+                "queue_depth": self.queued,
+                "pending_links": len(self.pending),
+                "recomputes": self.recomputes,
+                "recomputes_per_s": len(self.finished) / RATE_WINDOW,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "last_recompute_ms": 1000 * self.last_duration if self.last_duration is not None else None,
+                "debounce_ms": 1000 * self.debounce,
+            }
@@ -0,0 +1,96 @@
+# response_cache.py
+"""Encoded API responses cached per version, with ETags and long-polls.
+
+The controller's read endpoints serve things that only change with a
+version: the graph image with the graph version, a router's table with its
+generation. Each response body is built once per version and kept; its
+ETag names the controller epoch, the key and the version it was built at,
+so a client that sends it back in If-None-Match gets a 304 without a body.
+A key may also carry a signature of what the body is actually drawn from;
+when the version moves but the signature does not, the cached body (and
+its ETag) stay valid.
+
+?wait_for_version=N turns a request into a long-poll: it is answered once
+the key reaches version N, or when the timeout runs out, whichever comes
+first. Waiting happens on the event loop, so waiting clients do not hold
+worker threads; changed(key) wakes them from any thread.
+"""
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+CachedResponse = namedtuple("CachedResponse", ["version", "signature", "etag", "body"])
+
+
+def not_modified(if_none_match, etag):
+    """Whether an If-None-Match header names etag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ResponseCache:
+    """Response bodies by key, rebuilt only when the key's version (or signature) moves"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.epoch = int(time.time())
+        self.entries = {}  # key -> CachedResponse
+        self.events = {}   # key -> asyncio.Event set at its next change
+        self.loop = None
+        self.hits = 0
+        self.renders = 0
+
+    def attach(self, loop):
+        """Event loop the long-polls wait on"""
+        self.loop = loop
+
+    def get(self, key, version, render, signature=None):
+        """(etag, body) of key at version; render() builds the body when nothing cached still applies"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry.version == version
+                                      or (signature is not None and entry.signature == signature)):
+                self.hits += 1
+                if entry.version != version:
+                    self.entries[key] = entry._replace(version=version)
+                return entry.etag, entry.body
+        body = render()
+        etag = f'"{self.epoch}-{key}-{version}"'
+        with self.lock:
+            self.renders += 1
+            entry = self.entries.get(key)
+            if entry is None or entry.version <= version:
+                self.entries[key] = CachedResponse(version, signature, etag, body)
+        return etag, body
+
+    def changed(self, key):
+        """Wake the long-polls waiting on key; call after its version moved, from any thread"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wake, key)
+
+    def wake(self, key):
+        event = self.events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, key, target, current, timeout):
+        """Wait until current() reaches target or timeout seconds pass; returns current()"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while current() < target:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            event = self.events.setdefault(key, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        return current()
+
+    def status(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "renders": self.renders}
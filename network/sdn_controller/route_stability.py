@@ -0,0 +1,227 @@
+# route_stability.py
+"""Damping of reported link weights, so paths do not flap with every sample.
+
+Every metrics report used to become the link's weight as it was, so a few
+percent of measurement noise could move a shortest path back and forth,
+and every move tears down pipelined streams and reorders the orders in
+flight. Reported weights now pass three filters before they are published:
+
+  • smoothing: each link keeps an EWMA of its samples,
+        smoothed = alpha * sample + (1 - alpha) * smoothed
+    seeded with the first one;
+  • hysteresis: the smoothed weight is published only once it differs
+    from the published one by more than a fraction (hysteresis) of it;
+  • flap damping, after BGP's (RFC 2439): each published change adds
+    penalty to the link's figure of merit, which halves every half_life
+    seconds and never exceeds what max_suppress seconds take to decay to
+    reuse. A link whose penalty reaches suppress is suppressed: its weight
+    may still rise, so traffic keeps avoiding a link that got worse, but
+    it does not fall again, winning traffic back, until the penalty has
+    decayed below reuse.
+
+Held and damped updates are counted, so the controller can show how many
+changes stability cost. Times come from clock(), monotonic by default.
+
+The tracked pair's path (SOURCE_ROUTER to DESTINATION_ROUTER) gets one
+more filter, PathHold, in the flow tables themselves: after the trees are
+repaired, a new shortest path replaces the one the pair is on only when it
+is switch_gain cheaper and the current one has been in place for
+hold_down seconds, or at once when a link of the current one is gone.
+Until then the routers on the held path keep forwarding along it, and the
+kept changes are counted as suppressed.
+"""
+import threading
+import time
+
+INFINITY = float('inf')
+
+
+class LinkState:
+    """What the filters remember about one link"""
+    __slots__ = ('smoothed', 'penalty', 'updated', 'suppressed', 'flaps')
+
+    def __init__(self, smoothed, now):
+        self.smoothed = smoothed
+        self.penalty = 0.0
+        self.updated = now
+        self.suppressed = False
+        self.flaps = 0
+
+
+class RouteStability:
+    """Turns batches of reported link weights into the weights worth publishing"""
+
+    def __init__(self, alpha=0.3, hysteresis=0.1, penalty=1000.0, suppress=3000.0, reuse=750.0,
+                 half_life=300.0, max_suppress=1800.0, clock=time.monotonic):
+        self.alpha = alpha
+        self.hysteresis = hysteresis
+        self.penalty = penalty
+        self.suppress = suppress  # 0 turns flap damping off
+        self.reuse = reuse
+        self.half_life = half_life
+        self.ceiling = reuse * 2 ** (max_suppress / half_life) if half_life > 0 else suppress
+        self.clock = clock
+        self.lock = threading.Lock()  # status() reads while the recompute worker filters
+        self.links = {}           # (u, v) -> LinkState
+        self.suppressed = set()   # links whose weight may not fall
+        self.samples = 0
+        self.published = 0
+        self.held = 0             # updates within the hysteresis band
+        self.damped = 0           # updates held back from a suppressed link
+        self.suppressions = 0
+
+    def clear(self):
+        """Forget every link, e.g. after the topology was rebuilt"""
+        with self.lock:
+            self.links.clear()
+            self.suppressed.clear()
+
+    def forget(self, links):
+        """Forget links that were removed or went down"""
+        with self.lock:
+            for link in links:
+                self.links.pop(link, None)
+                self.suppressed.discard(link)
+
+    def penalty_at(self, state, now):
+        if state.penalty and self.half_life > 0:
+            return state.penalty * 0.5 ** ((now - state.updated) / self.half_life)
+        return state.penalty
+
+    def decay(self, link, state, now):
+        """Let state's penalty decay to now, releasing the link once it is below reuse"""
+        state.penalty = self.penalty_at(state, now)
+        state.updated = now
+        if state.suppressed and state.penalty < self.reuse:
+            state.suppressed = False
+            self.suppressed.discard(link)
+
+    def review(self, link, state, published, now):
+        """The weight to publish for link, or None to keep published"""
+        self.decay(link, state, now)
+        weight = state.smoothed
+        if abs(weight - published) <= self.hysteresis * abs(published):
+            if weight != published:
+                self.held += 1
+            return None
+        if state.suppressed and weight < published:
+            self.damped += 1
+            return None
+        state.flaps += 1
+        self.published += 1
+        if self.suppress:
+            state.penalty = min(state.penalty + self.penalty, self.ceiling)
+            if not state.suppressed and state.penalty >= self.suppress:
+                state.suppressed = True
+                self.suppressed.add(link)
+                self.suppressions += 1
+        return weight
+
+    def filter(self, weights, current):
+        """{link: weight} to publish for a batch of reported {link: weight}
+
+        current(link) is the link's published weight, None for a link that
+        no longer exists. Suppressed links released since the last batch
+        publish their smoothed weight too, reported in this batch or not.
+        """
+        with self.lock:
+            return self.filter_batch(weights, current, self.clock())
+
+    def filter_batch(self, weights, current, now):
+        publish = {}
+        for link, sample in weights.items():
+            published = current(link)
+            if published is None:
+                continue
+            state = self.links.get(link)
+            if state is None:
+                state = self.links[link] = LinkState(sample, now)
+            else:
+                state.smoothed = self.alpha * sample + (1 - self.alpha) * state.smoothed
+            self.samples += 1
+            weight = self.review(link, state, published, now)
+            if weight is not None:
+                publish[link] = weight
+        for link in list(self.suppressed - set(weights)):
+            published = current(link)
+            if published is None:
+                self.suppressed.discard(link)
+                continue
+            state = self.links[link]
+            self.decay(link, state, now)
+            if not state.suppressed:
+                weight = self.review(link, state, published, now)
+                if weight is not None:
+                    publish[link] = weight
+        return publish
+
+    def status(self):
+        with self.lock:
+            now = self.clock()
+            suppressed = {f"{u}-{v}": round(self.penalty_at(self.links[(u, v)], now), 1)
+                          for u, v in sorted(self.suppressed)}
+        return {
+            "alpha": self.alpha,
+            "hysteresis": self.hysteresis,
+            "damping": {"penalty": self.penalty, "suppress": self.suppress, "reuse": self.reuse,
+                        "half_life_s": self.half_life, "ceiling": self.ceiling},
+            "samples": self.samples,
+            "published": self.published,
+            "held": self.held,
+            "damped": self.damped,
+            "suppressions": self.suppressions,
+            "suppressed_links": suppressed,  # with their current penalty
+        }
+
+
+class PathHold:
+    """The path the flow tables give one router pair, moved only for a clear gain once it has been held"""
+
+    def __init__(self, source, destination, switch_gain=0.2, hold_down=60.0, clock=time.monotonic):
+        self.source = source
+        self.destination = destination
+        self.switch_gain = switch_gain
+        self.hold_down = hold_down  # 0 lets every gain through at once
+        self.clock = clock
+        self.path = None
+        self.held_at = -INFINITY
+        self.switches = 0
+        self.suppressed = 0  # new shortest paths that were cheaper but kept from the pair
+
+    def reset(self):
+        """Forget the held path, e.g. after the topology was rebuilt"""
+        self.path, self.held_at = None, -INFINITY
+
+    def update(self, path, cost):
+        """The pair's path given the trees' shortest path (None if unreachable)
+
+        cost(path) is a path's cost on the current weights, None once one of
+        its links is gone. Returns the held path while the new one has not
+        earned the switch, else path.
+        """
+        if path is not None and self.path is not None and path != self.path:
+            held = cost(self.path)
+            if held is not None:
+                new = cost(path)
+                if new >= held:
+                    return self.path  # an equally short path: no reason to move
+                if new * (1 + self.switch_gain) >= held or self.clock() - self.held_at < self.hold_down:
+                    self.suppressed += 1
+                    return self.path
+        if path != self.path:
+            if self.path is not None and path is not None:
+                self.switches += 1
+            self.held_at = self.clock()
+        self.path = path
+        return path
+
+    def status(self):
+        return {
+            "source": self.source,
+            "destination": self.destination,
+            "path": self.path,
+            "switch_gain": self.switch_gain,
+            "hold_down_s": self.hold_down,
+            "switches": self.switches,
+            "suppressed": self.suppressed,
+        }
@@ -0,0 +1,230 @@
+# router_channel.py
+"""Persistent controller <-> router channel.
+
+Every router keeps one TCP connection to the controller (CONTROL_CHANNEL_PORT,
+default 6653) carrying newline-delimited JSON in both directions, instead of
+a new HTTP connection per metrics report and polling its table file for
+route changes:
+
+  router -> controller
+    {"type": "hello", "router_id": "router4", "epoch": 1700000000, "version": 12}
+    {"type": "metrics", "metrics": {"router6": {"rtt_ms": 1.2, ...}}}
+    {"type": "applied", "version": 13}
+    {"type": "resync"}
+  controller -> router
+    {"type": "table", "epoch": 1700000000, "version": 13, "table": {...}}
+    {"type": "delta", "epoch": 1700000000, "version": 13, "base": 12, "delta": {...}}
+
+Each router's table has its own version, bumped only when its content
+changes. When the controller recomputes tables, the routers whose tables
+did not change hear nothing; the others get a delta against the version
+last sent to them (a full table on connect, after a resync, or when they
+missed a version). Routers answer with "applied", so the controller knows
+how long a change took to reach each router. Versions restart with every
+controller process, so they are qualified by its start time (the epoch).
+
+The table files in the shared volume are still written: routers read them
+at boot and fall back to watching them while the channel is down.
+"""
+import asyncio
+import copy
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CONTROL_CHANNEL_PORT = 6653
+
+# Table sections made of entries with a key, and how to get the key
+KEYED_SECTIONS = {
+    "flow_table": lambda flow: flow.get("match", {}).get("destination"),
+    "routes": lambda route: route.get("destination"),
+}
+
+
+def table_delta(old, new):
+    """Changes that turn table old into table new (see the router's apply_delta)"""
+    delta = {}
+    for field in set(old) | set(new):
+        if field in KEYED_SECTIONS:
+            key = KEYED_SECTIONS[field]
+            before = {key(e): e for e in old.get(field, [])}
+            after = {key(e): e for e in new.get(field, [])}
+            upsert = [e for k, e in after.items() if before.get(k) != e]
+            remove = [k for k in before if k not in after]
+            if upsert or remove:
+                delta[field] = {"upsert": upsert, "remove": remove}
+        elif field == "interfaces":
+            before, after = old.get(field, {}), new.get(field, {})
+            upsert = {k: v for k, v in after.items() if before.get(k) != v}
+            remove = [k for k in before if k not in after]
+            if upsert or remove:
+                delta[field] = {"upsert": upsert, "remove": remove}
+        elif old.get(field) != new.get(field):
+            delta.setdefault("set", {})[field] = new.get(field)
+    return delta
+
+
+class RouterSession:
+    """One connected router"""
+
+    def __init__(self, router_id, writer):
+        self.router_id = router_id
+        self.writer = writer
+        self.sent_version = 0     # last version written to the router, in order
+        self.applied_version = 0  # last version the router confirmed
+        self.connected_at = time.time()
+        self.convergence = None   # seconds from publish to "applied" of the latest confirmed version
+
+    def send(self, message):
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+
+
+class RouterChannelHub:
+    """Versioned router tables and the router connections they are pushed to
+
+    publish() may be called from any thread (FastAPI runs sync handlers in a
+    thread pool); pushes are handed to the event loop the server runs on.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.epoch = int(time.time())
+        self.tables = {}     # router -> last published table
+        self.versions = {}   # router -> version of that table
+        self.deltas = {}     # router -> (base version, delta) that produced it
+        self.published = {}  # router -> monotonic time it was published
+        self.sessions = {}   # router -> RouterSession
+        self.loop = None
+        self.server = None
+        self.on_metrics = None
+        self.pushed = 0       # deltas and tables written to routers
+        self.unchanged = 0    # publishes skipped because the table did not change
+
+    async def start(self, host, port, on_metrics):
+        """Listen for routers on the running loop; on_metrics(router_id, metrics) runs in a worker thread"""
+        self.loop = asyncio.get_running_loop()
+        self.on_metrics = on_metrics
+        self.server = await asyncio.start_server(self.handle_router, host, port)
+        logger.info(f"Router channel listening on port {port}")
+
+    async def stop(self):
+        """Stop listening and disconnect every router"""
+        self.server.close()
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.writer.close()
+        await asyncio.sleep(0)  # Let the handlers see their connections close
+
+    def publish(self, router_id, table):
+        """Record a router's table; a new version is pushed only if its content changed"""
+        table = copy.deepcopy(table)
+        with self.lock:
+            old = self.tables.get(router_id)
+            if old == table:
+                self.unchanged += 1
+                return self.versions[router_id]
+            base = self.versions.get(router_id, 0)
+            version = base + 1
+            self.tables[router_id] = table
+            self.versions[router_id] = version
+            self.deltas[router_id] = (base, table_delta(old, table)) if old is not None else None
+            self.published[router_id] = time.monotonic()
+            session = self.sessions.get(router_id)
+        if session is not None and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.push, session)
+        return version
+
+    def forget(self, router_id):
+        """Drop a removed router's table and disconnect it
+
+        Its version number is kept, so a router re-added under the same id
+        carries on from it instead of matching a version the old one confirmed.
+        """
+        with self.lock:
+            for entries in (self.tables, self.deltas, self.published):
+                entries.pop(router_id, None)
+            session = self.sessions.pop(router_id, None)
+        if session is not None and self.loop is not None:
+            self.loop.call_soon_threadsafe(session.writer.close)
+
+    def push(self, session):
+        """Bring a router up to the latest version; runs on the loop"""
+        with self.lock:
+            version = self.versions.get(session.router_id, 0)
+            if session.router_id not in self.tables or session.sent_version >= version or self.sessions.get(session.router_id) is not session:
+                return
+            delta = self.deltas.get(session.router_id)
+            table = self.tables[session.router_id]
+        if delta is not None and delta[0] == session.sent_version:
+            session.send({"type": "delta", "epoch": self.epoch, "version": version,
+                          "base": delta[0], "delta": delta[1]})
+        else:
+            session.send({"type": "table", "epoch": self.epoch, "version": version, "table": table})
+        session.sent_version = version
+        self.pushed += 1
+
+    async def handle_router(self, reader, writer):
+        session = None
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            if hello.get("type") != "hello" or not hello.get("router_id"):
+                return
+            session = RouterSession(hello["router_id"], writer)
+            if hello.get("epoch") == self.epoch:
+                session.sent_version = session.applied_version = hello.get("version", 0)
+            with self.lock:
+                previous = self.sessions.get(session.router_id)
+                self.sessions[session.router_id] = session
+            if previous is not None:
+                previous.writer.close()
+            logger.info(f"{session.router_id} connected on the router channel at version {session.sent_version}")
+            self.push(session)
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message.get("type")
+                if kind == "metrics":
+                    try:
+                        await asyncio.to_thread(self.on_metrics, session.router_id, message.get("metrics", {}))
+                    except Exception as e:
+                        logger.error(f"Error applying metrics from {session.router_id}: {e}")
+                elif kind == "applied":
+                    session.applied_version = message.get("version", 0)
+                    with self.lock:
+                        if session.applied_version == self.versions.get(session.router_id):
+                            session.convergence = time.monotonic() - self.published[session.router_id]
+                elif kind == "resync":
+                    session.sent_version = -1  # no delta applies; the next push is a full table
+                    self.push(session)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Router channel error{' with ' + session.router_id if session else ''}: {e}")
+        finally:
+            if session is not None:
+                with self.lock:
+                    if self.sessions.get(session.router_id) is session:
+                        del self.sessions[session.router_id]
+                logger.info(f"{session.router_id} left the router channel")
+            writer.close()
+
+    def status(self):
+        with self.lock:
+            routers = {}
+            for router_id, version in sorted(self.versions.items()):
+                if router_id not in self.tables:
+                    continue
+                session = self.sessions.get(router_id)
+                routers[router_id] = {
+                    "version": version,
+                    "connected": session is not None,
+                    "applied_version": session.applied_version if session else None,
+                    "convergence_ms": 1000 * session.convergence
+                    if session and session.convergence is not None else None,
+                }
+            return {"epoch": self.epoch, "routers": routers, "pushed": self.pushed, "unchanged": self.unchanged}
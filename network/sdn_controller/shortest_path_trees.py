@@ -0,0 +1,319 @@
+# shortest_path_trees.py
+"""Incremental shortest-path first (SPF) for the flow tables.
+
+The controller keeps every router's shortest-path tree in memory (distance
+and parent of each destination), so a link weight change does not mean
+running Dijkstra from every router again. Each tree is repaired where the
+change reaches it:
+
+  • a link that got more expensive only matters to trees that use it; the
+    routers below it in such a tree are detached and settled again from
+    their neighbors that kept their distance;
+  • a link that got cheaper only matters where it now offers a strictly
+    shorter way to one of its ends,
+        dist(S, U) + weight(U, V) < dist(S, V)
+    and the shorter distances spread from there, Dijkstra style.
+
+Trees no change reaches are left alone, and in the others only the routers
+whose distance or path changed are touched. Several changes are repaired
+together: detached routers start at infinity, improvements are seeded
+from every cheaper link, and the queue settles both.
+
+Routers and links added or removed are repaired the same way: a removed
+link is one that got infinitely expensive (routers it cut off for good
+leave the tree), an added link one that got cheaper than infinity. A
+removed router's tree is dropped and an added router gets a fresh one.
+
+A router's flow table depends on its own tree and, through its loop-free
+alternates and next-hop groups, on its neighbors' trees; stale_entries() names the flow entries
+to rebuild after an update, so unchanged entries are reused as they are.
+
+Full rebuilds run on one of two backends: 'networkx', one pure-Python
+Dijkstra per router over the networkx graph, or 'csgraph', scipy's
+vectorized all-pairs search (see csgraph_backend.py), which needs scipy and
+finds the same trees.
+"""
+import heapq
+
+from loop_free_alternates import loop_free_alternate
+from next_hop_groups import next_hop_group
+
+INFINITY = float('inf')
+
+BACKENDS = ('networkx', 'csgraph')
+
+
+def dijkstra(graph, source, weight='weight'):
+    """Distance and parent of every router reachable from source
+
+    Ties are broken the same way as networkx's single_source_dijkstra, so a
+    fresh tree has the paths the controller computed with it.
+    """
+    distances, parents = {}, {source: None}
+    seen = {source: 0}
+    heap = [(0, 0, source)]
+    count = 1
+    while heap:
+        distance, _, node = heapq.heappop(heap)
+        if node in distances:
+            continue
+        distances[node] = distance
+        for neighbor, attributes in graph[node].items():
+            candidate = distance + attributes.get(weight, 1)
+            if neighbor not in distances and (neighbor not in seen or candidate < seen[neighbor]):
+                seen[neighbor] = candidate
+                parents[neighbor] = node
+                heapq.heappush(heap, (candidate, count, neighbor))
+                count += 1
+    return distances, parents
+
+
+def all_shortest_path_trees(graph, weight='weight', backend='networkx', processes=1):
+    """({source: {destination: distance}}, {source: {destination: parent}}) for every router
+
+    weight None counts hops. processes > 1 spreads the csgraph backend's
+    sources over that many worker processes.
+    """
+    if backend == 'csgraph':
+        from csgraph_backend import all_shortest_path_trees as csgraph_trees  # needs scipy
+        return csgraph_trees(graph, weight, processes)
+    if backend != 'networkx':
+        raise ValueError(f"Unknown routing backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    distances, parents = {}, {}
+    for source in graph:
+        distances[source], parents[source] = dijkstra(graph, source, weight)
+    return distances, parents
+
+
+def tree_path(parents, source, destination):
+    """Routers from source to destination following source's parents"""
+    path = [destination]
+    while path[-1] != source:
+        path.append(parents[path[-1]])
+    path.reverse()
+    return path
+
+
+class ShortestPathTrees:
+    """Shortest-path tree of every router in graph, kept up to date as link weights change"""
+
+    def __init__(self, graph, weight='weight', backend='networkx', processes=1, multipath=1, stretch=0.0):
+        self.graph = graph
+        self.weight = weight
+        self.backend = backend
+        self.processes = processes
+        self.multipath = multipath  # most next hops in a flow entry's group; 1 for a single path
+        self.stretch = stretch      # how much costlier than the shortest a group member may be
+        self.distances = {}  # source -> {destination: distance}; what loop_free_alternate expects
+        self.parents = {}    # source -> {destination: previous router on the path}
+        self.rebuilds = 0    # full rebuilds
+        self.repairs = 0     # trees repaired after a weight change
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute every tree, e.g. after routers or links were added or removed"""
+        self.distances, self.parents = all_shortest_path_trees(self.graph, self.weight, self.backend, self.processes)
+        self.rebuilds += 1
+
+    def update(self, changed_links, graph=None, removed_links=(), added_links=(),
+               removed_routers=(), added_routers=()):
+        """Repair the trees after link weight changes; the graph already holds the new weights
+
+        changed_links maps (u, v) to the link's weight before the change.
+        graph, if given, is the new version of the graph that holds them
+        (the same routers and links, unless the routers and links it has
+        gained or lost are given too). Returns {source: routers whose
+        distance or path from source changed} for every tree that changed;
+        an added router's tree counts as changed everywhere.
+        """
+        if graph is not None:
+            self.graph = graph
+        changes = {}
+        for (u, v), old_weight in changed_links.items():
+            new_weight = self.graph[u][v].get(self.weight, 1)
+            if new_weight != old_weight:
+                changes[(u, v)] = new_weight < old_weight
+        changes.update((link, False) for link in removed_links)
+        changes.update((link, True) for link in added_links)
+        for router in removed_routers:
+            self.distances.pop(router, None)
+            self.parents.pop(router, None)
+        changed = {}
+        if changes or removed_routers:
+            for source in self.distances:
+                if source in added_routers:
+                    continue
+                touched = self.repair(source, changes, removed_routers)
+                if touched:
+                    changed[source] = touched
+            self.repairs += len(changed)
+        for router in added_routers:
+            self.distances[router], self.parents[router] = dijkstra(self.graph, router, self.weight)
+            changed[router] = set(self.distances[router])
+        return changed
+
+    def repair(self, source, changes, removed_routers=()):
+        """Bring source's tree up to date; changes maps each changed link to whether it got cheaper
+
+        A link that got more expensive may be gone from the graph, and so may removed_routers.
+        """
+        distances, parents = self.distances[source], self.parents[source]
+        touched = set()
+        for router in removed_routers:
+            if distances.pop(router, None) is not None:
+                del parents[router]
+                touched.add(router)
+        detached = set()
+        for (u, v), cheaper in changes.items():
+            if cheaper:
+                continue
+            for parent, child in ((u, v), (v, u)):
+                if child in self.graph and parents.get(child) == parent:
+                    detached.update(self.subtree(source, child))
+        improvements = [(u, v) for (u, v), cheaper in changes.items()
+                        if cheaper and (u in distances or v in distances)]
+        if not detached and not improvements:
+            return touched
+
+        heap, count = [], 0
+        touched.update(detached)
+
+        def relax(node, neighbor):
+            nonlocal count
+            if node not in distances:
+                return
+            candidate = distances[node] + self.graph[node][neighbor].get(self.weight, 1)
+            if candidate < distances.get(neighbor, INFINITY):
+                distances[neighbor] = candidate
+                parents[neighbor] = node
+                heapq.heappush(heap, (candidate, count, neighbor))
+                count += 1
+
+        for node in detached:
+            distances[node] = INFINITY
+        for node in detached:
+            for neighbor in self.graph[node]:
+                if neighbor not in detached:
+                    relax(neighbor, node)
+        for u, v in improvements:
+            relax(u, v)
+            relax(v, u)
+        while heap:
+            distance, _, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue  # superseded by a shorter way found later
+            touched.add(node)
+            for neighbor in self.graph[node]:
+                relax(node, neighbor)
+        for node in detached:
+            if distances[node] == INFINITY:  # cut off from source
+                del distances[node], parents[node]
+        return touched
+
+    def subtree(self, source, root):
+        """root and every router whose path from source goes through it"""
+        parents = self.parents[source]
+        below, stack = {root}, [root]
+        while stack:
+            node = stack.pop()
+            for neighbor in self.graph[node]:
+                if neighbor not in below and parents.get(neighbor) == node:
+                    below.add(neighbor)
+                    stack.append(neighbor)
+        return below
+
+    def stale_entries(self, changed, changed_links=()):
+        """{router: destinations whose flow entries may differ, or None for the whole table}
+
+        changed is what update() returned. A router's entries read its own
+        distances, and its neighbors' distances to each destination, to the
+        router itself and to its other neighbors (see loop_free_alternate
+        and next_hop_group).
+        """
+        stale = {}
+
+        def mark(router, destinations):
+            if destinations is None or stale.get(router, ()) is None:
+                stale[router] = None
+            else:
+                stale.setdefault(router, set()).update(destinations)
+
+        for source, destinations in changed.items():
+            mark(source, destinations)
+            for neighbor in self.graph[source]:
+                if neighbor in destinations or any(n in destinations for n in self.graph[neighbor]):
+                    mark(neighbor, None)
+                else:
+                    mark(neighbor, destinations)
+        for u, v in changed_links:
+            for router in (u, v):
+                if router in self.graph:
+                    mark(router, None)  # their alternates' metrics include the link's weight
+        return stale
+
+    def path(self, source, destination):
+        """Routers from source to destination along source's tree"""
+        return tree_path(self.parents[source], source, destination)
+
+    def path_cost(self, path):
+        """Sum of path's link weights, or None if one of its links is gone"""
+        cost = 0
+        for u, v in zip(path, path[1:]):
+            if not self.graph.has_edge(u, v):
+                return None
+            cost += self.graph[u][v].get(self.weight, 1)
+        return cost
+
+    def flow_entry(self, source, destination, path=None):
+        """Flow entry of source towards destination: next hop, path and metric, the best LFA and the next-hop group
+
+        path, if given, is a held path to follow instead of the tree's; its
+        entry gets no next-hop group, which would spread flows off it.
+        """
+        held = path is not None
+        if not held:
+            path = self.path(source, destination)
+        flow_entry = {
+            "match": {
+                "destination": destination
+            },
+            "action": {
+                "forward_to": path[1]
+            },
+            "priority": 100,
+            "path": path,
+            "metric": self.path_cost(path) if held else self.distances[source][destination]
+        }
+        # Precomputed backup the router switches to on its own when next_hop fails
+        alternate = loop_free_alternate(self.graph, self.distances, source, destination, path[1], self.weight)
+        if alternate is not None:
+            backup_hop, backup_metric, protection = alternate
+            flow_entry["action"]["backup_to"] = backup_hop
+            flow_entry["backup_metric"] = backup_metric
+            flow_entry["protection"] = protection
+        # Other next hops as good (or within stretch) that routers spread flows over
+        group = None if held else next_hop_group(self.graph, self.distances, source, destination, path[1],
+                                                 self.multipath, self.stretch, self.weight)
+        if group is not None:
+            flow_entry["action"]["group"] = group
+        return flow_entry
+
+    def flow_table(self, source, previous=None, destinations=None):
+        """Flow entries of source to every reachable router
+
+        With the previous flow table and the destinations whose entries may
+        have changed (see stale_entries), the other entries are reused.
+        """
+        reuse = {}
+        if previous is not None and destinations is not None:
+            reuse = {flow["match"]["destination"]: flow for flow in previous}
+        distances = self.distances[source]
+        flows = []
+        for destination in self.graph:  # graph order, so an unchanged table compares equal
+            if destination == source or destination not in distances:
+                continue
+            if destination in reuse and destination not in destinations:
+                flows.append(reuse[destination])
+            else:
+                flows.append(self.flow_entry(source, destination))
+        return flows
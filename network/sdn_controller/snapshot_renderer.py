@@ -0,0 +1,205 @@
+# snapshot_renderer.py
+"""Topology snapshots rendered in a worker process, only when the graph changes.
+
+The controller used to redraw the whole graph with matplotlib every 4 s,
+changed or not, on a thread competing with route computation for the GIL,
+and kept every PNG. Now it hands a plain description of the graph (a
+scene: routers, links with their weights, the highlighted path) to a
+worker process each time the graph version moves, and nothing happens
+while the network is idle.
+
+The worker keeps its figure between frames. The layout is recomputed only
+when the set of routers changes and the artists only when a router or link
+is added or removed; otherwise a frame just recolors the links and rewrites
+their weight labels. Scenes arriving faster than one per min_interval are
+coalesced into the newest, and only the newest retain PNGs are kept.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'network_graph_'
+
+REGULAR_EDGE = (0.5, 0.5, 0.5, 0.7)  # gray at alpha 0.7
+HIGHLIGHTED_EDGE = (1.0, 0.0, 0.0, 1.0)
+
+
+def prune_snapshots(directory, retain):
+    """Delete all but the newest retain snapshots; returns how many were deleted"""
+    snapshots = []
+    for name in os.listdir(directory):
+        if name.startswith(PREFIX) and name.endswith('.png'):
+            path = os.path.join(directory, name)
+            try:
+                snapshots.append((os.stat(path).st_mtime_ns, name, path))
+            except OSError:
+                continue
+    snapshots.sort()
+    deleted = 0
+    for _, _, path in snapshots[:max(len(snapshots) - retain, 0)]:
+        try:
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
+
+
+class SnapshotCanvas:
+    """One figure redrawn for each scene; lives in the worker process"""
+
+    def __init__(self, directory, retain=100):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.directory = directory
+        self.retain = retain
+        self.figure = Figure(figsize=(12, 10))
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.figure.text(0.02, 0.02, "", fontsize=10, bbox=dict(facecolor='white', alpha=0.8, boxstyle='round'))
+        self.legend = self.figure.texts[-1]
+        self.positions = {}
+        self.structure = None  # (routers, links) the artists were drawn for
+        self.edges = None      # LineCollection of the links, in link order
+        self.edge_labels = {}  # (u, v) -> Text
+        self.count = 0
+        self.layouts = 0       # spring layouts computed
+        self.redraws = 0       # times the artists were rebuilt
+
+    def draw(self, graph, links):
+        """Rebuild the artists for a new set of routers or links"""
+        import networkx as nx
+
+        if set(self.positions) != set(graph):
+            self.positions = nx.spring_layout(graph, seed=42)
+            self.layouts += 1
+        self.axes.clear()
+        self.axes.axis('off')
+        nx.draw_networkx_nodes(graph, self.positions, ax=self.axes, node_size=1000, node_color="skyblue")
+        self.edges = None
+        if links:
+            self.edges = nx.draw_networkx_edges(graph, self.positions, ax=self.axes, edgelist=links, width=2,
+                                                edge_color=[REGULAR_EDGE] * len(links))
+        nx.draw_networkx_labels(graph, self.positions, {node: node for node in graph}, ax=self.axes,
+                                font_size=12, font_weight='bold')
+        self.edge_labels = nx.draw_networkx_edge_labels(graph, self.positions, {link: "" for link in links},
+                                                        ax=self.axes, font_size=10, font_color='black')
+        self.redraws += 1
+
+    def render(self, scene):
+        """Draw a scene and save it as the next PNG; returns its path"""
+        import networkx as nx
+
+        links = [(u, v) for u, v, _ in scene["edges"]]
+        structure = (tuple(scene["nodes"]), tuple(links))
+        if structure != self.structure:
+            graph = nx.Graph()
+            graph.add_nodes_from(scene["nodes"])
+            graph.add_edges_from(links)
+            self.draw(graph, links)
+            self.structure = structure
+
+        path = scene.get("path") or []
+        on_path = {frozenset(hop) for hop in zip(path, path[1:])}
+        highlighted = [frozenset(link) in on_path for link in links]
+        if self.edges is not None:
+            self.edges.set_color([HIGHLIGHTED_EDGE if h else REGULAR_EDGE for h in highlighted])
+            self.edges.set_linewidth([4 if h else 2 for h in highlighted])
+        for u, v, weight in scene["edges"]:
+            label = self.edge_labels.get((u, v))
+            if label is not None:
+                label.set_text(f"{weight:.1f}")  # Format to 1 decimal place
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.axes.set_title(f"Network Topology - {timestamp}")
+        legend = f"Red edges: Path from {scene.get('source')} to {scene.get('destination')}"
+        suppressed = scene.get("suppressed")
+        if suppressed:
+            legend += (f"\nPath changes suppressed: {suppressed['path_changes']}, "
+                       f"link weight updates held back: {suppressed['link_updates']}")
+        self.legend.set_text(legend)
+        self.count += 1
+        filepath = os.path.join(self.directory, f"{PREFIX}{timestamp}_{self.count:04d}.png")
+        self.figure.savefig(filepath, format='png', dpi=150)
+        prune_snapshots(self.directory, self.retain)
+        return filepath
+
+
+def newest(scenes, scene):
+    """The last scene queued behind scene, or None if the worker was told to stop"""
+    while scene is not None:
+        try:
+            scene = scenes.get_nowait()
+        except queue.Empty:
+            break
+    return scene
+
+
+def render_loop(scenes, directory, retain, min_interval):
+    """Worker process: render scenes as they come, at most one per min_interval"""
+    logging.basicConfig(level=logging.INFO)
+    canvas = SnapshotCanvas(directory, retain)
+    rendered_at = float('-inf')
+    while True:
+        scene = scenes.get()
+        delay = rendered_at + min_interval - time.monotonic()
+        if scene is not None and delay > 0:
+            time.sleep(delay)
+        scene = newest(scenes, scene)
+        if scene is None:
+            return
+        try:
+            filepath = canvas.render(scene)
+            logger.info(f"Saved graph snapshot of version {scene['version']} to {filepath}")
+        except Exception as e:
+            logger.error(f"Error generating graph snapshot: {e}")
+        rendered_at = time.monotonic()
+
+
+class SnapshotRenderer:
+    """Controller side: starts the worker process and hands it a scene per graph version"""
+
+    def __init__(self, directory, retain=100, min_interval=4.0):
+        self.directory = directory
+        self.retain = retain
+        self.min_interval = min_interval
+        self.scenes = None
+        self.process = None
+        self.version = None  # graph version of the last scene handed over
+        self.submitted = 0
+
+    def start(self):
+        # spawn, not fork: the controller has threads and an event loop running
+        context = multiprocessing.get_context('spawn')
+        self.scenes = context.Queue()
+        self.process = context.Process(target=render_loop, name='snapshot-renderer', daemon=True,
+                                       args=(self.scenes, self.directory, self.retain, self.min_interval))
+        self.process.start()
+        return self
+
+    def submit(self, scene):
+        """Queue a scene for rendering unless its version was already queued; never blocks"""
+        if self.process is None or scene["version"] == self.version:
+            return False
+        if not self.process.is_alive():
+            logger.error("Snapshot renderer is not running")
+            return False
+        self.version = scene["version"]
+        self.scenes.put(scene)
+        self.submitted += 1
+        return True
+
+    def stop(self, timeout=5.0):
+        if self.process is None:
+            return
+        self.scenes.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
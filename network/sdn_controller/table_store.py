@@ -0,0 +1,299 @@
+# table_store.py
+"""Router table files in the shared volume, written atomically and stamped with a generation.
+
+Every saved table gets the controller's epoch (its start time) and the
+next generation number of this controller process, so a router can tell
+whether the file it sees is newer than the table it holds. Files are
+written to a temporary file in the same directory and renamed into place:
+a router reading at the same moment sees the old table or the new one,
+never a truncated one. Saving a table whose content did not change keeps
+its generation and leaves the file alone.
+
+Two encodings:
+
+  json    {router}_table.json, the table as it is; easy to read, but every
+          flow entry repeats its whole path, O(N^2) per router.
+  binary  {router}_table.bin, fixed-size records a router can memory-map:
+
+    header   magic "RTBL", format, epoch, generation, flow count,
+             group member count, route count
+    flows    changed, destination, forward_to, backup_to, parent, priority,
+             protection, metric, backup_metric, first member, member count
+    members  next_hop, weight, metric: the flows' next-hop groups, in flow order
+    routes   changed, destination, next_hop, destination_subnet, metric
+    trailer  JSON: router names the records index, the remaining fields of
+             the table, and entries that do not fit a record
+
+           Paths are not stored: each flow record names the parent of its
+           destination in the router's shortest-path tree, and a path is
+           read by following parents back to the router. "changed" is the
+           generation in which the entry last changed, so a router holding
+           generation G of the same epoch only decodes records with
+           changed > G and keeps its other entries (see the router's
+           table_codec.py).
+
+The JSON encoding stays the default. The controller's routing_table
+endpoint, and table_codec.py run as a script, export binary tables as JSON.
+"""
+import json
+import os
+import struct
+import tempfile
+import time
+
+ENCODINGS = ('json', 'binary')
+SUFFIXES = {'json': 'json', 'binary': 'bin'}
+
+MAGIC = b'RTBL'
+FORMAT = 2
+HEADER = struct.Struct('<4sHQQIII')      # magic, format, epoch, generation, flows, members, routes
+FLOW = struct.Struct('<Qiiiiiiddii')    # changed, destination, forward_to, backup_to, parent, priority,
+                                        # protection, metric, backup_metric, first member, members
+MEMBER = struct.Struct('<iid')          # next_hop, weight, metric
+ROUTE = struct.Struct('<Qiiii')         # changed, destination, next_hop, destination_subnet, metric
+NONE = -1                               # name index of an absent backup_to or protection
+
+FLOW_KEYS = {"match", "action", "priority", "path", "metric"}
+PROTECTED_FLOW_KEYS = FLOW_KEYS | {"backup_metric", "protection"}
+MEMBER_KEYS = {"next_hop", "weight", "metric"}
+ROUTE_KEYS = {"destination", "destination_subnet", "next_hop", "metric"}
+
+
+def table_path(directory, router_id, encoding='json'):
+    """Where router_id's table lives in the given encoding"""
+    return os.path.join(directory, f"{router_id}_table.{SUFFIXES[encoding]}")
+
+
+def atomic_write(path, data, fsync=True):
+    """Replace the file at path with data; readers see the old or the new content, never a mix"""
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def tree_parents(table):
+    """Parent of each destination in the router's shortest-path tree, as the flow entries' paths give it"""
+    parents = {}
+    for flow in table.get("flow_table", []):
+        path = flow.get("path") if isinstance(flow, dict) else None
+        if isinstance(path, list) and len(path) >= 2:
+            parents.setdefault(path[-1], path[-2])
+    return parents
+
+
+def group_fits(group):
+    """Whether a flow's next-hop group fits member records"""
+    return isinstance(group, list) and len(group) >= 2 and all(
+        isinstance(member, dict) and member.keys() == MEMBER_KEYS and isinstance(member["next_hop"], str)
+        and type(member["weight"]) is int and type(member["metric"]) is float for member in group)
+
+
+def flow_fields(flow, source, parents):
+    """(destination, forward_to, backup_to, parent, priority, protection, metric, backup_metric, group) or None
+
+    None means the entry does not fit a record and goes to the trailer whole.
+    """
+    try:
+        destination = flow["match"]["destination"]
+        action, path = flow["action"], flow["path"]
+        forward_to = action["forward_to"]
+    except (KeyError, TypeError):
+        return None
+    backup_to = action.get("backup_to")
+    if backup_to is None:
+        keys, action_keys, protection, backup_metric = FLOW_KEYS, {"forward_to"}, None, float('nan')
+    else:
+        keys, action_keys = PROTECTED_FLOW_KEYS, {"forward_to", "backup_to"}
+        protection, backup_metric = flow.get("protection"), flow.get("backup_metric")
+    group = action.get("group") if isinstance(action, dict) else None
+    if group is not None:
+        if not group_fits(group):
+            return None
+        action_keys = action_keys | {"group"}
+    if (flow.keys() != keys or flow["match"].keys() != {"destination"} or action.keys() != action_keys
+            or type(flow["priority"]) is not int or type(flow["metric"]) is not float
+            or not isinstance(path, list) or not all(isinstance(name, str) for name in (backup_to or "", protection or "", *path))
+            or (backup_to is not None and (type(backup_metric) is not float or protection is None))
+            or len(path) < 2 or path[0] != source
+            or path[1] != forward_to or path[-1] != destination or destination == source
+            or any(parents.get(node) != previous for previous, node in zip(path, path[1:]))):
+        return None
+    return (destination, forward_to, backup_to, path[-2], flow["priority"], protection, flow["metric"],
+            backup_metric, group or ())
+
+
+def route_fields(route):
+    """(destination, next_hop, destination_subnet, metric) or None if the route does not fit a record"""
+    if (not isinstance(route, dict) or route.keys() != ROUTE_KEYS or type(route["metric"]) is not int
+            or not all(isinstance(route[key], str) for key in ("destination", "next_hop", "destination_subnet"))):
+        return None
+    return route["destination"], route["next_hop"], route["destination_subnet"], route["metric"]
+
+
+def encode_table(table, epoch, generation, changed):
+    """Binary encoding of a stamped table; changed[section][position] is the generation an entry last changed in"""
+    names, index = [], {}
+
+    def intern(name):
+        if name is None:
+            return NONE
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        return index[name]
+
+    def pack(record, *fields):
+        try:
+            return record.pack(*fields)
+        except struct.error:
+            return None  # a number out of the record's range
+
+    source = table.get("router_id")
+    parents = tree_parents(table)
+    records, raw = {"flow_table": [], "routes": []}, {"flow_table": [], "routes": []}
+    members = []
+    recorded, via = set(), set()  # destinations of flow records, and routers their paths go through
+    for position, flow in enumerate(table.get("flow_table", [])):
+        fields = flow_fields(flow, source, parents)
+        if fields is not None:
+            destination, forward_to, backup_to, parent, priority, protection, metric, backup_metric, group = fields
+            group = [pack(MEMBER, intern(member["next_hop"]), member["weight"], member["metric"])
+                     for member in group]
+            fields = None if None in group else pack(
+                FLOW, changed["flow_table"][position], intern(destination), intern(forward_to),
+                intern(backup_to), intern(parent), priority, intern(protection), metric, backup_metric,
+                len(members), len(group))
+        if fields is None:
+            raw["flow_table"].append([position, flow])
+        else:
+            records["flow_table"].append(fields)
+            members.extend(group)
+            recorded.add(flow["match"]["destination"])
+            via.update(flow["path"][1:-1])
+    for position, route in enumerate(table.get("routes", [])):
+        fields = route_fields(route)
+        if fields is not None:
+            destination, next_hop, subnet, metric = fields
+            fields = pack(ROUTE, changed["routes"][position], intern(destination), intern(next_hop),
+                          intern(subnet), metric)
+        if fields is None:
+            raw["routes"].append([position, route])
+        else:
+            records["routes"].append(fields)
+
+    trailer = {
+        "names": names,
+        "table": {field: value for field, value in table.items() if field not in records},
+        "sections": [field for field in records if field in table],
+        "raw": raw,
+        "parents": {node: parents[node] for node in via - recorded},  # of routers without a flow record
+    }
+    return b''.join([
+        HEADER.pack(MAGIC, FORMAT, epoch, generation, len(records["flow_table"]), len(members),
+                    len(records["routes"])),
+        *records["flow_table"], *members, *records["routes"],
+        json.dumps(trailer, separators=(',', ':')).encode('utf-8'),
+    ])
+
+
+def entry_key(section, entry):
+    """Key of a flow entry or route within its table"""
+    if not isinstance(entry, dict):
+        return None
+    if section == "flow_table":
+        match = entry.get("match")
+        return match.get("destination") if isinstance(match, dict) else None
+    return entry.get("destination")
+
+
+class TableStore:
+    """Saves router tables to directory in one encoding, stamping each changed table with a new generation"""
+
+    def __init__(self, directory, encoding='json', fsync=True):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown table encoding {encoding!r}, expected one of {', '.join(ENCODINGS)}")
+        self.directory = directory
+        self.encoding = encoding
+        self.fsync = fsync
+        self.epoch = int(time.time())
+        self.generation = 0
+        self.tables = {}   # router -> last saved (stamped) table
+        self.changed = {}  # router -> {section: {key: (entry, generation it last changed in)}}
+        self.writes = 0
+        self.unchanged = 0
+        self.bytes_written = 0
+
+    def path(self, router_id):
+        return table_path(self.directory, router_id, self.encoding)
+
+    def save(self, router_id, table):
+        """Write router_id's table and return it stamped with epoch and generation
+
+        A table equal to the last one saved is not written again and keeps its generation.
+        """
+        old = self.tables.get(router_id)
+        if old is not None and dict(table, epoch=old["epoch"], generation=old["generation"]) == old:
+            self.unchanged += 1
+            return old
+        self.generation += 1
+        table = dict(table, epoch=self.epoch, generation=self.generation)
+        if self.encoding == 'binary':
+            data = encode_table(table, self.epoch, self.generation, self.track_changes(router_id, table))
+        else:
+            data = json.dumps(table, indent=2).encode('utf-8')
+        atomic_write(self.path(router_id), data, self.fsync)
+        self.tables[router_id] = table
+        self.writes += 1
+        self.bytes_written += len(data)
+        return table
+
+    def remove(self, router_id):
+        """Delete router_id's table file and forget it, e.g. once the router was removed"""
+        self.tables.pop(router_id, None)
+        self.changed.pop(router_id, None)
+        try:
+            os.remove(self.path(router_id))
+        except FileNotFoundError:
+            pass
+
+    def track_changes(self, router_id, table):
+        """{section: generation each entry of table last changed in, by position}, for encode_table
+
+        An entry whose destination appears twice always counts as changed.
+        """
+        before = self.changed.get(router_id, {})
+        after, changed = {}, {}
+        for section in ("flow_table", "routes"):
+            previous, current, stamps = before.get(section, {}), {}, []
+            for entry in table.get(section, []):
+                key = entry_key(section, entry)
+                seen = previous.get(key)
+                if key in current or seen is None or not (seen[0] is entry or seen[0] == entry):
+                    seen = (entry, self.generation)
+                current.setdefault(key, seen)
+                stamps.append(seen[1])
+            after[section], changed[section] = current, stamps
+        self.changed[router_id] = after
+        return changed
+
+    def status(self):
+        return {
+            "encoding": self.encoding,
+            "epoch": self.epoch,
+            "generation": self.generation,
+            "writes": self.writes,
+            "unchanged": self.unchanged,
+            "bytes_written": self.bytes_written,
+        }
@@ -0,0 +1,91 @@
+# topology.py
+"""Immutable, versioned snapshots of the network graph.
+
+The controller's graph used to be one networkx graph mutated in place by
+metrics reports while endpoints, the snapshot renderer and the flow table
+recompute iterated it. Now every change builds a new Topology and the
+controller publishes it by rebinding one global reference, which Python
+does atomically. A reader takes the reference once and works on that
+version for as long as it likes, with no lock, while writers move on.
+
+Snapshot graphs are frozen (networkx raises on any mutation). A weight
+change does not copy the whole graph: the new version shares the router
+attributes and the adjacency of every router the change does not touch,
+and copies only the adjacency of the changed links' ends. Iteration order
+is preserved, so tables built in graph order do not reshuffle. Adding or
+removing routers and links works the same way (restructured); only the
+router index is copied as well, and new routers come last.
+"""
+import networkx as nx
+
+
+class Topology:
+    """One version of the network graph; graph is frozen and never changes"""
+
+    __slots__ = ('graph', 'version')
+
+    def __init__(self, graph=None, version=0):
+        graph = nx.Graph() if graph is None else graph
+        self.graph = graph if nx.is_frozen(graph) else nx.freeze(graph)
+        self.version = version
+
+    def replaced(self, graph):
+        """Next version holding graph, e.g. after the topology was rebuilt"""
+        return Topology(graph, self.version + 1)
+
+    def with_weights(self, weights, attribute='weight'):
+        """(next version with the given link weights, {link: weight before}) for the links that exist
+
+        weights maps (u, v) to the link's new weight; links not in the graph or already at it are skipped.
+        """
+        old = self.graph
+        graph = old.__class__()
+        graph.graph.update(old.graph)
+        graph._node = old._node        # routers' attributes are shared as they are
+        graph._adj = dict(old._adj)    # adjacency is copied only for routers on a changed link
+        changed = {}
+        for (u, v), weight in weights.items():
+            if not old.has_edge(u, v) or old[u][v].get(attribute, 1) == weight:
+                continue
+            changed[(u, v)] = old[u][v].get(attribute, 1)
+            for router in (u, v):
+                if graph._adj[router] is old._adj[router]:
+                    graph._adj[router] = dict(old._adj[router])
+            attributes = dict(graph._adj[u][v])
+            attributes[attribute] = weight
+            graph._adj[u][v] = graph._adj[v][u] = attributes
+        return Topology(graph, self.version + 1), changed
+
+    def restructured(self, routers=None, links=None, removed_routers=(), removed_links=()):
+        """Next version with routers and links added or removed, copying only the adjacency they touch
+
+        routers maps routers to add, or whose attributes to replace, to their attributes; links maps
+        links to add to theirs. Removing a router removes its links.
+        """
+        old = self.graph
+        graph = old.__class__()
+        graph.graph.update(old.graph)
+        graph._node = dict(old._node) if routers or removed_routers else old._node
+        graph._adj = dict(old._adj)
+
+        def adjacency(router):
+            """router's adjacency in the new version, copied from the old one before its first change"""
+            if graph._adj[router] is old._adj.get(router):
+                graph._adj[router] = dict(graph._adj[router])
+            return graph._adj[router]
+
+        for router in removed_routers:
+            for neighbor in graph._adj.pop(router):
+                if neighbor != router:
+                    del adjacency(neighbor)[router]
+            del graph._node[router]
+        for u, v in removed_links:
+            del adjacency(u)[v]
+            del adjacency(v)[u]
+        for router, attributes in (routers or {}).items():
+            graph._adj.setdefault(router, {})
+            graph._node[router] = dict(attributes)
+        for (u, v), attributes in (links or {}).items():
+            attributes = dict(attributes)
+            adjacency(u)[v] = adjacency(v)[u] = attributes
+        return Topology(graph, self.version + 1)
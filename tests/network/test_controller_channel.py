@@ -0,0 +1,102 @@
+"""
+Unit tests for the controller <-> router channel: table deltas and pushes.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, asyncio, threading, time, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+from controller_channel import ControllerChannel, apply_delta   # noqa: E402
+from router_channel import RouterChannelHub, table_delta       # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def flow(dest, hop, metric=1.0):
+    return {"match": {"destination": dest}, "action": {"forward_to": hop}, "priority": 100, "metric": metric}
+
+def table(*flows, interfaces=("router2", "router4")):
+    return {"router_id": "router1",
+            "interfaces": {n: {"ip_address": f"10.0.{n[6:]}.1"} for n in interfaces},
+            "routes": [], "flow_table": list(flows)}
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+@pytest.fixture
+def hub():
+    hub = RouterChannelHub()
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(hub.start("127.0.0.1", 0, lambda r, m: None), loop).result()
+    hub.port = hub.server.sockets[0].getsockname()[1]
+    yield hub
+    asyncio.run_coroutine_threadsafe(hub.stop(), loop).result()
+    time.sleep(0.05)
+    loop.call_soon_threadsafe(loop.stop)
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_delta_round_trip():
+    old = table(flow("router3", "router2"), flow("router5", "router2"), flow("router6", "router4"))
+    new = table(flow("router3", "router2"), flow("router5", "router4", 2.0), flow("router7", "router4"),
+                interfaces=("router2", "router4", "router8"))
+    new["ports"] = {"8000": "8001"}
+    delta = table_delta(old, new)
+    assert [f["match"]["destination"] for f in delta["flow_table"]["upsert"]] == ["router5", "router7"]
+    assert delta["flow_table"]["remove"] == ["router6"]
+    assert list(delta["interfaces"]["upsert"]) == ["router8"] and "routes" not in delta
+    assert apply_delta(old, delta) == new
+    assert table_delta(new, new) == {}
+
+def test_only_changed_tables_are_pushed_as_deltas(hub):
+    received = []
+    hub.publish("router1", table(flow("router3", "router2")))
+    channel = ControllerChannel("router1", ("127.0.0.1", hub.port), received.append).start()
+    try:
+        wait_for(lambda: channel.version == 1)
+        hub.publish("router1", table(flow("router3", "router2")))      # unchanged
+        hub.publish("router1", table(flow("router3", "router4")))
+        wait_for(lambda: hub.status()["routers"]["router1"]["applied_version"] == 2)
+        assert [t["flow_table"][0]["action"]["forward_to"] for t in received] == ["router2", "router4"]
+        assert (channel.tables, channel.deltas) == (1, 1)
+        assert hub.status()["unchanged"] == 1
+    finally:
+        channel.running = False
+        channel.sock.close()
+
+def test_delta_for_another_version_triggers_a_full_resync(hub):
+    received = []
+    hub.publish("router1", table(flow("router3", "router2")))
+    channel = ControllerChannel("router1", ("127.0.0.1", hub.port), received.append).start()
+    try:
+        wait_for(lambda: channel.version == 1)
+        channel.version = 7                      # pretend we missed something
+        hub.publish("router1", table(flow("router3", "router4")))
+        wait_for(lambda: channel.tables == 2)
+        assert channel.resyncs == 1 and channel.version == 2
+        assert received[-1]["flow_table"][0]["action"]["forward_to"] == "router4"
+    finally:
+        channel.running = False
+        channel.sock.close()
+
+def test_forgotten_router_is_disconnected_and_a_readded_one_gets_its_table(hub):
+    received = []
+    hub.publish("router1", table(flow("router3", "router2")))
+    channel = ControllerChannel("router1", ("127.0.0.1", hub.port), received.append, max_backoff=0.05).start()
+    try:
+        wait_for(lambda: channel.version == 1)
+        hub.forget("router1")
+        assert "router1" not in hub.status()["routers"]
+        wait_for(lambda: "router1" in hub.sessions)           # it reconnects, still at version 1
+        assert hub.publish("router1", table(flow("router3", "router4"))) == 2
+        wait_for(lambda: channel.version == 2)
+        assert received[-1]["flow_table"][0]["action"]["forward_to"] == "router4"
+    finally:
+        channel.running = False
+        channel.sock.close()
@@ -0,0 +1,53 @@
+"""
+Unit tests for the controller's vectorized csgraph routing backend.
+
+Requires:
+  pip install pytest networkx scipy
+"""
+import os, sys, random
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                                   # noqa: E402
+from shortest_path_trees import ShortestPathTrees, all_shortest_path_trees   # noqa: E402
+
+pytest.importorskip("scipy")
+
+# ───────── helpers ──────────────────────────────────────────────────
+def tied_graph(n=120, seed=5):
+    """Weights of 1 and 2 mostly, so many routers have several shortest paths"""
+    rng = random.Random(seed)
+    g = nx.connected_watts_strogatz_graph(n, 4, 0.3, seed=seed)
+    g = nx.relabel_nodes(g, {i: f"router{i + 1}" for i in g})
+    for u, v in g.edges:
+        g[u][v]["weight"] = rng.choice([1.0, 1.0, 2.0, rng.uniform(1.0, 3.0)])
+    return g
+
+# ───────── test cases ───────────────────────────────────────────────
+@pytest.mark.parametrize("weight", ["weight", None])
+def test_csgraph_breaks_ties_like_networkx(weight):
+    g = tied_graph()
+    expected = all_shortest_path_trees(g, weight)
+    assert all_shortest_path_trees(g, weight, "csgraph") == expected
+    assert all_shortest_path_trees(g, weight, "csgraph", processes=2) == expected
+
+def test_unreachable_routers_are_left_out():
+    g = tied_graph(30)
+    g.add_edge("router91", "router92", weight=1.0)
+    distances, parents = all_shortest_path_trees(g, "weight", "csgraph")
+    assert "router91" not in distances["router1"]
+    assert parents["router91"] == {"router91": None, "router92": "router91"}
+    assert (distances, parents) == all_shortest_path_trees(g, "weight")
+
+def test_backend_is_checked_and_repairs_work_on_csgraph_trees():
+    g = tied_graph(40)
+    with pytest.raises(ValueError):
+        all_shortest_path_trees(g, backend="igraph")
+    trees = ShortestPathTrees(g, backend="csgraph")
+    u, v = next(iter(g.edges))
+    old, g[u][v]["weight"] = g[u][v]["weight"], 0.5
+    trees.update({(u, v): old})
+    assert trees.distances == ShortestPathTrees(g).distances
@@ -0,0 +1,117 @@
+"""
+Unit tests for the compiled router forwarding table.
+
+Requires:
+  pip install pytest
+"""
+import os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from forwarding_table import ForwardingTable   # noqa: E402
+from pool import NeighborPool                  # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def flow(dest, hop, priority=100, metric=1.0):
+    return {"match": {"destination": dest}, "action": {"forward_to": hop},
+            "priority": priority, "metric": metric}
+
+TABLE = {
+    "interfaces": {"router2": {"ip_address": "192.168.12.2"},
+                   "router4": {"ip_address": "192.168.14.2"}},
+    "routes": [{"destination": "router10", "next_hop": "router2", "metric": 4},
+               {"destination": "router5", "next_hop": "router2", "metric": 2}],
+    "flow_table": [flow("router10", "router4", 100, 7.0),
+                   flow("router10", "router2", 100, 9.0),
+                   flow("router7", "router9")],            # not a neighbor
+}
+
+class LiveLink:
+    closed = False
+
+def compile_table(table, pools=None):
+    pools = {} if pools is None else pools
+    return ForwardingTable.compile(table, lambda n: pools.setdefault(n, NeighborPool(n)))
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_flow_entries_beat_routes_and_lowest_metric_wins():
+    entry = compile_table(TABLE).get("router10")
+    assert entry.next_hop == "router4"
+    assert entry.interface_ip == "192.168.14.2"
+    assert entry.metric == 7.0
+
+def test_routes_fill_destinations_without_flows():
+    assert compile_table(TABLE).next_hop("router5") == "router2"
+
+def test_next_hops_must_be_neighbors():
+    fib = compile_table(TABLE)
+    assert fib.get("router7") is None
+    assert fib.next_hop("router99") is None
+
+def test_neighbor_pools_survive_recompilation():
+    pools, link = {}, LiveLink()
+    old = compile_table(TABLE, pools)
+    old.get("router10").neighbor.add(link)
+    new = compile_table(dict(TABLE, flow_table=[]), pools)
+    assert new.get("router10").next_hop == "router2"
+    assert compile_table(TABLE, pools).get("router10").neighbor.link is link
+
+def test_backup_takes_over_while_primary_has_no_live_link():
+    pools = {}
+    table = dict(TABLE, flow_table=[
+        {"match": {"destination": "router10"},
+         "action": {"forward_to": "router4", "backup_to": "router2"}, "priority": 100, "metric": 3.0}])
+    entry = compile_table(table, pools).get("router10")
+    assert (entry.backup_hop, entry.backup_ip) == ("router2", "192.168.12.2")
+    assert entry.active() is entry                # backup has no live link either
+    pools["router2"].add(LiveLink())
+    failed_over = entry.active()
+    assert (failed_over.next_hop, failed_over.interface_ip) == ("router2", "192.168.12.2")
+    assert failed_over.neighbor is pools["router2"] and failed_over.backup is None
+    pools["router4"].add(LiveLink())
+    assert entry.active() is entry                # primary is back
+
+def test_backup_must_be_another_neighbor():
+    table = dict(TABLE, flow_table=[
+        {"match": {"destination": "router10"}, "action": {"forward_to": "router4", "backup_to": "router9"}},
+        {"match": {"destination": "router5"}, "action": {"forward_to": "router4", "backup_to": "router4"}}])
+    fib = compile_table(table)
+    assert fib.get("router10").backup is None and fib.get("router5").backup is None
+    assert fib.protected == 0
+
+def test_streams_hash_to_weighted_group_members_and_skip_dead_ones():
+    pools = {}
+    table = dict(TABLE, router_id="router1", flow_table=[
+        {"match": {"destination": "router10"},
+         "action": {"forward_to": "router4", "group": [{"next_hop": "router4", "weight": 30, "metric": 3.0},
+                                                       {"next_hop": "router2", "weight": 10, "metric": 4.0},
+                                                       {"next_hop": "router9", "weight": 10, "metric": 3.0}]},
+         "priority": 100, "metric": 3.0}])
+    fib = compile_table(table, pools)
+    entry = fib.get("router10")
+    assert fib.multipath == 1 and len(entry.group.members) == 2   # router9 is not a neighbor
+    assert entry.for_stream(7) is entry                            # no member has a live link yet
+    pools["router2"].add(LiveLink())
+    pools["router4"].add(LiveLink())
+    picks = {stream: entry.for_stream(stream).next_hop for stream in range(1, 2001)}
+    assert picks == {stream: entry.for_stream(stream).next_hop for stream in picks}   # stable per stream
+    assert 1300 < sum(hop == "router4" for hop in picks.values()) < 1700              # about 3 in 4
+    assert entry.for_stream(0) is entry
+    pools["router4"].links[0].closed = True
+    assert {entry.for_stream(stream).next_hop for stream in picks} == {"router2"}
+
+def test_pinned_class_entries_fall_back_on_the_ordinary_next_hop():
+    pools = {}
+    table = dict(TABLE, priority_flows=[
+        {"match": {"destination": "router10", "traffic_class": "exchange"},
+         "action": {"forward_to": "router2"}, "priority": 200, "metric": 1.5},
+        {"match": {"destination": "router10"}, "action": {"forward_to": "router2"}, "priority": 200}])  # no class
+    fib = compile_table(table, pools)
+    assert fib.get("router10").next_hop == "router4"               # other traffic keeps its flow entry
+    pinned = fib.get("router10", "exchange")
+    assert (pinned.next_hop, pinned.priority, pinned.backup_hop) == ("router2", 200, "router4")
+    assert fib.get("router5", "exchange") is fib.get("router5")    # no pinned path there
+    assert fib.pinned == 1
+    pools["router4"].add(LiveLink())
+    assert pinned.active().next_hop == "router4"                   # pinned neighbor has no live link
@@ -0,0 +1,67 @@
+"""
+Unit tests for the router-to-router binary framing.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, socket, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import (                                   # noqa: E402
+    FRAME_EXCHANGE_DATA, FRAME_ACK, ACK_NO_ROUTE, HEADER_SIZE, FLAG_HOP_TIMES,
+    Frame, encode_frame, encode_ack, decode_frame, read_frame,
+)
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_roundtrip_keeps_payload_and_trace():
+    payload = bytes(range(256)) * 3
+    frame = Frame(FRAME_EXCHANGE_DATA, "router1", "router10", payload,
+                  route=["router1", "router4", "router6"])
+    wire = encode_frame(frame)
+    assert len(wire) == HEADER_SIZE + 2 * 3 + len(payload)
+
+    out = decode_frame(wire)
+    assert out.type == FRAME_EXCHANGE_DATA
+    assert (out.source, out.destination) == ("router1", "router10")
+    assert out.route == ["router1", "router4", "router6"]
+    assert bytes(out.payload) == payload
+
+def test_hop_times_follow_the_trace():
+    frame = Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"order",
+                  route=["router1", "router4"], flags=FLAG_HOP_TIMES)
+    frame.stamps = [(10, 25), (2**40, 2**40 + 7)]
+    wire = encode_frame(frame)
+    assert len(wire) == HEADER_SIZE + (2 + 16) * 2 + 5
+
+    out = decode_frame(wire)
+    assert out.route == ["router1", "router4"]
+    assert out.stamps == [(10, 25), (2**40, 2**40 + 7)]
+    assert bytes(out.payload) == b"order"
+
+    frame.stamps = frame.stamps[:1]
+    with pytest.raises(ValueError):
+        encode_frame(frame)
+
+def test_ack_is_header_only():
+    out = decode_frame(encode_ack("router4", "router1", ACK_NO_ROUTE))
+    assert out.type == FRAME_ACK and out.flags == ACK_NO_ROUTE
+    assert len(out.payload) == 0
+
+def test_rejects_json_and_truncated_input():
+    with pytest.raises(ValueError):
+        decode_frame(b'{"type": "hello"}' + b" " * HEADER_SIZE)
+    wire = encode_frame(Frame(FRAME_EXCHANGE_DATA, "router1", "router2", b"x" * 10))
+    with pytest.raises(ValueError):
+        decode_frame(wire[:-1])
+
+def test_read_frame_reassembles_split_segments():
+    wire = encode_frame(Frame(FRAME_EXCHANGE_DATA, "router1", "router2", b"abcdef"))
+    a, b = socket.socketpair()
+    try:
+        b.sendall(wire[5:])
+        out = read_frame(a, wire[:5])          # header split across reads
+        assert bytes(out.payload) == b"abcdef"
+    finally:
+        a.close(); b.close()
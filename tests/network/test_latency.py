@@ -0,0 +1,78 @@
+"""
+Unit tests for per-hop latency histograms and the stats endpoint.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, json, urllib.request
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import FRAME_EXCHANGE_DATA, FLAG_HOP_TIMES, Frame   # noqa: E402
+from latency import LatencyHistogram, RouterStats, start_stats_server  # noqa: E402
+
+MS = 1_000_000  # ns
+
+# ───────── helpers ──────────────────────────────────────────────────
+def stamped_frame(stamps, route):
+    frame = Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"order",
+                  route=list(route), flags=FLAG_HOP_TIMES)
+    frame.stamps = list(stamps)
+    return frame
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_histogram_percentiles_bound_the_samples():
+    hist = LatencyHistogram()
+    for _ in range(98):
+        hist.record(300_000)        # 0.3 ms
+    hist.record(5 * MS)
+    hist.record(40 * MS)
+    out = hist.to_dict()
+    assert out["count"] == 100
+    assert 0.3 <= out["p50_ms"] < 0.6
+    assert 5 <= out["p99_ms"] < 10
+    assert out["max_ms"] == 40 and out["min_ms"] == 0.3
+    assert LatencyHistogram().to_dict() == {"count": 0}
+
+def test_sampling_marks_every_nth_tunnel_frame():
+    stats = RouterStats("router1", sample_every=4)
+    frames = [Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"x") for _ in range(8)]
+    for i, frame in enumerate(frames):
+        stats.start_frame(frame, i)
+    assert [bool(f.flags & FLAG_HOP_TIMES) for f in frames] == [True, False, False, False] * 2
+    assert all(f.arrived is not None for f in frames)
+    assert stats.sampled == 2
+
+def test_destination_splits_the_trip_into_segments():
+    stats = RouterStats("router10")
+    frame = stamped_frame([(0, 1 * MS), (3 * MS, 4 * MS)], ["router1", "router4"])
+    frame.arrived = 10 * MS
+    stats.on_receive("router4", frame)
+    stats.on_deliver(frame)
+
+    snap = stats.snapshot()
+    assert snap["links"]["router4"]["max_ms"] == 6
+    assert snap["end_to_end"]["router1"]["max_ms"] == 10
+    assert snap["rx"]["router4"] == {"packets": 1, "bytes": 5}
+    (path,) = snap["paths"]
+    assert path["route"] == ["router1", "router4", "router10"]
+    assert [(s["segment"], s["max_ms"]) for s in path["segments"]] == [
+        ("router1", 1), ("router1->router4", 2), ("router4", 1), ("router4->router10", 6)]
+
+def test_stats_endpoint_serves_the_snapshot():
+    stats = RouterStats("router3")
+    frame = Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"abc")
+    frame.arrived = 0
+    stats.on_forward(frame, "router4", 2 * MS)
+    server = start_stats_server(stats.snapshot, "127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/stats"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            snap = json.load(response)
+        assert snap["router"] == "router3"
+        assert snap["tx"]["router4"] == {"packets": 1, "bytes": 3}
+        assert snap["residence"]["router10"]["count"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
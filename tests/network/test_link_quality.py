@@ -0,0 +1,49 @@
+"""
+Unit tests for heartbeat-based link quality probing.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from link_quality import LinkQuality                         # noqa: E402
+
+MS = 1_000_000  # ns
+
+# ───────── helpers ──────────────────────────────────────────────────
+def answer(quality, sent, rtt_ms):
+    number, padding = quality.probe(now=sent)
+    quality.on_reply(number, now=sent + int(rtt_ms * MS))
+    return padding
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_rtt_and_jitter_are_smoothed():
+    quality = LinkQuality(bulk_every=0)
+    for i in range(20):
+        answer(quality, i * 1000 * MS, 2.0)
+    answer(quality, 20_000 * MS, 50.0)             # one slow probe
+    snap = quality.snapshot()
+    assert 2.0 < snap["rtt_ms"] < 10.0
+    assert 0 < snap["jitter_ms"] < 5.0
+    assert snap["loss"] == 0.0 and snap["throughput_mbps"] is None
+
+def test_unanswered_probes_count_as_lost():
+    quality = LinkQuality(timeout=2.0, bulk_every=0)
+    answer(quality, 0, 1.0)
+    number, _ = quality.probe(now=1000 * MS)
+    assert quality.expire(now=2000 * MS) == 0
+    assert quality.expire(now=3500 * MS) == 1
+    assert not quality.on_reply(number, now=3600 * MS)   # too late
+    snap = quality.snapshot()
+    assert snap["lost"] == 1 and 0 < snap["loss"] <= 0.1 + 1e-9
+
+def test_bulk_probe_estimates_throughput():
+    quality = LinkQuality(bulk_every=5, bulk_bytes=125_000)
+    paddings = [answer(quality, i * 1000 * MS, 1.0 if i != 4 else 11.0) for i in range(5)]
+    assert paddings == [0, 0, 0, 0, 125_000]
+    # 125 kB in the 10 ms it took over a small probe = 100 Mbit/s
+    assert quality.snapshot()["throughput_mbps"] == pytest.approx(100.0)
+    assert quality.snapshot()["rtt_ms"] == pytest.approx(1.0)  # bulk probes stay out of the RTT
@@ -0,0 +1,78 @@
+"""
+Unit tests for link liveness detection and the controller's loop-free alternates.
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys, socket
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                               # noqa: E402
+from framing import FRAME_LIVENESS, read_frame                      # noqa: E402
+from liveness import LivenessMonitor                                # noqa: E402
+from loop_free_alternates import loop_free_alternate              # noqa: E402
+from pipeline import PipelinedLink                                  # noqa: E402
+from pool import NeighborPool                                       # noqa: E402
+from shortest_path_trees import ShortestPathTrees                   # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def pool_with_link(a):
+    pool = NeighborPool("router2")
+    link = PipelinedLink("router1", "router2", a)
+    pool.add(link)
+    return pool, link
+
+def graph(edges):
+    g = nx.Graph()
+    for u, v, w in edges:
+        g.add_edge(f"router{u}", f"router{v}", weight=w)
+    return g
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_beacon_announces_interval_and_multiplier():
+    a, b = socket.socketpair()
+    try:
+        pool, link = pool_with_link(a)
+        LivenessMonitor(0.05, 4).beacon(link)
+        beacon = read_frame(b)
+        assert (beacon.type, beacon.seq, beacon.flags) == (FRAME_LIVENESS, 50_000, 4)
+        receiver = LivenessMonitor()
+        receiver.on_beacon(link, beacon)
+        assert link.detect_time == 0.2
+    finally:
+        a.close(); b.close()
+
+def test_only_waiting_readers_past_the_detection_time_expire():
+    a, b = socket.socketpair()
+    try:
+        pool, link = pool_with_link(a)
+        monitor = LivenessMonitor()
+        link.idle_since = 100.0
+        assert monitor.expired([pool], now=200.0) == []   # no beacon from the neighbor yet
+        link.detect_time = 0.3
+        assert monitor.expired([pool], now=100.2) == []
+        assert monitor.expired([pool], now=100.4) == [link]
+        link.idle_since = None                            # reader busy with a batch
+        assert monitor.expired([pool], now=200.0) == []
+        assert monitor.detections == 1 and monitor.last_detection[0] == "router2"
+    finally:
+        a.close(); b.close()
+
+def test_alternate_must_not_loop_back_through_the_source():
+    # 1 - 2 - 4 is the primary; 3 only reaches 4 through 1
+    g = graph([(1, 2, 1), (2, 4, 1), (1, 3, 1), (3, 4, 5)])
+    d = ShortestPathTrees(g).distances
+    assert loop_free_alternate(g, d, "router1", "router4", "router2") is None
+    g["router3"]["router4"]["weight"] = 2
+    d = ShortestPathTrees(g).distances
+    assert loop_free_alternate(g, d, "router1", "router4", "router2") == ("router3", 3, "node")
+
+def test_node_protecting_alternate_is_preferred():
+    # From 1 towards 5 via 2: 3 reaches 5 through 2 (link protection only), 4 avoids 2
+    g = graph([(1, 2, 1), (2, 5, 1), (1, 3, 1), (3, 2, 1), (1, 4, 1), (4, 5, 2)])
+    d = ShortestPathTrees(g).distances
+    assert loop_free_alternate(g, d, "router1", "router5", "router2") == ("router4", 3, "node")
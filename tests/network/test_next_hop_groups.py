@@ -0,0 +1,77 @@
+"""
+Unit tests for the controller's weighted next-hop groups (ECMP and bounded stretch).
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys, random
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                   # noqa: E402
+from shortest_path_trees import ShortestPathTrees       # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def diamond():
+    """router1 reaches router4 over router2 or router3 at the same cost, or over router5 a little costlier"""
+    g = nx.Graph()
+    for middle, weight in (("router2", 1.0), ("router3", 1.0), ("router5", 1.25)):
+        g.add_edge("router1", middle, weight=weight)
+        g.add_edge(middle, "router4", weight=weight)
+    return g
+
+def random_graph(n=50, seed=5):
+    rng = random.Random(seed)
+    g = nx.connected_watts_strogatz_graph(n, 4, 0.3, seed=seed)
+    g = nx.relabel_nodes(g, {i: f"router{i + 1}" for i in g})
+    for u, v in g.edges:
+        g[u][v]["weight"] = float(rng.choice([1, 2, 3]))  # few distinct weights, so paths tie
+    return g
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_equal_cost_next_hops_form_a_group_led_by_the_tree_next_hop():
+    action = ShortestPathTrees(diamond(), multipath=4).flow_entry("router1", "router4")["action"]
+    assert action["forward_to"] in ("router2", "router3")
+    assert [m["next_hop"] for m in action["group"]][0] == action["forward_to"]
+    assert {m["next_hop"] for m in action["group"]} == {"router2", "router3"}
+    assert [(m["weight"], m["metric"]) for m in action["group"]] == [(10, 2.0), (10, 2.0)]
+    assert "group" not in ShortestPathTrees(diamond()).flow_entry("router1", "router4")["action"]
+
+def test_stretch_admits_costlier_paths_with_less_weight_up_to_the_limit():
+    trees = ShortestPathTrees(diamond(), multipath=4, stretch=0.3)
+    group = trees.flow_entry("router1", "router4")["action"]["group"]
+    assert [m["next_hop"] for m in group][2] == "router5"
+    assert (group[2]["weight"], group[2]["metric"]) == (8, 2.5)
+    assert len(ShortestPathTrees(diamond(), multipath=2, stretch=0.3)
+               .flow_entry("router1", "router4")["action"]["group"]) == 2
+
+def test_every_member_chain_reaches_the_destination_without_loops():
+    g = random_graph()
+    trees = ShortestPathTrees(g, multipath=4, stretch=0.5)
+    for destination in list(g)[:10]:
+        hops = {}
+        for source in g:
+            if source != destination:
+                action = trees.flow_entry(source, destination)["action"]
+                hops[source] = [m["next_hop"] for m in action.get("group", [{"next_hop": action["forward_to"]}])]
+        forwarding = nx.DiGraph([(source, hop) for source, members in hops.items() for hop in members])
+        assert nx.is_directed_acyclic_graph(forwarding)
+        assert all(nx.has_path(forwarding, source, destination) for source in hops)
+
+def test_groups_are_rebuilt_where_a_weight_change_reaches_them():
+    g, rng = random_graph(), random.Random(11)
+    trees = ShortestPathTrees(g, multipath=4, stretch=0.25)
+    tables = {source: trees.flow_table(source) for source in g}
+    edges = list(g.edges)
+    for _ in range(25):
+        u, v = rng.choice(edges)
+        changed_links = {(u, v): g[u][v]["weight"]}
+        g[u][v]["weight"] = float(rng.choice([1, 2, 3]))
+        stale = trees.stale_entries(trees.update(changed_links), changed_links)
+        for source, destinations in stale.items():
+            tables[source] = trees.flow_table(source, tables[source], destinations)
+        # Repairs may settle ties on other parents than a rebuild, so compare with whole tables of the same trees
+        assert tables == {source: trees.flow_table(source) for source in g}
+        fresh = ShortestPathTrees(g, multipath=4, stretch=0.25)
+        assert trees.distances == fresh.distances
@@ -0,0 +1,67 @@
+"""
+Unit tests for the sampled packet trace ring buffer.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, json, urllib.request, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import FRAME_EXCHANGE_DATA, FRAME_ACK, ACK_NO_ROUTE, Frame   # noqa: E402
+from latency import RouterStats, start_stats_server                      # noqa: E402
+from packet_trace import (                                                # noqa: E402
+    TRACE_RECEIVE, TRACE_FORWARD, TRACE_DROP,
+    PacketTracer, decode_dump, parse_rates,
+)
+
+# ───────── helpers ──────────────────────────────────────────────────
+def data_frame(stream=1):
+    return Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"x" * 33,
+                 route=["router1", "router2"], stream=stream)
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_sampling_rate_is_per_packet_type():
+    tracer = PacketTracer("router3", rates=parse_rates("exchange_data=4,ack=0"))
+    frames = [data_frame(i) for i in range(8)]
+    traced = [tracer.sample(f, TRACE_RECEIVE, "router2") for f in frames]
+    assert traced == [False, False, False, True] * 2
+    assert not tracer.sample(Frame(FRAME_ACK, "router2", "router3"), TRACE_RECEIVE, "router2")
+    assert tracer.written == 2
+
+def test_ring_keeps_the_newest_records_in_order():
+    tracer = PacketTracer("router3", capacity=4, rates=parse_rates("exchange_data=1"))
+    for stream in range(1, 11):
+        frame = data_frame(stream)
+        tracer.sample(frame, TRACE_RECEIVE, "router2", now=stream)
+    tracer.record(TRACE_DROP, frame, status=ACK_NO_ROUTE, now=11)
+
+    router, records = decode_dump(tracer.dump())
+    assert router == "router3"
+    assert [r["stream"] for r in records] == [8, 9, 10, 10]
+    assert [r["event"] for r in records] == ["receive"] * 3 + ["drop"]
+    first = records[0]
+    assert (first["source"], first["destination"], first["peer"]) == ("router1", "router10", "router2")
+    assert (first["type"], first["hops"], first["bytes"]) == ("exchange_data", 2, 33)
+    assert records[-1]["status"] == ACK_NO_ROUTE
+
+def test_unknown_packet_type_is_rejected():
+    with pytest.raises(ValueError):
+        parse_rates("heartbeat=1")
+
+def test_trace_endpoint_serves_binary_and_json():
+    tracer = PacketTracer("router4", rates=parse_rates("exchange_data=1"))
+    frame = data_frame()
+    tracer.sample(frame, TRACE_RECEIVE, "router3")
+    tracer.record(TRACE_FORWARD, frame, "router5")
+    server = start_stats_server(RouterStats("router4").snapshot, "127.0.0.1", 0, tracer)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/trace"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert decode_dump(response.read())[1][1]["peer"] == "router5"
+        with urllib.request.urlopen(url + "?format=json", timeout=5) as response:
+            assert [r["event"] for r in json.load(response)["records"]] == ["receive", "forward"]
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,71 @@
+"""
+Unit tests for the windowed neighbor link sender.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, socket, threading, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import ACK_NO_ROUTE, FRAME_EXCHANGE_DATA, Frame, read_frame   # noqa: E402
+from pipeline import PipelinedLink                            # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def data_frame():
+    return Frame(FRAME_EXCHANGE_DATA, "router1", "router10", b"order")
+
+@pytest.fixture
+def link():
+    a, b = socket.socketpair()
+    lk = PipelinedLink("router1", "router2", a, window=4, ack_timeout=0.2)
+    yield lk, b
+    lk.close(); b.close()
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_window_limits_unacked_frames(link):
+    lk, peer = link
+    for _ in range(4):
+        assert lk.send(data_frame())
+    assert lk.in_flight == 4
+    assert not lk.send(data_frame())              # full window times out
+    assert [read_frame(peer).seq for _ in range(4)] == [1, 2, 3, 4]
+
+def test_cumulative_ack_releases_waiting_sender(link):
+    lk, peer = link
+    for _ in range(4):
+        lk.send(data_frame())
+    threading.Timer(0.05, lk.on_ack, args=(3,)).start()
+    assert lk.send(data_frame())                  # unblocked by the ack
+    assert lk.in_flight == 2 and lk.acked_seq == 3
+    lk.on_ack(2)                                  # stale ack is ignored
+    assert lk.in_flight == 2
+
+def test_close_returns_unacknowledged_frames(link):
+    lk, _ = link
+    for _ in range(3):
+        lk.send(data_frame())
+    lk.on_ack(1)
+    assert [f.seq for f in lk.close()] == [2, 3]
+    assert not lk.send(data_frame())
+
+def test_unencodable_frame_gives_its_window_slot_back(link):
+    lk, peer = link
+    too_long = data_frame()
+    too_long.route = ["router2"] * 256
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            lk.send(too_long)
+    assert lk.reserved == 0 and lk.in_flight == 0
+    assert lk.send(data_frame())
+    assert read_frame(peer).seq == 1
+
+def test_failure_acks_release_the_slot_but_count_the_frame(link):
+    lk, _ = link
+    frames = [data_frame() for _ in range(3)]
+    for frame in frames:
+        lk.send(frame)
+    assert lk.on_ack(2, ACK_NO_ROUTE) is frames[1]     # covers 1 too, but only 2 failed
+    assert lk.on_ack(3) is None
+    assert lk.in_flight == 0 and (lk.frames_acked, lk.frames_failed) == (3, 1)
@@ -0,0 +1,63 @@
+"""
+Unit tests for the per-neighbor link pool.
+
+Requires:
+  pip install pytest
+"""
+import os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from pool import NeighborPool                                 # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+class FakeLink:
+    def __init__(self):
+        self.closed = False
+        self.in_flight = 0
+        self.window = 64
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_borrow_counts_hits_and_misses():
+    pool = NeighborPool("router2", size=2)
+    assert pool.borrow() is None
+    link = FakeLink()
+    pool.add(link)
+    assert pool.borrow(5) is link
+    assert (pool.hits, pool.misses) == (1, 1)
+
+def test_same_key_sticks_to_one_link_and_skips_closed_ones():
+    pool = NeighborPool("router2", size=2)
+    a, b = FakeLink(), FakeLink()
+    pool.add(a); pool.add(b)
+    assert pool.borrow(1) is pool.borrow(1)
+    assert {pool.borrow(0), pool.borrow(1)} == {a, b}
+    a.closed = True
+    assert pool.borrow(0) is b and pool.borrow(1) is b
+    assert pool.deficit == 1 and pool.healthy
+
+def test_discard_only_counts_members():
+    pool = NeighborPool("router2")
+    link = FakeLink()
+    pool.add(link)
+    assert pool.discard(link)
+    assert not pool.discard(link)
+    assert pool.drops == 1 and not pool.healthy
+
+def test_backoff_grows_is_capped_and_resets():
+    pool = NeighborPool("router2", base_backoff=1.0, max_backoff=4.0)
+    delays = [pool.connect_failed() for _ in range(6)]
+    assert delays[1] > 0.5 * 1.0 and all(d <= 4.0 for d in delays)
+    assert not pool.can_connect()
+    pool.add(FakeLink())
+    assert pool.failures == 0 and pool.can_connect()
+
+def test_links_beyond_the_size_are_refused_until_one_closes():
+    pool = NeighborPool("router2", size=2)
+    a, b, c = FakeLink(), FakeLink(), FakeLink()
+    assert pool.add(a) and pool.add(b)
+    assert not pool.add(c)                      # both ends dialed: the extra link is refused
+    assert pool.links == (a, b)
+    a.closed = True
+    assert pool.add(c) and pool.links == (b, c)
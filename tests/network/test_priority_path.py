@@ -0,0 +1,103 @@
+"""
+Unit tests for the exchange pair's pinned, latency-optimized path.
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                                       # noqa: E402
+from priority_path import PRIORITY, PriorityPath, constrained_shortest_path  # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def ladder():
+    """router1 to router4 over one slow hop through router5, or two fast ones through router2 and router3"""
+    g = nx.Graph()
+    for u, v, weight in (("router1", "router2", 1.0), ("router2", "router3", 1.0), ("router3", "router4", 1.0),
+                         ("router1", "router5", 2.0), ("router5", "router4", 2.0)):
+        g.add_edge(u, v, weight=weight)
+    return g
+
+def report(rtt_ms, loss=0.0, jitter_ms=0.0):
+    return {"router": {"rtt_ms": rtt_ms, "jitter_ms": jitter_ms, "loss": loss}}
+
+def latency_of(g, measurements=None):
+    return PriorityPath("router1", "router4").latencies(g, measurements or {})
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_hop_bound_trades_latency_for_fewer_links():
+    g = ladder()
+    assert constrained_shortest_path(g, "router1", "router4", latency_of(g)) == \
+        (["router1", "router2", "router3", "router4"], 3.0)
+    assert constrained_shortest_path(g, "router1", "router4", latency_of(g), max_hops=2) == \
+        (["router1", "router5", "router4"], 4.0)
+    assert constrained_shortest_path(g, "router1", "router4", latency_of(g), max_hops=1) == (None, float("inf"))
+
+def test_measured_latency_and_loss_decide_the_path():
+    g = ladder()
+    slow = {("router2", "router3"): report(rtt_ms=8.0, jitter_ms=1.0)}       # 5 ms one way
+    path = PriorityPath("router1", "router4")
+    path.update(g, slow)
+    assert path.path == ["router1", "router5", "router4"] and path.latency == 4.0
+    lossy = {("router4", "router5"): report(rtt_ms=0.2, loss=0.2)}
+    path = PriorityPath("router1", "router4")
+    path.update(g, lossy)
+    assert path.path == ["router1", "router2", "router3", "router4"]
+
+def test_pinned_path_only_moves_for_a_clear_gain_or_when_it_breaks():
+    g, path = ladder(), PriorityPath("router1", "router4", switch_gain=0.5)
+    assert path.update(g, {("router1", "router5"): report(rtt_ms=1.0), ("router4", "router5"): report(rtt_ms=1.0)})
+    assert path.path == ["router1", "router5", "router4"]
+    assert not path.update(g, {})                      # 3 ms is not 50% better than 4 ms
+    assert path.path == ["router1", "router5", "router4"] and path.latency == 4.0
+    assert path.update(g, {("router1", "router5"): report(rtt_ms=0.2, loss=0.5)})
+    assert path.path == ["router1", "router2", "router3", "router4"] and path.switches == 1
+
+def test_entries_for_both_directions_and_background_avoids_the_reserved_links():
+    g, path = ladder(), PriorityPath("router1", "router4", avoidance=4.0)
+    path.update(g, {})
+    entries = path.flow_entries("router2")
+    assert [(e["match"], e["action"]["forward_to"], e["priority"], e["path"], e["metric"]) for e in entries] == [
+        ({"destination": "router4", "traffic_class": "exchange"}, "router3", PRIORITY,
+         ["router2", "router3", "router4"], 2.0),
+        ({"destination": "router1", "traffic_class": "exchange"}, "router1", PRIORITY, ["router2", "router1"], 1.0)]
+    assert [e["match"]["destination"] for e in path.flow_entries("router4")] == ["router1"]
+    assert path.flow_entries("router5") == []
+    assert not path.update(g, {("router2", "router3"): report(rtt_ms=1.5)})
+    assert path.flow_entries("router2") == entries     # metrics stay those of the pinned path
+    background = g.copy()
+    for (u, v), weight in path.background_weights(g).items():
+        background[u][v]["weight"] = weight
+    assert nx.shortest_path(background, "router1", "router4", weight="weight") == ["router1", "router5", "router4"]
+
+def test_hold_down_keeps_a_new_path_for_a_while_and_counts_what_it_suppressed():
+    now = [0.0]
+    g, path = ladder(), PriorityPath("router1", "router4", switch_gain=0.2, hold_down=60, clock=lambda: now[0])
+    slow = {("router2", "router3"): report(rtt_ms=8.0)}
+    path.update(g, slow)
+    assert path.path == ["router1", "router5", "router4"]
+    now[0] = 30
+    assert not path.update(g, {})                   # 3 ms beats 4 ms by enough, but the path is held down
+    assert path.suppressed == 1 and path.status()["suppressed"] == 1
+    now[0] = 61
+    assert path.update(g, {}) and path.path == ["router1", "router2", "router3", "router4"]
+    assert path.update(g, {("router3", "router4"): report(rtt_ms=0.2, loss=0.5)})   # broken: switch at once
+    assert path.path == ["router1", "router5", "router4"] and path.switches == 2
+
+def test_disabled_pin_leaves_exchange_traffic_to_the_flow_tables():
+    g, path = ladder(), PriorityPath("router1", "router4", enabled=False)
+    assert not path.update(g, {})
+    assert path.path is None and path.reserved() == set() and path.background_weights(g) == {}
+    assert path.flow_entries("router1") == [] and path.status()["enabled"] is False
+
+def test_reset_forgets_the_pin_so_a_new_network_is_not_held_down():
+    now = [0.0]
+    g, path = ladder(), PriorityPath("router1", "router4", hold_down=60, clock=lambda: now[0])
+    path.update(g, {("router2", "router3"): report(rtt_ms=8.0)})
+    assert path.path == ["router1", "router5", "router4"]
+    path.reset()
+    assert path.path is None and path.hops == {} and path.flow_entries("router5") == []
+    assert path.update(g, {}) and path.path == ["router1", "router2", "router3", "router4"]
@@ -0,0 +1,71 @@
+"""
+Unit tests for the controller's coalescing flow table recompute scheduler.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, threading, time
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+from recompute_scheduler import RecomputeScheduler   # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+class Recorder:
+    """apply() stand-in that remembers every batch and can be held up"""
+    def __init__(self, fail=False):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = fail
+
+    def __call__(self, weights):
+        self.release.wait(5)
+        self.batches.append(weights)
+        if self.fail:
+            raise ValueError("no graph")
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_burst_is_applied_as_one_batch_with_the_newest_weights():
+    recorder = Recorder()
+    scheduler = RecomputeScheduler(debounce=0.1).start(recorder)
+    try:
+        versions = [scheduler.submit({("router1", "router2"): w}) for w in (3.0, 4.0)]
+        versions.append(scheduler.submit({("router2", "router3"): 1.5}))
+        assert versions == [1, 2, 3]
+        assert scheduler.status()["queue_depth"] == 3
+        assert scheduler.wait(3, timeout=5)
+        assert recorder.batches == [{("router1", "router2"): 4.0, ("router2", "router3"): 1.5}]
+        status = scheduler.status()
+        assert (status["applied_version"], status["recomputes"], status["coalesced"]) == (3, 1, 2)
+        assert status["queue_depth"] == 0 and status["recomputes_per_s"] > 0
+    finally:
+        scheduler.stop()
+
+def test_updates_during_a_recompute_wait_for_the_next_batch():
+    recorder = Recorder()
+    scheduler = RecomputeScheduler(debounce=0).start(recorder)
+    try:
+        recorder.release.clear()
+        first = scheduler.submit({("router1", "router2"): 2.0})
+        deadline = time.monotonic() + 5
+        while scheduler.status()["recomputing"] != first and time.monotonic() < deadline:
+            time.sleep(0.001)
+        second = scheduler.submit({("router1", "router2"): 5.0})
+        assert not scheduler.wait(first, timeout=0.05)
+        recorder.release.set()
+        assert scheduler.wait(second, timeout=5)
+        assert recorder.batches == [{("router1", "router2"): 2.0}, {("router1", "router2"): 5.0}]
+    finally:
+        scheduler.stop()
+
+def test_empty_reports_and_failed_recomputes_do_not_stall_versions():
+    scheduler = RecomputeScheduler(debounce=0).start(Recorder(fail=True))
+    try:
+        assert scheduler.submit({}) == 0
+        version = scheduler.submit({("router1", "router2"): 2.0})
+        assert scheduler.wait(version, timeout=5)
+        assert scheduler.status()["errors"] == 1
+    finally:
+        scheduler.stop()
@@ -0,0 +1,62 @@
+"""
+Unit tests for the controller's versioned response cache and long-polls.
+
+Requires:
+  pip install pytest
+"""
+import asyncio, os, sys, threading
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+from response_cache import ResponseCache, not_modified   # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+class Renders:
+    """render() stand-in that counts its calls"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"body {self.calls}".encode()
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_bodies_are_built_once_per_version_or_signature():
+    cache, render = ResponseCache(), Renders()
+    etag, body = cache.get("table/router1", 3, render)
+    assert cache.get("table/router1", 3, render) == (etag, body) and render.calls == 1
+    newer, _ = cache.get("table/router1", 4, render)
+    assert newer != etag and render.calls == 2
+    # Same signature at a new version: what the body shows did not change
+    graph = cache.get("graph", 1, render, signature=("router1", "router2"))
+    assert cache.get("graph", 2, render, signature=("router1", "router2")) == graph
+    assert cache.get("graph", 3, render, signature=("router1",)) != graph
+    assert render.calls == 4 and cache.status()["hits"] == 2
+
+def test_if_none_match_lists_and_wildcards():
+    assert not_modified('"a", "1-graph-2"', '"1-graph-2"')
+    assert not_modified('W/"1-graph-2"', '"1-graph-2"')
+    assert not_modified('*', '"1-graph-2"')
+    assert not not_modified(None, '"1-graph-2"')
+    assert not not_modified('"1-graph-1"', '"1-graph-2"')
+
+def test_long_poll_wakes_on_change_from_another_thread_or_times_out():
+    cache = ResponseCache()
+    version = [1]
+
+    def bump():
+        version[0] = 2
+        cache.changed("graph")
+
+    async def scenario():
+        cache.attach(asyncio.get_running_loop())
+        loop = asyncio.get_running_loop()
+        assert await cache.wait("graph", 1, lambda: version[0], timeout=5) == 1   # already there
+        loop.call_later(0.05, lambda: threading.Thread(target=bump).start())
+        start = loop.time()
+        assert await cache.wait("graph", 2, lambda: version[0], timeout=5) == 2
+        assert loop.time() - start < 2
+        assert await cache.wait("graph", 3, lambda: version[0], timeout=0.05) == 2
+
+    asyncio.run(scenario())
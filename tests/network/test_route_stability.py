@@ -0,0 +1,106 @@
+"""
+Unit tests for the controller's link weight smoothing, hysteresis and flap damping,
+and the hold-down of the tracked pair's path.
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                   # noqa: E402
+from route_stability import PathHold, RouteStability    # noqa: E402
+from shortest_path_trees import ShortestPathTrees       # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+LINK = ("router1", "router2")
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class Network:
+    """Published link weights, updated with whatever the filters let through"""
+    def __init__(self, stability, weight=1.0):
+        self.weights = {LINK: weight}
+        self.stability = stability
+
+    def report(self, weight, link=LINK):
+        published = self.stability.filter({link: weight}, self.weights.get)
+        self.weights.update(published)
+        return published
+
+def ladder():
+    """router1 to router4 over router2 and router3 (3), or over router5 (4)"""
+    g = nx.Graph()
+    for u, v, weight in (("router1", "router2", 1.0), ("router2", "router3", 1.0), ("router3", "router4", 1.0),
+                         ("router1", "router5", 2.0), ("router5", "router4", 2.0)):
+        g.add_edge(u, v, weight=weight)
+    return g
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_samples_are_smoothed_and_small_moves_held():
+    network = Network(RouteStability(alpha=0.5, hysteresis=0.1, suppress=0))
+    assert network.report(10.0) == {LINK: 10.0}      # the first sample seeds the average
+    assert network.report(10.8) == {}                # 10.4 is within 10% of 10
+    assert network.report(12.0) == {LINK: 11.2}      # 11.2 is not
+    assert network.report(10.0, ("router1", "router9")) == {}   # no such link
+    status = network.stability.status()
+    assert (status["samples"], status["published"], status["held"]) == (3, 2, 1)
+
+def test_flapping_link_is_suppressed_until_its_penalty_decays():
+    clock = Clock()
+    network = Network(RouteStability(alpha=1.0, hysteresis=0.1, penalty=1000, suppress=2500, reuse=750,
+                                     half_life=60, clock=clock))
+    for weight in (2.0, 1.0, 2.0):               # three published changes: penalty 3000, suppressed
+        assert network.report(weight) == {LINK: weight}
+        clock.now += 1
+    assert network.stability.status()["suppressions"] == 1
+    assert network.report(1.0) == {}             # cannot win traffic back yet
+    assert network.report(4.0) == {LINK: 4.0}   # but still gets worse at once
+    assert network.stability.status()["damped"] == 1
+    network.report(1.0)
+    clock.now += 60 * 3                          # 4000 halves three times: 500 < reuse
+    assert network.stability.filter({}, network.weights.get) == {LINK: 1.0}   # released without a report
+    assert network.stability.status()["suppressed_links"] == {}
+
+def test_penalty_is_capped_by_the_longest_suppression():
+    clock = Clock()
+    stability = RouteStability(alpha=1.0, hysteresis=0.0, penalty=1000, suppress=2000, reuse=500,
+                               half_life=10, max_suppress=20, clock=clock)
+    network = Network(stability)
+    for i in range(20):
+        network.report(1.0 + i % 2)
+    assert stability.links[LINK].penalty == 2000   # reuse * 2 ** (20 / 10)
+    assert network.weights[LINK] == 2.0          # only the rises got through since the suppression
+    clock.now += 20.5                            # 2000 halves just over twice: below reuse again
+    stability.filter({}, network.weights.get)
+    assert not stability.suppressed
+    assert network.report(1.0) == {LINK: 1.0}
+
+def test_pair_path_moves_only_for_a_clear_gain_after_its_hold_down():
+    clock, g = Clock(), ladder()
+    trees, hold = ShortestPathTrees(g), PathHold("router1", "router4", switch_gain=0.2, hold_down=60, clock=clock)
+    fast = ["router1", "router2", "router3", "router4"]
+    assert hold.update(trees.path("router1", "router4"), trees.path_cost) == fast
+    g["router2"]["router3"]["weight"] = 5.0
+    trees.update({("router2", "router3"): 1.0})
+    clock.now = 30
+    assert hold.update(trees.path("router1", "router4"), trees.path_cost) == fast   # 4 beats 7, but held down
+    assert hold.suppressed == 1 and hold.status()["suppressed"] == 1
+    entry = trees.flow_entry("router2", "router4", fast[1:])
+    assert entry["action"]["forward_to"] == "router3" and entry["metric"] == 6.0
+    assert "group" not in entry["action"]
+    clock.now = 61
+    assert hold.update(trees.path("router1", "router4"), trees.path_cost) == ["router1", "router5", "router4"]
+    g["router2"]["router3"]["weight"] = 1.0
+    trees.update({("router2", "router3"): 5.0})
+    g.remove_edge("router1", "router5")
+    trees.update({}, removed_links=[("router1", "router5")])
+    assert hold.update(trees.path("router1", "router4"), trees.path_cost) == fast   # broken: moves at once
+    assert hold.switches == 2 and trees.path_cost(["router1", "router5", "router4"]) is None
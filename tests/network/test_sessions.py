@@ -0,0 +1,50 @@
+"""
+Unit tests for the exchange tunnel session tables.
+
+Requires:
+  pip install pytest
+"""
+import os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import (                                   # noqa: E402
+    FRAME_EXCHANGE_RESPONSE, STREAM_FIN, Frame, encode_frame, decode_frame,
+)
+from sessions import SessionTable                       # noqa: E402
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_open_assigns_distinct_nonzero_stream_ids():
+    table = SessionTable()
+    ids = [table.open(object()).stream_id for _ in range(5)]
+    assert len(set(ids)) == 5 and 0 not in ids
+    assert len(table) == 5 and table.opened == 5
+
+def test_bind_keeps_first_endpoint():
+    table = SessionTable()
+    first = table.bind(7, "first")
+    again = table.bind(7, "second")
+    assert again is first and again.endpoint == "first"
+    assert table.get(7) is first and table.opened == 1
+
+def test_close_returns_session_only_once():
+    table = SessionTable()
+    session = table.open("sock")
+    assert table.close(session.stream_id) is session
+    assert table.close(session.stream_id) is None
+    assert table.get(session.stream_id) is None
+    assert (len(table), table.closed) == (0, 1)
+
+def test_response_measures_round_trip():
+    session = SessionTable().open("sock")
+    session.sent(37)
+    session.received(9)
+    assert session.last_rtt is not None and session.last_rtt >= 0
+    assert (session.frames_out, session.bytes_out, session.frames_in, session.bytes_in) == (1, 37, 1, 9)
+
+def test_stream_id_and_fin_survive_the_wire():
+    frame = Frame(FRAME_EXCHANGE_RESPONSE, "router10", "router1", b"",
+                  flags=STREAM_FIN, stream=0xDEADBEEF)
+    out = decode_frame(encode_frame(frame))
+    assert out.stream == 0xDEADBEEF and out.flags & STREAM_FIN
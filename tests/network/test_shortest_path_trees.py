@@ -0,0 +1,112 @@
+"""
+Unit tests for the controller's incremental shortest-path trees.
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys, random
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+import networkx as nx                                   # noqa: E402
+from shortest_path_trees import ShortestPathTrees       # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def random_graph(n=60, seed=3):
+    rng = random.Random(seed)
+    g = nx.connected_watts_strogatz_graph(n, 4, 0.3, seed=seed)
+    g = nx.relabel_nodes(g, {i: f"router{i + 1}" for i in g})
+    for u, v in g.edges:
+        g[u][v]["weight"] = rng.uniform(1.0, 10.0)
+    return g
+
+def set_weight(g, changed_links, u, v, weight):
+    changed_links.setdefault((u, v), g[u][v]["weight"])
+    g[u][v]["weight"] = weight
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_trees_match_networkx():
+    g = random_graph()
+    trees = ShortestPathTrees(g)
+    for source in g:
+        distances, paths = nx.single_source_dijkstra(g, source, weight="weight")
+        assert trees.distances[source] == distances
+        assert all(trees.path(source, d) == paths[d] for d in g)
+
+def test_repairs_and_partial_tables_match_a_full_rebuild():
+    g, rng = random_graph(), random.Random(7)
+    trees = ShortestPathTrees(g)
+    tables = {source: trees.flow_table(source) for source in g}
+    edges = list(g.edges)
+    for _ in range(40):
+        changed_links = {}
+        for u, v in rng.sample(edges, rng.choice([1, 3])):
+            set_weight(g, changed_links, u, v, g[u][v]["weight"] * rng.uniform(0.3, 1.7))
+        stale = trees.stale_entries(trees.update(changed_links), changed_links)
+        for source, destinations in stale.items():
+            tables[source] = trees.flow_table(source, tables[source], destinations)
+        fresh = ShortestPathTrees(g)
+        assert trees.distances == fresh.distances
+        assert trees.parents == fresh.parents
+        assert tables == {source: fresh.flow_table(source) for source in g}
+
+def test_only_trees_a_change_reaches_are_repaired():
+    g = nx.Graph()
+    g.add_edge("router1", "router2", weight=1.0)
+    g.add_edge("router2", "router3", weight=1.0)
+    g.add_edge("router1", "router3", weight=5.0)   # in no tree
+    trees = ShortestPathTrees(g)
+    g["router1"]["router3"]["weight"] = 8.0
+    assert trees.update({("router1", "router3"): 5.0}) == {}
+    g["router1"]["router3"]["weight"] = 1.5   # now the way from router1 to router3
+    changed = trees.update({("router1", "router3"): 8.0})
+    assert changed == {"router1": {"router3"}, "router3": {"router1"}}
+    assert trees.path("router1", "router3") == ["router1", "router3"]
+    assert trees.path("router2", "router3") == ["router2", "router3"]
+
+def test_stale_entries_cover_neighbors_that_read_a_repaired_tree():
+    g = nx.path_graph(["router1", "router2", "router3", "router4"])
+    nx.set_edge_attributes(g, 1.0, "weight")
+    trees = ShortestPathTrees(g)
+    stale = trees.stale_entries({"router4": {"router1"}})
+    assert stale["router4"] == {"router1"}
+    assert stale["router3"] == {"router1"}   # its alternates read router4's distances
+    assert set(stale) == {"router3", "router4"}
+    assert trees.stale_entries({"router4": {"router3"}})["router3"] is None   # its own distance changed
+
+def test_routers_and_links_added_and_removed_repair_to_a_rebuild():
+    g, rng = random_graph(40), random.Random(9)
+    trees = ShortestPathTrees(g, multipath=4)
+    tables = {source: trees.flow_table(source) for source in g}
+    for step in range(30):
+        structure = {}
+        if step % 5 == 4:                                  # a router goes, with its links
+            router = rng.choice(list(g))
+            structure = {"removed_routers": [router], "removed_links": list(g.edges(router))}
+            g.remove_node(router)
+            tables.pop(router)
+        elif step % 5 == 3:                                # a router comes, with two links
+            router = f"router{100 + step}"
+            links = [(router, r) for r in rng.sample(list(g), 2)]
+            g.add_weighted_edges_from((u, v, rng.uniform(1.0, 10.0)) for u, v in links)
+            structure = {"added_routers": [router], "added_links": links}
+            tables[router] = []
+        elif step % 2:                                     # a link fails, maybe cutting a router off
+            link = rng.choice(list(g.edges))
+            g.remove_edge(*link)
+            structure = {"removed_links": [link]}
+        else:
+            u, v = rng.sample(list(g), 2)
+            if g.has_edge(u, v):
+                continue
+            g.add_edge(u, v, weight=rng.uniform(1.0, 10.0))
+            structure = {"added_links": [(u, v)]}
+        changed = trees.update({}, g, **structure)
+        links = [*structure.get("removed_links", ()), *structure.get("added_links", ())]
+        for source, destinations in trees.stale_entries(changed, links).items():
+            tables[source] = trees.flow_table(source, tables[source], destinations)
+        fresh = ShortestPathTrees(g, multipath=4)
+        assert trees.distances == fresh.distances
+        assert tables == {source: trees.flow_table(source) for source in g}
+    assert trees.rebuilds == 1
@@ -0,0 +1,67 @@
+"""
+Unit tests for the controller's change-driven topology snapshots.
+
+Requires:
+  pip install pytest networkx matplotlib
+"""
+import os, sys, time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+from snapshot_renderer import SnapshotCanvas, SnapshotRenderer, prune_snapshots   # noqa: E402
+
+pytest.importorskip("matplotlib")
+
+# ───────── helpers ──────────────────────────────────────────────────
+def scene(version, weight=1.0, path=("router1", "router2", "router3"), extra_link=False):
+    edges = [("router1", "router2", weight), ("router2", "router3", 2.0), ("router1", "router3", 5.0)]
+    if extra_link:
+        edges.append(("router3", "router4", 1.0))
+    nodes = ["router1", "router2", "router3"] + (["router4"] if extra_link else [])
+    return {"version": version, "nodes": nodes, "edges": edges, "path": list(path),
+            "source": "router1", "destination": "router3"}
+
+def snapshots(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".png"))
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_weight_changes_reuse_layout_and_artists(tmp_path):
+    canvas = SnapshotCanvas(str(tmp_path))
+    canvas.render(scene(1))
+    canvas.render(scene(2, weight=3.25, path=("router1", "router3")))
+    assert (canvas.layouts, canvas.redraws) == (1, 1)
+    assert canvas.edge_labels[("router1", "router2")].get_text() == "3.2"
+    assert list(canvas.edges.get_linewidth()) == [2, 2, 4]
+    canvas.render(scene(3, extra_link=True))
+    assert (canvas.layouts, canvas.redraws) == (2, 2)
+    assert len(snapshots(tmp_path)) == 3
+
+def test_only_the_newest_snapshots_are_kept(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"network_graph_20240101_00000{i}_{i:04d}.png"
+        path.write_bytes(b"png")
+        os.utime(path, ns=(i, i))
+    (tmp_path / "notes.txt").write_text("kept")
+    assert prune_snapshots(str(tmp_path), 2) == 3
+    assert snapshots(tmp_path) == ["network_graph_20240101_000003_0003.png",
+                                   "network_graph_20240101_000004_0004.png"]
+    assert (tmp_path / "notes.txt").exists()
+
+def test_worker_process_coalesces_a_burst_and_idles_between_versions(tmp_path):
+    renderer = SnapshotRenderer(str(tmp_path), retain=10, min_interval=0.5).start()
+    try:
+        assert renderer.submit(scene(1))
+        assert not renderer.submit(scene(1))     # same version, nothing to draw
+        deadline = time.monotonic() + 60
+        while not snapshots(tmp_path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        for version in (2, 3, 4):                # within one min_interval
+            renderer.submit(scene(version, weight=float(version)))
+        time.sleep(1.5)
+        assert len(snapshots(tmp_path)) == 2
+    finally:
+        renderer.stop()
+    assert renderer.process is None
@@ -0,0 +1,96 @@
+"""
+Unit tests for stream reassembly and send coalescing on router sockets.
+
+Requires:
+  pip install pytest
+"""
+import os, sys, json, socket, threading, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from framing import FRAME_EXCHANGE_DATA, Frame, encode_frame   # noqa: E402
+from stream import BatchingWriter, MessageReassembler, recv_message   # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def wire(payload, stream=0):
+    return encode_frame(Frame(FRAME_EXCHANGE_DATA, "router1", "router10", payload, stream=stream))
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_many_frames_from_one_read():
+    r = MessageReassembler()
+    r.feed(b"".join(wire(bytes([i]) * 10) for i in range(50)))
+    out = list(r)
+    assert [bytes(f.payload)[0] for f in out] == list(range(50))
+    assert r.reads == 1 and r.pending == 0
+
+def test_partial_frame_waits_for_the_rest():
+    data = wire(b"abcdef") + wire(b"ghi")
+    r = MessageReassembler()
+    r.feed(data[:-2])
+    assert [bytes(f.payload) for f in r] == [b"abcdef"]
+    r.feed(data[-2:])
+    assert [bytes(f.payload) for f in r] == [b"ghi"]
+
+def test_json_followed_by_frames_keeps_the_frames():
+    hello = json.dumps({"type": "hello_ack", "status": "accepted"}).encode()
+    r = MessageReassembler(hello[:7])
+    assert r.next_message() is None                # JSON split across reads
+    r.feed(hello[7:] + wire(b"early"))
+    assert r.next_message()["type"] == "hello_ack"
+    rest = MessageReassembler(r.take_rest())       # handed to the link reader
+    assert bytes(rest.next_message().payload) == b"early"
+
+def test_back_to_back_json_messages():
+    r = MessageReassembler(b'{"a": 1}{"b": 2}\n{"c": "\xc3\xa9"}')
+    assert list(r) == [{"a": 1}, {"b": 2}, {"c": "é"}]
+
+def test_large_json_split_over_many_reads_is_scanned_once():
+    message = {"type": "table", "routes": [{"destination": f"router{i}", "note": 'br}ack]et "q" \\ é'}
+                                           for i in range(2000)]}
+    data = json.dumps(message).encode() + b"\n" + wire(b"after")
+    r, positions = MessageReassembler(), []
+    for i in range(0, len(data), 1000):
+        r.feed(data[i:i + 1000])
+        got = r.next_message()
+        if got is not None:
+            break
+        positions.append(r.scan[0])
+    assert got == message
+    assert positions == sorted(positions) and positions[-1] > len(data) - 2000   # resumed, never rescanned
+    r.feed(data[i + 1000:])
+    assert bytes(r.next_message().payload) == b"after"
+
+def test_garbage_line_raises():
+    r = MessageReassembler(b"not json\n")
+    with pytest.raises(ValueError):
+        r.next_message()
+
+def test_batching_writer_coalesces_concurrent_writers():
+    a, b = socket.socketpair()
+    writer = BatchingWriter(a, linger=0.005)
+    per_thread, threads = 200, 8
+    expected = threads * per_thread
+    try:
+        def send(t):
+            for i in range(per_thread):
+                writer.write(wire(f"{t}:{i}".encode(), stream=t + 1))
+        workers = [threading.Thread(target=send, args=(t,)) for t in range(threads)]
+        received = []
+        reader = MessageReassembler()
+        for w in workers: w.start()
+        while len(received) < expected:
+            received.append(recv_message(b, reader))
+        for w in workers: w.join()
+        assert writer.messages == expected
+        assert writer.flushes < expected               # several frames per sendmsg
+        for t in range(threads):                       # each writer's order preserved
+            mine = [bytes(f.payload).decode() for f in received if f.stream == t + 1]
+            assert mine == [f"{t}:{i}" for i in range(per_thread)]
+    finally:
+        a.close(); b.close()
+
+def test_unfinished_object_cut_by_a_newline_raises():
+    r = MessageReassembler(b'{"a": \xff\n{"b": 1}')
+    with pytest.raises(ValueError):
+        r.next_message()
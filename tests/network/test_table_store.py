@@ -0,0 +1,110 @@
+"""
+Unit tests for the controller's atomic, generation-stamped table files and
+the router's decoding of their compact binary encoding.
+
+Requires:
+  pip install pytest
+"""
+import json, os, sys
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from table_store import TableStore             # noqa: E402
+from table_codec import read_table             # noqa: E402
+from table_watcher import TableWatcher         # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+PATHS = {"router2": ["router1", "router2"],
+         "router3": ["router1", "router2", "router3"],
+         "router4": ["router1", "router2", "router3", "router4"],
+         "router5": ["router1", "router5"]}
+
+def flow(path, metric, backup=None):
+    entry = {"match": {"destination": path[-1]}, "action": {"forward_to": path[1]},
+             "priority": 100, "path": path, "metric": metric}
+    if backup:
+        entry["action"]["backup_to"] = backup
+        entry["backup_metric"] = metric + 2.0
+        entry["protection"] = "link"
+    return entry
+
+def table():
+    return {"router_id": "router1",
+            "interfaces": {"router2": {"ip_address": "192.168.12.2"}, "router5": {"ip_address": "192.168.15.2"}},
+            "flow_table": [flow(path, float(len(path)), "router5" if len(path) == 3 else None)
+                           for path in PATHS.values()],
+            "routes": [{"destination": d, "destination_subnet": "", "next_hop": p[1], "metric": len(p) - 1}
+                       for d, p in PATHS.items()],
+            "ports": {}}
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_json_tables_are_replaced_whole_and_stamped_once_per_change(tmp_path):
+    store = TableStore(str(tmp_path))
+    first = store.save("router1", table())
+    assert store.save("router1", table()) is first   # same content keeps its generation
+    second = store.save("router2", dict(table(), router_id="router2"))
+    assert (first["generation"], second["generation"], store.writes, store.unchanged) == (1, 2, 2, 1)
+    assert json.loads((tmp_path / "router1_table.json").read_text()) == first
+    assert sorted(os.listdir(tmp_path)) == ["router1_table.json", "router2_table.json"]
+
+def test_removed_tables_are_deleted_and_written_again_if_the_router_returns(tmp_path):
+    store = TableStore(str(tmp_path))
+    store.save("router1", table())
+    store.remove("router1")
+    store.remove("router1")                          # already gone
+    assert os.listdir(tmp_path) == [] and "router1" not in store.tables
+    assert store.save("router1", table())["generation"] == 2 and store.writes == 2
+
+def test_binary_tables_round_trip_including_entries_that_do_not_fit_a_record(tmp_path):
+    store = TableStore(str(tmp_path), "binary")
+    odd = table()
+    odd["flow_table"].insert(1, dict(flow(["router1", "router5", "router6"], 2.0), note="pinned"))
+    odd["flow_table"].append(flow(["router1", "router5", "router3", "router7"], 4.0))  # not on the tree
+    odd["routes"][0]["metric"] = 1.5
+    saved = store.save("router1", odd)
+    assert read_table(store.path("router1")) == saved
+    assert os.path.getsize(store.path("router1")) < len(json.dumps(saved))
+
+def test_next_hop_groups_are_stored_as_member_records(tmp_path):
+    store = TableStore(str(tmp_path), "binary")
+    grouped = table()
+    grouped["flow_table"][2]["action"]["group"] = [{"next_hop": "router2", "weight": 10, "metric": 4.0},
+                                                   {"next_hop": "router5", "weight": 7, "metric": 5.5}]
+    grouped["flow_table"][0]["action"]["group"] = [{"next_hop": "router2", "weight": 10, "metric": 2.0}]  # raw
+    saved = store.save("router1", grouped)
+    assert read_table(store.path("router1")) == saved
+    raw = (tmp_path / "router1_table.bin").read_bytes()
+    assert b"router5" in raw and b"5.5" not in raw and b'"weight"' in raw   # only the one-member group is raw
+
+def test_only_changed_entries_are_decoded_against_the_held_generation(tmp_path):
+    store = TableStore(str(tmp_path), "binary")
+    store.save("router1", table())
+    held = read_table(store.path("router1"))
+    changed = table()
+    changed["flow_table"][3] = flow(["router1", "router2", "router5"], 6.0)
+    saved = store.save("router1", changed)
+    new = read_table(store.path("router1"), held)
+    assert new == saved
+    assert [a is b for a, b in zip(held["flow_table"], new["flow_table"])] == [True, True, True, False]
+    assert all(a is b for a, b in zip(held["routes"], new["routes"]))
+    assert read_table(store.path("router1"), new) is new
+    # Another controller epoch's generations say nothing about the held entries
+    restarted = TableStore(str(tmp_path), "binary")
+    restarted.epoch += 1
+    restarted.save("router1", changed)
+    assert not any(a is b for a, b in zip(new["flow_table"], read_table(restarted.path("router1"), new)["flow_table"]))
+
+def test_watcher_applies_each_binary_generation_once(tmp_path):
+    store = TableStore(str(tmp_path), "binary")
+    store.save("router1", table())
+    seen = []
+    watcher = TableWatcher(store.path("router1"), seen.append, use_inotify=False)
+    assert watcher.check()
+    assert not watcher.check(force=True)
+    store.save("router1", dict(table(), ports={"9000": "exchange"}))
+    assert watcher.check(force=True)
+    assert [t["generation"] for t in seen] == [1, 2] and seen[-1]["ports"] == {"9000": "exchange"}
+    watcher.close()
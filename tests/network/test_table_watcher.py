@@ -0,0 +1,73 @@
+"""
+Unit tests for change-driven routing table reloads.
+
+Requires:
+  pip install pytest
+"""
+import json, os, select, sys, pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/router")))
+
+from table_watcher import TableWatcher, diff_tables   # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def table(next_hop="router2", ip="192.168.12.2"):
+    return {"interfaces": {next_hop: {"ip_address": ip}},
+            "routes": [{"destination": "router10", "next_hop": next_hop, "metric": 3}],
+            "flow_table": []}
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content if isinstance(content, str) else json.dumps(content))
+
+@pytest.fixture
+def watched(tmp_path):
+    path = tmp_path / "router1_table.json"
+    write(path, table())
+    seen = []
+    w = TableWatcher(str(path), seen.append, use_inotify=False)
+    assert w.check()                 # first look always applies the file
+    yield path, w, seen
+    w.close()
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_identical_rewrite_is_not_reloaded(watched):
+    path, w, seen = watched
+    write(path, table())
+    os.utime(path, ns=(1, 1))        # stat changed, content did not
+    assert not w.check()
+    assert len(seen) == 1 and w.reloads == 1
+
+def test_partial_write_is_retried(watched):
+    path, w, seen = watched
+    write(path, '{"interfaces": {')
+    assert not w.check()
+    write(path, table("router3", "192.168.13.2"))
+    assert w.check()
+    assert seen[-1]["routes"][0]["next_hop"] == "router3"
+
+def test_inotify_event_triggers_reload(tmp_path):
+    path = tmp_path / "router1_table.json"
+    write(path, table())
+    seen = []
+    w = TableWatcher(str(path), seen.append)
+    if w.fileno() is None:
+        pytest.skip("inotify not available")
+    w.check()
+    write(path, table("router4"))
+    assert select.select([w.fileno()], [], [], 2)[0]
+    assert w.handle_events()
+    assert seen[-1]["routes"][0]["next_hop"] == "router4"
+    w.close()
+
+def test_diff_reports_only_affected_neighbors_and_routes():
+    old = table()
+    new = table()
+    new["interfaces"]["router4"] = {"ip_address": "192.168.14.2"}
+    new["routes"].append({"destination": "router6", "next_hop": "router4", "metric": 2})
+    diff = diff_tables(old, new)
+    assert diff.added_neighbors == {"router4"}
+    assert not diff.removed_neighbors and not diff.changed_neighbors
+    assert diff.changed_destinations == {"router6"}
+    assert diff_tables(new, new).changed_destinations == set()
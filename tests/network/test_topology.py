@@ -0,0 +1,76 @@
+"""
+Unit tests for the controller's copy-on-write topology versions.
+
+Requires:
+  pip install pytest networkx
+"""
+import os, sys
+
+import networkx as nx
+import pytest
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../network/sdn_controller")))
+
+from shortest_path_trees import ShortestPathTrees   # noqa: E402
+from topology import Topology                       # noqa: E402
+
+# ───────── helpers ──────────────────────────────────────────────────
+def ring(n=6):
+    graph = nx.Graph()
+    for i in range(1, n + 1):
+        graph.add_node(f"router{i}", ports={})
+    for i in range(1, n + 1):
+        graph.add_edge(f"router{i}", f"router{i % n + 1}", weight=1.0, subnet=f"10.0.{i}.0/24")
+    graph.add_edge("router1", "router4", weight=5.0, subnet="10.0.99.0/24")
+    return graph
+
+# ───────── test cases ───────────────────────────────────────────────
+def test_new_weights_make_a_new_version_and_leave_the_old_one_alone():
+    old = Topology(ring())
+    new, changed = old.with_weights({("router1", "router2"): 3.0, ("router2", "router5"): 9.0,
+                                     ("router2", "router3"): 1.0})
+    # router2-router5 is no link and router2-router3 already weighs 1.0
+    assert changed == {("router1", "router2"): 1.0}
+    assert (old.version, new.version) == (0, 1)
+    assert old.graph["router1"]["router2"]["weight"] == 1.0
+    assert new.graph["router2"]["router1"]["weight"] == 3.0
+    assert new.graph["router1"]["router2"]["subnet"] == "10.0.1.0/24"
+    assert list(new.graph.edges) == list(old.graph.edges)
+    with pytest.raises(nx.NetworkXError):
+        new.graph.add_edge("router1", "router3")
+
+def test_only_the_changed_links_ends_are_copied():
+    old = Topology(ring())
+    new, _ = old.with_weights({("router3", "router4"): 2.0})
+    for router in ("router1", "router2", "router5", "router6"):
+        assert new.graph._adj[router] is old.graph._adj[router]
+    for router in ("router3", "router4"):
+        assert new.graph._adj[router] is not old.graph._adj[router]
+    assert new.graph["router4"]["router5"] is old.graph["router4"]["router5"]
+    assert new.graph.nodes["router1"] is old.graph.nodes["router1"]
+
+def test_trees_follow_published_versions():
+    topology = Topology(ring())
+    trees = ShortestPathTrees(topology.graph)
+    for weights in ({("router1", "router2"): 4.0}, {("router1", "router4"): 0.5, ("router5", "router6"): 3.0}):
+        topology, changed = topology.with_weights(weights)
+        trees.update(changed, topology.graph)
+        fresh = ShortestPathTrees(topology.graph)
+        for router in topology.graph:
+            assert trees.distances[router] == pytest.approx(fresh.distances[router])
+    assert topology.replaced(ring()).version == 3
+
+def test_routers_and_links_come_and_go_copying_only_what_they_touch():
+    old = Topology(ring())
+    new = old.restructured(routers={"router7": {"ports": {"8000": "8007"}}},
+                           links={("router6", "router7"): {"weight": 2.0}},
+                           removed_links=[("router1", "router4")])
+    assert list(new.graph) == list(old.graph) + ["router7"]
+    assert new.graph["router7"]["router6"]["weight"] == 2.0 and not new.graph.has_edge("router1", "router4")
+    assert old.graph.has_edge("router1", "router4") and "router7" not in old.graph
+    for router in ("router2", "router3", "router5"):
+        assert new.graph._adj[router] is old.graph._adj[router]
+    gone = new.restructured(removed_routers=["router6"])
+    assert "router6" not in gone.graph and not gone.graph["router7"] and gone.graph.has_edge("router4", "router5")
+    assert new.graph.has_edge("router6", "router7") and gone.version == 2